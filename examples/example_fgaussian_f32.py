@@ -1,12 +1,11 @@
 """
 Example usage of fgaussian_f32 module
-"""
 
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+Requires ftools to be installed, e.g. with ``pip install -e .``.
+"""
 
 import numpy as np
+
 from ftools import fgaussian_f32
 
 
@@ -55,16 +54,17 @@ def example_2d():
     print("Example 3: 2D Gaussian (separable)")
     print("=" * 50)
     
-    # Create 2D grid
-    x = np.linspace(-5, 5, 100)
-    y = np.linspace(-5, 5, 100)
-    X, Y = np.meshgrid(x, y)
+    # The radially symmetric Gaussian exp(-(x^2 + y^2) / (2 sigma^2)) is
+    # separable: evaluate two 1D profiles and take their outer product
+    # instead of evaluating exp() on a full 2D meshgrid.
+    x = np.linspace(-5, 5, 100, dtype=np.float32)
+    y = np.linspace(-5, 5, 100, dtype=np.float32)
     
-    # Compute radial distance
-    R = np.sqrt(X**2 + Y**2)
+    gx = fgaussian_f32(x, i0=1.0, mu=0.0, sigma=1.5)
+    gy = fgaussian_f32(y, i0=1.0, mu=0.0, sigma=1.5)
     
-    # 2D Gaussian (radially symmetric)
-    Z = fgaussian_f32(R, i0=1.0, mu=0.0, sigma=1.5)
+    # 2D Gaussian (peak intensity i0 = 1.0 applied once)
+    Z = np.multiply.outer(gy, gx)
     
     print(f"2D grid shape: {Z.shape}")
     print(f"Peak value: {Z.max():.6f}")
@@ -83,20 +83,32 @@ def example_benchmark():
     n = 10_000_000
     x = np.linspace(-100, 100, n)
     
+    # Bind to a local name before looping: saves a global lookup per call,
+    # which is noticeable when each call only does a little work
+    gaussian = fgaussian_f32
+
     # Warm up
-    _ = fgaussian_f32(x, i0=1.0, mu=0.0, sigma=10.0)
+    _ = gaussian(x, i0=1.0, mu=0.0, sigma=10.0)
     
     # Benchmark C extension (float32)
     start = time.time()
     for _ in range(10):
-        result_c = fgaussian_f32(x, i0=1.0, mu=0.0, sigma=10.0)
+        result_c = gaussian(x, i0=1.0, mu=0.0, sigma=10.0)
     time_c = (time.time() - start) / 10
     
-    # Benchmark NumPy (float64)
+    # Benchmark NumPy (float64), reusing preallocated buffers so the
+    # reference is not dominated by allocating a temporary per operation
     x_f64 = x.astype(np.float64)
+    mu, sigma = 0.0, 10.0
+    inv_2s2 = -1.0 / (2 * sigma * sigma)
+    tmp = np.empty_like(x_f64)
+    result_np = np.empty_like(x_f64)
     start = time.time()
     for _ in range(10):
-        result_np = 1.0 * np.exp(-((x_f64 - 0.0) ** 2) / (2 * 10.0 ** 2))
+        np.subtract(x_f64, mu, out=tmp)
+        np.square(tmp, out=tmp)
+        np.multiply(tmp, inv_2s2, out=tmp)
+        np.exp(tmp, out=result_np)
     time_np = (time.time() - start) / 10
     
     # Verify results match (within float32 precision)
@@ -4,12 +4,12 @@ Example usage of fgaussian_f64 (float64 version)
 
 Demonstrates the float64 version of the Gaussian profile computation.
 This version accepts float64 input arrays for compatibility with existing code.
-"""
 
-import sys
-sys.path.insert(0, 'src')
+Requires ftools to be installed, e.g. with ``pip install -e .``.
+"""
 
 import numpy as np
+
 from ftools.fgaussian import fgaussian_f64
 
 # Example parameters
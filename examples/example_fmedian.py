@@ -8,7 +8,7 @@ the filtered median function to smooth it.
 
 import numpy as np
 
-from ftools.fmedian import fmedian
+from ftools.fmedian import fmedian, fmedian_i16
 
 def main():
     print("=" * 60)
@@ -40,9 +40,15 @@ def main():
     print("\n2. Applying filtered median with parameters:")
     print(f"   - Window size: ({xsize} x {ysize})")
 
+    # Allocate the output buffers once and let fmedian write into them. When
+    # filtering many frames, reusing buffers like this avoids allocating (and
+    # touching) a fresh output array per call.
+    out_a = np.empty_like(input_array)
+    out_b = np.empty_like(input_array)
+
     # Call the fmedian function (exclude_center controls whether center is skipped)
     exclude_center = 1
-    output_array = fmedian(input_array, xsize, ysize, exclude_center=exclude_center)
+    output_array = fmedian(input_array, xsize, ysize, exclude_center=exclude_center, out=out_a)
     
     print("\n3. Output array (filtered median):")
     print(output_array)
@@ -70,9 +76,18 @@ def main():
     print("\n6. Re-running filter (center pixel included)...")
     # Example: include the center pixel this time (exclude_center=0)
     exclude_center = 0
-    output_array2 = fmedian(input_array, xsize, ysize, exclude_center=exclude_center)
+    output_array2 = fmedian(input_array, xsize, ysize, exclude_center=exclude_center, out=out_b)
     print("Output array (second run, exclude_center=0 -> center included):")
     print(output_array2)
+
+    # Detector data is often integer counts already; fmedian_i16 keeps it as
+    # int16 (2 bytes per pixel instead of 8) from input to output
+    print("\n7. Filtering the same data as int16 with fmedian_i16...")
+    counts = input_array.astype(np.int16)
+    output_i16 = fmedian_i16(counts, xsize, ysize, exclude_center=1)
+    print("Output array (int16, even counts rounded down):")
+    print(output_i16)
+    print(f"   Matches floor of the float64 result: {np.array_equal(output_i16, np.floor(output_array))}")
     
     print("\n" + "=" * 60)
     print("Example completed successfully!")
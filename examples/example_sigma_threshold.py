@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Example program flagging outliers (e.g. cosmic-ray hits) by local sigma.
+
+Each pixel is compared with the mean of its neighbors (center excluded),
+in units of the local sigma from ``fsigma``. Pixels more than ``thresh``
+sigma away are flagged and replaced by the neighbor mean.
+
+Run with ``--plot`` to show the intermediate maps (requires matplotlib).
+"""
+
+import sys
+
+import numpy as np
+
+from ftools.fsigma import fsigma
+
+# Approximate bytes per row strip in neighbor_mean_exclude_center (a fraction
+# of a typical L2 cache)
+_STRIP_BYTES = 256 * 1024
+
+# Largest half window summed by adding shifted slices; wider windows use
+# running sums, whose cost does not grow with the window
+_SHIFT_SUM_MAX_HALF = 3
+
+
+def _window_bounds(n, half):
+    """Start and (exclusive) end index of each window along an axis of length n."""
+    i = np.arange(n)
+    return np.clip(i - half, 0, n), np.clip(i + half + 1, 0, n)
+
+
+def _box_sum(a, lo, hi, axis):
+    """Sum of ``a`` over indices lo[i]..hi[i]-1 along ``axis``, for every i."""
+    shape = list(a.shape)
+    shape[axis] = 1
+    running = np.concatenate((np.zeros(shape), np.cumsum(a, axis=axis)), axis=axis)
+    return np.take(running, hi, axis=axis) - np.take(running, lo, axis=axis)
+
+
+def _shift_sum(a, half, start, n, axis):
+    """Sum of ``a`` over windows of 2*half+1 along ``axis``, for indices start..start+n-1.
+
+    Windows are truncated at the ends of ``a``. Only 2*half additions of
+    shifted slices, which beats _box_sum for small windows.
+    """
+    a = np.moveaxis(a, axis, 0)
+    total = a[start:start + n].copy()
+    for d in range(1, half + 1):
+        # Add a[i + d] where it exists, then a[i - d]
+        k = min(n, a.shape[0] - start - d)
+        if k > 0:
+            total[:k] += a[start + d:start + d + k]
+        i0 = max(0, d - start)
+        if i0 < n:
+            total[i0:] += a[start + i0 - d:start + n - d]
+    return np.moveaxis(total, 0, axis)
+
+
+def neighbor_mean_exclude_center(arr, xsize, ysize, out=None):
+    """Mean of each pixel's xsize-by-ysize neighborhood, excluding the pixel itself.
+
+    Windows are truncated at the edges (like fsigma), so edge pixels average
+    fewer neighbors. Where a window holds no neighbors the result is 0.0.
+    The result is written to ``out`` (a float64 array of the input's shape)
+    if given, so repeated calls can reuse one buffer.
+    """
+    arr = np.asarray(arr, dtype=np.float64)
+    xhalf, yhalf = xsize // 2, ysize // 2
+    height, width = arr.shape
+    if out is None:
+        out = np.empty_like(arr)
+
+    # The box sum is separable: a running sum along x, then one along y. Each
+    # pass only accumulates along one row or column, so rounding errors stay
+    # smaller than with a 2D summed-area table over the whole image.
+    y0, y1 = _window_bounds(height, yhalf)
+    x0, x1 = _window_bounds(width, xhalf)
+    # Truncated windows are rectangles, so the pixel counts follow from the bounds
+    ncols = x1 - x0
+
+    # Work through strips of rows (plus yhalf halo rows on each side) small
+    # enough that the temporaries of one strip stay in cache between passes
+    strip = max(_STRIP_BYTES // (8 * max(width, 1)), ysize)
+    for r0 in range(0, height, strip):
+        r1 = min(r0 + strip, height)
+        h0, h1 = y0[r0], y1[r1 - 1]
+        if xhalf <= _SHIFT_SUM_MAX_HALF:
+            rows = _shift_sum(arr[h0:h1], xhalf, 0, width, axis=1)
+        else:
+            rows = _box_sum(arr[h0:h1], x0, x1, axis=1)
+        # The strip holds every image row the windows reach, so truncating
+        # at its ends is truncating at the image edges
+        if yhalf <= _SHIFT_SUM_MAX_HALF:
+            wsum = _shift_sum(rows, yhalf, r0 - h0, r1 - r0, axis=0)
+        else:
+            wsum = _box_sum(rows, y0[r0:r1] - h0, y1[r0:r1] - h0, axis=0)
+        wcnt = np.outer(y1[r0:r1] - y0[r0:r1], ncols).astype(np.float64)
+
+        # Drop the center from the sums and counts in place, then divide
+        wsum -= arr[r0:r1]
+        wcnt -= 1
+        # where= leaves pixels without neighbors unwritten; they only occur
+        # for 1-pixel windows, so fill them afterwards instead of clearing
+        # the whole strip first
+        np.divide(wsum, wcnt, out=out[r0:r1], where=wcnt > 0)
+        if not wcnt.all():
+            out[r0:r1][wcnt == 0] = 0.0
+    return out
+
+
+def score_and_repair(im, sigma, nmean, thresh, eps=1e-12):
+    """Z score, outlier mask and repaired image, in one sweep over the image.
+
+    Returns ``z = (im - nmean) / (sigma + eps)``, ``mask = |z| > thresh`` and
+    ``im`` with the masked pixels replaced by ``nmean``. The stages run strip
+    by strip (like neighbor_mean_exclude_center), so each one reads the
+    previous one's output from cache. The strip of ``repaired`` doubles as
+    scratch space until it is written.
+    """
+    height, width = im.shape
+    z = np.empty_like(im, dtype=np.float64)
+    mask = np.empty(im.shape, dtype=bool)
+    repaired = np.empty_like(im, dtype=np.float64)
+
+    strip = max(_STRIP_BYTES // (8 * max(width, 1)), 1)
+    for r0 in range(0, height, strip):
+        rows = slice(r0, r0 + strip)
+        zs, scratch = z[rows], repaired[rows]
+        np.subtract(im[rows], nmean[rows], out=zs)
+        np.add(sigma[rows], eps, out=scratch)
+        zs /= scratch
+        np.abs(zs, out=scratch)
+        np.greater(scratch, thresh, out=mask[rows])
+        np.copyto(scratch, im[rows])
+        np.copyto(scratch, nmean[rows], where=mask[rows])
+    return z, mask, repaired
+
+
+def make_image(shape=(12, 12), seed=1):
+    """Smooth background plus noise, with a few single-pixel hits."""
+    rng = np.random.default_rng(seed)
+    y, x = np.indices(shape)
+    im = 100.0 + 2.0 * x + 1.0 * y + rng.normal(0.0, 3.0, size=shape)
+    im[3, 4] += 300.0
+    im[8, 9] += 150.0
+    im[6, 1] -= 120.0
+    return im
+
+
+def main(plot=False):
+    print("=" * 60)
+    print("Sigma Threshold Example")
+    print("=" * 60)
+
+    print("\n1. Creating sample image with three outliers...")
+    im = make_image()
+    print(np.array2string(im, precision=0, suppress_small=True, max_line_width=120))
+
+    # Define filter parameters
+    xsize = 3      # Window size in x direction (must be odd)
+    ysize = 3      # Window size in y direction (must be odd)
+    thresh = 5.0   # Flag pixels more than thresh sigma from the neighbor mean
+    eps = 1e-12    # Guards against division by zero in flat regions
+
+    print("\n2. Computing local sigma and neighbor mean (center excluded)...")
+    print(f"   - Window size: ({xsize} x {ysize})")
+    sigma = fsigma(im, xsize, ysize, exclude_center=1)
+    nmean = neighbor_mean_exclude_center(im, xsize, ysize)
+
+    print(f"\n3. Flagging pixels with |z| > {thresh}...")
+    z, mask, repaired = score_and_repair(im, sigma, nmean, thresh, eps)
+    print(mask.view(np.uint8))
+    for y, x in np.argwhere(mask):
+        print(f"   Position ({y}, {x}): {im[y, x]:.1f} (z = {z[y, x]:.1f})")
+
+    print("\n4. Replacing flagged pixels by the neighbor mean...")
+    print(np.array2string(repaired, precision=0, suppress_small=True, max_line_width=120))
+
+    if plot:
+        import matplotlib.pyplot as plt
+        from mpl_toolkits.axes_grid1 import ImageGrid
+
+        zmax = float(np.nanmax(np.abs(z)))
+        panels = [
+            (im, "Input", "viridis", {}),
+            (sigma, "Local sigma", "magma", {}),
+            (nmean, "Neighbor mean", "viridis", {}),
+            (z, "z = (input - mean) / sigma", "coolwarm", {"vmin": -zmax, "vmax": zmax}),
+            (mask, f"|z| > {thresh}", "gray", {}),
+            (repaired, "Repaired", "viridis", {}),
+        ]
+        # ImageGrid lays out the panels and their colorbar axes once, up front
+        fig = plt.figure(figsize=(12, 7))
+        grid = ImageGrid(fig, 111, nrows_ncols=(2, 3), axes_pad=0.5,
+                         cbar_mode="each", cbar_size="4%", cbar_pad=0.05)
+        for ax, cax, (data, title, cmap, kwargs) in zip(grid, grid.cbar_axes, panels):
+            image = ax.imshow(data, cmap=cmap, **kwargs)
+            ax.set_title(title)
+            cax.colorbar(image)
+        plt.show()
+
+    print("\n" + "=" * 60)
+    print("Example completed successfully!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main(plot="--plot" in sys.argv[1:])
@@ -3,7 +3,12 @@ from __future__ import annotations
 import io
 import os
 import sys
+import tempfile
+
+import numpy
 from setuptools import setup, find_packages, Extension
+from setuptools.command.build_ext import build_ext
+from setuptools.errors import CompileError, LinkError
 
 
 def read_readme():
@@ -15,17 +20,9 @@ def read_readme():
     return "ftools: C-based local image filters (fmedian, fsigma)"
 
 
-# Try to obtain numpy include dir; setup_requires ensures numpy is available when
-# building via setuptools, but fall back gracefully to an empty list at import-time.
-include_dirs = []
-try:
-    import numpy as _np
-
-    include_dirs = [_np.get_include()]
-except Exception:
-    # numpy may not yet be available at import time; setup_requires=['numpy'] will
-    # request it at build time.
-    include_dirs = []
+# numpy is listed in pyproject.toml's build-system requires, so pip installs it
+# (in the isolated build environment) before running this file.
+include_dirs = [numpy.get_include()]
 
 # Platform-specific settings for fgaussian
 fgaussian_extra_link_args = []
@@ -34,53 +31,150 @@ if sys.platform == "darwin":
     fgaussian_extra_link_args = ["-framework", "Accelerate"]
 # On Linux/other platforms, no special linking needed (uses standard math library)
 
+# The filters skip NaN values with isnan(), so they must not be built with
+# -ffast-math (which lets the compiler assume NaN never occurs). The fgaussian
+# kernels do not look for NaN, so they may. (-funroll-loops was measured on
+# the filters and made no difference.)
+filter_extra_compile_args = ["-O3"]
+fgaussian_extra_compile_args = ["-O3", "-ffast-math"]
+
+# The median filters #include the sorting sources rather than compiling them
+# separately; list them so build_ext rebuilds when (and only when) they change.
+sorting_depends = [
+    os.path.join("src", "ftools", "sorting", "sorting.c"),
+    os.path.join("src", "ftools", "sorting", "sorting_networks_generated.c"),
+    os.path.join("src", "ftools", "sorting", "sorting_networks_median.c"),
+    os.path.join("src", "ftools", "sorting", "sorting_networks_avx2.c"),
+    os.path.join("src", "ftools", "sorting", "sorting_networks_avx512.c"),
+    os.path.join("src", "ftools", "sorting", "sorting_networks_neon.c"),
+]
+
+# Extensions whose kernels are parallelized with OpenMP (when available)
+openmp_extensions = {
+    "ftools.fmedian.fmedian_ext",
+    "ftools.fmedian3.fmedian3_ext",
+    "ftools.fsigma.fsigma_ext",
+}
+
+
+def openmp_flags(compiler):
+    """Return (compile_args, link_args) enabling OpenMP for ``compiler``.
+
+    Returns empty lists if the compiler cannot build and link a trivial OpenMP
+    program (e.g. Apple clang without libomp) or if FTOOLS_OPENMP=0 is set;
+    the extensions then build single-threaded.
+    """
+    if os.environ.get("FTOOLS_OPENMP", "1") == "0":
+        return [], []
+    if compiler.compiler_type == "msvc":
+        return ["/openmp"], []
+
+    flags = ["-fopenmp"]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = os.path.join(tmpdir, "omp_test.c")
+        with open(src, "w") as fh:
+            fh.write("#include <omp.h>\nint main(void) { return omp_get_max_threads() > 0 ? 0 : 1; }\n")
+        try:
+            objects = compiler.compile([src], output_dir=tmpdir, extra_postargs=flags)
+            compiler.link_executable(objects, "omp_test", output_dir=tmpdir, extra_postargs=flags)
+        except (CompileError, LinkError):
+            return [], []
+    return flags, flags
+
+
+def native_flags(compiler):
+    """Return compile args tuning the extensions for the build machine's CPU.
+
+    Only used when FTOOLS_NATIVE=1 is set, since the resulting binaries may not
+    run on other CPUs. Returns an empty list if the compiler rejects the flag
+    (or is MSVC). The flag only selects the instruction set; -ffast-math stays
+    off, as the filters rely on isnan().
+    """
+    if os.environ.get("FTOOLS_NATIVE", "0") != "1" or compiler.compiler_type == "msvc":
+        return []
+
+    # GCC and x86 clang accept -march=native; clang on Apple Silicon wants -mcpu
+    for flags in (["-march=native"], ["-mcpu=native"]):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            src = os.path.join(tmpdir, "native_test.c")
+            with open(src, "w") as fh:
+                fh.write("int main(void) { return 0; }\n")
+            try:
+                compiler.compile([src], output_dir=tmpdir, extra_postargs=flags + ["-Werror"])
+            except CompileError:
+                continue
+        return flags
+    return []
+
+
+class BuildExt(build_ext):
+    """build_ext that enables OpenMP (and optionally native CPU tuning)."""
+
+    def build_extensions(self):
+        compile_args, link_args = openmp_flags(self.compiler)
+        cpu_args = native_flags(self.compiler)
+        for ext in self.extensions:
+            ext.extra_compile_args = list(ext.extra_compile_args or []) + cpu_args
+            if ext.name in openmp_extensions:
+                ext.extra_compile_args = list(ext.extra_compile_args or []) + compile_args
+                ext.extra_link_args = list(ext.extra_link_args or []) + link_args
+        super().build_extensions()
+
+
+# fmedian_ext takes its arrays through the Python buffer protocol and does not
+# use the NumPy C-API, so it needs no NumPy headers and no NumPy at import.
 ext_modules = [
     Extension(
         "ftools.fmedian.fmedian_ext",
         sources=[os.path.join("src", "ftools", "fmedian", "fmedian_ext.c")],
-        include_dirs=include_dirs,
+        depends=sorting_depends,
+        extra_compile_args=filter_extra_compile_args,
     ),
     Extension(
         "ftools.fsigma.fsigma_ext",
         sources=[os.path.join("src", "ftools", "fsigma", "fsigma_ext.c")],
         include_dirs=include_dirs,
+        extra_compile_args=filter_extra_compile_args,
     ),
     Extension(
         "ftools.fmedian3.fmedian3_ext",
         sources=[os.path.join("src", "ftools", "fmedian3", "fmedian3_ext.c")],
+        depends=sorting_depends,
         include_dirs=include_dirs,
+        extra_compile_args=filter_extra_compile_args,
     ),
     Extension(
         "ftools.fsigma3.fsigma3_ext",
         sources=[os.path.join("src", "ftools", "fsigma3", "fsigma3_ext.c")],
         include_dirs=include_dirs,
+        extra_compile_args=filter_extra_compile_args,
     ),
     Extension(
         "ftools.fgaussian.fgaussian_f32_ext",
         sources=[os.path.join("src", "ftools", "fgaussian", "fgaussian_f32_ext.c")],
         include_dirs=include_dirs,
-        extra_compile_args=["-O3", "-ffast-math"],
+        extra_compile_args=fgaussian_extra_compile_args,
         extra_link_args=fgaussian_extra_link_args,
     ),
     Extension(
         "ftools.fgaussian.fgaussian_f64_ext",
         sources=[os.path.join("src", "ftools", "fgaussian", "fgaussian_f64_ext.c")],
         include_dirs=include_dirs,
-        extra_compile_args=["-O3", "-ffast-math"],
+        extra_compile_args=fgaussian_extra_compile_args,
         extra_link_args=fgaussian_extra_link_args,
     ),
     Extension(
         "ftools.fgaussian.fgaussian_jacobian_f32_ext",
         sources=[os.path.join("src", "ftools", "fgaussian", "fgaussian_jacobian_f32_ext.c")],
         include_dirs=include_dirs,
-        extra_compile_args=["-O3", "-ffast-math"],
+        extra_compile_args=fgaussian_extra_compile_args,
         extra_link_args=fgaussian_extra_link_args,
     ),
     Extension(
         "ftools.fgaussian.fgaussian_jacobian_f64_ext",
         sources=[os.path.join("src", "ftools", "fgaussian", "fgaussian_jacobian_f64_ext.c")],
         include_dirs=include_dirs,
-        extra_compile_args=["-O3", "-ffast-math"],
+        extra_compile_args=fgaussian_extra_compile_args,
         extra_link_args=fgaussian_extra_link_args,
     ),
 ]
@@ -97,8 +191,10 @@ setup(
     package_dir={"": "src"},
     packages=find_packages("src"),
     ext_modules=ext_modules,
-    setup_requires=["numpy>=1.20"],
+    cmdclass={"build_ext": BuildExt},
     install_requires=["numpy>=1.20"],
+    # Numba backs fmedian and fsigma when the extensions are not built
+    extras_require={"numba": ["numba"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "Programming Language :: C",
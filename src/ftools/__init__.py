@@ -2,15 +2,63 @@
 
 Expose unified function names at package level so users can call
 `fmedian` and `fsigma` with either 2D or 3D arrays.
+
+When calling a filter many times in a tight loop (e.g. tile by tile), bind
+the implementation to a local name first, e.g. ``median = ftools.fmedian2d``,
+or get a filter with the window bound from ``make_fmedian``/``make_fsigma``,
+to avoid the attribute lookup and dispatch on every iteration.
 """
+import importlib
+
+# The 2D loaders are imported eagerly: importing the ftools.fmedian and
+# ftools.fsigma subpackages after the dispatchers below are defined would
+# rebind the package attributes of the same name to the subpackages.
 from .fmedian import fmedian as _fmedian2d
 from .fsigma import fsigma as _fsigma2d
-from .fmedian3 import fmedian3 as _fmedian3d
-from .fsigma3 import fsigma3 as _fsigma3d
-from .fgaussian import fgaussian_f32, fgaussian_f64
 
+# Everything else is loaded on first attribute access (PEP 562), so callers
+# that only filter 2D images never load the 3D or fgaussian extensions.
+_LAZY = {
+    "fmedian3d": ("fmedian3", "fmedian3"),
+    "fsigma3d": ("fsigma3", "fsigma3"),
+    "fgaussian_f32": ("fgaussian", "fgaussian_f32"),
+    "fgaussian_f64": ("fgaussian", "fgaussian_f64"),
+}
+
+
+def __getattr__(name):
+    try:
+        module, attr = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(f".{module}", __name__), attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+# Implementations by number of window dimensions. The 3D entries are added
+# by _implementation() on first use, keeping the 3D extensions lazy.
+_FMEDIAN_BY_NDIM = {2: _fmedian2d}
+_FSIGMA_BY_NDIM = {2: _fsigma2d}
 
-def fmedian(input_array, window_size: tuple, exclude_center: int = 0):
+
+def _implementation(table, window_size, name3d):
+    """Return the implementation in ``table`` for the length of window_size."""
+    if not isinstance(window_size, (tuple, list)):
+        raise TypeError("window_size must be a tuple or list")
+    impl = table.get(len(window_size))
+    if impl is None:
+        if len(window_size) != 3:
+            raise ValueError(f"window_size must be a 2-tuple or 3-tuple, got {len(window_size)} elements")
+        impl = table[3] = __getattr__(name3d)
+    return impl
+
+
+def fmedian(input_array, window_size: tuple, exclude_center: int = 0, out=None):
     """Compute filtered median for 2D or 3D arrays.
 
     Automatically dispatches to the appropriate implementation based on window_size length.
@@ -20,9 +68,11 @@ def fmedian(input_array, window_size: tuple, exclude_center: int = 0):
     - window_size: Tuple of window dimensions (xsize, ysize) for 2D or (xsize, ysize, zsize) for 3D
                    All values must be odd positive integers
     - exclude_center: Whether to exclude center pixel/voxel (default: 0)
+    - out: Optional float64 array of the input's shape to write the result
+      into (and return), saving the allocation of a new one on every call
 
     Returns:
-    - Filtered array of same shape as input
+    - Filtered array of same shape as input (``out`` if given)
 
     Examples:
     >>> # 2D array
@@ -30,28 +80,13 @@ def fmedian(input_array, window_size: tuple, exclude_center: int = 0):
     >>> # 3D array
     >>> result = fmedian(array_3d, (3, 3, 3))
     """
-    import numpy as np
+    impl = _implementation(_FMEDIAN_BY_NDIM, window_size, "fmedian3d")
+    if out is not None:
+        return impl(input_array, *window_size, exclude_center, out=out)
+    return impl(input_array, *window_size, exclude_center)
 
-    arr = np.asarray(input_array)
-    
-    if not isinstance(window_size, (tuple, list)):
-        raise TypeError("window_size must be a tuple or list")
-    
-    if len(window_size) == 2:
-        xsize, ysize = window_size
-        from .fmedian import fmedian as fmedian2d
-        return fmedian2d(arr, xsize, ysize, exclude_center)
-    
-    elif len(window_size) == 3:
-        xsize, ysize, zsize = window_size
-        from .fmedian3 import fmedian3
-        return fmedian3(arr, xsize, ysize, zsize, exclude_center)
-    
-    else:
-        raise ValueError(f"window_size must be a 2-tuple or 3-tuple, got {len(window_size)} elements")
-
-
-def fsigma(input_array, window_size: tuple, exclude_center: int = 0):
+
+def fsigma(input_array, window_size: tuple, exclude_center: int = 0, out=None):
     """Compute local population standard deviation for 2D or 3D arrays.
 
     Automatically dispatches to the appropriate implementation based on window_size length.
@@ -61,9 +96,11 @@ def fsigma(input_array, window_size: tuple, exclude_center: int = 0):
     - window_size: Tuple of window dimensions (xsize, ysize) for 2D or (xsize, ysize, zsize) for 3D
                    All values must be odd positive integers
     - exclude_center: Whether to exclude center pixel/voxel (default: 0)
+    - out: Optional float64 array of the input's shape to write the result
+      into (and return), saving the allocation of a new one on every call
 
     Returns:
-    - Array of local standard deviations, same shape as input
+    - Array of local standard deviations, same shape as input (``out`` if given)
 
     Examples:
     >>> # 2D array
@@ -71,32 +108,46 @@ def fsigma(input_array, window_size: tuple, exclude_center: int = 0):
     >>> # 3D array
     >>> result = fsigma(array_3d, (3, 3, 3))
     """
-    import numpy as np
+    impl = _implementation(_FSIGMA_BY_NDIM, window_size, "fsigma3d")
+    if out is not None:
+        return impl(input_array, *window_size, exclude_center, out=out)
+    return impl(input_array, *window_size, exclude_center)
 
-    arr = np.asarray(input_array)
-    
-    if not isinstance(window_size, (tuple, list)):
-        raise TypeError("window_size must be a tuple or list")
-    
-    if len(window_size) == 2:
-        xsize, ysize = window_size
-        from .fsigma import fsigma as fsigma2d
-        return fsigma2d(arr, xsize, ysize, exclude_center)
-    
-    elif len(window_size) == 3:
-        xsize, ysize, zsize = window_size
-        from .fsigma3 import fsigma3
-        return fsigma3(arr, xsize, ysize, zsize, exclude_center)
-    
-    else:
-        raise ValueError(f"window_size must be a 2-tuple or 3-tuple, got {len(window_size)} elements")
+
+def _make_filter(table, window_size, exclude_center, name3d):
+    impl = _implementation(table, window_size, name3d)
+    sizes = tuple(window_size)
+
+    def bound_filter(input_array, out=None):
+        if out is not None:
+            return impl(input_array, *sizes, exclude_center, out=out)
+        return impl(input_array, *sizes, exclude_center)
+
+    return bound_filter
+
+
+def make_fmedian(window_size: tuple, exclude_center: int = 0):
+    """Return ``f`` such that ``f(input_array, out=None)`` is ``fmedian(input_array, window_size, exclude_center, out)``.
+
+    The implementation is chosen once, here, so calling ``f`` in a loop skips
+    the dispatch on the window size.
+    """
+    return _make_filter(_FMEDIAN_BY_NDIM, window_size, exclude_center, "fmedian3d")
+
+
+def make_fsigma(window_size: tuple, exclude_center: int = 0):
+    """Return ``f`` such that ``f(input_array, out=None)`` is ``fsigma(input_array, window_size, exclude_center, out)``.
+
+    The implementation is chosen once, here, so calling ``f`` in a loop skips
+    the dispatch on the window size.
+    """
+    return _make_filter(_FSIGMA_BY_NDIM, window_size, exclude_center, "fsigma3d")
 
 
 # Keep the specific implementations available for direct access if needed
 fmedian2d = _fmedian2d
 fsigma2d = _fsigma2d
-fmedian3d = _fmedian3d
-fsigma3d = _fsigma3d
 
 __version__ = "3.0.0"
-__all__ = ["fmedian", "fsigma", "fgaussian_f32", "fgaussian_f64", "fmedian2d", "fsigma2d", "fmedian3d", "fsigma3d"]
+__all__ = ["fmedian", "fsigma", "fgaussian_f32", "fgaussian_f64", "fmedian2d", "fsigma2d", "fmedian3d", "fsigma3d",
+           "make_fmedian", "make_fsigma"]
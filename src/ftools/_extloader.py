@@ -0,0 +1,72 @@
+"""Shared loader for the compiled extensions of the ftools subpackages.
+
+setup.py builds each extension under its package-qualified name (e.g.
+ftools.fmedian.fmedian_ext), so a normal build or install resolves with a
+plain import and the filesystem scan below never runs. Legacy builds put
+the shared object in a directory of the subpackage's name at the
+repository root instead.
+"""
+from __future__ import annotations
+
+import importlib
+import importlib.machinery
+import importlib.util
+import os
+import sys
+from types import ModuleType
+
+
+def load_ext(package: str, name: str, fallback: str | None = None) -> ModuleType:
+    """Import and return the extension module `name` of subpackage `package`.
+
+    If the extension is not importable as a submodule, the legacy repository
+    layout is searched for it; if it is not there either, the pure-Python
+    module `fallback` of the subpackage (e.g. a Numba implementation of the
+    same entry points) is returned when given and importable.
+    """
+    try:
+        # import_module rather than `from . import`, because the latter
+        # would first look the name up through the package's __getattr__
+        return importlib.import_module(f"{package}.{name}")
+    except ImportError as exc:
+        error = exc
+
+    # The import above has already searched the package directory (and
+    # reports why a file found there failed to load), so only the legacy
+    # repository-root layout is left. Probe the exact file name for each
+    # suffix the interpreter accepts, in its order of preference.
+    subdir = package.rsplit(".", 1)[-1]
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    for suffix in importlib.machinery.EXTENSION_SUFFIXES:
+        so_path = os.path.join(repo_root, subdir, name + suffix)
+        if os.path.exists(so_path):
+            break
+    else:
+        so_path = None
+
+    if so_path is None:
+        suffix = importlib.machinery.EXTENSION_SUFFIXES[0]
+        message = (
+            f"Could not locate the compiled {subdir} extension (expected src/ftools/{subdir}/{name}{suffix} "
+            f"or {subdir}/{name}{suffix}). Build it first or install the package so the extension is available"
+        )
+        if fallback is None:
+            raise ImportError(message + ".") from error
+        # No compiled extension anywhere: use the fallback if it imports
+        # (i.e. if Numba is installed)
+        try:
+            return importlib.import_module(f"{package}.{fallback}")
+        except ImportError:
+            raise ImportError(message + " (or install numba to use the slower JIT-compiled fallback).") from error
+
+    # The loader name must match the compiled module name, so that the
+    # PyInit symbol is found
+    loader = importlib.machinery.ExtensionFileLoader(name, so_path)
+    spec = importlib.util.spec_from_loader(name, loader)
+    if spec is None:
+        raise ImportError(f"Could not create module spec for {name}")
+    ext = importlib.util.module_from_spec(spec)
+    loader.exec_module(ext)  # type: ignore[arg-type]
+    # Register it under its package-qualified name, so that importing
+    # package.name later finds it without another scan
+    return sys.modules.setdefault(f"{package}.{name}", ext)
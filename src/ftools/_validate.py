@@ -0,0 +1,36 @@
+"""Argument checks shared by the wrappers of the ftools subpackages.
+
+Each filter validates its arguments in Python before calling into C, with
+the same rules and error messages; the extensions keep their own checks
+only as a backstop.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+
+def check_num_threads(num_threads):
+    """Validate num_threads and return the value passed to C (0 = OpenMP default)."""
+    if num_threads is None:
+        return 0
+    num_threads = int(num_threads)
+    if num_threads <= 0:
+        raise ValueError(f"num_threads must be positive, got {num_threads}")
+    return num_threads
+
+
+def output_array(out, arr):
+    """Return ``out`` checked as the float64 output for ``arr``, or a new array if None."""
+    if out is None:
+        # Left uninitialized on purpose: the kernels write every element, so
+        # zero-filling it first would only add a pass over the whole array
+        return np.empty(arr.shape, dtype=np.float64)
+    if not isinstance(out, np.ndarray) or out.dtype != np.float64:
+        raise TypeError("out must be a float64 numpy array")
+    if out.shape != arr.shape:
+        raise ValueError(f"out must have the shape of the input {arr.shape}, got {out.shape}")
+    if not out.flags.writeable:
+        raise ValueError("out must be writeable")
+    if np.may_share_memory(out, arr):
+        raise ValueError("out must not overlap the input array")
+    return out
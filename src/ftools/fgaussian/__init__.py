@@ -5,35 +5,43 @@ Provides high-performance computation of Gaussian profiles using C extensions.
 Uses float32 for optimal performance (~5x faster than NumPy float64).
 """
 
-from . import fgaussian_f32_ext
-from . import fgaussian_f64_ext
+# Bind only the public C entry points; the wrappers below call these names
+# directly instead of looking them up on the extension module each call.
+from .fgaussian_f32_ext import fgaussian_f32 as _c_fgaussian_f32
+from .fgaussian_f64_ext import fgaussian_f64 as _c_fgaussian_f64
 
 
-def fgaussian_f32(x, i0, mu, sigma):
+def fgaussian_f32(x, i0, mu, sigma, out=None):
     """
     Compute Gaussian profile: i0 * exp(-((x - mu)^2) / (2 * sigma^2))
     
     Parameters
     ----------
     x : numpy.ndarray
-        Input array (Doppler or wavelength values), dtype=float32.
+        Input array (Doppler or wavelength values), dtype=float32 or
+        float64, with any strides. Both are read in place; float64
+        values are narrowed only after (x - mu)^2 / (2 * sigma^2).
     i0 : float
         Peak intensity. Must be scalar.
     mu : float
         Center position (Doppler shift). Must be scalar.
     sigma : float
         Width parameter. Must be scalar and positive.
+    out : numpy.ndarray, optional
+        float32 array of x's shape (any strides) to write the profile to
+        and return instead of a new array, e.g. to reuse one buffer when
+        a fit evaluates the profile many times. May be x itself.
     
     Returns
     -------
     numpy.ndarray
-        Gaussian profile with same shape as x, dtype=float32.
+        Gaussian profile with same shape as x, dtype=float32 (out, if
+        given).
     
     Notes
     -----
     Uses Apple Accelerate framework for vectorized computation.
-    No validation or type conversion is performed.
-    Assumes x is already float32 numpy array.
+    No validation is performed beyond sigma > 0.
     
     Performance: ~5x faster than NumPy with float64.
     Accuracy: <1e-7 difference vs float64 for typical values.
@@ -45,10 +53,10 @@ def fgaussian_f32(x, i0, mu, sigma):
     >>> x = np.linspace(-5, 5, 100, dtype=np.float32)
     >>> profile = fgaussian_f32(x, i0=1.0, mu=0.0, sigma=1.0)
     """
-    return fgaussian_f32_ext.fgaussian_f32(x, i0, mu, sigma)
+    return _c_fgaussian_f32(x, i0, mu, sigma, out)
 
 
-def fgaussian_f64(x, i0, mu, sigma):
+def fgaussian_f64(x, i0, mu, sigma, out=None):
     """
     Compute Gaussian profile: i0 * exp(-((x - mu)^2) / (2 * sigma^2))
     
@@ -57,18 +65,24 @@ def fgaussian_f64(x, i0, mu, sigma):
     Parameters
     ----------
     x : numpy.ndarray
-        Input array (Doppler or wavelength values), dtype=float64.
+        Input array (Doppler or wavelength values), dtype=float64 or
+        float32, with any strides. Both are read in place (float32 values
+        are widened as they are read); other dtypes are converted.
     i0 : float
         Peak intensity. Must be scalar.
     mu : float
         Center position (Doppler shift). Must be scalar.
     sigma : float
         Width parameter. Must be scalar and positive.
+    out : numpy.ndarray, optional
+        float64 array of x's shape (any strides) to write the profile to
+        and return instead of a new array. May be x itself.
     
     Returns
     -------
     numpy.ndarray
-        Gaussian profile with same shape as x, dtype=float64.
+        Gaussian profile with same shape as x, dtype=float64 (out, if
+        given).
     
     Notes
     -----
@@ -82,7 +96,7 @@ def fgaussian_f64(x, i0, mu, sigma):
     >>> x = np.linspace(-5, 5, 100, dtype=np.float64)
     >>> profile = fgaussian_f64(x, i0=1.0, mu=0.0, sigma=1.0)
     """
-    return fgaussian_f64_ext.fgaussian_f64(x, i0, mu, sigma)
+    return _c_fgaussian_f64(x, i0, mu, sigma, out)
 
 
 __all__ = ['fgaussian_f32', 'fgaussian_f64']
@@ -64,6 +64,102 @@ static void compute_gaussian_scalar_float(const float *x, float i0, float mu, fl
   }
 }
 
+#if !defined(USE_ACCELERATE) && defined(__x86_64__) && (defined(__GNUC__) || defined(__clang__))
+#define FGAUSSIAN_HAVE_AVX2 1
+#include <immintrin.h>
+
+static int fgaussian_use_avx2 = 0;
+
+/*
+ * exp of eight float arguments, none of them positive, evaluated inline
+ * instead of through libm: the argument is split as k * ln2 + r with
+ * |r| <= ln2 / 2 (ln2 in two parts, so that k * ln2 is exact), exp(r)
+ * comes from the Cephes expf polynomial and 2^k is built directly in the
+ * exponent bits. Accurate to about 1 ulp; arguments below the smallest
+ * normal float give 0, NaN gives NaN.
+ */
+static inline __attribute__((always_inline, target("avx2,fma"))) __m256 exp_nonpositive_ps(__m256 e)
+{
+  const __m256 lowest = _mm256_set1_ps(-87.33654f); /* log(FLT_MIN) */
+  /* Clamp the tiny arguments (max keeps NaN, which is its second operand)
+     and zero their results below */
+  __m256 underflow = _mm256_cmp_ps(e, lowest, _CMP_LT_OQ);
+  e = _mm256_max_ps(lowest, e);
+
+  __m256 k = _mm256_round_ps(_mm256_mul_ps(e, _mm256_set1_ps(1.44269504088896341f)),
+                             _MM_FROUND_TO_NEAREST_INT | _MM_FROUND_NO_EXC);
+  __m256 r = _mm256_fnmadd_ps(k, _mm256_set1_ps(0.693359375f), e);
+  r = _mm256_fnmadd_ps(k, _mm256_set1_ps(-2.12194440e-4f), r);
+
+  __m256 p = _mm256_set1_ps(1.9875691500e-4f);
+  p = _mm256_fmadd_ps(p, r, _mm256_set1_ps(1.3981999507e-3f));
+  p = _mm256_fmadd_ps(p, r, _mm256_set1_ps(8.3334519073e-3f));
+  p = _mm256_fmadd_ps(p, r, _mm256_set1_ps(4.1665795894e-2f));
+  p = _mm256_fmadd_ps(p, r, _mm256_set1_ps(1.6666665459e-1f));
+  p = _mm256_fmadd_ps(p, r, _mm256_set1_ps(5.0000001201e-1f));
+  p = _mm256_fmadd_ps(p, _mm256_mul_ps(r, r), _mm256_add_ps(r, _mm256_set1_ps(1.0f)));
+
+  __m256i bits = _mm256_slli_epi32(_mm256_add_epi32(_mm256_cvtps_epi32(k), _mm256_set1_epi32(127)), 23);
+  return _mm256_andnot_ps(underflow, _mm256_mul_ps(p, _mm256_castsi256_ps(bits)));
+}
+
+/*
+ * AVX2 implementation (float), eight values at a time
+ */
+__attribute__((target("avx2,fma"))) static void compute_gaussian_avx2_float(const float *x, float i0,
+                                                                           float mu, float sigma,
+                                                                           float *result, npy_intp n)
+{
+  const float neg_inv_two_sigma_sq = -1.0f / (2.0f * sigma * sigma);
+  const __m256 vmu = _mm256_set1_ps(mu);
+  const __m256 vi0 = _mm256_set1_ps(i0);
+  const __m256 vscale = _mm256_set1_ps(neg_inv_two_sigma_sq);
+
+  npy_intp i = 0;
+  for (; i + 8 <= n; i += 8)
+  {
+    __m256 d = _mm256_sub_ps(_mm256_loadu_ps(x + i), vmu);
+    __m256 e = _mm256_mul_ps(_mm256_mul_ps(d, d), vscale);
+    _mm256_storeu_ps(result + i, _mm256_mul_ps(vi0, exp_nonpositive_ps(e)));
+  }
+  for (; i < n; i++)
+  {
+    float diff = x[i] - mu;
+    result[i] = i0 * expf(diff * diff * neg_inv_two_sigma_sq);
+  }
+}
+
+/*
+ * AVX2 implementation for float64 input, eight values at a time: the
+ * exponent is formed in double and narrowed to float for exp
+ */
+__attribute__((target("avx2,fma"))) static void compute_gaussian_avx2_double(const double *x, float i0,
+                                                                            float mu, float sigma,
+                                                                            float *result, npy_intp n)
+{
+  const double neg_inv_two_sigma_sq = -1.0 / (2.0 * (double)sigma * sigma);
+  const __m256d vmu = _mm256_set1_pd(mu);
+  const __m256d vscale = _mm256_set1_pd(neg_inv_two_sigma_sq);
+  const __m256 vi0 = _mm256_set1_ps(i0);
+
+  npy_intp i = 0;
+  for (; i + 8 <= n; i += 8)
+  {
+    __m256d d0 = _mm256_sub_pd(_mm256_loadu_pd(x + i), vmu);
+    __m256d d1 = _mm256_sub_pd(_mm256_loadu_pd(x + i + 4), vmu);
+    __m128 e0 = _mm256_cvtpd_ps(_mm256_mul_pd(_mm256_mul_pd(d0, d0), vscale));
+    __m128 e1 = _mm256_cvtpd_ps(_mm256_mul_pd(_mm256_mul_pd(d1, d1), vscale));
+    __m256 e = _mm256_insertf128_ps(_mm256_castps128_ps256(e0), e1, 1);
+    _mm256_storeu_ps(result + i, _mm256_mul_ps(vi0, exp_nonpositive_ps(e)));
+  }
+  for (; i < n; i++)
+  {
+    double diff = x[i] - mu;
+    result[i] = i0 * expf((float)(diff * diff * neg_inv_two_sigma_sq));
+  }
+}
+#endif
+
 /*
  * Main computation function - dispatches to appropriate implementation
  */
@@ -73,22 +169,116 @@ static void compute_gaussian_float(const float *x, float i0, float mu, float sig
 #ifdef USE_ACCELERATE
   compute_gaussian_accelerate_float(x, i0, mu, sigma, result, n);
 #else
+#ifdef FGAUSSIAN_HAVE_AVX2
+  if (fgaussian_use_avx2)
+  {
+    compute_gaussian_avx2_float(x, i0, mu, sigma, result, n);
+    return;
+  }
+#endif
   compute_gaussian_scalar_float(x, i0, mu, sigma, result, n);
 #endif
 }
 
 /*
- * Python interface: fgaussian_f32(x, i0, mu, sigma)
+ * One inner loop of the iteration over x: n values of x (float32 or
+ * float64, as type_num says) at x_stride bytes apart into float32 values
+ * at result_stride bytes apart. Contiguous loops go through the vector
+ * implementations; float64 values are not narrowed before the exponent.
+ */
+static void compute_gaussian_strided(const char *x, npy_intp x_stride, int type_num, float i0,
+                                     float mu, float sigma, char *result, npy_intp result_stride,
+                                     npy_intp n)
+{
+  int contiguous = result_stride == (npy_intp)sizeof(float) &&
+                   x_stride == (type_num == NPY_DOUBLE ? (npy_intp)sizeof(double) : (npy_intp)sizeof(float));
+  if (contiguous && type_num == NPY_FLOAT)
+  {
+    compute_gaussian_float((const float *)x, i0, mu, sigma, (float *)result, n);
+    return;
+  }
+#ifdef FGAUSSIAN_HAVE_AVX2
+  if (contiguous && fgaussian_use_avx2)
+  {
+    compute_gaussian_avx2_double((const double *)x, i0, mu, sigma, (float *)result, n);
+    return;
+  }
+#endif
+#ifdef USE_ACCELERATE
+  if (contiguous)
+  {
+    /* Narrow into the output and compute there in place */
+    vDSP_vdpsp((const double *)x, 1, (float *)result, 1, n);
+    compute_gaussian_accelerate_float((const float *)result, i0, mu, sigma, (float *)result, n);
+    return;
+  }
+#endif
+
+  if (type_num == NPY_DOUBLE)
+  {
+    const double neg_inv_two_sigma_sq = -1.0 / (2.0 * (double)sigma * sigma);
+    for (npy_intp i = 0; i < n; i++)
+    {
+      double diff = *(const double *)(x + i * x_stride) - mu;
+      *(float *)(result + i * result_stride) = i0 * expf((float)(diff * diff * neg_inv_two_sigma_sq));
+    }
+  }
+  else
+  {
+    const float two_sigma_sq = 2.0f * sigma * sigma;
+    for (npy_intp i = 0; i < n; i++)
+    {
+      float diff = *(const float *)(x + i * x_stride) - mu;
+      *(float *)(result + i * result_stride) = i0 * expf(-(diff * diff) / two_sigma_sq);
+    }
+  }
+}
+
+/*
+ * The result array for x: out if it is given (checked as a float32 array
+ * of x's shape that can be written in place), else a new C-ordered one.
+ * Returns a new reference, or NULL with an exception set.
+ */
+static PyArrayObject *output_array(PyObject *out, PyArrayObject *x)
+{
+  if (out == NULL || out == Py_None)
+  {
+    return (PyArrayObject *)PyArray_SimpleNew(PyArray_NDIM(x), PyArray_DIMS(x), NPY_FLOAT);
+  }
+  if (!PyArray_Check(out) || PyArray_TYPE((PyArrayObject *)out) != NPY_FLOAT ||
+      !PyArray_ISNOTSWAPPED((PyArrayObject *)out))
+  {
+    PyErr_SetString(PyExc_TypeError, "out must be a float32 numpy array");
+    return NULL;
+  }
+  PyArrayObject *out_array = (PyArrayObject *)out;
+  if (!PyArray_SAMESHAPE(out_array, x))
+  {
+    PyErr_SetString(PyExc_ValueError, "out must have the shape of x");
+    return NULL;
+  }
+  if (!PyArray_ISWRITEABLE(out_array) || !PyArray_ISALIGNED(out_array))
+  {
+    PyErr_SetString(PyExc_ValueError, "out must be writeable and aligned");
+    return NULL;
+  }
+  Py_INCREF(out_array);
+  return out_array;
+}
+
+/*
+ * Python interface: fgaussian_f32(x, i0, mu, sigma, out=None)
  */
 static PyObject *fgaussian_f32_fgaussian_f32(PyObject *self, PyObject *args)
 {
   PyArrayObject *x_array = NULL;
+  PyObject *out = NULL;
   float i0, mu, sigma;
 
   /* Parse arguments */
-  if (!PyArg_ParseTuple(args, "O!fff",
+  if (!PyArg_ParseTuple(args, "O!fff|O",
                         &PyArray_Type, &x_array,
-                        &i0, &mu, &sigma))
+                        &i0, &mu, &sigma, &out))
   {
     return NULL;
   }
@@ -100,44 +290,79 @@ static PyObject *fgaussian_f32_fgaussian_f32(PyObject *self, PyObject *args)
     return NULL;
   }
 
-  /* Ensure x is float32 type and contiguous */
-  PyArrayObject *x_contig = (PyArrayObject *)PyArray_FROM_OTF(
-      (PyObject *)x_array, NPY_FLOAT, NPY_ARRAY_IN_ARRAY);
-  if (x_contig == NULL)
+  /* Validate sigma is positive */
+  if (sigma <= 0.0f)
   {
+    PyErr_SetString(PyExc_ValueError, "sigma must be positive");
     return NULL;
   }
 
-  /* Get array dimensions */
-  int ndim = PyArray_NDIM(x_contig);
-  npy_intp *dims = PyArray_DIMS(x_contig);
-  npy_intp total_size = PyArray_SIZE(x_contig);
+  /* float32 and float64 arrays are read in place, whatever their strides;
+     byte-swapped or unaligned ones are copied into native order first and
+     anything else is converted to float32 (where that is a safe cast) */
+  PyArrayObject *x_in;
+  int type_num = PyArray_TYPE(x_array);
+  if ((type_num == NPY_FLOAT || type_num == NPY_DOUBLE) && PyArray_ISALIGNED(x_array) &&
+      PyArray_ISNOTSWAPPED(x_array))
+  {
+    Py_INCREF(x_array);
+    x_in = x_array;
+  }
+  else
+  {
+    type_num = type_num == NPY_DOUBLE ? NPY_DOUBLE : NPY_FLOAT;
+    x_in = (PyArrayObject *)PyArray_FROM_OTF((PyObject *)x_array, type_num, NPY_ARRAY_IN_ARRAY);
+    if (x_in == NULL)
+    {
+      return NULL;
+    }
+  }
 
-  /* Create output array (float32) */
-  PyArrayObject *result = (PyArrayObject *)PyArray_SimpleNew(ndim, dims, NPY_FLOAT);
+  /* The output array (float32; C order unless out is given) */
+  PyArrayObject *result = output_array(out, x_in);
   if (result == NULL)
   {
-    Py_DECREF(x_contig);
+    Py_DECREF(x_in);
     return NULL;
   }
 
-  /* Get pointers to data */
-  const float *x_data = (const float *)PyArray_DATA(x_contig);
-  float *result_data = (float *)PyArray_DATA(result);
-
-  /* Validate sigma is positive */
-  if (sigma <= 0.0f)
+  /* Walk x and the result together, in the order that keeps x's reads
+     closest to contiguous. out may be x itself (each value is read before
+     its result is written); if it overlaps x any other way, the iterator
+     works on a copy and writes it back. */
+  PyArrayObject *ops[2] = {x_in, result};
+  npy_uint32 op_flags[2] = {NPY_ITER_READONLY, NPY_ITER_WRITEONLY};
+  NpyIter *iter = NpyIter_MultiNew(2, ops, NPY_ITER_EXTERNAL_LOOP | NPY_ITER_ZEROSIZE_OK | NPY_ITER_COPY_IF_OVERLAP,
+                                   NPY_KEEPORDER, NPY_NO_CASTING, op_flags, NULL);
+  if (iter == NULL)
   {
-    Py_DECREF(x_contig);
+    Py_DECREF(x_in);
     Py_DECREF(result);
-    PyErr_SetString(PyExc_ValueError, "sigma must be positive");
     return NULL;
   }
+  if (NpyIter_GetIterSize(iter) > 0)
+  {
+    NpyIter_IterNextFunc *iternext = NpyIter_GetIterNext(iter, NULL);
+    if (iternext == NULL)
+    {
+      NpyIter_Deallocate(iter);
+      Py_DECREF(x_in);
+      Py_DECREF(result);
+      return NULL;
+    }
+    char **data = NpyIter_GetDataPtrArray(iter);
+    npy_intp *strides = NpyIter_GetInnerStrideArray(iter);
+    npy_intp *size = NpyIter_GetInnerLoopSizePtr(iter);
 
-  /* Compute Gaussian profile */
-  compute_gaussian_float(x_data, i0, mu, sigma, result_data, total_size);
-
-  Py_DECREF(x_contig);
+    Py_BEGIN_ALLOW_THREADS
+    do
+    {
+      compute_gaussian_strided(data[0], strides[0], type_num, i0, mu, sigma, data[1], strides[1], *size);
+    } while (iternext(iter));
+    Py_END_ALLOW_THREADS
+  }
+  NpyIter_Deallocate(iter);
+  Py_DECREF(x_in);
 
   return (PyObject *)result;
 }
@@ -167,5 +392,9 @@ PyMODINIT_FUNC PyInit_fgaussian_f32_ext(void)
     return NULL;
   }
 
+#ifdef FGAUSSIAN_HAVE_AVX2
+  __builtin_cpu_init();
+  fgaussian_use_avx2 = __builtin_cpu_supports("avx2") && __builtin_cpu_supports("fma");
+#endif
   return PyModule_Create(&fgaussian_f32_module);
 }
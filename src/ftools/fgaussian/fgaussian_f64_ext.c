@@ -77,17 +77,104 @@ static void compute_gaussian_double(const double *x, double i0, double mu, doubl
 }
 
 /*
- * Python interface: fgaussian_f64(x, i0, mu, sigma)
+ * Scalar implementation for float32 input, widened on load
+ */
+static void compute_gaussian_scalar_widen(const float *x, double i0, double mu, double sigma,
+                                          double *result, npy_intp n)
+{
+  const double two_sigma_sq = 2.0 * sigma * sigma;
+
+  for (npy_intp i = 0; i < n; i++)
+  {
+    double diff = (double)x[i] - mu;
+    result[i] = i0 * exp(-(diff * diff) / two_sigma_sq);
+  }
+}
+
+/*
+ * One inner loop of the iteration over x: n values of x (float64 or
+ * float32, as type_num says) at x_stride bytes apart into float64 values
+ * at result_stride bytes apart. Contiguous loops go through the
+ * implementations above.
+ */
+static void compute_gaussian_strided(const char *x, npy_intp x_stride, int type_num, double i0,
+                                     double mu, double sigma, char *result, npy_intp result_stride,
+                                     npy_intp n)
+{
+  int contiguous = result_stride == (npy_intp)sizeof(double) &&
+                   x_stride == (type_num == NPY_DOUBLE ? (npy_intp)sizeof(double) : (npy_intp)sizeof(float));
+  if (contiguous && type_num == NPY_DOUBLE)
+  {
+    compute_gaussian_double((const double *)x, i0, mu, sigma, (double *)result, n);
+    return;
+  }
+  if (contiguous)
+  {
+#ifdef USE_ACCELERATE
+    /* Widen into the output and compute there in place */
+    vDSP_vspdp((const float *)x, 1, (double *)result, 1, n);
+    compute_gaussian_accelerate_double((const double *)result, i0, mu, sigma, (double *)result, n);
+#else
+    compute_gaussian_scalar_widen((const float *)x, i0, mu, sigma, (double *)result, n);
+#endif
+    return;
+  }
+
+  const double two_sigma_sq = 2.0 * sigma * sigma;
+  for (npy_intp i = 0; i < n; i++)
+  {
+    double value = type_num == NPY_DOUBLE ? *(const double *)(x + i * x_stride)
+                                          : (double)*(const float *)(x + i * x_stride);
+    double diff = value - mu;
+    *(double *)(result + i * result_stride) = i0 * exp(-(diff * diff) / two_sigma_sq);
+  }
+}
+
+/*
+ * The result array for x: out if it is given (checked as a float64 array
+ * of x's shape that can be written in place), else a new C-ordered one.
+ * Returns a new reference, or NULL with an exception set.
+ */
+static PyArrayObject *output_array(PyObject *out, PyArrayObject *x)
+{
+  if (out == NULL || out == Py_None)
+  {
+    return (PyArrayObject *)PyArray_SimpleNew(PyArray_NDIM(x), PyArray_DIMS(x), NPY_DOUBLE);
+  }
+  if (!PyArray_Check(out) || PyArray_TYPE((PyArrayObject *)out) != NPY_DOUBLE ||
+      !PyArray_ISNOTSWAPPED((PyArrayObject *)out))
+  {
+    PyErr_SetString(PyExc_TypeError, "out must be a float64 numpy array");
+    return NULL;
+  }
+  PyArrayObject *out_array = (PyArrayObject *)out;
+  if (!PyArray_SAMESHAPE(out_array, x))
+  {
+    PyErr_SetString(PyExc_ValueError, "out must have the shape of x");
+    return NULL;
+  }
+  if (!PyArray_ISWRITEABLE(out_array) || !PyArray_ISALIGNED(out_array))
+  {
+    PyErr_SetString(PyExc_ValueError, "out must be writeable and aligned");
+    return NULL;
+  }
+  Py_INCREF(out_array);
+  return out_array;
+}
+
+/*
+ * Python interface: fgaussian_f64(x, i0, mu, sigma, out=None)
  */
 static PyObject *fgaussian_f64_fgaussian_f64(PyObject *self, PyObject *args)
 {
   PyArrayObject *x_array = NULL;
+  PyObject *out = NULL;
   double i0, mu, sigma;
 
   /* Parse arguments */
-  if (!PyArg_ParseTuple(args, "O!ddd",
+  if (!PyArg_ParseTuple(args, "O!ddd|O",
                         &PyArray_Type, &x_array,
-                        &i0, &mu, &sigma))
+                        &i0, &mu, &sigma, &out))
   {
     return NULL;
   }
@@ -99,44 +186,79 @@ static PyObject *fgaussian_f64_fgaussian_f64(PyObject *self, PyObject *args)
     return NULL;
   }
 
-  /* Ensure x is float64 type and contiguous */
-  PyArrayObject *x_contig = (PyArrayObject *)PyArray_FROM_OTF(
-      (PyObject *)x_array, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
-  if (x_contig == NULL)
+  /* Validate sigma is positive */
+  if (sigma <= 0.0)
   {
+    PyErr_SetString(PyExc_ValueError, "sigma must be positive");
     return NULL;
   }
 
-  /* Get array dimensions */
-  int ndim = PyArray_NDIM(x_contig);
-  npy_intp *dims = PyArray_DIMS(x_contig);
-  npy_intp total_size = PyArray_SIZE(x_contig);
+  /* float64 and float32 arrays are read in place, whatever their strides;
+     byte-swapped or unaligned ones are copied into native order first and
+     anything else is converted to float64 (where that is a safe cast) */
+  PyArrayObject *x_in;
+  int type_num = PyArray_TYPE(x_array);
+  if ((type_num == NPY_FLOAT || type_num == NPY_DOUBLE) && PyArray_ISALIGNED(x_array) &&
+      PyArray_ISNOTSWAPPED(x_array))
+  {
+    Py_INCREF(x_array);
+    x_in = x_array;
+  }
+  else
+  {
+    type_num = type_num == NPY_FLOAT ? NPY_FLOAT : NPY_DOUBLE;
+    x_in = (PyArrayObject *)PyArray_FROM_OTF((PyObject *)x_array, type_num, NPY_ARRAY_IN_ARRAY);
+    if (x_in == NULL)
+    {
+      return NULL;
+    }
+  }
 
-  /* Create output array (float64) */
-  PyArrayObject *result = (PyArrayObject *)PyArray_SimpleNew(ndim, dims, NPY_DOUBLE);
+  /* The output array (float64; C order unless out is given) */
+  PyArrayObject *result = output_array(out, x_in);
   if (result == NULL)
   {
-    Py_DECREF(x_contig);
+    Py_DECREF(x_in);
     return NULL;
   }
 
-  /* Get pointers to data */
-  const double *x_data = (const double *)PyArray_DATA(x_contig);
-  double *result_data = (double *)PyArray_DATA(result);
-
-  /* Validate sigma is positive */
-  if (sigma <= 0.0)
+  /* Walk x and the result together, in the order that keeps x's reads
+     closest to contiguous. out may be x itself (each value is read before
+     its result is written); if it overlaps x any other way, the iterator
+     works on a copy and writes it back. */
+  PyArrayObject *ops[2] = {x_in, result};
+  npy_uint32 op_flags[2] = {NPY_ITER_READONLY, NPY_ITER_WRITEONLY};
+  NpyIter *iter = NpyIter_MultiNew(2, ops, NPY_ITER_EXTERNAL_LOOP | NPY_ITER_ZEROSIZE_OK | NPY_ITER_COPY_IF_OVERLAP,
+                                   NPY_KEEPORDER, NPY_NO_CASTING, op_flags, NULL);
+  if (iter == NULL)
   {
-    Py_DECREF(x_contig);
+    Py_DECREF(x_in);
     Py_DECREF(result);
-    PyErr_SetString(PyExc_ValueError, "sigma must be positive");
     return NULL;
   }
+  if (NpyIter_GetIterSize(iter) > 0)
+  {
+    NpyIter_IterNextFunc *iternext = NpyIter_GetIterNext(iter, NULL);
+    if (iternext == NULL)
+    {
+      NpyIter_Deallocate(iter);
+      Py_DECREF(x_in);
+      Py_DECREF(result);
+      return NULL;
+    }
+    char **data = NpyIter_GetDataPtrArray(iter);
+    npy_intp *strides = NpyIter_GetInnerStrideArray(iter);
+    npy_intp *size = NpyIter_GetInnerLoopSizePtr(iter);
 
-  /* Compute Gaussian profile */
-  compute_gaussian_double(x_data, i0, mu, sigma, result_data, total_size);
-
-  Py_DECREF(x_contig);
+    Py_BEGIN_ALLOW_THREADS
+    do
+    {
+      compute_gaussian_strided(data[0], strides[0], type_num, i0, mu, sigma, data[1], strides[1], *size);
+    } while (iternext(iter));
+    Py_END_ALLOW_THREADS
+  }
+  NpyIter_Deallocate(iter);
+  Py_DECREF(x_in);
 
   return (PyObject *)result;
 }
@@ -1,72 +1,46 @@
 """ftools.fmedian package loader.
 
-This module locates the pre-built extension shared object in the repository
-(`../fmedian/fmedian_ext*.so`) and loads it as a private module, then
-exposes the `fmedian` function at package level.
+This module imports the compiled `fmedian_ext` extension and exposes the
+`fmedian` function at package level.
 
-We avoid moving any compiled artifacts; the loader simply finds the first
-matching shared object in the repository layout and imports it.
+If the extension is not importable as a submodule (legacy layout), the loader
+falls back to finding a matching shared object in the repository and loads it
+as a private module. If there is none either, the Numba implementation in
+`_numba_impl` is used when Numba is installed (its first call pays a JIT
+compile).
 """
 from __future__ import annotations
 
-import glob
-import importlib.machinery
-import importlib.util
-import os
+import importlib
 
-# Try to import a bundled extension if available (e.g. when package is
-# installed with aligned module names).
-try:
-    from . import _fmedian_ext as _ext  # type: ignore
-except Exception:
-    # First, look for a compiled extension in the package directory (useful when
-    # built in-place or installed). If not found, fall back to the repository
-    # top-level location (legacy layout).
-    _HERE = os.path.dirname(__file__)
-    repo_root = os.path.abspath(os.path.join(_HERE, "..", "..", ".."))
-
-    candidates = glob.glob(os.path.join(_HERE, "fmedian_ext*.so"))
-    if not candidates:
-        # Fallback to legacy location at the repository root
-        candidates = glob.glob(os.path.join(repo_root, "fmedian", "fmedian_ext*.so"))
-        if not candidates:
-            # macOS sometimes adds extra suffixes
-            candidates = glob.glob(os.path.join(repo_root, "fmedian", "fmedian_ext*.*.so"))
-
-    if not candidates:
-        raise ImportError(
-            "Could not locate the compiled fmedian extension (expected src/ftools/fmedian/fmedian_ext*.so or fmedian/fmedian_ext*.so). "
-            "Build it first or install the package so the extension is available."
-        )
-
-    so_path = candidates[0]
-    # Ensure loader name matches the compiled module name (so the PyInit symbol matches)
-    base = os.path.basename(so_path)
-    base_mod = os.path.splitext(base)[0].split(".")[0]
-    loader = importlib.machinery.ExtensionFileLoader(base_mod, so_path)
-    spec = importlib.util.spec_from_loader(base_mod, loader)
-    _ext = importlib.util.module_from_spec(spec)
-    loader.exec_module(_ext)  # type: ignore[arg-type]
+import numpy as _np
+
+from .._extloader import load_ext
+from .._validate import check_num_threads, output_array
+
+_ext = load_ext(__name__, "fmedian_ext", fallback="_numba_impl")
 
 try:
     _c_fmedian = _ext.fmedian  # type: ignore[attr-defined]
+    _c_fmedian_batch = _ext.fmedian_batch  # type: ignore[attr-defined]
+    _c_fmedian_u16 = _ext.fmedian_u16  # type: ignore[attr-defined]
+    _c_fmedian_i16 = _ext.fmedian_i16  # type: ignore[attr-defined]
 except Exception as exc:  # pragma: no cover - defensive
     raise ImportError("Loaded fmedian extension but could not find 'fmedian' symbol") from exc
 
 
-def fmedian(input_array, xsize: int, ysize: int, exclude_center: int = 0):
-    """Compute filtered median and return the output array.
-
-    Signature: fmedian(input_array, xsize, ysize, exclude_center=0) -> numpy.ndarray
+# Window area from which fmedian sends uint8/uint16 input to the sliding
+# histogram kernel; below it, sorting small windows is faster.
+_HISTOGRAM_MIN_WINDOW = 49
 
-    Parameters:
-    - xsize, ysize: Full window sizes (must be odd numbers)
-    - exclude_center: Whether to exclude the center pixel from the calculation (default: 0)
+# Largest window area device="cuda" accepts (15x15). Each GPU thread sorts
+# its window in an array of its own, which spills to local memory and
+# costs the square of the area, so larger windows are left to the CPU.
+_CUDA_MAX_WINDOW = 225
 
-    The input will be coerced to float64; the returned array is float64.
-    """
-    import numpy as _np
 
+def _check_sizes(xsize, ysize):
+    """Validate window sizes and return them as ints."""
     if xsize is None or ysize is None:
         raise TypeError("fmedian requires xsize and ysize parameters")
 
@@ -85,11 +59,221 @@ def fmedian(input_array, xsize: int, ysize: int, exclude_center: int = 0):
         raise ValueError(f"xsize must be positive, got {xsize}")
     if ysize <= 0:
         raise ValueError(f"ysize must be positive, got {ysize}")
-    
+
+    return xsize, ysize
+
+
+def _use_cuda(device):
+    """Return True for device="cuda" and False for None or "cpu"."""
+    if device is None or device == "cpu":
+        return False
+    if device == "cuda":
+        return True
+    raise ValueError(f"device must be 'cpu' or 'cuda', got {device!r}")
+
+
+def _load_cupy_impl():
+    """Import the CuPy implementation used for device="cuda"."""
+    try:
+        return importlib.import_module(f"{__name__}._cupy_impl")
+    except ImportError as exc:
+        raise ImportError("device='cuda' requires CuPy (e.g. pip install cupy-cuda12x)") from exc
+
+
+def fmedian(input_array, xsize: int, ysize: int, exclude_center: int = 0, *, num_threads=None, out=None,
+            device=None):
+    """Compute filtered median and return the output array.
+
+    Signature: fmedian(input_array, xsize, ysize, exclude_center=0, *, num_threads=None, out=None, device=None) -> numpy.ndarray
+
+    Parameters:
+    - xsize, ysize: Full window sizes (must be odd numbers)
+    - exclude_center: Whether to exclude the center pixel from the calculation (default: 0)
+    - num_threads: Number of threads; None uses the OpenMP default (OMP_NUM_THREADS
+      or the number of cores). Small inputs, and builds without OpenMP, run on
+      one thread. The GIL is released while filtering.
+    - out: Optional float64 array of the input's shape to write the result
+      into (and return), e.g. to reuse one buffer across many calls. Every
+      element is overwritten, so it can come from numpy.empty. It must not
+      overlap the input.
+    - device: None or "cpu" to filter on the CPU, or "cuda" to filter on the
+      current CUDA device with CuPy, which must be installed. The input may
+      then also be a cupy array, which gives a cupy result; num_threads and
+      out are not used (passing out raises ValueError). Windows of up to 225
+      pixels (e.g. 15x15) are supported on the GPU.
+
+    The input will be coerced to a C-contiguous float64 array (strided views
+    are copied, contiguous float64 input is used as-is); the returned array is
+    float64. uint8/uint16 input with windows of 7x7 pixels or more is filtered
+    with the histogram kernel of fmedian_u16 instead, with identical results.
+    """
+    xsize, ysize = _check_sizes(xsize, ysize)
+    num_threads = check_num_threads(num_threads)
+
+    if _use_cuda(device):
+        if out is not None:
+            raise ValueError("out is not supported with device='cuda'")
+        if xsize * ysize > _CUDA_MAX_WINDOW:
+            raise ValueError(f"device='cuda' supports windows of up to {_CUDA_MAX_WINDOW} pixels, "
+                             f"got {xsize}x{ysize}")
+        return _load_cupy_impl().fmedian(input_array, xsize, ysize, int(exclude_center))
+
+    if (isinstance(input_array, _np.ndarray) and input_array.dtype in (_np.uint8, _np.uint16)
+            and xsize * ysize >= _HISTOGRAM_MIN_WINDOW):
+        return _fmedian_u16(input_array, xsize, ysize, exclude_center, num_threads, out)
+
+    arr = _np.ascontiguousarray(input_array, dtype=_np.float64)
+    out = output_array(out, arr)
+    _c_fmedian(arr, out, xsize, ysize, int(exclude_center), num_threads)
+    return out
+
+
+def fmedian_u16(input_array, xsize: int, ysize: int, exclude_center: int = 0, num_threads=None, out=None):
+    """Compute filtered median of uint8/uint16 data using a sliding histogram.
+
+    Signature: fmedian_u16(input_array, xsize, ysize, exclude_center=0, num_threads=None, out=None) -> numpy.ndarray
+
+    Gives exactly the same result as fmedian on the same data, but the cost
+    per pixel grows only with ysize instead of with the window area, so it is
+    much faster for large windows.
+
+    Parameters:
+    - input_array: 2D array of dtype uint8 or uint16
+    - xsize, ysize: Full window sizes (must be odd numbers)
+    - exclude_center: Whether to exclude the center pixel from the calculation (default: 0)
+    - num_threads: Number of threads, as for fmedian
+    - out: Optional float64 output array, as for fmedian
+
+    The returned array is float64 (the median of an even number of values is
+    the mean of the two middle values).
+    """
+    xsize, ysize = _check_sizes(xsize, ysize)
+    num_threads = check_num_threads(num_threads)
+    return _fmedian_u16(input_array, xsize, ysize, exclude_center, num_threads, out)
+
+
+def _fmedian_u16(input_array, xsize, ysize, exclude_center, num_threads, out=None):
+    arr = _np.asarray(input_array)
+    if arr.dtype not in (_np.uint8, _np.uint16):
+        raise TypeError(f"fmedian_u16 requires uint8 or uint16 input, got {arr.dtype}")
+    arr = _np.ascontiguousarray(arr, dtype=_np.uint16)
+    out = output_array(out, arr)
+    _c_fmedian_u16(arr, out, xsize, ysize, int(exclude_center), num_threads)
+    return out
+
+
+def fmedian_i16(input_array, xsize: int, ysize: int, exclude_center: int = 0, num_threads=None):
+    """Compute filtered median of integer data, keeping it as int16 throughout.
+
+    Signature: fmedian_i16(input_array, xsize, ysize, exclude_center=0, num_threads=None) -> numpy.ndarray
+
+    Reads and writes 2 bytes per pixel instead of the 8 of the float64 path.
+    3x3 windows are filtered 16 pixels at a time with AVX2 where the CPU
+    supports it; other windows use the sliding histogram of fmedian_u16.
+
+    Parameters:
+    - input_array: 2D array of dtype int8, uint8 or int16
+    - xsize, ysize: Full window sizes (must be odd numbers)
+    - exclude_center: Whether to exclude the center pixel from the calculation (default: 0)
+    - num_threads: Number of threads, as for fmedian
+
+    The returned array is int16. The median of an even number of values is
+    the mean of the two middle values rounded down, i.e.
+    ``numpy.floor(fmedian(...))``; odd counts give exactly the fmedian result.
+    """
+    xsize, ysize = _check_sizes(xsize, ysize)
+    num_threads = check_num_threads(num_threads)
+
+    arr = _np.asarray(input_array)
+    if not _np.can_cast(arr.dtype, _np.int16, casting="safe") or arr.dtype.kind not in "iu":
+        raise TypeError(f"fmedian_i16 requires int8, uint8 or int16 input, got {arr.dtype}")
+    arr = _np.ascontiguousarray(arr, dtype=_np.int16)
+    out = _np.empty(arr.shape, dtype=_np.int16)
+    _c_fmedian_i16(arr, out, xsize, ysize, int(exclude_center), num_threads)
+    return out
+
+
+def fmedian_quantized(input_array, xsize: int, ysize: int, exclude_center: int = 0, vmin=None, vmax=None,
+                      nbins: int = 4096, num_threads=None, out=None):
+    """Compute an approximate filtered median by quantizing the data to nbins levels.
+
+    Signature: fmedian_quantized(input_array, xsize, ysize, exclude_center=0, vmin=None, vmax=None, nbins=4096, num_threads=None, out=None) -> numpy.ndarray
+
+    The values are mapped to the integers 0 .. nbins - 1 (nbins equal bins
+    from vmin to vmax, values outside the range going to the end bins) and
+    filtered with the sliding histogram of fmedian_u16, whose cost per
+    pixel grows only with ysize; the medians are mapped back to the bin
+    centers. Data with about log2(nbins) bits of real precision (e.g.
+    12-bit detector counts with the default 4096 bins) thus loses nothing,
+    and windows of 7x7 pixels or more are much faster than with fmedian
+    (e.g. 0.8 s instead of 12 s for 31x31 on a 2048x2048 image); smaller
+    windows are faster with fmedian.
+
+    Parameters:
+    - xsize, ysize: Full window sizes (must be odd numbers)
+    - exclude_center: Whether to exclude the center pixel from the calculation (default: 0)
+    - vmin, vmax: Value range to quantize (default: the minimum and maximum of the input)
+    - nbins: Number of quantization levels, 2 .. 65536 (default: 4096)
+    - num_threads: Number of threads, as for fmedian
+    - out: Optional float64 output array, as for fmedian
+
+    Where all the window values lie in [vmin, vmax], the result is within
+    (vmax - vmin) / nbins / 2 of the fmedian result. The input must not
+    contain NaN. The returned array is float64.
+    """
+    xsize, ysize = _check_sizes(xsize, ysize)
+    num_threads = check_num_threads(num_threads)
+    nbins = int(nbins)
+    if not 2 <= nbins <= 65536:
+        raise ValueError(f"nbins must be between 2 and 65536, got {nbins}")
+
     arr = _np.asarray(input_array, dtype=_np.float64)
-    out = _np.empty_like(arr, dtype=_np.float64)
-    _c_fmedian(arr, out, xsize, ysize, int(exclude_center))
+    if _np.isnan(arr).any():
+        raise ValueError("fmedian_quantized does not support NaN input; use fmedian")
+    if vmin is None:
+        vmin = arr.min() if arr.size else 0.0
+    if vmax is None:
+        # Constant input still needs a range of non-zero width
+        vmax = arr.max() if arr.size and arr.max() > vmin else vmin + 1.0
+    vmin, vmax = float(vmin), float(vmax)
+    if not (_np.isfinite(vmin) and _np.isfinite(vmax) and vmax > vmin):
+        raise ValueError(f"vmin and vmax must be finite with vmax > vmin, got vmin={vmin}, vmax={vmax}")
+
+    scale = (vmax - vmin) / nbins
+    levels = (arr - vmin) / scale
+    _np.clip(levels, 0, nbins - 1, out=levels)
+    out = _fmedian_u16(levels.astype(_np.uint16), xsize, ysize, exclude_center, num_threads, out)
+    # Level medians (halves for even counts) back to bin centers
+    out *= scale
+    out += vmin + 0.5 * scale
     return out
 
 
-__all__ = ["fmedian"]
+def fmedian_batch(input_arrays, xsize: int, ysize: int, exclude_center: int = 0, num_threads=None):
+    """Compute filtered medians of many 2D arrays with a single C call.
+
+    Signature: fmedian_batch(input_arrays, xsize, ysize, exclude_center=0, num_threads=None) -> list of numpy.ndarray
+
+    Equivalent to ``[fmedian(a, xsize, ysize, exclude_center) for a in input_arrays]``
+    but pays the Python call overhead once and releases the GIL while
+    filtering, which matters when filtering many small tiles.
+
+    Parameters:
+    - input_arrays: Iterable of 2D arrays (shapes may differ)
+    - xsize, ysize: Full window sizes (must be odd numbers)
+    - exclude_center: Whether to exclude the center pixel from the calculation (default: 0)
+    - num_threads: Number of threads, as for fmedian
+
+    Each input will be coerced to a C-contiguous float64 array; the returned
+    arrays are float64.
+    """
+    xsize, ysize = _check_sizes(xsize, ysize)
+    num_threads = check_num_threads(num_threads)
+
+    arrs = [_np.ascontiguousarray(a, dtype=_np.float64) for a in input_arrays]
+    outs = [_np.empty_like(a, dtype=_np.float64) for a in arrs]
+    _c_fmedian_batch(arrs, outs, xsize, ysize, int(exclude_center), num_threads)
+    return outs
+
+
+__all__ = ["fmedian", "fmedian_batch", "fmedian_i16", "fmedian_quantized", "fmedian_u16"]
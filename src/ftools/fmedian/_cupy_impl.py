@@ -0,0 +1,97 @@
+"""CuPy implementation of fmedian for device="cuda".
+
+One CUDA thread computes one output pixel: it gathers the non-NaN values
+of its clipped window into a local array, sorts them and takes the median,
+with the same empty-window and even-count rules as fmedian_ext.c, so the
+results are identical to the CPU path. The kernel is compiled for each
+window area on its first use in a process (CuPy caches the compiled code
+on disk). The sort is quadratic in the window area and its array lives in
+per-thread local memory, so fmedian() limits device="cuda" to windows of
+_CUDA_MAX_WINDOW values.
+"""
+import functools
+
+import cupy as cp
+import numpy as np
+
+_SOURCE = r"""
+extern "C" __global__ void fmedian_f64(const double *input, double *output,
+                                       int height, int width, int xsize_half,
+                                       int ysize_half, int exclude_center)
+{
+  int x = blockIdx.x * blockDim.x + threadIdx.x;
+  int y = blockIdx.y * blockDim.y + threadIdx.y;
+  if (x >= width || y >= height)
+  {
+    return;
+  }
+
+  double values[WINDOW];
+  int count = 0;
+  for (int ny = max(y - ysize_half, 0); ny <= min(y + ysize_half, height - 1); ny++)
+  {
+    for (int nx = max(x - xsize_half, 0); nx <= min(x + xsize_half, width - 1); nx++)
+    {
+      double value = input[(size_t)ny * width + nx];
+      if (isnan(value) || (exclude_center && ny == y && nx == x))
+      {
+        continue;
+      }
+      /* Insertion sort as the values arrive */
+      int i = count++;
+      while (i > 0 && values[i - 1] > value)
+      {
+        values[i] = values[i - 1];
+        i--;
+      }
+      values[i] = value;
+    }
+  }
+
+  double median;
+  if (count == 0)
+  {
+    /* The center value if it is not NaN, else NaN */
+    median = input[(size_t)y * width + x];
+  }
+  else if (count % 2 == 1)
+  {
+    median = values[count / 2];
+  }
+  else
+  {
+    median = (values[count / 2 - 1] + values[count / 2]) / 2.0;
+  }
+  output[(size_t)y * width + x] = median;
+}
+"""
+
+# 256 threads per block, 32 along a row so that each warp reads whole rows
+_BLOCK = (32, 8)
+
+
+@functools.cache
+def _kernel(window):
+    """The kernel compiled for windows of up to `window` values."""
+    return cp.RawKernel(_SOURCE, "fmedian_f64", options=(f"-DWINDOW={window}",))
+
+
+def fmedian(input_array, xsize, ysize, exclude_center):
+    """Filter a 2D array on the current CUDA device.
+
+    A cupy input gives a cupy result; anything else is copied to the device
+    and the result is returned as a numpy array.
+    """
+    on_device = isinstance(input_array, cp.ndarray)
+    arr = cp.asarray(input_array, dtype=cp.float64, order="C")
+    if arr.ndim != 2:
+        raise ValueError("Arrays must be 2-dimensional")
+    height, width = arr.shape
+    xsize_half, ysize_half = xsize // 2, ysize // 2
+    result = cp.empty(arr.shape, dtype=cp.float64)
+    if result.size:
+        grid = ((width + _BLOCK[0] - 1) // _BLOCK[0], (height + _BLOCK[1] - 1) // _BLOCK[1])
+        kernel = _kernel((2 * xsize_half + 1) * (2 * ysize_half + 1))
+        kernel(grid, _BLOCK, (arr, result, np.int32(height), np.int32(width),
+                              np.int32(xsize_half), np.int32(ysize_half), np.int32(exclude_center != 0)))
+    return result if on_device else cp.asnumpy(result)
@@ -0,0 +1,102 @@
+"""Numba implementation of the fmedian_ext entry points.
+
+The package loader uses this module in place of the compiled extension
+when no extension can be found but Numba is installed, so fmedian works
+without a C compiler. The functions take the same arguments, raise the
+same errors and give the same results as their C counterparts. Each
+kernel is compiled on its first call, which takes a few seconds; the
+compiled code is cached on disk for later processes.
+"""
+import numba
+import numpy as np
+
+
+@numba.njit(cache=True)
+def _window_median(arr, y, x, xsize_half, ysize_half, exclude_center, values):
+    """Median of the non-NaN values in the window around (x, y), clipped to the array."""
+    height, width = arr.shape
+    count = 0
+    for ny in range(max(y - ysize_half, 0), min(y + ysize_half, height - 1) + 1):
+        for nx in range(max(x - xsize_half, 0), min(x + xsize_half, width - 1) + 1):
+            if exclude_center and ny == y and nx == x:
+                continue
+            value = arr[ny, nx]
+            if not np.isnan(value):
+                values[count] = value
+                count += 1
+    if count == 0:
+        # As in fmedian_ext.c: the center value if it is not NaN, else NaN
+        return arr[y, x]
+    return np.median(values[:count])
+
+
+@numba.njit(parallel=True, cache=True)
+def _fmedian_rows(arr, out, xsize_half, ysize_half, exclude_center):
+    height, width = arr.shape
+    for y in numba.prange(height):
+        values = np.empty((2 * xsize_half + 1) * (2 * ysize_half + 1))
+        for x in range(width):
+            out[y, x] = _window_median(arr, y, x, xsize_half, ysize_half, exclude_center, values)
+
+
+def _check_arrays(input_array, output_array, input_type, output_type):
+    input_array = np.asarray(input_array)
+    output_array = np.asarray(output_array)
+    if input_array.ndim != 2 or output_array.ndim != 2:
+        raise ValueError("Arrays must be 2-dimensional")
+    if input_array.shape != output_array.shape:
+        raise ValueError("Input and output arrays must have identical size")
+    if input_array.dtype != input_type:
+        raise TypeError(f"input_array must be of type {np.dtype(input_type).name}")
+    if output_array.dtype != output_type:
+        raise TypeError(f"output_array must be of type {np.dtype(output_type).name}")
+    if not output_array.flags.writeable:
+        raise ValueError("output_array is read-only")
+    return input_array, output_array
+
+
+def _run(kernel, num_threads, *args):
+    """Call kernel(*args) on num_threads threads (<= 0: Numba's default)."""
+    if num_threads <= 0:
+        kernel(*args)
+        return
+    previous = numba.get_num_threads()
+    numba.set_num_threads(min(num_threads, numba.config.NUMBA_NUM_THREADS))
+    try:
+        kernel(*args)
+    finally:
+        numba.set_num_threads(previous)
+
+
+def fmedian(input_array, output_array, xsize, ysize, exclude_center, num_threads=0):
+    """Numba version of fmedian_ext.fmedian."""
+    arr, out = _check_arrays(input_array, output_array, np.float64, np.float64)
+    _run(_fmedian_rows, num_threads, arr, out, xsize // 2, ysize // 2, int(exclude_center) != 0)
+
+
+def fmedian_batch(input_arrays, output_arrays, xsize, ysize, exclude_center, num_threads=0):
+    """Numba version of fmedian_ext.fmedian_batch."""
+    input_arrays = list(input_arrays)
+    output_arrays = list(output_arrays)
+    if len(input_arrays) != len(output_arrays):
+        raise ValueError("input_arrays and output_arrays must have the same length")
+    pairs = [_check_arrays(a, o, np.float64, np.float64) for a, o in zip(input_arrays, output_arrays)]
+    for arr, out in pairs:
+        _run(_fmedian_rows, num_threads, arr, out, xsize // 2, ysize // 2, int(exclude_center) != 0)
+
+
+def fmedian_u16(input_array, output_array, xsize, ysize, exclude_center, num_threads=0):
+    """Numba version of fmedian_ext.fmedian_u16."""
+    arr, out = _check_arrays(input_array, output_array, np.uint16, np.float64)
+    _run(_fmedian_rows, num_threads, arr.astype(np.float64), out, xsize // 2, ysize // 2,
+         int(exclude_center) != 0)
+
+
+def fmedian_i16(input_array, output_array, xsize, ysize, exclude_center, num_threads=0):
+    """Numba version of fmedian_ext.fmedian_i16."""
+    arr, out = _check_arrays(input_array, output_array, np.int16, np.int16)
+    medians = np.empty(arr.shape)
+    _run(_fmedian_rows, num_threads, arr.astype(np.float64), medians, xsize // 2, ysize // 2,
+         int(exclude_center) != 0)
+    # The mean of two middle values is rounded down, as in the C kernel
+    out[...] = np.floor(medians)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-call overhead of fmedian on tiny arrays.
+Compares the C extension entry point, the fmedian wrapper and the
+ftools.fmedian dispatcher, so regressions in the Python layers show up
+separately from the cost of the filter itself.
+
+Run with: python -m ftools.fmedian.benchmark_fmedian_call_overhead
+"""
+
+import time
+
+import numpy as np
+
+from . import fmedian, fmedian_ext
+
+
+def time_calls(func, args, num_iterations):
+    """Return the mean time per call in seconds"""
+    for _ in range(1000):
+        func(*args)
+    start = time.perf_counter()
+    for _ in range(num_iterations):
+        func(*args)
+    return (time.perf_counter() - start) / num_iterations
+
+
+def main():
+    """Measure call overhead for 1x1 and 3x3 inputs"""
+    import ftools
+
+    num_iterations = 200000
+
+    print("=" * 80)
+    print("fmedian call overhead")
+    print("=" * 80)
+    print()
+    print(f"{'Shape':<10} {'C ext (us)':<14} {'Wrapper (us)':<14} {'Dispatcher (us)':<16}")
+    print("-" * 80)
+
+    for shape in [(1, 1), (3, 3)]:
+        a = np.ones(shape, dtype=np.float64)
+        out = np.empty_like(a)
+
+        time_ext = time_calls(fmedian_ext.fmedian, (a, out, 1, 1, 0), num_iterations)
+        time_wrap = time_calls(fmedian, (a, 1, 1, 0), num_iterations)
+        time_disp = time_calls(ftools.fmedian, (a, (1, 1), 0), num_iterations)
+
+        label = f"{shape[0]}x{shape[1]}"
+        print(f"{label:<10} {time_ext * 1e6:<14.3f} {time_wrap * 1e6:<14.3f} {time_disp * 1e6:<16.3f}")
+
+    print()
+    print("Notes:")
+    print("  - C ext calls fmedian_ext.fmedian with a preallocated output")
+    print("  - Wrapper is ftools.fmedian.fmedian (validation + allocation)")
+    print("  - Dispatcher is ftools.fmedian with a window_size tuple")
+    print()
+
+
+if __name__ == "__main__":
+    main()
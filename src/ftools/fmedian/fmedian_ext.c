@@ -1,14 +1,43 @@
 #define PY_SSIZE_T_CLEAN
 #include <Python.h>
-#include <numpy/arrayobject.h>
 #include <stdlib.h>
 #include <math.h>
 #include <stdint.h>
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
+/* Below this much work (pixels times window area) a call is filtered on a
+   single thread; starting a parallel region would cost more than it saves. */
+#define FMEDIAN_MIN_PARALLEL_WORK 65536
+
+/* Neighborhood buffers of up to this many values (e.g. one 15x15 window)
+   are placed on the stack, so small calls skip the heap */
+#define STACK_NEIGHBORS 256
+
+/* Each thread's neighbors buffer is padded to whole 64-byte cache lines
+   (NEIGHBORS_LINE doubles) and starts on a line boundary, so threads
+   filling their buffers never write to the same line */
+#define NEIGHBORS_LINE 8
+
+static size_t neighbors_stride(int max_neighbors)
+{
+  return ((size_t)max_neighbors + NEIGHBORS_LINE - 1) / NEIGHBORS_LINE * NEIGHBORS_LINE;
+}
+
+/* The first cache-line boundary in a buffer of at least NEIGHBORS_LINE
+   extra doubles */
+static double *line_aligned(double *buffer)
+{
+  const uintptr_t mask = NEIGHBORS_LINE * sizeof(double) - 1;
+  return (double *)(((uintptr_t)buffer + mask) & ~mask);
+}
 
 /* Include sorting network routines */
 #include "../sorting/sorting.c"
 
-/* Function to compute median from a sorted array */
+/* Function to compute the median of an array (reordering it): sorted with
+   a sorting network for small windows, located with select_kth otherwise */
 static double compute_median(double *values, int count)
 {
   if (count == 0)
@@ -16,72 +45,815 @@ static double compute_median(double *values, int count)
     return 0.0;
   }
 
-  sort_doubles(values, count);
+  return median_doubles(values, count);
+}
 
-  if (count % 2 == 0)
-  {
-    return (values[count / 2 - 1] + values[count / 2]) / 2.0;
-  }
-  else
+/* Return non-zero if a buffer holds native-order elements of the struct
+   module type `code` (e.g. 'd' for float64) and the given item size */
+static int buffer_has_format(const Py_buffer *view, char code, Py_ssize_t itemsize)
+{
+  const char *format = view->format != NULL ? view->format : "B";
+  if (format[0] == '@' || format[0] == '=')
   {
-    return values[count / 2];
+    format++;
   }
+  return format[0] == code && format[1] == '\0' && view->itemsize == itemsize;
 }
 
-/* Function to check input arguments */
-static int check_inputs(PyArrayObject *input_array, PyArrayObject *output_array,
+/* Function to check input arguments. input must hold elements of type
+   input_code and output of type output_code (struct module codes, named
+   input_type_name and output_type_name in the error messages). */
+static int check_inputs(const Py_buffer *input, const Py_buffer *output,
+                        char input_code, const char *input_type_name,
+                        char output_code, const char *output_type_name,
+                        Py_ssize_t itemsize, Py_ssize_t output_itemsize,
                         int *height, int *width)
 {
   /* Check array dimensions */
-  if (PyArray_NDIM(input_array) != 2 || PyArray_NDIM(output_array) != 2)
+  if (input->ndim != 2 || output->ndim != 2)
   {
     PyErr_SetString(PyExc_ValueError, "Arrays must be 2-dimensional");
     return -1;
   }
 
-  /* Get array dimensions */
-  npy_intp *input_dims = PyArray_DIMS(input_array);
-  npy_intp *output_dims = PyArray_DIMS(output_array);
-
   /* Check that arrays have same size */
-  if (input_dims[0] != output_dims[0] || input_dims[1] != output_dims[1])
+  if (input->shape[0] != output->shape[0] || input->shape[1] != output->shape[1])
   {
     PyErr_SetString(PyExc_ValueError, "Input and output arrays must have identical size");
     return -1;
   }
 
   /* Set output dimensions */
-  *height = (int)input_dims[0];
-  *width = (int)input_dims[1];
+  *height = (int)input->shape[0];
+  *width = (int)input->shape[1];
 
   /* Check data types */
-  if (PyArray_TYPE(input_array) != NPY_FLOAT64)
+  if (!buffer_has_format(input, input_code, itemsize))
   {
-    PyErr_SetString(PyExc_TypeError, "input_array must be of type float64");
+    PyErr_Format(PyExc_TypeError, "input_array must be of type %s", input_type_name);
     return -1;
   }
 
-  if (PyArray_TYPE(output_array) != NPY_FLOAT64)
+  if (!buffer_has_format(output, output_code, output_itemsize))
   {
-    PyErr_SetString(PyExc_TypeError, "output_array must be of type float64");
+    PyErr_Format(PyExc_TypeError, "output_array must be of type %s", output_type_name);
     return -1;
   }
 
   return 0; /* Success */
 }
 
+/* Get buffer views of an input array (read-only access is enough) and an
+   output array (must be writable), and check them with check_inputs. Any
+   object exporting a strided buffer works, NumPy arrays included. On
+   failure an exception is set and neither view is held. */
+static int get_buffers(PyObject *input_obj, PyObject *output_obj, Py_buffer *input, Py_buffer *output,
+                       char input_code, const char *input_type_name,
+                       char output_code, const char *output_type_name,
+                       Py_ssize_t itemsize, Py_ssize_t output_itemsize,
+                       int *height, int *width)
+{
+  if (PyObject_GetBuffer(input_obj, input, PyBUF_RECORDS_RO) != 0)
+  {
+    return -1;
+  }
+  if (PyObject_GetBuffer(output_obj, output, PyBUF_RECORDS) != 0)
+  {
+    PyBuffer_Release(input);
+    return -1;
+  }
+  if (check_inputs(input, output, input_code, input_type_name, output_code, output_type_name,
+                   itemsize, output_itemsize, height, width) != 0)
+  {
+    PyBuffer_Release(input);
+    PyBuffer_Release(output);
+    return -1;
+  }
+  return 0;
+}
+
+/* Number of threads to use for a call. num_threads <= 0 selects the OpenMP
+   default (OMP_NUM_THREADS or the number of cores). Small workloads and
+   builds without OpenMP always use a single thread. */
+static int resolve_num_threads(int num_threads, long long work)
+{
+#ifdef _OPENMP
+  if (work < FMEDIAN_MIN_PARALLEL_WORK)
+  {
+    return 1;
+  }
+  int nthreads = num_threads > 0 ? num_threads : omp_get_max_threads();
+  return nthreads > 1 ? nthreads : 1;
+#else
+  (void)num_threads;
+  (void)work;
+  return 1;
+#endif
+}
+
+/* Append the non-NaN values of row_data[x0..x1] (x stride x_stride) to
+   neighbors and return the new count. The caller clips the span to the
+   array, so only NaN values need to be skipped here. */
+static inline int append_row_span(const char *row_data, Py_ssize_t x_stride, int x0, int x1,
+                                  double *neighbors, int count)
+{
+  for (int nx = x0; nx <= x1; nx++)
+  {
+    double neighbor_value = *(const double *)(row_data + nx * x_stride);
+    if (!isnan(neighbor_value))
+    {
+      neighbors[count++] = neighbor_value;
+    }
+  }
+  return count;
+}
+
+/* Median of the window centred on pixel (x, y) of a 2D float64 array.
+   neighbors must hold at least (2 * xsize_half + 1) * (2 * ysize_half + 1)
+   values. */
+static double fmedian_pixel(const char *input_data, const Py_ssize_t *input_strides,
+                            int height, int width, int x, int y, int xsize_half, int ysize_half,
+                            int exclude_center, double *neighbors)
+{
+  int count = 0;
+
+  /* Get current pixel value */
+  double center_value = *(const double *)(input_data + y * input_strides[0] + x * input_strides[1]);
+
+  /* Clip the window to the array once, so the loops below need no bounds
+     checks. When the center is excluded, the center row is walked in two
+     spans around it. */
+  int y0 = y - ysize_half > 0 ? y - ysize_half : 0;
+  int y1 = y + ysize_half < height - 1 ? y + ysize_half : height - 1;
+  int x0 = x - xsize_half > 0 ? x - xsize_half : 0;
+  int x1 = x + xsize_half < width - 1 ? x + xsize_half : width - 1;
+  for (int ny = y0; ny <= y1; ny++)
+  {
+    const char *row_data = input_data + ny * input_strides[0];
+    if (ny == y && exclude_center != 0)
+    {
+      count = append_row_span(row_data, input_strides[1], x0, x - 1, neighbors, count);
+      count = append_row_span(row_data, input_strides[1], x + 1, x1, neighbors, count);
+    }
+    else
+    {
+      count = append_row_span(row_data, input_strides[1], x0, x1, neighbors, count);
+    }
+  }
+
+  /* Compute median.
+     If no neighbors (e.g., xsize=ysize=0 and include_center==0),
+     fall back to the center pixel value so a 1x1 window returns the original. */
+  double median_value;
+  if (count == 0)
+  {
+    /* No valid neighbors (all were NaN or window empty). If the center
+       pixel is finite and was not excluded, use it; otherwise write NaN. */
+    if (!isnan(center_value))
+    {
+      median_value = center_value;
+    }
+    else
+    {
+      median_value = NAN;
+    }
+  }
+  else
+  {
+    median_value = compute_median(neighbors, count);
+  }
+
+  return median_value;
+}
+
+/* Vector kernels compute 3x3 or 5x5 medians of fmedian_vector_lanes
+   adjacent pixels at once: AVX-512 or AVX2 on x86-64 (whichever is the
+   widest the CPU has) and NEON on AArch64 */
+#if defined(__x86_64__) && (defined(__GNUC__) || defined(__clang__))
+#define FMEDIAN_HAVE_AVX2 1
+#define FMEDIAN_HAVE_VECTOR 1
+#include <immintrin.h>
+#include "../sorting/sorting_networks_avx2.c"
+#include "../sorting/sorting_networks_avx512.c"
+#elif defined(__aarch64__) && defined(__ARM_NEON)
+#define FMEDIAN_HAVE_VECTOR 1
+#include <arm_neon.h>
+#include "../sorting/sorting_networks_neon.c"
+#endif
+
+#ifdef FMEDIAN_HAVE_VECTOR
+/* 19-exchange median-of-9 network; the median ends up in p4. S(a, b) is a
+   compare-exchange leaving the minimum in a and the maximum in b. */
+#define MEDIAN9_NETWORK(S, p0, p1, p2, p3, p4, p5, p6, p7, p8) \
+  S(p1, p2); S(p4, p5); S(p7, p8);                              \
+  S(p0, p1); S(p3, p4); S(p6, p7);                              \
+  S(p1, p2); S(p4, p5); S(p7, p8);                              \
+  S(p0, p3); S(p5, p8); S(p4, p7);                              \
+  S(p3, p6); S(p1, p4); S(p2, p5);                              \
+  S(p4, p7); S(p4, p2); S(p6, p4);                              \
+  S(p4, p2)
+
+/* 19-exchange sorting network for 8 values */
+#define SORT8_NETWORK(S, q0, q1, q2, q3, q4, q5, q6, q7)      \
+  S(q0, q2); S(q1, q3); S(q4, q6); S(q5, q7);                 \
+  S(q0, q4); S(q1, q5); S(q2, q6); S(q3, q7);                 \
+  S(q0, q1); S(q2, q3); S(q4, q5); S(q6, q7);                 \
+  S(q2, q4); S(q3, q5);                                       \
+  S(q1, q4); S(q3, q6);                                       \
+  S(q1, q2); S(q3, q4); S(q5, q6)
+#endif
+
+#ifdef FMEDIAN_HAVE_AVX2
+/* Set at import time if the CPU supports AVX2 */
+static int fmedian_use_avx2 = 0;
+
+/* Compare-exchange of four double lanes at once */
+#define VSORT_PD(a, b)                    \
+  {                                       \
+    __m256d t_ = _mm256_min_pd((a), (b)); \
+    (b) = _mm256_max_pd((a), (b));        \
+    (a) = t_;                             \
+  }
+
+/* Compare-exchange of sixteen int16 lanes at once */
+#define VSORT_EPI16(a, b)                    \
+  {                                          \
+    __m256i t_ = _mm256_min_epi16((a), (b)); \
+    (b) = _mm256_max_epi16((a), (b));        \
+    (a) = t_;                                \
+  }
+
+/* 3x3 median of the four pixels x .. x+3 of an interior row. r0, r1 and r2
+   point at column x - 1 of rows y - 1, y and y + 1, which must be contiguous
+   in x. Returns 0 without writing anything if any input value is NaN, so the
+   caller can fall back to the scalar path that skips NaNs. */
+__attribute__((target("avx2"))) static int fmedian_3x3_f64(const double *r0, const double *r1,
+                                                            const double *r2, double *out,
+                                                            int exclude_center)
+{
+  __m256d p0 = _mm256_loadu_pd(r0), p1 = _mm256_loadu_pd(r0 + 1), p2 = _mm256_loadu_pd(r0 + 2);
+  __m256d p3 = _mm256_loadu_pd(r1), p4 = _mm256_loadu_pd(r1 + 1), p5 = _mm256_loadu_pd(r1 + 2);
+  __m256d p6 = _mm256_loadu_pd(r2), p7 = _mm256_loadu_pd(r2 + 1), p8 = _mm256_loadu_pd(r2 + 2);
+
+  /* Columns x - 1 .. x + 4 of the three rows; the loads above cover them all */
+  __m256d nan = _mm256_or_pd(_mm256_cmp_pd(p0, p0, _CMP_UNORD_Q), _mm256_cmp_pd(p2, p2, _CMP_UNORD_Q));
+  nan = _mm256_or_pd(nan, _mm256_or_pd(_mm256_cmp_pd(p3, p3, _CMP_UNORD_Q), _mm256_cmp_pd(p5, p5, _CMP_UNORD_Q)));
+  nan = _mm256_or_pd(nan, _mm256_or_pd(_mm256_cmp_pd(p6, p6, _CMP_UNORD_Q), _mm256_cmp_pd(p8, p8, _CMP_UNORD_Q)));
+  if (_mm256_movemask_pd(nan) != 0)
+  {
+    return 0;
+  }
+
+  if (exclude_center == 0)
+  {
+    MEDIAN9_NETWORK(VSORT_PD, p0, p1, p2, p3, p4, p5, p6, p7, p8);
+    _mm256_storeu_pd(out, p4);
+  }
+  else
+  {
+    /* Sort the 8 neighbors (p4 is the excluded center) and average the two
+       middle values */
+    SORT8_NETWORK(VSORT_PD, p0, p1, p2, p3, p5, p6, p7, p8);
+    _mm256_storeu_pd(out, _mm256_div_pd(_mm256_add_pd(p3, p5), _mm256_set1_pd(2.0)));
+  }
+  return 1;
+}
+
+/* 5x5 median of the four pixels x .. x+3 of an interior row. rows[i] + x0
+   points at column x - 2 of row y - 2 + i; rows must be contiguous in x.
+   Each of the 25 window positions is one vector holding it for all four
+   pixels, so one pass of the median network gives four medians. Returns 0
+   as fmedian_3x3_f64 does if any input value is NaN. */
+__attribute__((target("avx2"))) static int fmedian_5x5_f64(const double *const *rows, int x0,
+                                                            double *out, int exclude_center)
+{
+  __m256d d[25];
+  __m256d nan = _mm256_setzero_pd();
+  for (int i = 0; i < 5; i++)
+  {
+    const double *row = rows[i] + x0;
+    for (int j = 0; j < 5; j++)
+    {
+      d[5 * i + j] = _mm256_loadu_pd(row + j);
+    }
+    /* Columns x - 2 .. x + 5 of the row; the first and last load cover them */
+    nan = _mm256_or_pd(nan, _mm256_cmp_pd(d[5 * i], d[5 * i], _CMP_UNORD_Q));
+    nan = _mm256_or_pd(nan, _mm256_cmp_pd(d[5 * i + 4], d[5 * i + 4], _CMP_UNORD_Q));
+  }
+  if (_mm256_movemask_pd(nan) != 0)
+  {
+    return 0;
+  }
+
+  if (exclude_center == 0)
+  {
+    median25b_pd4(d);
+    _mm256_storeu_pd(out, d[12]);
+  }
+  else
+  {
+    /* Find the middle two of the 24 neighbors (d[12] is the excluded center)
+       and average them */
+    __m256d e[24];
+    for (int i = 0; i < 12; i++)
+    {
+      e[i] = d[i];
+      e[i + 12] = d[i + 13];
+    }
+    median24_pd4(e);
+    _mm256_storeu_pd(out, _mm256_div_pd(_mm256_add_pd(e[11], e[12]), _mm256_set1_pd(2.0)));
+  }
+  return 1;
+}
+
+/* 3x3 median of the sixteen pixels x .. x+15 of an interior row of an int16
+   array, laid out as for fmedian_3x3_f64. With the center excluded the two
+   middle values are averaged rounding down, as fmedian_i16 does. */
+__attribute__((target("avx2"))) static void fmedian_3x3_i16(const int16_t *r0, const int16_t *r1,
+                                                             const int16_t *r2, int16_t *out,
+                                                             int exclude_center)
+{
+  __m256i p0 = _mm256_loadu_si256((const __m256i *)r0);
+  __m256i p1 = _mm256_loadu_si256((const __m256i *)(r0 + 1));
+  __m256i p2 = _mm256_loadu_si256((const __m256i *)(r0 + 2));
+  __m256i p3 = _mm256_loadu_si256((const __m256i *)r1);
+  __m256i p4 = _mm256_loadu_si256((const __m256i *)(r1 + 1));
+  __m256i p5 = _mm256_loadu_si256((const __m256i *)(r1 + 2));
+  __m256i p6 = _mm256_loadu_si256((const __m256i *)r2);
+  __m256i p7 = _mm256_loadu_si256((const __m256i *)(r2 + 1));
+  __m256i p8 = _mm256_loadu_si256((const __m256i *)(r2 + 2));
+
+  if (exclude_center == 0)
+  {
+    MEDIAN9_NETWORK(VSORT_EPI16, p0, p1, p2, p3, p4, p5, p6, p7, p8);
+    _mm256_storeu_si256((__m256i *)out, p4);
+  }
+  else
+  {
+    SORT8_NETWORK(VSORT_EPI16, p0, p1, p2, p3, p5, p6, p7, p8);
+    /* floor((a + b) / 2) without overflow: (a & b) + ((a ^ b) >> 1) */
+    __m256i avg = _mm256_add_epi16(_mm256_and_si256(p3, p5),
+                                   _mm256_srai_epi16(_mm256_xor_si256(p3, p5), 1));
+    _mm256_storeu_si256((__m256i *)out, avg);
+  }
+}
+
+/* Compare-exchange of eight double lanes at once */
+#define VSORT_PD8(a, b)                   \
+  {                                       \
+    __m512d t_ = _mm512_min_pd((a), (b)); \
+    (b) = _mm512_max_pd((a), (b));        \
+    (a) = t_;                             \
+  }
+
+/* As fmedian_3x3_f64, for the eight pixels x .. x+7 */
+__attribute__((target("avx512f"))) static int fmedian_3x3_f64_avx512(const double *r0,
+                                                                     const double *r1,
+                                                                     const double *r2,
+                                                                     double *out,
+                                                                     int exclude_center)
+{
+  __m512d p0 = _mm512_loadu_pd(r0), p1 = _mm512_loadu_pd(r0 + 1), p2 = _mm512_loadu_pd(r0 + 2);
+  __m512d p3 = _mm512_loadu_pd(r1), p4 = _mm512_loadu_pd(r1 + 1), p5 = _mm512_loadu_pd(r1 + 2);
+  __m512d p6 = _mm512_loadu_pd(r2), p7 = _mm512_loadu_pd(r2 + 1), p8 = _mm512_loadu_pd(r2 + 2);
+
+  __mmask8 nan = _mm512_cmp_pd_mask(p0, p0, _CMP_UNORD_Q) | _mm512_cmp_pd_mask(p2, p2, _CMP_UNORD_Q) |
+                 _mm512_cmp_pd_mask(p3, p3, _CMP_UNORD_Q) | _mm512_cmp_pd_mask(p5, p5, _CMP_UNORD_Q) |
+                 _mm512_cmp_pd_mask(p6, p6, _CMP_UNORD_Q) | _mm512_cmp_pd_mask(p8, p8, _CMP_UNORD_Q);
+  if (nan != 0)
+  {
+    return 0;
+  }
+
+  if (exclude_center == 0)
+  {
+    MEDIAN9_NETWORK(VSORT_PD8, p0, p1, p2, p3, p4, p5, p6, p7, p8);
+    _mm512_storeu_pd(out, p4);
+  }
+  else
+  {
+    SORT8_NETWORK(VSORT_PD8, p0, p1, p2, p3, p5, p6, p7, p8);
+    _mm512_storeu_pd(out, _mm512_div_pd(_mm512_add_pd(p3, p5), _mm512_set1_pd(2.0)));
+  }
+  return 1;
+}
+
+/* As fmedian_5x5_f64, for the eight pixels x .. x+7 */
+__attribute__((target("avx512f"))) static int fmedian_5x5_f64_avx512(const double *const *rows,
+                                                                     int x0, double *out,
+                                                                     int exclude_center)
+{
+  __m512d d[25];
+  __mmask8 nan = 0;
+  for (int i = 0; i < 5; i++)
+  {
+    const double *row = rows[i] + x0;
+    for (int j = 0; j < 5; j++)
+    {
+      d[5 * i + j] = _mm512_loadu_pd(row + j);
+    }
+    nan |= _mm512_cmp_pd_mask(d[5 * i], d[5 * i], _CMP_UNORD_Q);
+    nan |= _mm512_cmp_pd_mask(d[5 * i + 4], d[5 * i + 4], _CMP_UNORD_Q);
+  }
+  if (nan != 0)
+  {
+    return 0;
+  }
+
+  if (exclude_center == 0)
+  {
+    median25b_pd8(d);
+    _mm512_storeu_pd(out, d[12]);
+  }
+  else
+  {
+    __m512d e[24];
+    for (int i = 0; i < 12; i++)
+    {
+      e[i] = d[i];
+      e[i + 12] = d[i + 13];
+    }
+    median24_pd8(e);
+    _mm512_storeu_pd(out, _mm512_div_pd(_mm512_add_pd(e[11], e[12]), _mm512_set1_pd(2.0)));
+  }
+  return 1;
+}
+
+#undef VSORT_PD
+#undef VSORT_EPI16
+#undef VSORT_PD8
+#endif
+
+#if defined(FMEDIAN_HAVE_VECTOR) && !defined(FMEDIAN_HAVE_AVX2)
+/* Compare-exchange of two double lanes at once */
+#define VSORT_F64X2(a, b)             \
+  {                                   \
+    float64x2_t t_ = vminq_f64(a, b); \
+    (b) = vmaxq_f64(a, b);            \
+    (a) = t_;                         \
+  }
+
+/* As the AVX2 fmedian_3x3_f64, for the two pixels x .. x+1 */
+static int fmedian_3x3_f64(const double *r0, const double *r1, const double *r2, double *out,
+                           int exclude_center)
+{
+  float64x2_t p0 = vld1q_f64(r0), p1 = vld1q_f64(r0 + 1), p2 = vld1q_f64(r0 + 2);
+  float64x2_t p3 = vld1q_f64(r1), p4 = vld1q_f64(r1 + 1), p5 = vld1q_f64(r1 + 2);
+  float64x2_t p6 = vld1q_f64(r2), p7 = vld1q_f64(r2 + 1), p8 = vld1q_f64(r2 + 2);
+
+  /* Columns x - 1 .. x + 2 of the three rows; the first and last loads cover them */
+  uint64x2_t valid = vandq_u64(vceqq_f64(p0, p0), vceqq_f64(p2, p2));
+  valid = vandq_u64(valid, vandq_u64(vceqq_f64(p3, p3), vceqq_f64(p5, p5)));
+  valid = vandq_u64(valid, vandq_u64(vceqq_f64(p6, p6), vceqq_f64(p8, p8)));
+  if ((vgetq_lane_u64(valid, 0) & vgetq_lane_u64(valid, 1)) != ~(uint64_t)0)
+  {
+    return 0;
+  }
+
+  if (exclude_center == 0)
+  {
+    MEDIAN9_NETWORK(VSORT_F64X2, p0, p1, p2, p3, p4, p5, p6, p7, p8);
+    vst1q_f64(out, p4);
+  }
+  else
+  {
+    SORT8_NETWORK(VSORT_F64X2, p0, p1, p2, p3, p5, p6, p7, p8);
+    vst1q_f64(out, vdivq_f64(vaddq_f64(p3, p5), vdupq_n_f64(2.0)));
+  }
+  return 1;
+}
+
+/* As the AVX2 fmedian_5x5_f64, for the two pixels x .. x+1 */
+static int fmedian_5x5_f64(const double *const *rows, int x0, double *out, int exclude_center)
+{
+  float64x2_t d[25];
+  uint64x2_t valid = vdupq_n_u64(~(uint64_t)0);
+  for (int i = 0; i < 5; i++)
+  {
+    const double *row = rows[i] + x0;
+    for (int j = 0; j < 5; j++)
+    {
+      d[5 * i + j] = vld1q_f64(row + j);
+    }
+    valid = vandq_u64(valid, vceqq_f64(d[5 * i], d[5 * i]));
+    valid = vandq_u64(valid, vceqq_f64(d[5 * i + 4], d[5 * i + 4]));
+  }
+  if ((vgetq_lane_u64(valid, 0) & vgetq_lane_u64(valid, 1)) != ~(uint64_t)0)
+  {
+    return 0;
+  }
+
+  if (exclude_center == 0)
+  {
+    median25b_f64x2(d);
+    vst1q_f64(out, d[12]);
+  }
+  else
+  {
+    float64x2_t e[24];
+    for (int i = 0; i < 12; i++)
+    {
+      e[i] = d[i];
+      e[i + 12] = d[i + 13];
+    }
+    median24_f64x2(e);
+    vst1q_f64(out, vdivq_f64(vaddq_f64(e[11], e[12]), vdupq_n_f64(2.0)));
+  }
+  return 1;
+}
+
+#undef VSORT_F64X2
+#endif
+
+#ifdef FMEDIAN_HAVE_VECTOR
+#undef MEDIAN9_NETWORK
+#undef SORT8_NETWORK
+
+/* The vector kernels in use, with the number of pixels each call filters */
+typedef int (*fmedian_3x3_kernel)(const double *r0, const double *r1, const double *r2,
+                                  double *out, int exclude_center);
+typedef int (*fmedian_5x5_kernel)(const double *const *rows, int x0, double *out,
+                                  int exclude_center);
+#ifdef FMEDIAN_HAVE_AVX2
+/* Chosen at import time from the CPU features; NULL if it has neither */
+static fmedian_3x3_kernel fmedian_3x3_vector = NULL;
+static fmedian_5x5_kernel fmedian_5x5_vector = NULL;
+static int fmedian_vector_lanes = 0;
+#else
+/* NEON is part of the AArch64 baseline */
+static fmedian_3x3_kernel fmedian_3x3_vector = fmedian_3x3_f64;
+static fmedian_5x5_kernel fmedian_5x5_vector = fmedian_5x5_f64;
+static int fmedian_vector_lanes = 2;
+#endif
+#endif
+
+/* Windows of at least this many values are filtered with
+   fmedian_row_sliding instead of collecting each pixel's window (on 500x500,
+   9x5 takes 57 instead of 83 ms that way, but 7x5 55 instead of 50 ms) */
+#define FMEDIAN_SLIDING_MIN_AREA 45
+
+/* Merge (window[0..n-1] minus leaving[0..n_leaving-1]) with
+   entering[0..n_entering-1] into merged and return its length. All three
+   are sorted and leaving holds values that are in window. */
+static int merge_window(const double *window, int n, const double *leaving, int n_leaving,
+                        const double *entering, int n_entering, double *merged)
+{
+  int j = 0, k = 0, m = 0;
+  for (int i = 0; i < n; i++)
+  {
+    double value = window[i];
+    if (j < n_leaving && leaving[j] == value)
+    {
+      j++;
+      continue;
+    }
+    while (k < n_entering && entering[k] < value)
+    {
+      merged[m++] = entering[k++];
+    }
+    merged[m++] = value;
+  }
+  while (k < n_entering)
+  {
+    merged[m++] = entering[k++];
+  }
+  return m;
+}
+
+/* Median-filter row y of a 2D float64 array like fmedian_row, keeping a
+   sorted copy of the window as it slides along the row: each step removes
+   the column leaving the window and merges in the one entering it (each
+   column is sorted once, when it enters), so a pixel costs a linear pass
+   over the window rather than a selection. Returns 0 without writing
+   anything if its buffers cannot be allocated. */
+static int fmedian_row_sliding(const char *input_data, const Py_ssize_t *input_strides,
+                               char *output_data, const Py_ssize_t *output_strides,
+                               int height, int width, int y, int xsize_half, int ysize_half,
+                               int exclude_center)
+{
+  int xsize = 2 * xsize_half + 1;
+  int ysize = 2 * ysize_half + 1;
+  int area = xsize * ysize;
+  int y0 = y - ysize_half > 0 ? y - ysize_half : 0;
+  int y1 = y + ysize_half < height - 1 ? y + ysize_half : height - 1;
+
+  /* The window, a buffer to merge it into and the sorted columns in it,
+     in xsize + 1 slots so the entering column never overwrites the one
+     leaving in the same step */
+  double *buffer = (double *)malloc(((size_t)2 * area + (size_t)(xsize + 1) * ysize) * sizeof(double));
+  int *column_counts = (int *)malloc((xsize + 1) * sizeof(int));
+  if (buffer == NULL || column_counts == NULL)
+  {
+    free(buffer);
+    free(column_counts);
+    return 0;
+  }
+  double *window = buffer;
+  double *merged = buffer + area;
+  double *columns = buffer + 2 * area;
+  int n = 0;
+
+  for (int x = 0; x < width; x++)
+  {
+    /* Columns x + xsize_half (or, at the start of the row, all of
+       0 .. xsize_half) enter and column x - xsize_half - 1 leaves */
+    for (int cx = x == 0 ? 0 : x + xsize_half; cx <= x + xsize_half && cx < width; cx++)
+    {
+      int slot = cx % (xsize + 1);
+      double *column = columns + slot * ysize;
+      int count = 0;
+      for (int ny = y0; ny <= y1; ny++)
+      {
+        double value = *(const double *)(input_data + ny * input_strides[0] + cx * input_strides[1]);
+        if (!isnan(value))
+        {
+          column[count++] = value;
+        }
+      }
+      sort_doubles(column, count);
+      column_counts[slot] = count;
+
+      int leave = x - xsize_half - 1;
+      int leave_slot = leave % (xsize + 1);
+      n = leave >= 0 ? merge_window(window, n, columns + leave_slot * ysize, column_counts[leave_slot],
+                                    column, count, merged)
+                     : merge_window(window, n, NULL, 0, column, count, merged);
+      double *tmp = window;
+      window = merged;
+      merged = tmp;
+    }
+    if (x + xsize_half >= width && x - xsize_half - 1 >= 0)
+    {
+      /* Near the right edge columns only leave */
+      int leave_slot = (x - xsize_half - 1) % (xsize + 1);
+      n = merge_window(window, n, columns + leave_slot * ysize, column_counts[leave_slot],
+                       NULL, 0, merged);
+      double *tmp = window;
+      window = merged;
+      merged = tmp;
+    }
+
+    /* An excluded (finite) center is skipped by its position in the window */
+    double center_value = *(const double *)(input_data + y * input_strides[0] + x * input_strides[1]);
+    int skip = n;
+    int count = n;
+    if (exclude_center != 0 && !isnan(center_value))
+    {
+      int lo = 0, hi = n;
+      while (lo < hi)
+      {
+        int mid = (lo + hi) / 2;
+        if (window[mid] < center_value)
+        {
+          lo = mid + 1;
+        }
+        else
+        {
+          hi = mid;
+        }
+      }
+      skip = lo;
+      count = n - 1;
+    }
+
+    double median_value;
+    if (count == 0)
+    {
+      median_value = isnan(center_value) ? NAN : center_value;
+    }
+    else
+    {
+      int upper = count / 2;
+      median_value = window[upper >= skip ? upper + 1 : upper];
+      if (count % 2 == 0)
+      {
+        int lower = upper - 1;
+        median_value = (window[lower >= skip ? lower + 1 : lower] + median_value) / 2.0;
+      }
+    }
+    *(double *)(output_data + y * output_strides[0] + x * output_strides[1]) = median_value;
+  }
+
+  free(buffer);
+  free(column_counts);
+  return 1;
+}
+
+/* Median-filter row y of a 2D float64 array. Touches no Python objects, so
+   it may run with the GIL released. neighbors must hold at least
+   (2 * xsize_half + 1) * (2 * ysize_half + 1) values. */
+static void fmedian_row(const char *input_data, const Py_ssize_t *input_strides,
+                        char *output_data, const Py_ssize_t *output_strides,
+                        int height, int width, int y, int xsize_half, int ysize_half,
+                        int exclude_center, double *neighbors)
+{
+  int x = 0;
+
+  if ((2 * xsize_half + 1) * (2 * ysize_half + 1) >= FMEDIAN_SLIDING_MIN_AREA &&
+      fmedian_row_sliding(input_data, input_strides, output_data, output_strides, height, width,
+                          y, xsize_half, ysize_half, exclude_center))
+  {
+    return;
+  }
+
+#ifdef FMEDIAN_HAVE_VECTOR
+  /* 3x3 and 5x5 windows on interior rows of x-contiguous arrays: a block of
+     pixels per step with the vector kernels, blocks containing NaN go
+     through the scalar path below. Border pixels are always handled by the
+     scalar path. */
+  int half = xsize_half;
+  int lanes = fmedian_vector_lanes;
+  if (fmedian_3x3_vector != NULL && (half == 1 || half == 2) && ysize_half == half &&
+      y >= half && y < height - half &&
+      input_strides[1] == sizeof(double) && output_strides[1] == sizeof(double))
+  {
+    const double *rows[5];
+    for (int i = 0; i <= 2 * half; i++)
+    {
+      rows[i] = (const double *)(input_data + (y - half + i) * input_strides[0]);
+    }
+    double *out = (double *)(output_data + y * output_strides[0]);
+
+    for (; x < half; x++)
+    {
+      out[x] = fmedian_pixel(input_data, input_strides, height, width, x, y,
+                             xsize_half, ysize_half, exclude_center, neighbors);
+    }
+    for (; x + half + lanes - 1 < width; x += lanes)
+    {
+      int done = half == 1
+                     ? fmedian_3x3_vector(rows[0] + x - 1, rows[1] + x - 1, rows[2] + x - 1,
+                                          out + x, exclude_center)
+                     : fmedian_5x5_vector(rows, x - 2, out + x, exclude_center);
+      if (!done)
+      {
+        for (int k = x; k < x + lanes; k++)
+        {
+          out[k] = fmedian_pixel(input_data, input_strides, height, width, k, y,
+                                 xsize_half, ysize_half, exclude_center, neighbors);
+        }
+      }
+    }
+  }
+#endif
+
+  for (; x < width; x++)
+  {
+    *(double *)(output_data + y * output_strides[0] + x * output_strides[1]) =
+        fmedian_pixel(input_data, input_strides, height, width, x, y,
+                      xsize_half, ysize_half, exclude_center, neighbors);
+  }
+}
+
+/* Median-filter one 2D float64 array into another, splitting rows across
+   nthreads threads. neighbors must hold nthreads buffers of
+   neighbors_stride((2 * xsize_half + 1) * (2 * ysize_half + 1)) values each. */
+static void fmedian_kernel(const char *input_data, const Py_ssize_t *input_strides,
+                           char *output_data, const Py_ssize_t *output_strides,
+                           int height, int width, int xsize_half, int ysize_half,
+                           int exclude_center, double *neighbors, int nthreads)
+{
+  size_t stride = neighbors_stride((2 * xsize_half + 1) * (2 * ysize_half + 1));
+
+#ifdef _OPENMP
+  if (nthreads > 1)
+  {
+#pragma omp parallel for schedule(static) num_threads(nthreads)
+    for (int y = 0; y < height; y++)
+    {
+      fmedian_row(input_data, input_strides, output_data, output_strides,
+                  height, width, y, xsize_half, ysize_half, exclude_center,
+                  neighbors + (size_t)omp_get_thread_num() * stride);
+    }
+    return;
+  }
+#else
+  (void)nthreads;
+  (void)stride;
+#endif
+
+  for (int y = 0; y < height; y++)
+  {
+    fmedian_row(input_data, input_strides, output_data, output_strides,
+                height, width, y, xsize_half, ysize_half, exclude_center, neighbors);
+  }
+}
+
 /* Main fmedian function */
 static PyObject *fmedian(PyObject *self, PyObject *args)
 {
-  PyArrayObject *input_array, *output_array;
+  PyObject *input_obj, *output_obj;
+  Py_buffer input, output;
   int xsize, ysize, exclude_center;
+  int num_threads = 0;
   int height, width;
 
-  /* Parse arguments: input_array, output_array, xsize, ysize, exclude_center */
-  if (!PyArg_ParseTuple(args, "O!O!iii",
-                        &PyArray_Type, &input_array,
-                        &PyArray_Type, &output_array,
-                        &xsize, &ysize, &exclude_center))
+  /* Parse arguments: input_array, output_array, xsize, ysize, exclude_center[, num_threads].
+     Sizes and exclude_center use the "i" format, so plain Python ints (or
+     any object implementing __index__) are accepted as-is; callers do not
+     need to wrap them in NumPy integer scalars. */
+  if (!PyArg_ParseTuple(args, "OOiii|i", &input_obj, &output_obj,
+                        &xsize, &ysize, &exclude_center, &num_threads))
   {
     return NULL;
   }
@@ -91,97 +863,509 @@ static PyObject *fmedian(PyObject *self, PyObject *args)
   int ysize_half = ysize / 2;
 
   /* Check input arguments */
-  if (check_inputs(input_array, output_array, &height, &width) != 0)
+  if (get_buffers(input_obj, output_obj, &input, &output, 'd', "float64", 'd', "float64",
+                  sizeof(double), sizeof(double), &height, &width) != 0)
+  {
+    return NULL;
+  }
+
+  /* Allocate one buffer for neighborhood values per thread */
+  int max_neighbors = (2 * xsize_half + 1) * (2 * ysize_half + 1);
+  int nthreads = resolve_num_threads(num_threads, (long long)height * width * max_neighbors);
+  size_t stride = neighbors_stride(max_neighbors);
+  double stack_neighbors[STACK_NEIGHBORS + NEIGHBORS_LINE];
+  double *buffer = stack_neighbors;
+  if ((size_t)nthreads * stride > STACK_NEIGHBORS)
+  {
+    buffer = (double *)malloc(((size_t)nthreads * stride + NEIGHBORS_LINE) * sizeof(double));
+  }
+  if (buffer == NULL)
   {
+    PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory for neighbors");
+    PyBuffer_Release(&input);
+    PyBuffer_Release(&output);
     return NULL;
   }
+  double *neighbors = line_aligned(buffer);
 
-  /* Get data pointers */
-  double *input_data = (double *)PyArray_DATA(input_array);
-  double *output_data = (double *)PyArray_DATA(output_array);
+  Py_BEGIN_ALLOW_THREADS
+  fmedian_kernel((const char *)input.buf, input.strides, (char *)output.buf, output.strides,
+                 height, width, xsize_half, ysize_half, exclude_center, neighbors, nthreads);
+  Py_END_ALLOW_THREADS
 
-  /* Get strides */
-  npy_intp *input_strides = PyArray_STRIDES(input_array);
-  npy_intp *output_strides = PyArray_STRIDES(output_array);
+  if (buffer != stack_neighbors)
+  {
+    free(buffer);
+  }
+  PyBuffer_Release(&input);
+  PyBuffer_Release(&output);
 
-  /* Allocate buffer for neighborhood values */
+  Py_RETURN_NONE;
+}
+
+/* Batched fmedian: filter a sequence of arrays with one call.
+   All arguments are validated while holding the GIL; the filtering itself
+   runs with the GIL released. With several threads, whole arrays are
+   distributed across threads when there are enough of them, otherwise the
+   rows of each array are. */
+static PyObject *fmedian_batch(PyObject *self, PyObject *args)
+{
+  PyObject *inputs, *outputs;
+  int xsize, ysize, exclude_center;
+  int num_threads = 0;
+
+  /* Parse arguments: input_arrays, output_arrays, xsize, ysize, exclude_center[, num_threads] */
+  if (!PyArg_ParseTuple(args, "OOiii|i", &inputs, &outputs,
+                        &xsize, &ysize, &exclude_center, &num_threads))
+  {
+    return NULL;
+  }
+
+  PyObject *in_seq = PySequence_Fast(inputs, "input_arrays must be a sequence of arrays");
+  if (in_seq == NULL)
+  {
+    return NULL;
+  }
+  PyObject *out_seq = PySequence_Fast(outputs, "output_arrays must be a sequence of arrays");
+  if (out_seq == NULL)
+  {
+    Py_DECREF(in_seq);
+    return NULL;
+  }
+
+  PyObject *result = NULL;
+  Py_buffer *in_views = NULL, *out_views = NULL;
+  Py_ssize_t acquired = 0;
+  int *heights = NULL, *widths = NULL;
+  double stack_neighbors[STACK_NEIGHBORS + NEIGHBORS_LINE];
+  double *buffer = NULL;
+
+  Py_ssize_t n = PySequence_Fast_GET_SIZE(in_seq);
+  if (PySequence_Fast_GET_SIZE(out_seq) != n)
+  {
+    PyErr_SetString(PyExc_ValueError, "input_arrays and output_arrays must have the same length");
+    goto done;
+  }
+
+  int xsize_half = xsize / 2;
+  int ysize_half = ysize / 2;
   int max_neighbors = (2 * xsize_half + 1) * (2 * ysize_half + 1);
-  double *neighbors = (double *)malloc(max_neighbors * sizeof(double));
-  if (neighbors == NULL)
+
+  in_views = (Py_buffer *)malloc((n + 1) * sizeof(Py_buffer));
+  out_views = (Py_buffer *)malloc((n + 1) * sizeof(Py_buffer));
+  heights = (int *)malloc((n + 1) * sizeof(int));
+  widths = (int *)malloc((n + 1) * sizeof(int));
+  if (in_views == NULL || out_views == NULL || heights == NULL || widths == NULL)
+  {
+    PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory for fmedian_batch");
+    goto done;
+  }
+
+  /* Validate every pair before doing any work */
+  long long work = 0;
+  for (Py_ssize_t i = 0; i < n; i++)
+  {
+    if (get_buffers(PySequence_Fast_GET_ITEM(in_seq, i), PySequence_Fast_GET_ITEM(out_seq, i),
+                    &in_views[i], &out_views[i], 'd', "float64", 'd', "float64",
+                    sizeof(double), sizeof(double), &heights[i], &widths[i]) != 0)
+    {
+      goto done;
+    }
+    acquired = i + 1;
+    work += (long long)heights[i] * widths[i] * max_neighbors;
+  }
+
+  int nthreads = resolve_num_threads(num_threads, work);
+  size_t stride = neighbors_stride(max_neighbors);
+  buffer = stack_neighbors;
+  if ((size_t)nthreads * stride > STACK_NEIGHBORS)
+  {
+    buffer = (double *)malloc(((size_t)nthreads * stride + NEIGHBORS_LINE) * sizeof(double));
+  }
+  if (buffer == NULL)
   {
     PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory for neighbors");
-    return NULL;
+    goto done;
   }
+  double *neighbors = line_aligned(buffer);
 
-  /* Process each pixel */
-  for (int y = 0; y < height; y++)
+  /* The buffer views keep the arrays alive while the GIL is released */
+  Py_BEGIN_ALLOW_THREADS
+#ifdef _OPENMP
+  if (nthreads > 1 && n >= nthreads)
   {
-    for (int x = 0; x < width; x++)
+#pragma omp parallel for schedule(dynamic) num_threads(nthreads)
+    for (Py_ssize_t i = 0; i < n; i++)
     {
-      int count = 0;
+      fmedian_kernel((const char *)in_views[i].buf, in_views[i].strides,
+                     (char *)out_views[i].buf, out_views[i].strides,
+                     heights[i], widths[i], xsize_half, ysize_half, exclude_center,
+                     neighbors + (size_t)omp_get_thread_num() * stride, 1);
+    }
+  }
+  else
+#endif
+  {
+    for (Py_ssize_t i = 0; i < n; i++)
+    {
+      fmedian_kernel((const char *)in_views[i].buf, in_views[i].strides,
+                     (char *)out_views[i].buf, out_views[i].strides,
+                     heights[i], widths[i], xsize_half, ysize_half, exclude_center,
+                     neighbors, nthreads);
+    }
+  }
+  Py_END_ALLOW_THREADS
+
+  Py_INCREF(Py_None);
+  result = Py_None;
+
+done:
+  for (Py_ssize_t i = 0; i < acquired; i++)
+  {
+    PyBuffer_Release(&in_views[i]);
+    PyBuffer_Release(&out_views[i]);
+  }
+  free(in_views);
+  free(out_views);
+  free(heights);
+  free(widths);
+  if (buffer != stack_neighbors)
+  {
+    free(buffer);
+  }
+  Py_DECREF(in_seq);
+  Py_DECREF(out_seq);
+  return result;
+}
 
-      /* Get current pixel value */
-      double center_value = *(double *)(((char *)input_data) + y * input_strides[0] + x * input_strides[1]);
+/* ---- Histogram median for 16-bit integer input ----
+
+   Huang's sliding-histogram algorithm: each row keeps one histogram of the
+   window contents and slides it along x, removing the column that leaves the
+   window and adding the one that enters it. The cost per pixel is O(ysize)
+   updates plus a search of a two-level histogram (256 coarse bins of 256 fine
+   bins each), independent of the sort-based O(n log n) per window.
+   Perreault & Hebert's fully O(1) variant is not used because it needs a
+   65536-bin histogram per image column. */
+
+#define HIST_COARSE_BINS 256
+#define HIST_FINE_BINS 65536
+
+typedef struct
+{
+  uint32_t coarse[HIST_COARSE_BINS];
+  uint32_t fine[HIST_FINE_BINS];
+} median_histogram;
+
+static inline void hist_add(median_histogram *hist, uint16_t key)
+{
+  hist->coarse[key >> 8]++;
+  hist->fine[key]++;
+}
+
+static inline void hist_remove(median_histogram *hist, uint16_t key)
+{
+  hist->coarse[key >> 8]--;
+  hist->fine[key]--;
+}
+
+/* Return the key with the given 0-based rank; rank must be < the number of
+   keys in the histogram. */
+static uint16_t hist_select(const median_histogram *hist, uint32_t rank)
+{
+  int c = 0;
+  while (rank >= hist->coarse[c])
+  {
+    rank -= hist->coarse[c];
+    c++;
+  }
+  const uint32_t *fine = hist->fine + (c << 8);
+  int f = 0;
+  while (rank >= fine[f])
+  {
+    rank -= fine[f];
+    f++;
+  }
+  return (uint16_t)((c << 8) | f);
+}
+
+/* Histogram keys are the raw 16-bit values XOR a bias: 0 for uint16 input,
+   and 0x8000 for int16 input, which maps -32768..32767 onto 0..65535 in
+   order. Decode a key back to the value it stands for. */
+static inline double hist_key_value(uint32_t key, uint16_t bias)
+{
+  return bias != 0 ? (double)(int16_t)(uint16_t)(key ^ bias) : (double)key;
+}
+
+/* Add (sign = 1) or remove (sign = -1) column x, rows y0..y1, of a 16-bit array */
+static void hist_update_column(median_histogram *hist, const char *input_data,
+                               const Py_ssize_t *input_strides, int x, int y0, int y1,
+                               uint16_t bias, int sign)
+{
+  const char *p = input_data + y0 * input_strides[0] + x * input_strides[1];
+  for (int y = y0; y <= y1; y++, p += input_strides[0])
+  {
+    uint16_t key = *(const uint16_t *)p ^ bias;
+    if (sign > 0)
+    {
+      hist_add(hist, key);
+    }
+    else
+    {
+      hist_remove(hist, key);
+    }
+  }
+}
 
-      /* Collect neighborhood values (conditionally include center) */
-      for (int dy = -ysize_half; dy <= ysize_half; dy++)
+/* Histogram-median row y of a 16-bit array whose keys use the given bias.
+   The output is float64, or int16 if output_i16 is non-zero; an int16 median
+   of an even number of values is the mean of the two middle values rounded
+   down. The histogram must be empty on entry and is left empty on return. */
+static void fmedian_hist_row(const char *input_data, const Py_ssize_t *input_strides,
+                             char *output_data, const Py_ssize_t *output_strides,
+                             int height, int width, int y, int xsize_half, int ysize_half,
+                             int exclude_center, uint16_t bias, int output_i16,
+                             median_histogram *hist)
+{
+  int y0 = y - ysize_half > 0 ? y - ysize_half : 0;
+  int y1 = y + ysize_half < height - 1 ? y + ysize_half : height - 1;
+  uint32_t rows = (uint32_t)(y1 - y0 + 1);
+  uint32_t count = 0;
+
+  /* Window for x = 0 covers columns 0 .. xsize_half */
+  for (int nx = 0; nx <= xsize_half && nx < width; nx++)
+  {
+    hist_update_column(hist, input_data, input_strides, nx, y0, y1, bias, 1);
+    count += rows;
+  }
+
+  for (int x = 0; x < width; x++)
+  {
+    if (x > 0)
+    {
+      if (x + xsize_half < width)
       {
-        for (int dx = -xsize_half; dx <= xsize_half; dx++)
-        {
-          int ny = y + dy;
-          int nx = x + dx;
-
-          /* Check bounds */
-          if (ny >= 0 && ny < height && nx >= 0 && nx < width)
-          {
-            /* Skip center when exclude_center != 0 */
-            if (dy == 0 && dx == 0 && exclude_center != 0)
-            {
-              continue;
-            }
-
-            double neighbor_value = *(double *)(((char *)input_data) + ny * input_strides[0] + nx * input_strides[1]);
-            /* Skip NaN values so they are not considered in the median */
-            if (isnan(neighbor_value))
-            {
-              continue;
-            }
-            neighbors[count++] = neighbor_value;
-          }
-        }
+        hist_update_column(hist, input_data, input_strides, x + xsize_half, y0, y1, bias, 1);
+        count += rows;
+      }
+      if (x - xsize_half - 1 >= 0)
+      {
+        hist_update_column(hist, input_data, input_strides, x - xsize_half - 1, y0, y1, bias, -1);
+        count -= rows;
       }
+    }
+
+    uint16_t center = *(const uint16_t *)(input_data + y * input_strides[0] + x * input_strides[1]) ^ bias;
+    uint32_t n = count;
+    if (exclude_center != 0)
+    {
+      hist_remove(hist, center);
+      n--;
+    }
+
+    /* Keys of the two middle values (the same key for odd counts) */
+    uint32_t lo, hi;
+    if (n == 0)
+    {
+      /* Only possible for a 1x1 window with the center excluded: fall back
+         to the center value, as the float64 kernel does */
+      lo = hi = center;
+    }
+    else if (n % 2 == 0)
+    {
+      lo = hist_select(hist, n / 2 - 1);
+      hi = hist_select(hist, n / 2);
+    }
+    else
+    {
+      lo = hi = hist_select(hist, n / 2);
+    }
+
+    if (exclude_center != 0)
+    {
+      hist_add(hist, center);
+    }
+
+    char *dst = output_data + y * output_strides[0] + x * output_strides[1];
+    if (output_i16 != 0)
+    {
+      /* Keys are ordered like the values, so rounding the key mean down
+         rounds the value mean down */
+      *(int16_t *)dst = (int16_t)(uint16_t)(((lo + hi) >> 1) ^ bias);
+    }
+    else
+    {
+      *(double *)dst = (hist_key_value(lo, bias) + hist_key_value(hi, bias)) / 2.0;
+    }
+  }
+
+  /* Empty the histogram: remove the columns still in the last window */
+  for (int nx = width - 1 - xsize_half > 0 ? width - 1 - xsize_half : 0; nx < width; nx++)
+  {
+    hist_update_column(hist, input_data, input_strides, nx, y0, y1, bias, -1);
+  }
+}
 
-      /* Compute median and store in output.
-         If no neighbors (e.g., xsize=ysize=0 and include_center==0),
-         fall back to the center pixel value so a 1x1 window returns the original. */
-      double median_value;
-      if (count == 0)
+/* 3x3 median of pixel (x, y) of an int16 array, for the pixels the vector
+   kernel does not cover. Uses the key encoding of the histogram kernel. */
+static int16_t fmedian_i16_3x3_pixel(const char *input_data, const Py_ssize_t *input_strides,
+                                     int height, int width, int x, int y, int exclude_center)
+{
+  uint32_t keys[9];
+  int n = 0;
+  for (int ny = y - 1; ny <= y + 1; ny++)
+  {
+    for (int nx = x - 1; nx <= x + 1; nx++)
+    {
+      if (ny < 0 || ny >= height || nx < 0 || nx >= width || (exclude_center != 0 && nx == x && ny == y))
       {
-        /* No valid neighbors (all were NaN or window empty). If the center
-           pixel is finite and was not excluded, use it; otherwise write NaN. */
-        if (!isnan(center_value))
-        {
-          median_value = center_value;
-        }
-        else
-        {
-          median_value = NAN;
-        }
+        continue;
       }
-      else
+      uint32_t key = *(const uint16_t *)(input_data + ny * input_strides[0] + nx * input_strides[1]) ^ 0x8000u;
+      /* Insertion sort */
+      int i = n++;
+      while (i > 0 && keys[i - 1] > key)
       {
-        median_value = compute_median(neighbors, count);
+        keys[i] = keys[i - 1];
+        i--;
       }
+      keys[i] = key;
+    }
+  }
+  /* Only called on interior rows of 3x3 windows, so n >= 5 */
+  uint32_t lo = keys[(n - 1) / 2], hi = keys[n / 2];
+  return (int16_t)(uint16_t)(((lo + hi) >> 1) ^ 0x8000u);
+}
 
-      *(double *)(((char *)output_data) + y * output_strides[0] + x * output_strides[1]) = median_value;
+/* Median-filter row y of an int16 array into an int16 array. 3x3 windows on
+   interior rows of x-contiguous arrays use the AVX2 kernel where available,
+   everything else the sliding histogram. */
+static void fmedian_i16_row(const char *input_data, const Py_ssize_t *input_strides,
+                            char *output_data, const Py_ssize_t *output_strides,
+                            int height, int width, int y, int xsize_half, int ysize_half,
+                            int exclude_center, median_histogram *hist)
+{
+#ifdef FMEDIAN_HAVE_AVX2
+  if (fmedian_use_avx2 && xsize_half == 1 && ysize_half == 1 && y > 0 && y < height - 1 &&
+      input_strides[1] == sizeof(int16_t) && output_strides[1] == sizeof(int16_t))
+  {
+    const int16_t *r0 = (const int16_t *)(input_data + (y - 1) * input_strides[0]);
+    const int16_t *r1 = (const int16_t *)(input_data + y * input_strides[0]);
+    const int16_t *r2 = (const int16_t *)(input_data + (y + 1) * input_strides[0]);
+    int16_t *out = (int16_t *)(output_data + y * output_strides[0]);
+
+    out[0] = fmedian_i16_3x3_pixel(input_data, input_strides, height, width, 0, y, exclude_center);
+    int x;
+    for (x = 1; x + 16 < width; x += 16)
+    {
+      fmedian_3x3_i16(r0 + x - 1, r1 + x - 1, r2 + x - 1, out + x, exclude_center);
+    }
+    for (; x < width; x++)
+    {
+      out[x] = fmedian_i16_3x3_pixel(input_data, input_strides, height, width, x, y, exclude_center);
     }
+    return;
   }
+#endif
+  fmedian_hist_row(input_data, input_strides, output_data, output_strides,
+                   height, width, y, xsize_half, ysize_half, exclude_center, 0x8000, 1, hist);
+}
 
-  free(neighbors);
+/* Shared implementation of fmedian_u16 (uint16 in, float64 out) and
+   fmedian_i16 (int16 in, int16 out) */
+static PyObject *fmedian_16bit(PyObject *args, int signed_input)
+{
+  PyObject *input_obj, *output_obj;
+  Py_buffer input, output;
+  int xsize, ysize, exclude_center;
+  int num_threads = 0;
+  int height, width;
+
+  /* Parse arguments: input_array, output_array, xsize, ysize, exclude_center[, num_threads] */
+  if (!PyArg_ParseTuple(args, "OOiii|i", &input_obj, &output_obj,
+                        &xsize, &ysize, &exclude_center, &num_threads))
+  {
+    return NULL;
+  }
+
+  int xsize_half = xsize / 2;
+  int ysize_half = ysize / 2;
+
+  int status = signed_input
+                   ? get_buffers(input_obj, output_obj, &input, &output, 'h', "int16", 'h', "int16",
+                                 sizeof(int16_t), sizeof(int16_t), &height, &width)
+                   : get_buffers(input_obj, output_obj, &input, &output, 'H', "uint16", 'd', "float64",
+                                 sizeof(uint16_t), sizeof(double), &height, &width);
+  if (status != 0)
+  {
+    return NULL;
+  }
+
+  /* Histogram updates are O(ysize) per pixel, so weigh the work accordingly */
+  int nthreads = resolve_num_threads(num_threads, (long long)height * width * (2 * ysize_half + 1) * 16);
+  if (nthreads > height)
+  {
+    nthreads = height > 0 ? height : 1;
+  }
+
+  /* One zeroed histogram per thread */
+  median_histogram *hists = (median_histogram *)calloc((size_t)nthreads, sizeof(median_histogram));
+  if (hists == NULL)
+  {
+    PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory for histograms");
+    PyBuffer_Release(&input);
+    PyBuffer_Release(&output);
+    return NULL;
+  }
+
+  const char *input_data = (const char *)input.buf;
+  char *output_data = (char *)output.buf;
+  Py_ssize_t *input_strides = input.strides;
+  Py_ssize_t *output_strides = output.strides;
+
+  Py_BEGIN_ALLOW_THREADS
+#ifdef _OPENMP
+#pragma omp parallel for schedule(static) num_threads(nthreads) if (nthreads > 1)
+#endif
+  for (int y = 0; y < height; y++)
+  {
+#ifdef _OPENMP
+    median_histogram *hist = hists + omp_get_thread_num();
+#else
+    median_histogram *hist = hists;
+#endif
+    if (signed_input)
+    {
+      fmedian_i16_row(input_data, input_strides, output_data, output_strides,
+                      height, width, y, xsize_half, ysize_half, exclude_center, hist);
+    }
+    else
+    {
+      fmedian_hist_row(input_data, input_strides, output_data, output_strides,
+                       height, width, y, xsize_half, ysize_half, exclude_center, 0, 0, hist);
+    }
+  }
+  Py_END_ALLOW_THREADS
+
+  free(hists);
+  PyBuffer_Release(&input);
+  PyBuffer_Release(&output);
 
   Py_RETURN_NONE;
 }
 
+/* fmedian for uint16 input using the sliding histogram */
+static PyObject *fmedian_u16(PyObject *self, PyObject *args)
+{
+  return fmedian_16bit(args, 0);
+}
+
+/* fmedian for int16 input and output */
+static PyObject *fmedian_i16(PyObject *self, PyObject *args)
+{
+  return fmedian_16bit(args, 1);
+}
+
 /* Method definitions */
 static PyMethodDef FmedianMethods[] = {
     {"fmedian", fmedian, METH_VARARGS,
@@ -190,13 +1374,73 @@ static PyMethodDef FmedianMethods[] = {
      "    input_array : numpy.ndarray (float64, 2D)\n"
      "        Input array\n"
      "    output_array : numpy.ndarray (float64, 2D)\n"
-     "        Output array (same size as input)\n"
+     "        Output array (same size as input). Every element is written,\n"
+     "        so allocate it with numpy.empty rather than numpy.zeros\n"
+     "    xsize : int\n"
+     "        Full width of window in x direction\n"
+     "    ysize : int\n"
+     "        Full height of window in y direction\n"
+     "    exclude_center : int\n"
+     "        If non-zero, exclude the center pixel from the median calculation\n"
+     "    num_threads : int, optional\n"
+     "        Number of OpenMP threads; 0 (default) uses the OpenMP default.\n"
+     "        Ignored when built without OpenMP\n"},
+    {"fmedian_batch", fmedian_batch, METH_VARARGS,
+     "Compute filtered medians of a sequence of 2D arrays in one call.\n\n"
+     "The GIL is released while filtering.\n\n"
+     "Parameters:\n"
+     "    input_arrays : sequence of numpy.ndarray (float64, 2D)\n"
+     "        Input arrays (shapes may differ between entries)\n"
+     "    output_arrays : sequence of numpy.ndarray (float64, 2D)\n"
+     "        Output arrays, one per input and of the same size\n"
+     "    xsize : int\n"
+     "        Full width of window in x direction\n"
+     "    ysize : int\n"
+     "        Full height of window in y direction\n"
+     "    exclude_center : int\n"
+     "        If non-zero, exclude the center pixel from the median calculation\n"
+     "    num_threads : int, optional\n"
+     "        Number of OpenMP threads; 0 (default) uses the OpenMP default.\n"
+     "        Ignored when built without OpenMP\n"},
+    {"fmedian_u16", fmedian_u16, METH_VARARGS,
+     "Compute filtered median of a 2D uint16 array using a sliding histogram.\n\n"
+     "Gives the same result as fmedian on the array converted to float64, at\n"
+     "a cost per pixel that grows with ysize only (not with the window area).\n\n"
+     "Parameters:\n"
+     "    input_array : numpy.ndarray (uint16, 2D)\n"
+     "        Input array\n"
+     "    output_array : numpy.ndarray (float64, 2D)\n"
+     "        Output array (same size as input). Every element is written,\n"
+     "        so allocate it with numpy.empty rather than numpy.zeros\n"
+     "    xsize : int\n"
+     "        Full width of window in x direction\n"
+     "    ysize : int\n"
+     "        Full height of window in y direction\n"
+     "    exclude_center : int\n"
+     "        If non-zero, exclude the center pixel from the median calculation\n"
+     "    num_threads : int, optional\n"
+     "        Number of OpenMP threads; 0 (default) uses the OpenMP default.\n"
+     "        Ignored when built without OpenMP\n"},
+    {"fmedian_i16", fmedian_i16, METH_VARARGS,
+     "Compute filtered median of a 2D int16 array into an int16 array.\n\n"
+     "The median of an even number of values is the mean of the two middle\n"
+     "values rounded down. 3x3 windows use an AVX2 kernel where available,\n"
+     "other windows a sliding histogram.\n\n"
+     "Parameters:\n"
+     "    input_array : numpy.ndarray (int16, 2D)\n"
+     "        Input array\n"
+     "    output_array : numpy.ndarray (int16, 2D)\n"
+     "        Output array (same size as input). Every element is written,\n"
+     "        so allocate it with numpy.empty rather than numpy.zeros\n"
      "    xsize : int\n"
      "        Full width of window in x direction\n"
      "    ysize : int\n"
      "        Full height of window in y direction\n"
      "    exclude_center : int\n"
-     "        If non-zero, exclude the center pixel from the median calculation\n"},
+     "        If non-zero, exclude the center pixel from the median calculation\n"
+     "    num_threads : int, optional\n"
+     "        Number of OpenMP threads; 0 (default) uses the OpenMP default.\n"
+     "        Ignored when built without OpenMP\n"},
     {NULL, NULL, 0, NULL}};
 
 /* Module definition */
@@ -210,6 +1454,21 @@ static struct PyModuleDef fmedian_module = {
 /* Module initialization */
 PyMODINIT_FUNC PyInit_fmedian_ext(void)
 {
-  import_array();
+#ifdef FMEDIAN_HAVE_AVX2
+  __builtin_cpu_init();
+  fmedian_use_avx2 = __builtin_cpu_supports("avx2");
+  if (__builtin_cpu_supports("avx512f"))
+  {
+    fmedian_3x3_vector = fmedian_3x3_f64_avx512;
+    fmedian_5x5_vector = fmedian_5x5_f64_avx512;
+    fmedian_vector_lanes = 8;
+  }
+  else if (fmedian_use_avx2)
+  {
+    fmedian_3x3_vector = fmedian_3x3_f64;
+    fmedian_5x5_vector = fmedian_5x5_f64;
+    fmedian_vector_lanes = 4;
+  }
+#endif
   return PyModule_Create(&fmedian_module);
 }
@@ -1,54 +1,20 @@
 """ftools.fmedian3 package loader.
 
-This module locates the pre-built extension shared object in the repository
-(`../fmedian3/fmedian3_ext*.so`) and loads it as a private module, then
-exposes the `fmedian3` function at package level.
+This module imports the compiled `fmedian3_ext` extension and exposes the
+`fmedian3` function at package level.
 
-We avoid moving any compiled artifacts; the loader simply finds the first
-matching shared object in the repository layout and imports it.
+If the extension is not importable as a submodule (legacy layout), the loader
+falls back to finding a matching shared object in the repository and loads it
+as a private module.
 """
 from __future__ import annotations
 
-import glob
-import importlib.machinery
-import importlib.util
-import os
+import numpy as _np
 
-# Try to import a bundled extension if available (e.g. when package is
-# installed with aligned module names).
-try:
-    from . import _fmedian3_ext as _ext  # type: ignore
-except Exception:
-    # First, look for a compiled extension in the package directory (useful when
-    # built in-place or installed). If not found, fall back to the repository
-    # top-level location (legacy layout).
-    _HERE = os.path.dirname(__file__)
-    repo_root = os.path.abspath(os.path.join(_HERE, "..", "..", ".."))
-
-    candidates = glob.glob(os.path.join(_HERE, "fmedian3_ext*.so"))
-    if not candidates:
-        # Fallback to legacy location at the repository root
-        candidates = glob.glob(os.path.join(repo_root, "fmedian3", "fmedian3_ext*.so"))
-        if not candidates:
-            # macOS sometimes adds extra suffixes
-            candidates = glob.glob(os.path.join(repo_root, "fmedian3", "fmedian3_ext*.*.so"))
-
-    if not candidates:
-        raise ImportError(
-            "Could not locate the compiled fmedian3 extension (expected src/ftools/fmedian3/fmedian3_ext*.so or fmedian3/fmedian3_ext*.so). "
-            "Build it first or install the package so the extension is available."
-        )
-
-    so_path = candidates[0]
-    # Ensure loader name matches the compiled module name (so the PyInit symbol matches)
-    base = os.path.basename(so_path)
-    base_mod = os.path.splitext(base)[0].split(".")[0]
-    loader = importlib.machinery.ExtensionFileLoader(base_mod, so_path)
-    spec = importlib.util.spec_from_loader(base_mod, loader)
-    if spec is None:
-        raise ImportError(f"Could not create module spec for {base_mod}")
-    _ext = importlib.util.module_from_spec(spec)
-    loader.exec_module(_ext)  # type: ignore[arg-type]
+from .._extloader import load_ext
+from .._validate import check_num_threads, output_array
+
+_ext = load_ext(__name__, "fmedian3_ext")
 
 try:
     _c_fmedian3 = _ext.fmedian3  # type: ignore[attr-defined]
@@ -56,19 +22,34 @@ except Exception as exc:  # pragma: no cover - defensive
     raise ImportError("Loaded fmedian3 extension but could not find 'fmedian3' symbol") from exc
 
 
-def fmedian3(input_array, xsize: int, ysize: int, zsize: int, exclude_center: int = 0):
+def fmedian3(input_array, xsize: int, ysize: int, zsize: int, exclude_center: int = 0, *,
+             method: str = "exact", num_threads=None, out=None):
     """Compute filtered median and return the output array.
 
-    Signature: fmedian3(input_array, xsize, ysize, zsize, exclude_center=0) -> numpy.ndarray
+    Signature: fmedian3(input_array, xsize, ysize, zsize, exclude_center=0, *, method="exact", num_threads=None, out=None) -> numpy.ndarray
 
     Parameters:
     - xsize, ysize, zsize: Full window sizes (must be odd numbers)
     - exclude_center: Whether to exclude the center voxel from the calculation (default: 0)
-
-    The input will be coerced to float64; the returned array is float64.
+    - method: "exact" (default) for the median of each xsize*ysize*zsize
+      window, or "separable" for a median along z, then along y, then
+      along x, each pass filtering the result of the previous one. The
+      separable result is not the 3D median, but it also suppresses
+      isolated outliers and costs zsize + ysize + xsize values per voxel
+      instead of their product. NaNs are skipped in each pass, and with
+      exclude_center each pass leaves out the center of its 1D window.
+    - num_threads: Number of threads; None uses the OpenMP default (OMP_NUM_THREADS
+      or the number of cores). Small inputs, and builds without OpenMP, run on
+      one thread. The GIL is released while filtering.
+    - out: Optional float64 array of the input's shape to write the result
+      into (and return), e.g. to reuse one buffer across many calls instead
+      of allocating a new one each time. Every element is overwritten, so
+      it can come from numpy.empty. It must not overlap the input.
+
+    The input will be coerced to a C-contiguous float64 array (strided views
+    are copied, contiguous float64 input is used as-is); the returned array is
+    float64.
     """
-    import numpy as _np
-
     if xsize is None or ysize is None or zsize is None:
         raise TypeError("fmedian3 requires xsize, ysize, and zsize parameters")
 
@@ -92,13 +73,34 @@ def fmedian3(input_array, xsize: int, ysize: int, zsize: int, exclude_center: in
         raise ValueError(f"ysize must be an odd number, got {ysize}")
     if zsize % 2 == 0:
         raise ValueError(f"zsize must be an odd number, got {zsize}")
+    if method not in ("exact", "separable"):
+        raise ValueError(f"method must be 'exact' or 'separable', got {method!r}")
+    num_threads = check_num_threads(num_threads)
     
-    arr = _np.asarray(input_array, dtype=_np.float64)
+    arr = _np.ascontiguousarray(input_array, dtype=_np.float64)
     if arr.ndim != 3:
         raise ValueError(f"Input array must be 3-dimensional, got {arr.ndim}D")
-    
-    out = _np.empty_like(arr, dtype=_np.float64)
-    _c_fmedian3(arr, out, xsize, ysize, zsize, int(exclude_center))
+
+    out = output_array(out, arr)
+
+    if method == "separable":
+        # One 1D pass per axis; passes of length 1 would return their input.
+        # The passes alternate between out and one scratch array, starting
+        # with whichever makes the last pass write to out.
+        passes = [sizes for sizes in ((1, 1, zsize), (1, ysize, 1), (xsize, 1, 1))
+                  if max(sizes) > 1]
+        if not passes:
+            out[...] = arr
+            return out
+        scratch = _np.empty_like(arr) if len(passes) > 1 else None
+        result = arr
+        for i, sizes in enumerate(passes):
+            dest = out if (len(passes) - 1 - i) % 2 == 0 else scratch
+            _c_fmedian3(result, dest, *sizes, int(exclude_center), num_threads)
+            result = dest
+        return out
+
+    _c_fmedian3(arr, out, xsize, ysize, zsize, int(exclude_center), num_threads)
     return out
 
 
@@ -2,13 +2,27 @@
 #include <Python.h>
 #include <numpy/arrayobject.h>
 #include <stdlib.h>
+#include <string.h>
 #include <math.h>
 #include <stdint.h>
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
+/* Below this much work (voxels times window volume) a call is filtered on
+   a single thread; starting a parallel region would cost more than it
+   saves. */
+#define FMEDIAN3_MIN_PARALLEL_WORK 65536
+
+/* Neighborhoods of up to this many values (e.g. a 15x15 window) are
+   collected in a buffer on the stack, so small calls skip the heap */
+#define STACK_NEIGHBORS 256
 
 /* Include sorting network routines */
 #include "../sorting/sorting.c"
 
-/* Function to compute median from a sorted array */
+/* Function to compute the median of an array (reordering it): sorted with
+   a sorting network for small windows, located with select_kth otherwise */
 static double compute_median(double *values, int count)
 {
   if (count == 0)
@@ -16,16 +30,7 @@ static double compute_median(double *values, int count)
     return 0.0;
   }
 
-  sort_doubles(values, count);
-
-  if (count % 2 == 0)
-  {
-    return (values[count / 2 - 1] + values[count / 2]) / 2.0;
-  }
-  else
-  {
-    return values[count / 2];
-  }
+  return median_doubles(values, count);
 }
 
 /* Function to check input arguments */
@@ -68,21 +73,558 @@ static int check_inputs(PyArrayObject *input_array, PyArrayObject *output_array,
     return -1;
   }
 
+  if (!PyArray_ISWRITEABLE(output_array))
+  {
+    PyErr_SetString(PyExc_ValueError, "output_array must be writeable");
+    return -1;
+  }
+
   return 0; /* Success */
 }
 
+/* Append the non-NaN values of row_data[x0..x1] (x stride x_stride) to
+   neighbors and return the new count. The caller clips the span to the
+   array, so only NaN values need to be skipped here. */
+static inline int append_row_span(const char *row_data, npy_intp x_stride, int x0, int x1,
+                                  double *neighbors, int count)
+{
+  for (int nx = x0; nx <= x1; nx++)
+  {
+    double neighbor_value = *(const double *)(row_data + nx * x_stride);
+    if (!isnan(neighbor_value))
+    {
+      neighbors[count++] = neighbor_value;
+    }
+  }
+  return count;
+}
+
+/* Median of the window centred on voxel (x, y, z) of a 3D float64 array.
+   The planes z0..z1 and rows y0..y1 of the window are already clipped to
+   the array. neighbors must hold at least
+   (2 * xsize_half + 1) * (z1 - z0 + 1) * (y1 - y0 + 1) values. */
+static double fmedian3_voxel(const char *input_data, const npy_intp *input_strides, int width,
+                             int x, int y, int z, int z0, int z1, int y0, int y1,
+                             int xsize_half, int exclude_center, double *neighbors)
+{
+  int count = 0;
+
+  /* Get current voxel value */
+  double center_value = *(const double *)(input_data + z * input_strides[0] + y * input_strides[1] + x * input_strides[2]);
+
+  /* Collect neighborhood values from the window clipped to the array, so
+     the loops need no bounds checks. When the center is excluded, the
+     center row is walked in two spans around it. */
+  int x0 = x - xsize_half > 0 ? x - xsize_half : 0;
+  int x1 = x + xsize_half < width - 1 ? x + xsize_half : width - 1;
+  for (int nz = z0; nz <= z1; nz++)
+  {
+    for (int ny = y0; ny <= y1; ny++)
+    {
+      const char *row_data = input_data + nz * input_strides[0] + ny * input_strides[1];
+      if (nz == z && ny == y && exclude_center != 0)
+      {
+        count = append_row_span(row_data, input_strides[2], x0, x - 1, neighbors, count);
+        count = append_row_span(row_data, input_strides[2], x + 1, x1, neighbors, count);
+      }
+      else
+      {
+        count = append_row_span(row_data, input_strides[2], x0, x1, neighbors, count);
+      }
+    }
+  }
+
+  /* Compute median.
+     If no neighbors (e.g., xsize=ysize=zsize=0 and include_center==0),
+     fall back to the center voxel value so a 1x1x1 window returns the original. */
+  if (count == 0)
+  {
+    /* No valid neighbors (all were NaN or window empty). If the center
+       voxel is finite and was not excluded, use it; otherwise write NaN. */
+    return isnan(center_value) ? NAN : center_value;
+  }
+  return compute_median(neighbors, count);
+}
+
+/* A vector kernel computes 3x3x3 medians of fmedian3_vector_lanes voxels
+   at once: AVX-512 or AVX2 on x86-64 (whichever is the widest the CPU has)
+   and NEON on AArch64. All kernels have this signature. */
+typedef int (*fmedian3_kernel)(const char *corner, npy_intp zstride, npy_intp ystride,
+                               double *out, int exclude_center);
+
+#if defined(__x86_64__) && (defined(__GNUC__) || defined(__clang__))
+#define FMEDIAN3_HAVE_AVX2 1
+#define FMEDIAN3_HAVE_VECTOR 1
+#include <immintrin.h>
+#include "../sorting/sorting_networks_avx2.c"
+#include "../sorting/sorting_networks_avx512.c"
+
+/* Chosen at import time from the CPU features; NULL if it has neither */
+static fmedian3_kernel fmedian3_vector = NULL;
+static int fmedian3_vector_lanes = 0;
+
+/* 3x3x3 median of the four voxels x .. x+3 of an interior row. corner
+   points at voxel (x - 1, y - 1, z - 1); rows must be contiguous in x.
+   Each of the 27 window positions is one vector holding it for all four
+   voxels, so one pass of the median network gives four medians. Returns 0
+   without writing anything if any input value is NaN, so the caller can
+   fall back to the scalar path that skips NaNs. */
+__attribute__((target("avx2"))) static int fmedian3_3x3x3_f64(const char *corner, npy_intp zstride,
+                                                               npy_intp ystride, double *out,
+                                                               int exclude_center)
+{
+  __m256d d[27];
+  __m256d nan = _mm256_setzero_pd();
+  for (int i = 0; i < 9; i++)
+  {
+    const double *row = (const double *)(corner + (i / 3) * zstride + (i % 3) * ystride);
+    d[3 * i] = _mm256_loadu_pd(row);
+    d[3 * i + 1] = _mm256_loadu_pd(row + 1);
+    d[3 * i + 2] = _mm256_loadu_pd(row + 2);
+    /* Columns x - 1 .. x + 4 of the row; the first and last load cover them */
+    nan = _mm256_or_pd(nan, _mm256_cmp_pd(d[3 * i], d[3 * i], _CMP_UNORD_Q));
+    nan = _mm256_or_pd(nan, _mm256_cmp_pd(d[3 * i + 2], d[3 * i + 2], _CMP_UNORD_Q));
+  }
+  if (_mm256_movemask_pd(nan) != 0)
+  {
+    return 0;
+  }
+
+  if (exclude_center == 0)
+  {
+    median27b_pd4(d);
+    _mm256_storeu_pd(out, d[13]);
+  }
+  else
+  {
+    /* Find the middle two of the 26 neighbors (d[13] is the excluded center)
+       and average them */
+    __m256d e[26];
+    for (int i = 0; i < 13; i++)
+    {
+      e[i] = d[i];
+      e[i + 13] = d[i + 14];
+    }
+    median26_pd4(e);
+    _mm256_storeu_pd(out, _mm256_div_pd(_mm256_add_pd(e[12], e[13]), _mm256_set1_pd(2.0)));
+  }
+  return 1;
+}
+
+/* As the AVX2 version above, for the eight voxels x .. x+7 */
+__attribute__((target("avx512f"))) static int fmedian3_3x3x3_f64_avx512(const char *corner,
+                                                                        npy_intp zstride,
+                                                                        npy_intp ystride,
+                                                                        double *out,
+                                                                        int exclude_center)
+{
+  __m512d d[27];
+  __mmask8 nan = 0;
+  for (int i = 0; i < 9; i++)
+  {
+    const double *row = (const double *)(corner + (i / 3) * zstride + (i % 3) * ystride);
+    d[3 * i] = _mm512_loadu_pd(row);
+    d[3 * i + 1] = _mm512_loadu_pd(row + 1);
+    d[3 * i + 2] = _mm512_loadu_pd(row + 2);
+    nan |= _mm512_cmp_pd_mask(d[3 * i], d[3 * i], _CMP_UNORD_Q);
+    nan |= _mm512_cmp_pd_mask(d[3 * i + 2], d[3 * i + 2], _CMP_UNORD_Q);
+  }
+  if (nan != 0)
+  {
+    return 0;
+  }
+
+  if (exclude_center == 0)
+  {
+    median27b_pd8(d);
+    _mm512_storeu_pd(out, d[13]);
+  }
+  else
+  {
+    __m512d e[26];
+    for (int i = 0; i < 13; i++)
+    {
+      e[i] = d[i];
+      e[i + 13] = d[i + 14];
+    }
+    median26_pd8(e);
+    _mm512_storeu_pd(out, _mm512_div_pd(_mm512_add_pd(e[12], e[13]), _mm512_set1_pd(2.0)));
+  }
+  return 1;
+}
+#elif defined(__aarch64__) && defined(__ARM_NEON)
+#define FMEDIAN3_HAVE_VECTOR 1
+#include <arm_neon.h>
+#include "../sorting/sorting_networks_neon.c"
+
+/* As the AVX2 version above, for the two voxels x .. x+1 */
+static int fmedian3_3x3x3_f64(const char *corner, npy_intp zstride, npy_intp ystride,
+                              double *out, int exclude_center)
+{
+  float64x2_t d[27];
+  uint64x2_t valid = vdupq_n_u64(~(uint64_t)0);
+  for (int i = 0; i < 9; i++)
+  {
+    const double *row = (const double *)(corner + (i / 3) * zstride + (i % 3) * ystride);
+    d[3 * i] = vld1q_f64(row);
+    d[3 * i + 1] = vld1q_f64(row + 1);
+    d[3 * i + 2] = vld1q_f64(row + 2);
+    /* Columns x - 1 .. x + 2 of the row; the first and last load cover them */
+    valid = vandq_u64(valid, vceqq_f64(d[3 * i], d[3 * i]));
+    valid = vandq_u64(valid, vceqq_f64(d[3 * i + 2], d[3 * i + 2]));
+  }
+  if ((vgetq_lane_u64(valid, 0) & vgetq_lane_u64(valid, 1)) != ~(uint64_t)0)
+  {
+    return 0;
+  }
+
+  if (exclude_center == 0)
+  {
+    median27b_f64x2(d);
+    vst1q_f64(out, d[13]);
+  }
+  else
+  {
+    float64x2_t e[26];
+    for (int i = 0; i < 13; i++)
+    {
+      e[i] = d[i];
+      e[i + 13] = d[i + 14];
+    }
+    median26_f64x2(e);
+    vst1q_f64(out, vdivq_f64(vaddq_f64(e[12], e[13]), vdupq_n_f64(2.0)));
+  }
+  return 1;
+}
+
+/* NEON is part of the AArch64 baseline */
+static fmedian3_kernel fmedian3_vector = fmedian3_3x3x3_f64;
+static int fmedian3_vector_lanes = 2;
+#endif
+
+/* Number of threads to use for a call. num_threads <= 0 selects the OpenMP
+   default (OMP_NUM_THREADS or the number of cores). Small workloads and
+   builds without OpenMP always use a single thread. */
+static int resolve_num_threads(int num_threads, long long work)
+{
+#ifdef _OPENMP
+  if (work < FMEDIAN3_MIN_PARALLEL_WORK)
+  {
+    return 1;
+  }
+  int nthreads = num_threads > 0 ? num_threads : omp_get_max_threads();
+  return nthreads > 1 ? nthreads : 1;
+#else
+  (void)num_threads;
+  (void)work;
+  return 1;
+#endif
+}
+
+/* Median-filter voxels xa..xb-1 of row y of plane z of a 3D float64
+   array. Touches no Python objects, so it may run with the GIL released.
+   neighbors must hold at least the window volume in values. */
+static void fmedian3_row(const char *input_data, const npy_intp *input_strides,
+                         char *output_data, const npy_intp *output_strides,
+                         int depth, int height, int width, int z, int y, int xa, int xb,
+                         int xsize_half, int ysize_half, int zsize_half,
+                         int exclude_center, double *neighbors)
+{
+  /* Planes and rows of the window, clipped to the array */
+  int z0 = z - zsize_half > 0 ? z - zsize_half : 0;
+  int z1 = z + zsize_half < depth - 1 ? z + zsize_half : depth - 1;
+  int y0 = y - ysize_half > 0 ? y - ysize_half : 0;
+  int y1 = y + ysize_half < height - 1 ? y + ysize_half : height - 1;
+  int x = xa;
+
+#ifdef FMEDIAN3_HAVE_VECTOR
+  /* 3x3x3 windows on interior rows of x-contiguous arrays: a block of
+     voxels per step with the vector kernel, blocks containing NaN go
+     through the scalar path below. Border voxels always use the scalar
+     path. */
+  if (fmedian3_vector != NULL && xsize_half == 1 && ysize_half == 1 && zsize_half == 1 &&
+      z > 0 && z < depth - 1 && y > 0 && y < height - 1 &&
+      input_strides[2] == sizeof(double) && output_strides[2] == sizeof(double))
+  {
+    const char *corner = input_data + (z - 1) * input_strides[0] + (y - 1) * input_strides[1];
+    double *out = (double *)(output_data + z * output_strides[0] + y * output_strides[1]);
+
+    if (x == 0)
+    {
+      out[0] = fmedian3_voxel(input_data, input_strides, width, 0, y, z, z0, z1, y0, y1,
+                              xsize_half, exclude_center, neighbors);
+      x = 1;
+    }
+    for (; x + fmedian3_vector_lanes <= xb && x + fmedian3_vector_lanes < width;
+         x += fmedian3_vector_lanes)
+    {
+      if (!fmedian3_vector(corner + (x - 1) * sizeof(double), input_strides[0],
+                           input_strides[1], out + x, exclude_center))
+      {
+        for (int k = x; k < x + fmedian3_vector_lanes; k++)
+        {
+          out[k] = fmedian3_voxel(input_data, input_strides, width, k, y, z, z0, z1, y0, y1,
+                                  xsize_half, exclude_center, neighbors);
+        }
+      }
+    }
+  }
+#endif
+
+  for (; x < xb; x++)
+  {
+    *(double *)(output_data + z * output_strides[0] + y * output_strides[1] + x * output_strides[2]) =
+        fmedian3_voxel(input_data, input_strides, width, x, y, z, z0, z1, y0, y1,
+                       xsize_half, exclude_center, neighbors);
+  }
+}
+
+/* The rows of a volume are filtered in tiles of up to FMEDIAN3_TILE_DEPTH
+   planes, FMEDIAN3_TILE_HEIGHT rows and FMEDIAN3_TILE_WIDTH columns. Each
+   plane of a tile then reads the input its predecessor read while it is
+   still in L2 (about 210 KB for 3x3x3 windows, 370 KB for 5x5x5), where
+   going row by row through whole planes comes back to it only a full plane
+   later (32 MB for 2048x2048 planes). */
+#define FMEDIAN3_TILE_DEPTH 16
+#define FMEDIAN3_TILE_HEIGHT 32
+#define FMEDIAN3_TILE_WIDTH 256
+
+/* Median-filter tile number `tile` of a volume split as above. */
+static void fmedian3_tile(const char *input_data, const npy_intp *input_strides,
+                          char *output_data, const npy_intp *output_strides,
+                          int depth, int height, int width, int tile,
+                          int xsize_half, int ysize_half, int zsize_half,
+                          int exclude_center, double *neighbors)
+{
+  int ytiles = (height + FMEDIAN3_TILE_HEIGHT - 1) / FMEDIAN3_TILE_HEIGHT;
+  int xtiles = (width + FMEDIAN3_TILE_WIDTH - 1) / FMEDIAN3_TILE_WIDTH;
+  int za = tile / (ytiles * xtiles) * FMEDIAN3_TILE_DEPTH;
+  int ya = tile / xtiles % ytiles * FMEDIAN3_TILE_HEIGHT;
+  int xa = tile % xtiles * FMEDIAN3_TILE_WIDTH;
+  int zb = za + FMEDIAN3_TILE_DEPTH < depth ? za + FMEDIAN3_TILE_DEPTH : depth;
+  int yb = ya + FMEDIAN3_TILE_HEIGHT < height ? ya + FMEDIAN3_TILE_HEIGHT : height;
+  int xb = xa + FMEDIAN3_TILE_WIDTH < width ? xa + FMEDIAN3_TILE_WIDTH : width;
+
+  for (int z = za; z < zb; z++)
+  {
+    for (int y = ya; y < yb; y++)
+    {
+      fmedian3_row(input_data, input_strides, output_data, output_strides, depth, height, width,
+                   z, y, xa, xb, xsize_half, ysize_half, zsize_half, exclude_center, neighbors);
+    }
+  }
+}
+
+/* Windows reaching at least this far along one axis, and no further along
+   the other two (e.g. the passes of the separable method), slide a sorted
+   window along each line instead of collecting every window anew. Below
+   it (windows of up to 15 values) the sorting networks are faster. */
+#define FMEDIAN3_LINE_MIN_HALF 8
+
+/* Number of values in sorted[0..count-1] less than v, i.e. the index of
+   the first value not less than v. A branch-free scan beats a binary
+   search on the short windows this is used for. */
+static inline int count_less(const double *sorted, int count, double v)
+{
+  int n = 0;
+  for (int j = 0; j < count; j++)
+  {
+    n += sorted[j] < v;
+  }
+  return n;
+}
+
+/* Median of a sorted window of count values, leaving out one copy of
+   center if exclude_center is set and center is not NaN. An empty window
+   gives the center value (NaN if it is NaN), as fmedian3_voxel does. */
+static double sorted_window_median(const double *sorted, int count, double center, int exclude_center)
+{
+  int skip = count;
+  if (exclude_center != 0 && !isnan(center))
+  {
+    skip = count_less(sorted, count, center);
+    count--;
+  }
+  if (count <= 0)
+  {
+    return center;
+  }
+  int mid = count / 2;
+  double upper = sorted[mid < skip ? mid : mid + 1];
+  if (count % 2 != 0)
+  {
+    return upper;
+  }
+  double lower = sorted[mid - 1 < skip ? mid - 1 : mid];
+  return (lower + upper) / 2.0;
+}
+
+/* Median-filter `lanes` lines of `length` values with a window of
+   2 * half + 1 values along each line. Line l starts at input_data +
+   l * input_lane, and its values are input_step bytes apart (likewise for
+   the output). Each line keeps its non-NaN window values sorted in
+   windows[l * (2 * half + 1) ...]; moving one step removes the value that
+   leaves and inserts the one that enters. Stepping all lanes together
+   keeps the reads contiguous when the lanes are the rows' x axis. */
+static void fmedian3_lines(const char *input_data, npy_intp input_step, npy_intp input_lane,
+                           char *output_data, npy_intp output_step, npy_intp output_lane,
+                           int length, int lanes, int half, int exclude_center,
+                           double *windows, int *counts)
+{
+  int window_size = 2 * half + 1;
+  for (int l = 0; l < lanes; l++)
+  {
+    counts[l] = 0;
+  }
+
+  for (int i = -half; i < length; i++)
+  {
+    int enter = i + half;
+    int leave = i - half - 1;
+    for (int l = 0; l < lanes; l++)
+    {
+      const char *line = input_data + l * input_lane;
+      double *sorted = windows + (size_t)l * window_size;
+      int count = counts[l];
+
+      double out_v = leave >= 0 ? *(const double *)(line + leave * input_step) : NAN;
+      double in_v = enter < length ? *(const double *)(line + enter * input_step) : NAN;
+      if (!isnan(out_v) && !isnan(in_v))
+      {
+        /* Replace out_v by in_v, shifting the values between them by one */
+        int pos = count_less(sorted, count, out_v);
+        if (in_v > out_v)
+        {
+          while (pos + 1 < count && sorted[pos + 1] < in_v)
+          {
+            sorted[pos] = sorted[pos + 1];
+            pos++;
+          }
+        }
+        else
+        {
+          while (pos > 0 && sorted[pos - 1] > in_v)
+          {
+            sorted[pos] = sorted[pos - 1];
+            pos--;
+          }
+        }
+        sorted[pos] = in_v;
+      }
+      else if (!isnan(out_v))
+      {
+        int pos = count_less(sorted, count, out_v);
+        count--;
+        for (int j = pos; j < count; j++)
+        {
+          sorted[j] = sorted[j + 1];
+        }
+      }
+      else if (!isnan(in_v))
+      {
+        int pos = count_less(sorted, count, in_v);
+        for (int j = count; j > pos; j--)
+        {
+          sorted[j] = sorted[j - 1];
+        }
+        sorted[pos] = in_v;
+        count++;
+      }
+      counts[l] = count;
+
+      if (i >= 0)
+      {
+        double center = *(const double *)(line + i * input_step);
+        *(double *)(output_data + l * output_lane + i * output_step) =
+            sorted_window_median(sorted, count, center, exclude_center);
+      }
+    }
+  }
+}
+
+/* Median-filter the whole array with a window of 2 * half + 1 values
+   along axis (0 = z, 1 = y, 2 = x) and one value along the others. z and y
+   lines are stepped one row of x at a time; x lines one at a time.
+   Returns -1 (with no exception set) if memory runs out. */
+static int fmedian3_along_axis(const char *input_data, const npy_intp *input_strides,
+                               char *output_data, const npy_intp *output_strides,
+                               int depth, int height, int width, int axis, int half,
+                               int exclude_center, int num_threads)
+{
+  int dims[3] = {depth, height, width};
+  int length = dims[axis];
+  int lanes = axis == 2 ? 1 : width;
+  /* Lines are grouped in blocks of `lanes`; a block is one (z, y) row
+     for x lines, one y for z lines and one z for y lines */
+  int blocks = axis == 2 ? depth * height : (axis == 0 ? height : depth);
+  int window_size = 2 * half + 1;
+  int nthreads = resolve_num_threads(num_threads, (long long)depth * height * width * window_size);
+  if (nthreads > blocks)
+  {
+    nthreads = blocks > 0 ? blocks : 1;
+  }
+
+  size_t per_thread = (size_t)lanes * window_size;
+  double *windows = (double *)malloc((size_t)nthreads * per_thread * sizeof(double));
+  int *counts = (int *)malloc((size_t)nthreads * lanes * sizeof(int));
+  if (windows == NULL || counts == NULL)
+  {
+    free(windows);
+    free(counts);
+    return -1;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+#ifdef _OPENMP
+#pragma omp parallel for schedule(static) num_threads(nthreads) if (nthreads > 1)
+#endif
+  for (int b = 0; b < blocks; b++)
+  {
+    int thread = 0;
+#ifdef _OPENMP
+    thread = omp_get_thread_num();
+#endif
+    npy_intp in_offset, out_offset;
+    if (axis == 2)
+    {
+      in_offset = (b / height) * input_strides[0] + (b % height) * input_strides[1];
+      out_offset = (b / height) * output_strides[0] + (b % height) * output_strides[1];
+    }
+    else
+    {
+      /* The block index runs along the axis that is neither the line axis nor x */
+      int other = axis == 0 ? 1 : 0;
+      in_offset = b * input_strides[other];
+      out_offset = b * output_strides[other];
+    }
+    fmedian3_lines(input_data + in_offset, input_strides[axis], input_strides[2],
+                   output_data + out_offset, output_strides[axis], output_strides[2],
+                   length, lanes, half, exclude_center,
+                   windows + thread * per_thread, counts + (size_t)thread * lanes);
+  }
+  Py_END_ALLOW_THREADS
+
+  free(windows);
+  free(counts);
+  return 0;
+}
+
 /* Main fmedian3 function */
 static PyObject *fmedian3(PyObject *self, PyObject *args)
 {
   PyArrayObject *input_array, *output_array;
   int xsize, ysize, zsize, exclude_center;
+  int num_threads = 0;
   int depth, height, width;
 
-  /* Parse arguments: input_array, output_array, xsize, ysize, zsize, exclude_center */
-  if (!PyArg_ParseTuple(args, "O!O!iiii",
+  /* Parse arguments: input_array, output_array, xsize, ysize, zsize, exclude_center[, num_threads].
+     Sizes and exclude_center use the "i" format, so plain Python ints (or
+     any object implementing __index__) are accepted as-is; callers do not
+     need to wrap them in NumPy integer scalars. */
+  if (!PyArg_ParseTuple(args, "O!O!iiii|i",
                         &PyArray_Type, &input_array,
                         &PyArray_Type, &output_array,
-                        &xsize, &ysize, &zsize, &exclude_center))
+                        &xsize, &ysize, &zsize, &exclude_center, &num_threads))
   {
     return NULL;
   }
@@ -99,94 +641,77 @@ static PyObject *fmedian3(PyObject *self, PyObject *args)
   }
 
   /* Get data pointers */
-  double *input_data = (double *)PyArray_DATA(input_array);
-  double *output_data = (double *)PyArray_DATA(output_array);
+  const char *input_data = (const char *)PyArray_DATA(input_array);
+  char *output_data = (char *)PyArray_DATA(output_array);
 
   /* Get strides */
   npy_intp *input_strides = PyArray_STRIDES(input_array);
   npy_intp *output_strides = PyArray_STRIDES(output_array);
 
-  /* Allocate buffer for neighborhood values */
+  /* Windows along a single axis */
+  int halves[3] = {zsize_half, ysize_half, xsize_half};
+  for (int axis = 0; axis < 3; axis++)
+  {
+    if (halves[axis] >= FMEDIAN3_LINE_MIN_HALF &&
+        halves[(axis + 1) % 3] == 0 && halves[(axis + 2) % 3] == 0)
+    {
+      if (fmedian3_along_axis(input_data, input_strides, output_data, output_strides, depth, height,
+                              width, axis, halves[axis], exclude_center, num_threads) != 0)
+      {
+        PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory for sliding windows");
+        return NULL;
+      }
+      Py_RETURN_NONE;
+    }
+  }
+
+  /* Allocate one buffer for neighborhood values per thread */
   int max_neighbors = (2 * xsize_half + 1) * (2 * ysize_half + 1) * (2 * zsize_half + 1);
-  double *neighbors = (double *)malloc(max_neighbors * sizeof(double));
+  int nthreads = resolve_num_threads(num_threads, (long long)depth * height * width * max_neighbors);
+  double stack_neighbors[STACK_NEIGHBORS];
+  double *neighbors = stack_neighbors;
+  if ((size_t)nthreads * max_neighbors > STACK_NEIGHBORS)
+  {
+    neighbors = (double *)malloc((size_t)nthreads * max_neighbors * sizeof(double));
+  }
   if (neighbors == NULL)
   {
     PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory for neighbors");
     return NULL;
   }
 
-  /* Process each voxel */
-  for (int z = 0; z < depth; z++)
+  int tiles = ((depth + FMEDIAN3_TILE_DEPTH - 1) / FMEDIAN3_TILE_DEPTH) *
+              ((height + FMEDIAN3_TILE_HEIGHT - 1) / FMEDIAN3_TILE_HEIGHT) *
+              ((width + FMEDIAN3_TILE_WIDTH - 1) / FMEDIAN3_TILE_WIDTH);
+
+  Py_BEGIN_ALLOW_THREADS
+  /* Tiles are independent, so they are split across threads */
+#ifdef _OPENMP
+  if (nthreads > 1)
   {
-    for (int y = 0; y < height; y++)
+#pragma omp parallel for schedule(static) num_threads(nthreads)
+    for (int tile = 0; tile < tiles; tile++)
     {
-      for (int x = 0; x < width; x++)
-      {
-        int count = 0;
-
-        /* Get current voxel value */
-        double center_value = *(double *)(((char *)input_data) + z * input_strides[0] + y * input_strides[1] + x * input_strides[2]);
-
-        /* Collect neighborhood values (conditionally include center) */
-        for (int dz = -zsize_half; dz <= zsize_half; dz++)
-        {
-          for (int dy = -ysize_half; dy <= ysize_half; dy++)
-          {
-            for (int dx = -xsize_half; dx <= xsize_half; dx++)
-            {
-              int nz = z + dz;
-              int ny = y + dy;
-              int nx = x + dx;
-
-              /* Check bounds */
-              if (nz >= 0 && nz < depth && ny >= 0 && ny < height && nx >= 0 && nx < width)
-              {
-                /* Skip center when exclude_center != 0 */
-                if (dz == 0 && dy == 0 && dx == 0 && exclude_center != 0)
-                {
-                  continue;
-                }
-
-                double neighbor_value = *(double *)(((char *)input_data) + nz * input_strides[0] + ny * input_strides[1] + nx * input_strides[2]);
-                /* Skip NaN values so they are not considered in the median */
-                if (isnan(neighbor_value))
-                {
-                  continue;
-                }
-                neighbors[count++] = neighbor_value;
-              }
-            }
-          }
-        }
-
-        /* Compute median and store in output.
-           If no neighbors (e.g., xsize=ysize=zsize=0 and include_center==0),
-           fall back to the center voxel value so a 1x1x1 window returns the original. */
-        double median_value;
-        if (count == 0)
-        {
-          /* No valid neighbors (all were NaN or window empty). If the center
-             voxel is finite and was not excluded, use it; otherwise write NaN. */
-          if (!isnan(center_value))
-          {
-            median_value = center_value;
-          }
-          else
-          {
-            median_value = NAN;
-          }
-        }
-        else
-        {
-          median_value = compute_median(neighbors, count);
-        }
-
-        *(double *)(((char *)output_data) + z * output_strides[0] + y * output_strides[1] + x * output_strides[2]) = median_value;
-      }
+      fmedian3_tile(input_data, input_strides, output_data, output_strides, depth, height, width,
+                    tile, xsize_half, ysize_half, zsize_half, exclude_center,
+                    neighbors + (size_t)omp_get_thread_num() * max_neighbors);
+    }
+  }
+  else
+#endif
+  {
+    for (int tile = 0; tile < tiles; tile++)
+    {
+      fmedian3_tile(input_data, input_strides, output_data, output_strides, depth, height, width,
+                    tile, xsize_half, ysize_half, zsize_half, exclude_center, neighbors);
     }
   }
+  Py_END_ALLOW_THREADS
 
-  free(neighbors);
+  if (neighbors != stack_neighbors)
+  {
+    free(neighbors);
+  }
 
   Py_RETURN_NONE;
 }
@@ -199,7 +724,8 @@ static PyMethodDef Fmedian3Methods[] = {
      "    input_array : numpy.ndarray (float64, 3D)\n"
      "        Input array\n"
      "    output_array : numpy.ndarray (float64, 3D)\n"
-     "        Output array (same size as input)\n"
+     "        Output array (same size as input). Every element is written,\n"
+     "        so allocate it with numpy.empty rather than numpy.zeros\n"
      "    xsize : int\n"
      "        Full width of window in x direction\n"
      "    ysize : int\n"
@@ -207,7 +733,10 @@ static PyMethodDef Fmedian3Methods[] = {
      "    zsize : int\n"
      "        Full depth of window in z direction\n"
      "    exclude_center : int\n"
-     "        If non-zero, exclude the center voxel from the median calculation\n"},
+     "        If non-zero, exclude the center voxel from the median calculation\n"
+     "    num_threads : int, optional\n"
+     "        Number of OpenMP threads; 0 (default) uses the OpenMP default.\n"
+     "        Ignored when built without OpenMP\n"},
     {NULL, NULL, 0, NULL}};
 
 /* Module definition */
@@ -222,5 +751,18 @@ static struct PyModuleDef fmedian3_module = {
 PyMODINIT_FUNC PyInit_fmedian3_ext(void)
 {
   import_array();
+#ifdef FMEDIAN3_HAVE_AVX2
+  __builtin_cpu_init();
+  if (__builtin_cpu_supports("avx512f"))
+  {
+    fmedian3_vector = fmedian3_3x3x3_f64_avx512;
+    fmedian3_vector_lanes = 8;
+  }
+  else if (__builtin_cpu_supports("avx2"))
+  {
+    fmedian3_vector = fmedian3_3x3x3_f64;
+    fmedian3_vector_lanes = 4;
+  }
+#endif
   return PyModule_Create(&fmedian3_module);
 }
\ No newline at end of file
@@ -1,61 +1,77 @@
 """ftools.fsigma package loader.
 
-Locate the pre-built `fsigma` extension in the repository and load it.
+Load the compiled `fsigma` extension on first use, falling back to a search
+of the repository layout for legacy builds, and then to the Numba
+implementation in `_numba_impl` if no compiled extension exists and Numba
+is installed (its first call pays a JIT compile).
 Expose `fsigma` at package level for `from ftools import fsigma` imports.
 """
 from __future__ import annotations
 
-import glob
-import importlib.machinery
-import importlib.util
-import os
-
-try:
-    from . import _fsigma_ext as _ext  # type: ignore
-except Exception:
-    _HERE = os.path.dirname(__file__)
-    repo_root = os.path.abspath(os.path.join(_HERE, "..", "..", ".."))
-
-    candidates = glob.glob(os.path.join(_HERE, "fsigma_ext*.so"))
-    if not candidates:
-        candidates = glob.glob(os.path.join(repo_root, "fsigma", "fsigma_ext*.so"))
-        if not candidates:
-            candidates = glob.glob(os.path.join(repo_root, "fsigma", "fsigma_ext*.*.so"))
-
-    if not candidates:
-        raise ImportError(
-            "Could not locate the compiled fsigma extension (expected src/ftools/fsigma/fsigma_ext*.so or fsigma/fsigma_ext*.so). "
-            "Build it first or install the package so the extension is available."
-        )
-
-    so_path = candidates[0]
-    # Ensure loader name matches the compiled module name (so the PyInit symbol matches)
-    base = os.path.basename(so_path)
-    base_mod = os.path.splitext(base)[0].split(".")[0]
-    loader = importlib.machinery.ExtensionFileLoader(base_mod, so_path)
-    spec = importlib.util.spec_from_loader(base_mod, loader)
-    _ext = importlib.util.module_from_spec(spec)
-    loader.exec_module(_ext)  # type: ignore[arg-type]
-
-try:
-    _c_fsigma = _ext.fsigma  # type: ignore[attr-defined]
-except Exception as exc:  # pragma: no cover - defensive
-    raise ImportError("Loaded fsigma extension but could not find 'fsigma' symbol") from exc
-
-
-def fsigma(input_array, xsize: int, ysize: int, exclude_center: int = 0):
-    """Compute local population sigma and return the output array.
+import importlib
 
-    Signature: fsigma(input_array, xsize, ysize, exclude_center=0) -> numpy.ndarray
+import numpy as _np
 
-    Parameters:
-    - xsize, ysize: Full window sizes (must be odd numbers)
-    - exclude_center: Whether to exclude the center pixel from the calculation (default: 0)
+from .._extloader import load_ext
+from .._validate import check_num_threads, output_array
+
+# The C entry points, bound by _load_extension() on the first call to fsigma().
+# Importing the package (and ftools) therefore does not load the extension.
+_c_fsigma = None
+_c_fsigma_u16 = None
+_c_fsigma_running = None
+
+
+def _load_extension():
+    """Import the extension module, bind _ext and _c_fsigma and return it."""
+    global _c_fsigma, _c_fsigma_u16, _c_fsigma_running, _ext
+
+    ext = load_ext(__name__, "fsigma_ext", fallback="_numba_impl")
+
+    try:
+        _c_fsigma = ext.fsigma  # type: ignore[attr-defined]
+        _c_fsigma_u16 = ext.fsigma_u16  # type: ignore[attr-defined]
+        _c_fsigma_running = ext.fsigma_running  # type: ignore[attr-defined]
+    except AttributeError as exc:  # pragma: no cover - defensive
+        raise ImportError("Loaded fsigma extension but could not find 'fsigma' symbol") from exc
+    _ext = ext
+    return ext
 
-    The input will be coerced to float64; the returned array is float64.
-    """
-    import numpy as _np
 
+def __getattr__(name):
+    # PEP 562: `_ext` is resolved (and the extension loaded) on first access,
+    # and other public names not defined here are looked up on the extension,
+    # so nothing has to be copied over from it at import time
+    if name == "_ext":
+        return _load_extension()
+    if not name.startswith("_"):
+        ext = _load_extension() if _c_fsigma is None else _ext
+        try:
+            return getattr(ext, name)
+        except AttributeError:
+            pass
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _use_cuda(device):
+    """Return True for device="cuda" and False for None or "cpu"."""
+    if device is None or device == "cpu":
+        return False
+    if device == "cuda":
+        return True
+    raise ValueError(f"device must be 'cpu' or 'cuda', got {device!r}")
+
+
+def _load_cupy_impl():
+    """Import the CuPy implementation used for device="cuda"."""
+    try:
+        return importlib.import_module(f"{__name__}._cupy_impl")
+    except ImportError as exc:
+        raise ImportError("device='cuda' requires CuPy (e.g. pip install cupy-cuda12x)") from exc
+
+
+def _check_sizes(xsize, ysize):
+    """Validate window sizes and return them as ints."""
     if xsize is None or ysize is None:
         raise TypeError("fsigma requires xsize and ysize parameters")
 
@@ -74,11 +90,108 @@ def fsigma(input_array, xsize: int, ysize: int, exclude_center: int = 0):
         raise ValueError(f"xsize must be positive, got {xsize}")
     if ysize <= 0:
         raise ValueError(f"ysize must be positive, got {ysize}")
-    
-    arr = _np.asarray(input_array, dtype=_np.float64)
-    out = _np.empty_like(arr, dtype=_np.float64)
-    _c_fsigma(arr, out, xsize, ysize, int(exclude_center))
+
+    return xsize, ysize
+
+
+# Integer input types fsigma sends to the running-sum kernel of fsigma_u16
+_INT16_TYPES = (_np.int8, _np.uint8, _np.int16, _np.uint16)
+
+
+def fsigma(input_array, xsize: int, ysize: int, exclude_center: int = 0, *, out=None,
+           num_threads=None, device=None, method: str = "exact"):
+    """Compute local population sigma and return the output array.
+
+    Signature: fsigma(input_array, xsize, ysize, exclude_center=0, *, out=None, num_threads=None, device=None, method="exact") -> numpy.ndarray
+
+    Parameters:
+    - xsize, ysize: Full window sizes (must be odd numbers)
+    - exclude_center: Whether to exclude the center pixel from the calculation (default: 0)
+    - out: Optional float64 array of the input's shape to write the result
+      into (and return). Every element is overwritten, so it need not be
+      cleared between calls. It must not overlap the input.
+    - num_threads: Number of threads; None uses the OpenMP default (OMP_NUM_THREADS
+      or the number of cores). Small inputs, and builds without OpenMP, run on
+      one thread. The GIL is released while filtering.
+    - device: None or "cpu" to filter on the CPU, or "cuda" to filter on the
+      current CUDA device with CuPy, which must be installed. The input may
+      then also be a cupy array, which gives a cupy result; num_threads and
+      out are not used (passing out raises ValueError).
+    - method: "exact" (default) to sum the values of each window, or
+      "running" to update the sums of the previous window as it slides, so
+      the cost per pixel does not depend on the window size (several times
+      faster from about 7x7 up). The results differ from "exact" by rounding
+      errors; windows whose spread is tiny next to their offset from the
+      mean of the array are recomputed from their values, so the errors
+      stay small relative to each window's own sigma. Used for float input
+      on the CPU; integer input always uses running sums (see below).
+
+    The input will be coerced to a C-contiguous float64 array (strided views
+    are copied, contiguous float64 input is used as-is); float32 input is
+    read without converting it. The returned array is float64, and the same
+    as for the input converted to float64. 8- and 16-bit integer input is
+    filtered with the running-sum kernel of fsigma_u16 instead, which runs
+    on one thread.
+    """
+    xsize, ysize = _check_sizes(xsize, ysize)
+    num_threads = check_num_threads(num_threads)
+    if method not in ("exact", "running"):
+        raise ValueError(f"method must be 'exact' or 'running', got {method!r}")
+
+    if _use_cuda(device):
+        if out is not None:
+            raise ValueError("out is not supported with device='cuda'")
+        return _load_cupy_impl().fsigma(input_array, xsize, ysize, int(exclude_center))
+
+    if _c_fsigma is None:
+        _load_extension()
+
+    if isinstance(input_array, _np.ndarray) and input_array.dtype in _INT16_TYPES:
+        return _fsigma_u16(input_array, xsize, ysize, exclude_center, out)
+
+    # float32 input is read as it is; anything else is converted to float64
+    if isinstance(input_array, _np.ndarray) and input_array.dtype == _np.float32:
+        arr = _np.ascontiguousarray(input_array)
+    else:
+        arr = _np.ascontiguousarray(input_array, dtype=_np.float64)
+    out = output_array(out, arr)
+    kernel = _c_fsigma_running if method == "running" else _c_fsigma
+    kernel(arr, out, xsize, ysize, int(exclude_center), num_threads)
+    return out
+
+
+def fsigma_u16(input_array, xsize: int, ysize: int, exclude_center: int = 0, out=None):
+    """Compute local population sigma of 8/16-bit integer data using running sums.
+
+    Signature: fsigma_u16(input_array, xsize, ysize, exclude_center=0, out=None) -> numpy.ndarray
+
+    Agrees with fsigma on the same data converted to float64 to within
+    rounding (the sums are exact integers), but the cost per pixel does not
+    grow with the window size.
+
+    Parameters:
+    - input_array: 2D array of dtype int8, uint8, int16 or uint16
+    - xsize, ysize: Full window sizes (must be odd numbers)
+    - exclude_center: Whether to exclude the center pixel from the calculation (default: 0)
+    - out: Optional float64 output array, as for fsigma
+
+    The returned array is float64.
+    """
+    xsize, ysize = _check_sizes(xsize, ysize)
+    if _c_fsigma is None:
+        _load_extension()
+    return _fsigma_u16(input_array, xsize, ysize, exclude_center, out)
+
+
+def _fsigma_u16(input_array, xsize, ysize, exclude_center, out=None):
+    arr = _np.asarray(input_array)
+    if arr.dtype not in _INT16_TYPES:
+        raise TypeError(f"fsigma_u16 requires int8, uint8, int16 or uint16 input, got {arr.dtype}")
+    # Signed input is widened to int16 and unsigned to uint16, keeping every value
+    arr = _np.ascontiguousarray(arr, dtype=_np.int16 if arr.dtype.kind == "i" else _np.uint16)
+    out = output_array(out, arr)
+    _c_fsigma_u16(arr, out, xsize, ysize, int(exclude_center))
     return out
 
 
-__all__ = ["fsigma"]
+__all__ = ["fsigma", "fsigma_u16"]
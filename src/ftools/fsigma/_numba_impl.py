@@ -0,0 +1,225 @@
+"""Numba implementation of the fsigma_ext entry points.
+
+The package loader uses this module in place of the compiled extension
+when no extension can be found but Numba is installed, so fsigma works
+without a C compiler. The functions take the same arguments and raise the
+same errors as their C counterparts, and give the same results (fsigma_u16
+to rounding, as its C kernel sums exactly in integers, and fsigma_running
+to rounding, as the C code orders its sums differently). Each kernel is
+compiled on its first call, which takes a few seconds; the compiled code
+is cached on disk for later processes.
+"""
+import numba
+import numpy as np
+
+
+@numba.njit(cache=True)
+def _window_sigma(arr, y, x, xsize_half, ysize_half, exclude_center, values):
+    """Population sigma of the non-NaN values in the window around (x, y), clipped to the array."""
+    height, width = arr.shape
+    count = 0
+    for ny in range(max(y - ysize_half, 0), min(y + ysize_half, height - 1) + 1):
+        for nx in range(max(x - xsize_half, 0), min(x + xsize_half, width - 1) + 1):
+            if exclude_center and ny == y and nx == x:
+                continue
+            value = arr[ny, nx]
+            if not np.isnan(value):
+                values[count] = value
+                count += 1
+    if count == 0:
+        return 0.0
+
+    # Two passes, mean first, as compute_sigma in fsigma_ext.c
+    total = 0.0
+    for i in range(count):
+        total += values[i]
+    mean = total / count
+    ssum = 0.0
+    for i in range(count):
+        d = values[i] - mean
+        ssum += d * d
+    return np.sqrt(ssum / count)
+
+
+@numba.njit(parallel=True, cache=True)
+def _fsigma_rows(arr, out, xsize_half, ysize_half, exclude_center):
+    height, width = arr.shape
+    for y in numba.prange(height):
+        values = np.empty((2 * xsize_half + 1) * (2 * ysize_half + 1))
+        for x in range(width):
+            out[y, x] = _window_sigma(arr, y, x, xsize_half, ysize_half, exclude_center, values)
+
+
+# Rows of fsigma_running's output are filtered in bands of this many rows,
+# each band starting its sums afresh, as in fsigma_ext.c
+_RUNNING_BAND = 64
+
+# A window whose variance from running sums is below this fraction of its
+# mean square (relative to the shift) plus that of the whole array is
+# recomputed from its values, as in fsigma_ext.c
+_RUNNING_RECHECK = 1.0 / (1 << 20)
+
+
+@numba.njit(cache=True)
+def _value_sums(v, shift):
+    """(v - shift, (v - shift)^2, 1, 0) for finite v, (0, 0, 0, 1) for inf, zeros for NaN."""
+    if np.isnan(v):
+        return 0.0, 0.0, 0.0, 0.0
+    if np.isinf(v):
+        return 0.0, 0.0, 0.0, 1.0
+    d = v - shift
+    return d, d * d, 1.0, 0.0
+
+
+@numba.njit(cache=True)
+def _shift_and_scale(arr):
+    """The mean of the finite values and their mean square relative to it."""
+    total = 0.0
+    count = 0.0
+    for v in arr.flat:
+        if np.isfinite(v):
+            total += v
+            count += 1.0
+    if count == 0.0:
+        return 0.0, 0.0
+    shift = total / count
+    squares = 0.0
+    for v in arr.flat:
+        if np.isfinite(v):
+            squares += (v - shift) * (v - shift)
+    return shift, squares / count
+
+
+@numba.njit(cache=True)
+def _window_welford(arr, y, x, xsize_half, ysize_half, exclude_center):
+    """Sigma of the window around (x, y) with Welford's update, relative to its first value."""
+    height, width = arr.shape
+    first = 0.0
+    mean = 0.0
+    m2 = 0.0
+    count = 0
+    for ny in range(max(y - ysize_half, 0), min(y + ysize_half, height - 1) + 1):
+        for nx in range(max(x - xsize_half, 0), min(x + xsize_half, width - 1) + 1):
+            value = arr[ny, nx]
+            if np.isnan(value) or (exclude_center and ny == y and nx == x):
+                continue
+            if count == 0:
+                first = value
+            d = value - first
+            count += 1
+            delta = d - mean
+            mean += delta / count
+            m2 += delta * (d - mean)
+    return np.sqrt(m2 / count) if count > 0 else 0.0
+
+
+@numba.njit(parallel=True, cache=True)
+def _fsigma_running_bands(arr, out, xsize_half, ysize_half, exclude_center, shift, scale):
+    height, width = arr.shape
+    for band in numba.prange((height + _RUNNING_BAND - 1) // _RUNNING_BAND):
+        ya = band * _RUNNING_BAND
+        # Sums over the rows of the y window for each column: s1, s2, n, ninf
+        cols = np.zeros((4, width))
+        row0 = max(ya - ysize_half, 0)
+        row1 = row0 - 1
+        for y in range(ya, min(ya + _RUNNING_BAND, height)):
+            while row1 < min(y + ysize_half, height - 1):
+                row1 += 1
+                for x in range(width):
+                    s1, s2, n, ninf = _value_sums(arr[row1, x], shift)
+                    cols[0, x] += s1
+                    cols[1, x] += s2
+                    cols[2, x] += n
+                    cols[3, x] += ninf
+            while row0 < y - ysize_half:
+                for x in range(width):
+                    s1, s2, n, ninf = _value_sums(arr[row0, x], shift)
+                    cols[0, x] -= s1
+                    cols[1, x] -= s2
+                    cols[2, x] -= n
+                    cols[3, x] -= ninf
+                row0 += 1
+
+            w1 = w2 = wn = winf = 0.0
+            c0 = 0
+            c1 = -1
+            for x in range(width):
+                while c1 < min(x + xsize_half, width - 1):
+                    c1 += 1
+                    w1 += cols[0, c1]
+                    w2 += cols[1, c1]
+                    wn += cols[2, c1]
+                    winf += cols[3, c1]
+                while c0 < x - xsize_half:
+                    w1 -= cols[0, c0]
+                    w2 -= cols[1, c0]
+                    wn -= cols[2, c0]
+                    winf -= cols[3, c0]
+                    c0 += 1
+
+                s1, s2, n, ninf = w1, w2, wn, winf
+                if exclude_center:
+                    v1, v2, vn, vinf = _value_sums(arr[y, x], shift)
+                    s1 -= v1
+                    s2 -= v2
+                    n -= vn
+                    ninf -= vinf
+                if ninf > 0:
+                    out[y, x] = np.nan
+                    continue
+                if n < 1.5:
+                    out[y, x] = 0.0
+                    continue
+                mean = s1 / n
+                mean_square = s2 / n
+                var = mean_square - mean * mean
+                if var < _RUNNING_RECHECK * (mean_square + scale):
+                    out[y, x] = _window_welford(arr, y, x, xsize_half, ysize_half, exclude_center)
+                else:
+                    out[y, x] = np.sqrt(var)
+
+
+def _check_arrays(input_array, output_array, input_types, input_type_name):
+    if input_array.ndim != 2 or output_array.ndim != 2:
+        raise ValueError("Arrays must be 2-dimensional")
+    if input_array.shape != output_array.shape:
+        raise ValueError("Input and output arrays must have identical size")
+    if input_array.dtype not in input_types:
+        raise TypeError(f"input_array must be of type {input_type_name}")
+    if output_array.dtype != np.float64:
+        raise TypeError("output_array must be of type float64")
+
+
+def _run(kernel, num_threads, *args):
+    """Call kernel(*args) on num_threads threads (<= 0: Numba's default)."""
+    if num_threads <= 0:
+        kernel(*args)
+        return
+    previous = numba.get_num_threads()
+    numba.set_num_threads(min(num_threads, numba.config.NUMBA_NUM_THREADS))
+    try:
+        kernel(*args)
+    finally:
+        numba.set_num_threads(previous)
+
+
+def fsigma(input_array, output_array, xsize, ysize, exclude_center, num_threads=0):
+    """Numba version of fsigma_ext.fsigma."""
+    _check_arrays(input_array, output_array, (np.float32, np.float64), "float32 or float64")
+    _run(_fsigma_rows, num_threads, input_array, output_array, xsize // 2, ysize // 2,
+         int(exclude_center) != 0)
+
+
+def fsigma_running(input_array, output_array, xsize, ysize, exclude_center, num_threads=0):
+    """Numba version of fsigma_ext.fsigma_running."""
+    _check_arrays(input_array, output_array, (np.float32, np.float64), "float32 or float64")
+    shift, scale = _shift_and_scale(input_array)
+    _run(_fsigma_running_bands, num_threads, input_array, output_array, xsize // 2, ysize // 2,
+         int(exclude_center) != 0, shift, scale)
+
+
+def fsigma_u16(input_array, output_array, xsize, ysize, exclude_center):
+    """Numba version of fsigma_ext.fsigma_u16."""
+    _check_arrays(input_array, output_array, (np.uint16, np.int16), "uint16 or int16")
+    _run(_fsigma_rows, 0, input_array.astype(np.float64), output_array, xsize // 2, ysize // 2,
+         int(exclude_center) != 0)
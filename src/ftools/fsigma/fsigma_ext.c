@@ -4,6 +4,18 @@
 #include <stdlib.h>
 #include <math.h>
 #include <stdint.h>
+#include <string.h>
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
+/* Below this much work (pixels times window area) a call is filtered on a
+   single thread; starting a parallel region would cost more than it saves. */
+#define FSIGMA_MIN_PARALLEL_WORK 65536
+
+/* Neighborhoods of up to this many values (e.g. a 15x15 window) are
+   collected in a buffer on the stack, so small calls skip the heap */
+#define STACK_NEIGHBORS 256
 
 /* Function to compute population standard deviation (sigma) of values */
 static double compute_sigma(double *values, int count)
@@ -32,6 +44,148 @@ static double compute_sigma(double *values, int count)
   return sqrt(var);
 }
 
+/* On x86-64, windows lying wholly inside the array are filtered four
+   pixels at a time with AVX2 when the CPU has it */
+#if defined(__x86_64__) && (defined(__GNUC__) || defined(__clang__))
+#define FSIGMA_HAVE_AVX2 1
+#include <immintrin.h>
+
+static int fsigma_use_avx2 = 0;
+
+/* Four consecutive input values from p, widened to double if input_f32 */
+static inline __attribute__((always_inline, target("avx2"))) __m256d
+load_f64x4(const char *p, int input_f32)
+{
+  return input_f32 ? _mm256_cvtps_pd(_mm_loadu_ps((const float *)p))
+                   : _mm256_loadu_pd((const double *)p);
+}
+
+/* Sigma of the windows of the four pixels x .. x+3 of row y of a float64
+   (or, if input_f32 is set, float32) array with contiguous rows; the
+   windows must lie inside the array. Each lane sums its window in the
+   order compute_sigma does, with the same two passes, so the results are
+   identical to the scalar path. Returns 0 without storing anything if a
+   window holds a NaN, leaving those pixels to the scalar path that skips
+   NaNs. */
+static inline __attribute__((always_inline, target("avx2"))) int
+fsigma_f64x4(const char *input_data, npy_intp row_stride, int input_f32, int x, int y,
+             int xsize_half, int ysize_half, int exclude_center, double *out)
+{
+  const npy_intp itemsize = input_f32 ? sizeof(float) : sizeof(double);
+  __m256d sum = _mm256_setzero_pd();
+  __m256d unordered = _mm256_setzero_pd();
+  for (int ny = y - ysize_half; ny <= y + ysize_half; ny++)
+  {
+    const char *row = input_data + ny * row_stride + x * itemsize;
+    for (int dx = -xsize_half; dx <= xsize_half; dx++)
+    {
+      if (dx == 0 && ny == y && exclude_center != 0)
+      {
+        continue;
+      }
+      __m256d v = load_f64x4(row + dx * itemsize, input_f32);
+      unordered = _mm256_or_pd(unordered, _mm256_cmp_pd(v, v, _CMP_UNORD_Q));
+      sum = _mm256_add_pd(sum, v);
+    }
+  }
+  if (_mm256_movemask_pd(unordered) != 0)
+  {
+    return 0;
+  }
+
+  int count = (2 * xsize_half + 1) * (2 * ysize_half + 1) - (exclude_center != 0);
+  __m256d n = _mm256_set1_pd((double)count);
+  __m256d mean = _mm256_div_pd(sum, n);
+  __m256d ssum = _mm256_setzero_pd();
+  for (int ny = y - ysize_half; ny <= y + ysize_half; ny++)
+  {
+    const char *row = input_data + ny * row_stride + x * itemsize;
+    for (int dx = -xsize_half; dx <= xsize_half; dx++)
+    {
+      if (dx == 0 && ny == y && exclude_center != 0)
+      {
+        continue;
+      }
+      __m256d d = _mm256_sub_pd(load_f64x4(row + dx * itemsize, input_f32), mean);
+      ssum = _mm256_add_pd(ssum, _mm256_mul_pd(d, d));
+    }
+  }
+  _mm256_storeu_pd(out, _mm256_sqrt_pd(_mm256_div_pd(ssum, n)));
+  return 1;
+}
+
+/* fsigma_f64x4 for a given input type, window and exclude_center, plus
+   one per input type for any window. The fixed-size versions are compiled
+   with the window known, so the loops over it are fully unrolled and the
+   center test disappears. */
+typedef int (*fsigma_f64x4_kernel)(const char *input_data, npy_intp row_stride, int x, int y,
+                                   int xsize_half, int ysize_half, int exclude_center, double *out);
+
+#define FSIGMA_F64X4_FIXED(name, f32, xh, yh, excl)                                              \
+  __attribute__((target("avx2"))) static int name(const char *input_data, npy_intp row_stride,   \
+                                                  int x, int y, int xsize_half, int ysize_half, \
+                                                  int exclude_center, double *out)              \
+  {                                                                                             \
+    (void)xsize_half;                                                                           \
+    (void)ysize_half;                                                                           \
+    (void)exclude_center;                                                                       \
+    return fsigma_f64x4(input_data, row_stride, f32, x, y, xh, yh, excl, out);                  \
+  }
+
+#define FSIGMA_F64X4_ANY(name, f32)                                                              \
+  __attribute__((target("avx2"))) static int name(const char *input_data, npy_intp row_stride,   \
+                                                  int x, int y, int xsize_half, int ysize_half, \
+                                                  int exclude_center, double *out)              \
+  {                                                                                             \
+    return fsigma_f64x4(input_data, row_stride, f32, x, y, xsize_half, ysize_half,              \
+                        exclude_center, out);                                                   \
+  }
+
+FSIGMA_F64X4_FIXED(fsigma_f64x4_3x3_incl, 0, 1, 1, 0)
+FSIGMA_F64X4_FIXED(fsigma_f64x4_3x3_excl, 0, 1, 1, 1)
+FSIGMA_F64X4_FIXED(fsigma_f64x4_5x5_incl, 0, 2, 2, 0)
+FSIGMA_F64X4_FIXED(fsigma_f64x4_5x5_excl, 0, 2, 2, 1)
+FSIGMA_F64X4_ANY(fsigma_f64x4_any, 0)
+FSIGMA_F64X4_FIXED(fsigma_f32x4_3x3_incl, 1, 1, 1, 0)
+FSIGMA_F64X4_FIXED(fsigma_f32x4_3x3_excl, 1, 1, 1, 1)
+FSIGMA_F64X4_FIXED(fsigma_f32x4_5x5_incl, 1, 2, 2, 0)
+FSIGMA_F64X4_FIXED(fsigma_f32x4_5x5_excl, 1, 2, 2, 1)
+FSIGMA_F64X4_ANY(fsigma_f32x4_any, 1)
+
+/* The version of fsigma_f64x4 to use for an input type and window */
+static fsigma_f64x4_kernel select_fsigma_f64x4(int input_f32, int xsize_half, int ysize_half,
+                                               int exclude_center)
+{
+  /* One hex digit per field; wider windows all use the generic kernel */
+  int key = -1;
+  if (xsize_half < 16 && ysize_half < 16)
+  {
+    key = ((input_f32 != 0) << 12) | (xsize_half << 8) | (ysize_half << 4) | (exclude_center != 0);
+  }
+  switch (key)
+  {
+  case 0x0110:
+    return fsigma_f64x4_3x3_incl;
+  case 0x0111:
+    return fsigma_f64x4_3x3_excl;
+  case 0x0220:
+    return fsigma_f64x4_5x5_incl;
+  case 0x0221:
+    return fsigma_f64x4_5x5_excl;
+  case 0x1110:
+    return fsigma_f32x4_3x3_incl;
+  case 0x1111:
+    return fsigma_f32x4_3x3_excl;
+  case 0x1220:
+    return fsigma_f32x4_5x5_incl;
+  case 0x1221:
+    return fsigma_f32x4_5x5_excl;
+  default:
+    return input_f32 ? fsigma_f32x4_any : fsigma_f64x4_any;
+  }
+}
+#endif
+
 /* Function to check input arguments */
 static int check_inputs(PyArrayObject *input_array, PyArrayObject *output_array,
                         int *height, int *width)
@@ -59,9 +213,9 @@ static int check_inputs(PyArrayObject *input_array, PyArrayObject *output_array,
   *width = (int)input_dims[1];
 
   /* Check data types */
-  if (PyArray_TYPE(input_array) != NPY_FLOAT64)
+  if (PyArray_TYPE(input_array) != NPY_FLOAT64 && PyArray_TYPE(input_array) != NPY_FLOAT32)
   {
-    PyErr_SetString(PyExc_TypeError, "input_array must be of type float64");
+    PyErr_SetString(PyExc_TypeError, "input_array must be of type float32 or float64");
     return -1;
   }
 
@@ -71,21 +225,169 @@ static int check_inputs(PyArrayObject *input_array, PyArrayObject *output_array,
     return -1;
   }
 
+  if (!PyArray_ISWRITEABLE(output_array))
+  {
+    PyErr_SetString(PyExc_ValueError, "output_array must be writeable");
+    return -1;
+  }
+
   return 0; /* Success */
 }
 
+/* Append the non-NaN values of row_data[x0..x1] (x stride x_stride) to
+   neighbors and return the new count. The caller clips the span to the
+   array, so only NaN values need to be skipped here. */
+static inline int append_row_span(const char *row_data, npy_intp x_stride, int x0, int x1,
+                                  double *neighbors, int count)
+{
+  for (int nx = x0; nx <= x1; nx++)
+  {
+    double neighbor_value = *(const double *)(row_data + nx * x_stride);
+    if (!isnan(neighbor_value))
+    {
+      neighbors[count++] = neighbor_value;
+    }
+  }
+  return count;
+}
+
+/* As append_row_span, for a float32 row; values are widened to double */
+static inline int append_row_span_f32(const char *row_data, npy_intp x_stride, int x0, int x1,
+                                      double *neighbors, int count)
+{
+  for (int nx = x0; nx <= x1; nx++)
+  {
+    float neighbor_value = *(const float *)(row_data + nx * x_stride);
+    if (!isnan(neighbor_value))
+    {
+      neighbors[count++] = neighbor_value;
+    }
+  }
+  return count;
+}
+
+/* Number of threads to use for a call. num_threads <= 0 selects the OpenMP
+   default (OMP_NUM_THREADS or the number of cores). Small workloads and
+   builds without OpenMP always use a single thread. */
+static int resolve_num_threads(int num_threads, long long work)
+{
+#ifdef _OPENMP
+  if (work < FSIGMA_MIN_PARALLEL_WORK)
+  {
+    return 1;
+  }
+  int nthreads = num_threads > 0 ? num_threads : omp_get_max_threads();
+  return nthreads > 1 ? nthreads : 1;
+#else
+  (void)num_threads;
+  (void)work;
+  return 1;
+#endif
+}
+
+/* Compute sigma for row y of a 2D float64 (or, if input_f32 is set,
+   float32) array into a float64 array. Touches no Python objects, so it
+   may run with the GIL released. neighbors must hold at least
+   (2 * xsize_half + 1) * (2 * ysize_half + 1) values. */
+/* Sigma of the window around pixel (x, y), clipped to rows y0 .. y1 and
+   to the array width */
+static double fsigma_pixel(const char *input_data, const npy_intp *input_strides,
+                           int (*append)(const char *, npy_intp, int, int, double *, int),
+                           int width, int x, int y, int y0, int y1, int xsize_half,
+                           int exclude_center, double *neighbors)
+{
+  int count = 0;
+
+  /* Collect neighborhood values from the window clipped to the array,
+     so the loops need no bounds checks. When the center is excluded,
+     the center row is walked in two spans around it. */
+  int x0 = x - xsize_half > 0 ? x - xsize_half : 0;
+  int x1 = x + xsize_half < width - 1 ? x + xsize_half : width - 1;
+  for (int ny = y0; ny <= y1; ny++)
+  {
+    const char *row_data = input_data + ny * input_strides[0];
+    if (ny == y && exclude_center != 0)
+    {
+      count = append(row_data, input_strides[1], x0, x - 1, neighbors, count);
+      count = append(row_data, input_strides[1], x + 1, x1, neighbors, count);
+    }
+    else
+    {
+      count = append(row_data, input_strides[1], x0, x1, neighbors, count);
+    }
+  }
+
+  /* Compute sigma of neighborhood values. If count==0, return 0.0 */
+  return compute_sigma(neighbors, count);
+}
+
+static void fsigma_row(const char *input_data, const npy_intp *input_strides, int input_f32,
+                       char *output_data, const npy_intp *output_strides,
+                       int height, int width, int y, int xsize_half, int ysize_half,
+                       int exclude_center, double *neighbors)
+{
+  int (*append)(const char *, npy_intp, int, int, double *, int) =
+      input_f32 ? append_row_span_f32 : append_row_span;
+
+  /* Rows of the window, clipped to the array */
+  int y0 = y - ysize_half > 0 ? y - ysize_half : 0;
+  int y1 = y + ysize_half < height - 1 ? y + ysize_half : height - 1;
+  char *out_row = output_data + y * output_strides[0];
+  int x = 0;
+
+#ifdef FSIGMA_HAVE_AVX2
+  /* Rows whose windows are not clipped vertically: the pixels whose
+     windows are not clipped horizontally either go four at a time */
+  if (fsigma_use_avx2 && y0 == y - ysize_half && y1 == y + ysize_half &&
+      (xsize_half > 0 || ysize_half > 0) &&
+      input_strides[1] == (npy_intp)(input_f32 ? sizeof(float) : sizeof(double)) &&
+      output_strides[1] == sizeof(double))
+  {
+    fsigma_f64x4_kernel kernel = select_fsigma_f64x4(input_f32, xsize_half, ysize_half, exclude_center);
+    for (; x < xsize_half && x < width; x++)
+    {
+      ((double *)out_row)[x] = fsigma_pixel(input_data, input_strides, append, width, x, y,
+                                            y0, y1, xsize_half, exclude_center, neighbors);
+    }
+    for (; x + 3 + xsize_half < width; x += 4)
+    {
+      if (!kernel(input_data, input_strides[0], x, y, xsize_half, ysize_half,
+                        exclude_center, (double *)out_row + x))
+      {
+        for (int k = x; k < x + 4; k++)
+        {
+          ((double *)out_row)[k] = fsigma_pixel(input_data, input_strides, append, width, k, y,
+                                                y0, y1, xsize_half, exclude_center, neighbors);
+        }
+      }
+    }
+  }
+#endif
+
+  for (; x < width; x++)
+  {
+    *(double *)(out_row + x * output_strides[1]) =
+        fsigma_pixel(input_data, input_strides, append, width, x, y, y0, y1, xsize_half,
+                     exclude_center, neighbors);
+  }
+}
+
 /* Main fsigma function */
 static PyObject *fsigma(PyObject *self, PyObject *args)
 {
   PyArrayObject *input_array, *output_array;
   int xsize, ysize, exclude_center;
+  int num_threads = 0;
   int height, width;
 
-  /* Parse arguments: input_array, output_array, xsize, ysize, exclude_center */
-  if (!PyArg_ParseTuple(args, "O!O!iii",
+  /* Parse arguments: input_array, output_array, xsize, ysize, exclude_center[, num_threads].
+     Sizes and exclude_center use the "i" format, so plain Python ints (or
+     any object implementing __index__) are accepted as-is; callers do not
+     need to wrap them in NumPy integer scalars. */
+  if (!PyArg_ParseTuple(args, "O!O!iii|i",
                         &PyArray_Type, &input_array,
                         &PyArray_Type, &output_array,
-                        &xsize, &ysize, &exclude_center))
+                        &xsize, &ysize, &exclude_center, &num_threads))
   {
     return NULL;
   }
@@ -101,65 +403,890 @@ static PyObject *fsigma(PyObject *self, PyObject *args)
   }
 
   /* Get data pointers */
-  double *input_data = (double *)PyArray_DATA(input_array);
-  double *output_data = (double *)PyArray_DATA(output_array);
+  const char *input_data = (const char *)PyArray_DATA(input_array);
+  char *output_data = (char *)PyArray_DATA(output_array);
 
   /* Get strides */
   npy_intp *input_strides = PyArray_STRIDES(input_array);
   npy_intp *output_strides = PyArray_STRIDES(output_array);
 
-  /* Allocate buffer for neighborhood values */
+  int input_f32 = PyArray_TYPE(input_array) == NPY_FLOAT32;
+
+  /* Allocate one buffer for neighborhood values per thread */
   int max_neighbors = (2 * xsize_half + 1) * (2 * ysize_half + 1);
-  double *neighbors = (double *)malloc(max_neighbors * sizeof(double));
+  int nthreads = resolve_num_threads(num_threads, (long long)height * width * max_neighbors);
+  double stack_neighbors[STACK_NEIGHBORS];
+  double *neighbors = stack_neighbors;
+  if ((size_t)nthreads * max_neighbors > STACK_NEIGHBORS)
+  {
+    neighbors = (double *)malloc((size_t)nthreads * max_neighbors * sizeof(double));
+  }
   if (neighbors == NULL)
   {
     PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory for neighbors");
     return NULL;
   }
 
-  /* Process each pixel */
+  Py_BEGIN_ALLOW_THREADS
+#ifdef _OPENMP
+  if (nthreads > 1)
+  {
+#pragma omp parallel for schedule(static) num_threads(nthreads)
+    for (int y = 0; y < height; y++)
+    {
+      fsigma_row(input_data, input_strides, input_f32, output_data, output_strides, height, width, y,
+                 xsize_half, ysize_half, exclude_center,
+                 neighbors + (size_t)omp_get_thread_num() * max_neighbors);
+    }
+  }
+  else
+#endif
+  {
+    for (int y = 0; y < height; y++)
+    {
+      fsigma_row(input_data, input_strides, input_f32, output_data, output_strides, height, width, y,
+                 xsize_half, ysize_half, exclude_center, neighbors);
+    }
+  }
+  Py_END_ALLOW_THREADS
+
+  if (neighbors != stack_neighbors)
+  {
+    free(neighbors);
+  }
+
+  Py_RETURN_NONE;
+}
+
+/* Sigma from the exact integer sums s1 = sum(v) and s2 = sum(v*v) of n
+   values. The mean is split as q + r/n (q = s1 / n), so that the variance
+   comes from the exactly computed sum of (v - q)^2 instead of from the
+   difference of two large, rounded numbers. */
+static double sigma_from_sums(int64_t s1, int64_t s2, int64_t n)
+{
+  if (n <= 0)
+  {
+    return 0.0;
+  }
+  int64_t q = s1 / n;
+  int64_t r = s1 - q * n;
+  int64_t m = s2 - q * q * n - 2 * q * r;
+  double mean_frac = (double)r / (double)n;
+  double var = (double)m / (double)n - mean_frac * mean_frac;
+  return var > 0.0 ? sqrt(var) : 0.0;
+}
+
+/* Value x of a row of int16 (is_signed != 0) or uint16 values */
+static inline int64_t int16_value(const char *row_data, npy_intp x_stride, int x, int is_signed)
+{
+  const char *p = row_data + x * x_stride;
+  if (is_signed)
+  {
+    return *(const int16_t *)p;
+  }
+  return *(const uint16_t *)p;
+}
+
+/* Add sign (+1 or -1) times row ny to the per-column sums */
+static void add_row_to_columns(const char *input_data, const npy_intp *strides, int width, int ny,
+                               int is_signed, int64_t sign, int64_t *col1, int64_t *col2)
+{
+  const char *row_data = input_data + ny * strides[0];
+  for (int x = 0; x < width; x++)
+  {
+    int64_t v = int16_value(row_data, strides[1], x, is_signed);
+    col1[x] += sign * v;
+    col2[x] += sign * v * v;
+  }
+}
+
+/* fsigma for uint16 or int16 input, from running sums. The sums over each
+   column of the window are updated as the window moves down a row, and the
+   sums over the window as it moves along the row, so the cost per pixel does
+   not depend on the window size. All sums are exact 64-bit integers. */
+static PyObject *fsigma_u16(PyObject *self, PyObject *args)
+{
+  PyArrayObject *input_array, *output_array;
+  int xsize, ysize, exclude_center;
+
+  if (!PyArg_ParseTuple(args, "O!O!iii",
+                        &PyArray_Type, &input_array,
+                        &PyArray_Type, &output_array,
+                        &xsize, &ysize, &exclude_center))
+  {
+    return NULL;
+  }
+
+  int xsize_half = xsize / 2;
+  int ysize_half = ysize / 2;
+
+  if (PyArray_NDIM(input_array) != 2 || PyArray_NDIM(output_array) != 2)
+  {
+    PyErr_SetString(PyExc_ValueError, "Arrays must be 2-dimensional");
+    return NULL;
+  }
+  npy_intp *input_dims = PyArray_DIMS(input_array);
+  npy_intp *output_dims = PyArray_DIMS(output_array);
+  if (input_dims[0] != output_dims[0] || input_dims[1] != output_dims[1])
+  {
+    PyErr_SetString(PyExc_ValueError, "Input and output arrays must have identical size");
+    return NULL;
+  }
+  int input_type = PyArray_TYPE(input_array);
+  if (input_type != NPY_UINT16 && input_type != NPY_INT16)
+  {
+    PyErr_SetString(PyExc_TypeError, "input_array must be of type uint16 or int16");
+    return NULL;
+  }
+  if (PyArray_TYPE(output_array) != NPY_FLOAT64)
+  {
+    PyErr_SetString(PyExc_TypeError, "output_array must be of type float64");
+    return NULL;
+  }
+
+  if (!PyArray_ISWRITEABLE(output_array))
+  {
+    PyErr_SetString(PyExc_ValueError, "output_array must be writeable");
+    return NULL;
+  }
+
+  int height = (int)input_dims[0];
+  int width = (int)input_dims[1];
+  int is_signed = input_type == NPY_INT16;
+  const char *input_data = (const char *)PyArray_DATA(input_array);
+  char *output_data = (char *)PyArray_DATA(output_array);
+  npy_intp *input_strides = PyArray_STRIDES(input_array);
+  npy_intp *output_strides = PyArray_STRIDES(output_array);
+
+  /* Sums of v and v*v over the window rows, per column */
+  int64_t *col1 = (int64_t *)calloc(2 * (size_t)width + 1, sizeof(int64_t));
+  if (col1 == NULL)
+  {
+    PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory for column sums");
+    return NULL;
+  }
+  int64_t *col2 = col1 + width;
+
+  /* Rows currently summed into the columns: row0 .. row1 */
+  int row0 = 0, row1 = -1;
   for (int y = 0; y < height; y++)
   {
+    int y0 = y - ysize_half > 0 ? y - ysize_half : 0;
+    int y1 = y + ysize_half < height - 1 ? y + ysize_half : height - 1;
+    while (row1 < y1)
+    {
+      add_row_to_columns(input_data, input_strides, width, ++row1, is_signed, 1, col1, col2);
+    }
+    while (row0 < y0)
+    {
+      add_row_to_columns(input_data, input_strides, width, row0++, is_signed, -1, col1, col2);
+    }
+
+    const char *row_data = input_data + y * input_strides[0];
+    int64_t s1 = 0, s2 = 0;
+    int c0 = 0, c1 = -1;
     for (int x = 0; x < width; x++)
     {
-      int count = 0;
+      int x0 = x - xsize_half > 0 ? x - xsize_half : 0;
+      int x1 = x + xsize_half < width - 1 ? x + xsize_half : width - 1;
+      while (c1 < x1)
+      {
+        c1++;
+        s1 += col1[c1];
+        s2 += col2[c1];
+      }
+      while (c0 < x0)
+      {
+        s1 -= col1[c0];
+        s2 -= col2[c0];
+        c0++;
+      }
 
-      /* Collect neighborhood values (conditionally include center) */
-      for (int dy = -ysize_half; dy <= ysize_half; dy++)
+      int64_t n = (int64_t)(y1 - y0 + 1) * (x1 - x0 + 1);
+      int64_t t1 = s1, t2 = s2;
+      if (exclude_center != 0)
       {
-        for (int dx = -xsize_half; dx <= xsize_half; dx++)
-        {
-          int ny = y + dy;
-          int nx = x + dx;
-
-          /* Check bounds */
-          if (ny >= 0 && ny < height && nx >= 0 && nx < width)
-          {
-            /* Skip center when exclude_center != 0 */
-            if (dy == 0 && dx == 0 && exclude_center != 0)
-            {
-              continue;
-            }
-
-            double neighbor_value = *(double *)(((char *)input_data) + ny * input_strides[0] + nx * input_strides[1]);
-            /* Skip NaN values so they are not considered in the sigma */
-            if (isnan(neighbor_value))
-            {
-              continue;
-            }
-            neighbors[count++] = neighbor_value;
-          }
-        }
+        int64_t v = int16_value(row_data, input_strides[1], x, is_signed);
+        t1 -= v;
+        t2 -= v * v;
+        n--;
+      }
+      *(double *)(output_data + y * output_strides[0] + x * output_strides[1]) = sigma_from_sums(t1, t2, n);
+    }
+  }
+
+  free(col1);
+  Py_RETURN_NONE;
+}
+
+/* Rows of float input are filtered from running sums in bands of this many
+   rows (at least), each band starting its sums afresh. The bands do not
+   depend on the number of threads, so neither do the results, and the
+   rounding errors the running sums collect never span more than a band. */
+#define FSIGMA_RUNNING_BAND 64
+
+/* A window whose variance from running sums is below this fraction of its
+   mean square (relative to the shift) plus that of the whole array has
+   lost too many bits to cancellation and to the rounding the sums carry
+   along, and is recomputed from its values */
+#define FSIGMA_RUNNING_RECHECK (1.0 / (1 << 20))
+
+/* Sums over a set of values, taken relative to a shift: of v - shift and
+   (v - shift)^2 over the finite values, the number of finite values and
+   the number of infinite ones (NaN values are skipped) */
+typedef struct
+{
+  double s1, s2, n, ninf;
+} fsigma_sums;
+
+/* The same sums for each pixel of a row, one array per sum, so that rows
+   of them are added and filtered several pixels at a time */
+typedef struct
+{
+  double *s1, *s2, *n, *ninf;
+} fsigma_sums_row;
+
+static inline void sums_add(fsigma_sums *sums, const fsigma_sums *other, double sign)
+{
+  sums->s1 += sign * other->s1;
+  sums->s2 += sign * other->s2;
+  sums->n += sign * other->n;
+  sums->ninf += sign * other->ninf;
+}
+
+/* The sums over the single input value v */
+static inline fsigma_sums value_sums(double v, double shift)
+{
+  fsigma_sums sums = {0.0, 0.0, 0.0, 0.0};
+  if (isinf(v))
+  {
+    sums.ninf = 1.0;
+  }
+  else if (!isnan(v))
+  {
+    double d = v - shift;
+    sums.s1 = d;
+    sums.s2 = d * d;
+    sums.n = 1.0;
+  }
+  return sums;
+}
+
+/* Input value x of a float64 (or, if input_f32 is set, float32) row */
+static inline double float_value(const char *row_data, npy_intp x_stride, int x, int input_f32)
+{
+  const char *p = row_data + x * x_stride;
+  return input_f32 ? (double)*(const float *)p : *(const double *)p;
+}
+
+/* Sigma of the values summed in sums, as compute_sigma gives it: NaN if
+   one of them is infinite, 0 if there are none (or one). Returns -1
+   instead if the sums cannot give it accurately (see
+   FSIGMA_RUNNING_RECHECK); scale is the mean square of the whole array
+   relative to the shift. */
+static inline double sigma_from_running_sums(const fsigma_sums *sums, double scale)
+{
+  if (sums->ninf > 0)
+  {
+    return NAN;
+  }
+  if (sums->n < 1.5)
+  {
+    return 0.0;
+  }
+  double inv_n = 1.0 / sums->n;
+  double mean = sums->s1 * inv_n;
+  double mean_square = sums->s2 * inv_n;
+  double var = mean_square - mean * mean;
+  if (var < FSIGMA_RUNNING_RECHECK * (mean_square + scale))
+  {
+    return -1.0;
+  }
+  return sqrt(var);
+}
+
+/* Sigma of the window around pixel (x, y), clipped to the array, with
+   Welford's single-pass update of the mean and the sum of squared
+   deviations, for the windows the running sums cannot give accurately.
+   The values are taken relative to the first one, so that the mean being
+   updated stays small next to the deviations from it. The window holds
+   no infinite values (those windows give NaN first). */
+static double fsigma_welford(const char *input_data, const npy_intp *input_strides, int input_f32,
+                             int height, int width, int x, int y, int xsize_half, int ysize_half,
+                             int exclude_center)
+{
+  int y0 = y - ysize_half > 0 ? y - ysize_half : 0;
+  int y1 = y + ysize_half < height - 1 ? y + ysize_half : height - 1;
+  int x0 = x - xsize_half > 0 ? x - xsize_half : 0;
+  int x1 = x + xsize_half < width - 1 ? x + xsize_half : width - 1;
+  double first = 0.0, mean = 0.0, m2 = 0.0;
+  int count = 0;
+  for (int ny = y0; ny <= y1; ny++)
+  {
+    const char *row_data = input_data + ny * input_strides[0];
+    for (int nx = x0; nx <= x1; nx++)
+    {
+      double v = float_value(row_data, input_strides[1], nx, input_f32);
+      if (isnan(v) || (nx == x && ny == y && exclude_center != 0))
+      {
+        continue;
+      }
+      if (count == 0)
+      {
+        first = v;
+      }
+      double d = v - first;
+      double delta = d - mean;
+      mean += delta / ++count;
+      m2 += delta * (d - mean);
+    }
+  }
+  return count > 0 ? sqrt(m2 / count) : 0.0;
+}
+
+/* Sigma of pixel (x, y) of row_data from the sums over its window (with
+   the center excluded here, if requested), or from its values if the
+   sums cannot give it accurately */
+static double running_pixel_sigma(fsigma_sums sums, const char *row_data, double shift, double scale,
+                                  const char *input_data, const npy_intp *input_strides,
+                                  int input_f32, int height, int width, int x, int y,
+                                  int xsize_half, int ysize_half, int exclude_center)
+{
+  if (exclude_center != 0)
+  {
+    fsigma_sums center = value_sums(float_value(row_data, input_strides[1], x, input_f32), shift);
+    sums_add(&sums, &center, -1.0);
+  }
+  double sigma = sigma_from_running_sums(&sums, scale);
+  if (sigma < 0.0)
+  {
+    sigma = fsigma_welford(input_data, input_strides, input_f32, height, width, x, y,
+                           xsize_half, ysize_half, exclude_center);
+  }
+  return sigma;
+}
+
+#ifdef FSIGMA_HAVE_AVX2
+/* value_sums of the input values x .. x+3 of a row, as vectors of s1, s2,
+   n and ninf */
+static inline __attribute__((always_inline, target("avx2"))) void
+value_sums_x4(const char *row_data, npy_intp x_stride, int x, int input_f32, __m256d shift,
+              __m256d v[4])
+{
+  __m256d value;
+  if (x_stride == (input_f32 ? (npy_intp)sizeof(float) : (npy_intp)sizeof(double)))
+  {
+    value = load_f64x4(row_data + x * x_stride, input_f32);
+  }
+  else
+  {
+    value = _mm256_setr_pd(float_value(row_data, x_stride, x, input_f32),
+                           float_value(row_data, x_stride, x + 1, input_f32),
+                           float_value(row_data, x_stride, x + 2, input_f32),
+                           float_value(row_data, x_stride, x + 3, input_f32));
+  }
+  __m256d magnitude = _mm256_andnot_pd(_mm256_set1_pd(-0.0), value);
+  __m256d infinity = _mm256_set1_pd(INFINITY);
+  __m256d one = _mm256_set1_pd(1.0);
+  __m256d finite = _mm256_cmp_pd(magnitude, infinity, _CMP_LT_OQ);
+  __m256d d = _mm256_and_pd(finite, _mm256_sub_pd(value, shift));
+  v[0] = d;
+  v[1] = _mm256_mul_pd(d, d);
+  v[2] = _mm256_and_pd(finite, one);
+  v[3] = _mm256_and_pd(_mm256_cmp_pd(magnitude, infinity, _CMP_EQ_OQ), one);
+}
+
+/* cols_update_row for pixels 0 .. width / 4 * 4 - 1, four at a time;
+   returns the number done */
+__attribute__((target("avx2"))) static int cols_update_row_avx2(const fsigma_sums_row *cols,
+                                                               const char *entering,
+                                                               const char *leaving,
+                                                               npy_intp x_stride, int input_f32,
+                                                               int width, double shift, int reset)
+{
+  __m256d vshift = _mm256_set1_pd(shift);
+  __m256d zero = _mm256_setzero_pd();
+  double *sums[4] = {cols->s1, cols->s2, cols->n, cols->ninf};
+  int x = 0;
+  for (; x + 3 < width; x += 4)
+  {
+    __m256d add[4] = {zero, zero, zero, zero}, sub[4] = {zero, zero, zero, zero};
+    if (entering != NULL)
+    {
+      value_sums_x4(entering, x_stride, x, input_f32, vshift, add);
+    }
+    if (leaving != NULL)
+    {
+      value_sums_x4(leaving, x_stride, x, input_f32, vshift, sub);
+    }
+    for (int j = 0; j < 4; j++)
+    {
+      __m256d s = reset ? zero : _mm256_loadu_pd(sums[j] + x);
+      _mm256_storeu_pd(sums[j] + x, _mm256_add_pd(s, _mm256_sub_pd(add[j], sub[j])));
+    }
+  }
+  return x;
+}
+
+/* running_row for pixels 0 .. width / 4 * 4 - 1, four at a time, with the
+   operations of running_pixel_sigma; returns the number done. Pixels
+   whose window holds an inf, fewer than two values or needs recomputing
+   go through running_pixel_sigma. */
+__attribute__((target("avx2"))) static int running_row_avx2(const fsigma_sums_row *windows,
+                                                           const char *input_data,
+                                                           const npy_intp *input_strides,
+                                                           int input_f32, char *out_row,
+                                                           npy_intp out_stride, int height,
+                                                           int width, int y, int xsize_half,
+                                                           int ysize_half, int exclude_center,
+                                                           double shift, double scale)
+{
+  const char *row_data = input_data + y * input_strides[0];
+  __m256d vshift = _mm256_set1_pd(shift);
+  __m256d vscale = _mm256_set1_pd(scale);
+  __m256d recheck = _mm256_set1_pd(FSIGMA_RUNNING_RECHECK);
+  __m256d zero = _mm256_setzero_pd();
+  __m256d one = _mm256_set1_pd(1.0);
+  __m256d few = _mm256_set1_pd(1.5);
+  int x = 0;
+  for (; x + 3 < width; x += 4)
+  {
+    __m256d w[4] = {_mm256_loadu_pd(windows->s1 + x), _mm256_loadu_pd(windows->s2 + x),
+                    _mm256_loadu_pd(windows->n + x), _mm256_loadu_pd(windows->ninf + x)};
+    if (exclude_center != 0)
+    {
+      __m256d v[4];
+      value_sums_x4(row_data, input_strides[1], x, input_f32, vshift, v);
+      for (int j = 0; j < 4; j++)
+      {
+        w[j] = _mm256_sub_pd(w[j], v[j]);
+      }
+    }
+    __m256d inv_n = _mm256_div_pd(one, w[2]);
+    __m256d mean = _mm256_mul_pd(w[0], inv_n);
+    __m256d mean_square = _mm256_mul_pd(w[1], inv_n);
+    __m256d var = _mm256_sub_pd(mean_square, _mm256_mul_pd(mean, mean));
+    __m256d bad = _mm256_or_pd(_mm256_cmp_pd(w[3], zero, _CMP_GT_OQ), _mm256_cmp_pd(w[2], few, _CMP_LT_OQ));
+    bad = _mm256_or_pd(bad, _mm256_cmp_pd(var, _mm256_mul_pd(recheck, _mm256_add_pd(mean_square, vscale)),
+                                          _CMP_LT_OQ));
+    double sigma[4];
+    _mm256_storeu_pd(sigma, _mm256_sqrt_pd(var));
+    int mask = _mm256_movemask_pd(bad);
+    for (int k = 0; k < 4; k++)
+    {
+      if (mask & (1 << k))
+      {
+        fsigma_sums sums = {windows->s1[x + k], windows->s2[x + k], windows->n[x + k], windows->ninf[x + k]};
+        sigma[k] = running_pixel_sigma(sums, row_data, shift, scale, input_data, input_strides,
+                                       input_f32, height, width, x + k, y, xsize_half, ysize_half,
+                                       exclude_center);
+      }
+      *(double *)(out_row + (x + k) * out_stride) = sigma[k];
+    }
+  }
+  return x;
+}
+#elif defined(__aarch64__) && defined(__ARM_NEON)
+/* The same two steps with NEON, two pixels at a time. NEON is part of the
+   AArch64 baseline, so it needs no dispatch. */
+#define FSIGMA_HAVE_NEON 1
+#include <arm_neon.h>
+
+/* value_sums of the input values x and x+1 of a row, as vectors of s1,
+   s2, n and ninf */
+static inline void value_sums_x2(const char *row_data, npy_intp x_stride, int x, int input_f32,
+                                 float64x2_t shift, float64x2_t v[4])
+{
+  float64x2_t value;
+  if (x_stride == (input_f32 ? (npy_intp)sizeof(float) : (npy_intp)sizeof(double)))
+  {
+    const char *p = row_data + x * x_stride;
+    value = input_f32 ? vcvt_f64_f32(vld1_f32((const float *)p)) : vld1q_f64((const double *)p);
+  }
+  else
+  {
+    double pair[2] = {float_value(row_data, x_stride, x, input_f32),
+                      float_value(row_data, x_stride, x + 1, input_f32)};
+    value = vld1q_f64(pair);
+  }
+  float64x2_t magnitude = vabsq_f64(value);
+  float64x2_t infinity = vdupq_n_f64(INFINITY);
+  uint64x2_t one = vreinterpretq_u64_f64(vdupq_n_f64(1.0));
+  uint64x2_t finite = vcltq_f64(magnitude, infinity);
+  float64x2_t d = vreinterpretq_f64_u64(vandq_u64(finite, vreinterpretq_u64_f64(vsubq_f64(value, shift))));
+  v[0] = d;
+  v[1] = vmulq_f64(d, d);
+  v[2] = vreinterpretq_f64_u64(vandq_u64(finite, one));
+  v[3] = vreinterpretq_f64_u64(vandq_u64(vceqq_f64(magnitude, infinity), one));
+}
+
+/* cols_update_row for pixels 0 .. width / 2 * 2 - 1, two at a time;
+   returns the number done */
+static int cols_update_row_neon(const fsigma_sums_row *cols, const char *entering, const char *leaving,
+                                npy_intp x_stride, int input_f32, int width, double shift, int reset)
+{
+  float64x2_t vshift = vdupq_n_f64(shift);
+  float64x2_t zero = vdupq_n_f64(0.0);
+  double *sums[4] = {cols->s1, cols->s2, cols->n, cols->ninf};
+  int x = 0;
+  for (; x + 1 < width; x += 2)
+  {
+    float64x2_t add[4] = {zero, zero, zero, zero}, sub[4] = {zero, zero, zero, zero};
+    if (entering != NULL)
+    {
+      value_sums_x2(entering, x_stride, x, input_f32, vshift, add);
+    }
+    if (leaving != NULL)
+    {
+      value_sums_x2(leaving, x_stride, x, input_f32, vshift, sub);
+    }
+    for (int j = 0; j < 4; j++)
+    {
+      float64x2_t s = reset ? zero : vld1q_f64(sums[j] + x);
+      vst1q_f64(sums[j] + x, vaddq_f64(s, vsubq_f64(add[j], sub[j])));
+    }
+  }
+  return x;
+}
+
+/* running_row for pixels 0 .. width / 2 * 2 - 1, two at a time, as
+   running_row_avx2 does it; returns the number done */
+static int running_row_neon(const fsigma_sums_row *windows, const char *input_data,
+                            const npy_intp *input_strides, int input_f32, char *out_row,
+                            npy_intp out_stride, int height, int width, int y, int xsize_half,
+                            int ysize_half, int exclude_center, double shift, double scale)
+{
+  const char *row_data = input_data + y * input_strides[0];
+  float64x2_t vshift = vdupq_n_f64(shift);
+  float64x2_t vscale = vdupq_n_f64(scale);
+  float64x2_t recheck = vdupq_n_f64(FSIGMA_RUNNING_RECHECK);
+  float64x2_t zero = vdupq_n_f64(0.0);
+  float64x2_t one = vdupq_n_f64(1.0);
+  float64x2_t few = vdupq_n_f64(1.5);
+  int x = 0;
+  for (; x + 1 < width; x += 2)
+  {
+    float64x2_t w[4] = {vld1q_f64(windows->s1 + x), vld1q_f64(windows->s2 + x),
+                        vld1q_f64(windows->n + x), vld1q_f64(windows->ninf + x)};
+    if (exclude_center != 0)
+    {
+      float64x2_t v[4];
+      value_sums_x2(row_data, input_strides[1], x, input_f32, vshift, v);
+      for (int j = 0; j < 4; j++)
+      {
+        w[j] = vsubq_f64(w[j], v[j]);
+      }
+    }
+    float64x2_t inv_n = vdivq_f64(one, w[2]);
+    float64x2_t mean = vmulq_f64(w[0], inv_n);
+    float64x2_t mean_square = vmulq_f64(w[1], inv_n);
+    float64x2_t var = vsubq_f64(mean_square, vmulq_f64(mean, mean));
+    uint64x2_t bad = vorrq_u64(vcgtq_f64(w[3], zero), vcltq_f64(w[2], few));
+    bad = vorrq_u64(bad, vcltq_f64(var, vmulq_f64(recheck, vaddq_f64(mean_square, vscale))));
+    double sigma[2];
+    vst1q_f64(sigma, vsqrtq_f64(var));
+    uint64_t lanes[2];
+    vst1q_u64(lanes, bad);
+    for (int k = 0; k < 2; k++)
+    {
+      if (lanes[k] != 0)
+      {
+        fsigma_sums sums = {windows->s1[x + k], windows->s2[x + k], windows->n[x + k], windows->ninf[x + k]};
+        sigma[k] = running_pixel_sigma(sums, row_data, shift, scale, input_data, input_strides,
+                                       input_f32, height, width, x + k, y, xsize_half, ysize_half,
+                                       exclude_center);
+      }
+      *(double *)(out_row + (x + k) * out_stride) = sigma[k];
+    }
+  }
+  return x;
+}
+#endif
+
+/* Add the value_sums of input row entering to cols and subtract those of
+   row leaving; either may be NULL. When both are given, the difference
+   is added, so each column sum is read and written once. If reset is
+   set, cols is taken to be zero rather than read. */
+static void cols_update_row(const fsigma_sums_row *cols, const char *entering, const char *leaving,
+                            npy_intp x_stride, int input_f32, int width, double shift, int reset)
+{
+  int x = 0;
+#ifdef FSIGMA_HAVE_AVX2
+  if (fsigma_use_avx2)
+  {
+    x = cols_update_row_avx2(cols, entering, leaving, x_stride, input_f32, width, shift, reset);
+  }
+#elif defined(FSIGMA_HAVE_NEON)
+  x = cols_update_row_neon(cols, entering, leaving, x_stride, input_f32, width, shift, reset);
+#endif
+  fsigma_sums none = {0.0, 0.0, 0.0, 0.0};
+  for (; x < width; x++)
+  {
+    if (reset)
+    {
+      cols->s1[x] = cols->s2[x] = cols->n[x] = cols->ninf[x] = 0.0;
+    }
+    fsigma_sums add = entering != NULL ? value_sums(float_value(entering, x_stride, x, input_f32), shift) : none;
+    fsigma_sums sub = leaving != NULL ? value_sums(float_value(leaving, x_stride, x, input_f32), shift) : none;
+    cols->s1[x] += add.s1 - sub.s1;
+    cols->s2[x] += add.s2 - sub.s2;
+    cols->n[x] += add.n - sub.n;
+    cols->ninf[x] += add.ninf - sub.ninf;
+  }
+}
+
+/* Add v to *sum with compensated summation: the rounding error of each
+   addition is collected in *comp, to be added back when the sum is read.
+   The error is found with Knuth's TwoSum rather than Neumaier's compare
+   of magnitudes; both give it exactly, but TwoSum needs no branch. */
+static inline void compensated_add(double *sum, double *comp, double v)
+{
+  double t = *sum + v;
+  double v_part = t - *sum;
+  *comp += (*sum - (t - v_part)) + (v - v_part);
+  *sum = t;
+}
+
+/* Slide a window along cols (the sums over the rows of the windows of
+   row y), storing its sums for each pixel of the row in
+   windows. Where the window moves by one column, the difference of the
+   entering and leaving column is added, so each sum carries one
+   dependent addition per pixel. s1 and s2 are summed with compensation,
+   so that their rounding errors do not build up along wide rows (n and
+   ninf count whole values and are exact). */
+static void window_sums_row(const fsigma_sums_row *cols, const fsigma_sums_row *windows, int width,
+                            int xsize_half)
+{
+  fsigma_sums sums = {0.0, 0.0, 0.0, 0.0};
+  double comp1 = 0.0, comp2 = 0.0;
+  for (int c = 0; c < xsize_half && c < width; c++)
+  {
+    compensated_add(&sums.s1, &comp1, cols->s1[c]);
+    compensated_add(&sums.s2, &comp2, cols->s2[c]);
+    sums.n += cols->n[c];
+    sums.ninf += cols->ninf[c];
+  }
+  for (int x = 0; x < width; x++)
+  {
+    int entering = x + xsize_half, leaving = x - xsize_half - 1;
+    fsigma_sums delta = {0.0, 0.0, 0.0, 0.0};
+    if (entering < width && leaving >= 0)
+    {
+      delta.s1 = cols->s1[entering] - cols->s1[leaving];
+      delta.s2 = cols->s2[entering] - cols->s2[leaving];
+      delta.n = cols->n[entering] - cols->n[leaving];
+      delta.ninf = cols->ninf[entering] - cols->ninf[leaving];
+    }
+    else if (entering < width)
+    {
+      delta = (fsigma_sums){cols->s1[entering], cols->s2[entering], cols->n[entering], cols->ninf[entering]};
+    }
+    else if (leaving >= 0)
+    {
+      delta = (fsigma_sums){-cols->s1[leaving], -cols->s2[leaving], -cols->n[leaving], -cols->ninf[leaving]};
+    }
+    compensated_add(&sums.s1, &comp1, delta.s1);
+    compensated_add(&sums.s2, &comp2, delta.s2);
+    sums.n += delta.n;
+    sums.ninf += delta.ninf;
+    windows->s1[x] = sums.s1 + comp1;
+    windows->s2[x] = sums.s2 + comp2;
+    windows->n[x] = sums.n;
+    windows->ninf[x] = sums.ninf;
+  }
+}
+
+/* Filter row y from the sums over the windows of its pixels */
+static void running_row(const fsigma_sums_row *windows, const char *input_data,
+                        const npy_intp *input_strides, int input_f32, char *out_row,
+                        npy_intp out_stride, int height, int width, int y, int xsize_half,
+                        int ysize_half, int exclude_center, double shift, double scale)
+{
+  const char *row_data = input_data + y * input_strides[0];
+  int x = 0;
+#ifdef FSIGMA_HAVE_AVX2
+  if (fsigma_use_avx2)
+  {
+    x = running_row_avx2(windows, input_data, input_strides, input_f32, out_row, out_stride, height,
+                         width, y, xsize_half, ysize_half, exclude_center, shift, scale);
+  }
+#elif defined(FSIGMA_HAVE_NEON)
+  x = running_row_neon(windows, input_data, input_strides, input_f32, out_row, out_stride, height,
+                       width, y, xsize_half, ysize_half, exclude_center, shift, scale);
+#endif
+  for (; x < width; x++)
+  {
+    fsigma_sums sums = {windows->s1[x], windows->s2[x], windows->n[x], windows->ninf[x]};
+    *(double *)(out_row + x * out_stride) =
+        running_pixel_sigma(sums, row_data, shift, scale, input_data, input_strides, input_f32,
+                            height, width, x, y, xsize_half, ysize_half, exclude_center);
+  }
+}
+
+/* Filter rows ya .. yb-1 from running sums. buffer holds 8 * width
+   doubles: the column sums over the rows of the current windows and the
+   window sums of the current row. */
+static void fsigma_running_band(const char *input_data, const npy_intp *input_strides, int input_f32,
+                                char *output_data, const npy_intp *output_strides,
+                                int height, int width, int ya, int yb, int xsize_half,
+                                int ysize_half, int exclude_center, double shift,
+                                double scale, double *buffer)
+{
+  fsigma_sums_row cols = {buffer, buffer + width, buffer + 2 * (size_t)width, buffer + 3 * (size_t)width};
+  fsigma_sums_row windows = {buffer + 4 * (size_t)width, buffer + 5 * (size_t)width,
+                             buffer + 6 * (size_t)width, buffer + 7 * (size_t)width};
+
+  /* Rows currently summed into the columns: row0 .. row1 */
+  int row0 = ya - ysize_half > 0 ? ya - ysize_half : 0;
+  int row1 = row0 - 1;
+  memset(buffer, 0, 4 * (size_t)width * sizeof(double));
+
+  for (int y = ya; y < yb; y++)
+  {
+    int y0 = y - ysize_half > 0 ? y - ysize_half : 0;
+    int y1 = y + ysize_half < height - 1 ? y + ysize_half : height - 1;
+    if (ysize_half == 0)
+    {
+      /* Windows one row high (as for spectra): the column sums are those
+         of row y alone, so they are set from it in one pass instead of
+         updated from the row entering and the row leaving */
+      cols_update_row(&cols, input_data + y * input_strides[0], NULL, input_strides[1], input_f32,
+                      width, shift, 1);
+      row0 = row1 = y;
+    }
+    while (row1 < y1 || row0 < y0)
+    {
+      const char *entering = row1 < y1 ? input_data + ++row1 * input_strides[0] : NULL;
+      const char *leaving = row0 < y0 ? input_data + row0++ * input_strides[0] : NULL;
+      cols_update_row(&cols, entering, leaving, input_strides[1], input_f32, width, shift, 0);
+    }
+    /* Windows one column wide: the column sums are already the window sums */
+    const fsigma_sums_row *row_sums = &cols;
+    if (xsize_half > 0)
+    {
+      window_sums_row(&cols, &windows, width, xsize_half);
+      row_sums = &windows;
+    }
+    running_row(row_sums, input_data, input_strides, input_f32, output_data + y * output_strides[0],
+                output_strides[1], height, width, y, xsize_half, ysize_half, exclude_center, shift,
+                scale);
+  }
+}
+
+/* fsigma for float input from running sums, as fsigma_u16 does for
+   integers: the cost per pixel does not depend on the window size. The
+   values are summed relative to their mean, which keeps the variance from
+   being the small difference of two large sums for data far from zero;
+   windows far from that mean relative to their spread are recomputed. */
+static PyObject *fsigma_running(PyObject *self, PyObject *args)
+{
+  PyArrayObject *input_array, *output_array;
+  int xsize, ysize, exclude_center;
+  int num_threads = 0;
+  int height, width;
+
+  /* Parse arguments: input_array, output_array, xsize, ysize, exclude_center[, num_threads] */
+  if (!PyArg_ParseTuple(args, "O!O!iii|i",
+                        &PyArray_Type, &input_array,
+                        &PyArray_Type, &output_array,
+                        &xsize, &ysize, &exclude_center, &num_threads))
+  {
+    return NULL;
+  }
+
+  int xsize_half = xsize / 2;
+  int ysize_half = ysize / 2;
+
+  if (check_inputs(input_array, output_array, &height, &width) != 0)
+  {
+    return NULL;
+  }
+
+  const char *input_data = (const char *)PyArray_DATA(input_array);
+  char *output_data = (char *)PyArray_DATA(output_array);
+  npy_intp *input_strides = PyArray_STRIDES(input_array);
+  npy_intp *output_strides = PyArray_STRIDES(output_array);
+  int input_f32 = PyArray_TYPE(input_array) == NPY_FLOAT32;
+
+  /* Bands of rows; a band re-reads the window rows above its first row, so
+     it is made long enough for that to stay a small part of its work */
+  int band = 4 * (2 * ysize_half + 1) > FSIGMA_RUNNING_BAND ? 4 * (2 * ysize_half + 1)
+                                                            : FSIGMA_RUNNING_BAND;
+  int nbands = (height + band - 1) / band;
+  int nthreads = resolve_num_threads(num_threads, (long long)height * width * 8);
+  if (nthreads > nbands)
+  {
+    nthreads = nbands > 0 ? nbands : 1;
+  }
+
+  /* One set of column and window sums per thread */
+  double *sums = (double *)malloc(((size_t)nthreads * 8 * width + 1) * sizeof(double));
+  if (sums == NULL)
+  {
+    PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory for column sums");
+    return NULL;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  /* The shift: the mean of the finite values */
+  double total = 0.0, count = 0.0;
+  for (int y = 0; y < height; y++)
+  {
+    const char *row_data = input_data + y * input_strides[0];
+    for (int x = 0; x < width; x++)
+    {
+      double v = float_value(row_data, input_strides[1], x, input_f32);
+      if (isfinite(v))
+      {
+        total += v;
+        count += 1.0;
       }
+    }
+  }
+  double shift = count > 0.0 ? total / count : 0.0;
 
-      /* Compute sigma of neighborhood values. If count==0, return 0.0 */
-      double sigma_value = compute_sigma(neighbors, count);
-      *(double *)(((char *)output_data) + y * output_strides[0] + x * output_strides[1]) = sigma_value;
+  /* The scale for FSIGMA_RUNNING_RECHECK: the mean square relative to it */
+  double squares = 0.0;
+  for (int y = 0; y < height; y++)
+  {
+    const char *row_data = input_data + y * input_strides[0];
+    for (int x = 0; x < width; x++)
+    {
+      double v = float_value(row_data, input_strides[1], x, input_f32);
+      if (isfinite(v))
+      {
+        squares += (v - shift) * (v - shift);
+      }
     }
   }
+  double scale = count > 0.0 ? squares / count : 0.0;
 
-  free(neighbors);
+#ifdef _OPENMP
+  if (nthreads > 1)
+  {
+#pragma omp parallel for schedule(static) num_threads(nthreads)
+    for (int b = 0; b < nbands; b++)
+    {
+      int yb = (b + 1) * band < height ? (b + 1) * band : height;
+      fsigma_running_band(input_data, input_strides, input_f32, output_data, output_strides,
+                          height, width, b * band, yb, xsize_half, ysize_half, exclude_center,
+                          shift, scale, sums + (size_t)omp_get_thread_num() * 8 * width);
+    }
+  }
+  else
+#endif
+  {
+    for (int b = 0; b < nbands; b++)
+    {
+      int yb = (b + 1) * band < height ? (b + 1) * band : height;
+      fsigma_running_band(input_data, input_strides, input_f32, output_data, output_strides,
+                          height, width, b * band, yb, xsize_half, ysize_half, exclude_center,
+                          shift, scale, sums);
+    }
+  }
+  Py_END_ALLOW_THREADS
 
+  free(sums);
   Py_RETURN_NONE;
 }
 
@@ -168,21 +1295,47 @@ static PyMethodDef FsigmaMethods[] = {
     {"fsigma", fsigma, METH_VARARGS,
      "Compute filtered sigma-like operation on a 2D array.\n\n"
      "Parameters:\n"
-     "    input_array : numpy.ndarray (float64, 2D)\n"
+     "    input_array : numpy.ndarray (float32 or float64, 2D)\n"
      "        Input array\n"
      "    output_array : numpy.ndarray (float64, 2D)\n"
-     "        Output array (same size as input)\n"
+     "        Output array (same size as input). Every element is written,\n"
+     "        so allocate it with numpy.empty rather than numpy.zeros\n"
      "    xsize : int\n"
      "        Full width of window in x direction\n"
      "    ysize : int\n"
      "        Full height of window in y direction\n"
      "    exclude_center : int\n"
      "        If non-zero, exclude the center pixel from the computation.\n"
+     "    num_threads : int, optional\n"
+     "        Number of OpenMP threads; 0 (default) uses the OpenMP default.\n"
+     "        Ignored when built without OpenMP\n"
      "\n"
      "Notes:\n"
      "    NaN values in the neighborhood (including the center if included)\n"
      "    are ignored when computing sigma. If no valid neighbors remain,\n"
      "    the result is 0.0.\n"},
+    {"fsigma_u16", fsigma_u16, METH_VARARGS,
+     "Compute local population sigma of a 2D uint16 or int16 array.\n\n"
+     "Uses running sums, so the cost per pixel does not grow with the window,\n"
+     "and the sums are exact; the result agrees with fsigma on the array\n"
+     "converted to float64 to within rounding.\n\n"
+     "Parameters:\n"
+     "    input_array : numpy.ndarray (uint16 or int16, 2D)\n"
+     "        Input array\n"
+     "    output_array : numpy.ndarray (float64, 2D)\n"
+     "        Output array (same size as input). Every element is written,\n"
+     "        so allocate it with numpy.empty rather than numpy.zeros\n"
+     "    xsize : int\n"
+     "        Full width of window in x direction\n"
+     "    ysize : int\n"
+     "        Full height of window in y direction\n"
+     "    exclude_center : int\n"
+     "        If non-zero, exclude the center pixel from the computation.\n"},
+    {"fsigma_running", fsigma_running, METH_VARARGS,
+     "Compute local population sigma of a 2D float array from running sums.\n\n"
+     "Takes the arguments of fsigma. The cost per pixel does not depend on\n"
+     "the window size, and the result agrees with fsigma to within rounding\n"
+     "(relative to the spread of the data, not to its mean).\n"},
     {NULL, NULL, 0, NULL}};
 
 /* Module definition */
@@ -197,5 +1350,9 @@ static struct PyModuleDef fsigma_module = {
 PyMODINIT_FUNC PyInit_fsigma_ext(void)
 {
   import_array();
+#ifdef FSIGMA_HAVE_AVX2
+  __builtin_cpu_init();
+  fsigma_use_avx2 = __builtin_cpu_supports("avx2");
+#endif
   return PyModule_Create(&fsigma_module);
 }
@@ -0,0 +1,233 @@
+"""Numba implementation of the fsigma3_ext entry points.
+
+The package loader uses this module in place of the compiled extension
+when no extension can be found but Numba is installed, so fsigma3 works
+without a C compiler. The functions take the same arguments and raise the
+same errors as their C counterparts, and give the same results
+(fsigma3_running to rounding, as the C code orders its sums differently).
+The planes of the output are filtered in parallel. Each kernel is
+compiled on its first call, which takes a few seconds; the compiled code
+is cached on disk for later processes.
+"""
+import numba
+import numpy as np
+
+# Planes of fsigma3_running's output are filtered in slabs of at least this
+# many planes, each slab starting its sums afresh, as in fsigma3_ext.c
+_RUNNING_SLAB = 32
+
+# A window whose variance from running sums is below this fraction of its
+# mean square (relative to the shift) plus that of the whole array is
+# recomputed from its values, as in fsigma3_ext.c
+_RUNNING_RECHECK = 1.0 / (1 << 20)
+
+
+@numba.njit(cache=True)
+def _window_sigma(arr, z, y, x, xsize_half, ysize_half, zsize_half, exclude_center, values):
+    """Population sigma of the non-NaN values in the window around (x, y, z), clipped to the array."""
+    depth, height, width = arr.shape
+    count = 0
+    for nz in range(max(z - zsize_half, 0), min(z + zsize_half, depth - 1) + 1):
+        for ny in range(max(y - ysize_half, 0), min(y + ysize_half, height - 1) + 1):
+            for nx in range(max(x - xsize_half, 0), min(x + xsize_half, width - 1) + 1):
+                if exclude_center and nz == z and ny == y and nx == x:
+                    continue
+                value = arr[nz, ny, nx]
+                if not np.isnan(value):
+                    values[count] = value
+                    count += 1
+    if count == 0:
+        return 0.0
+
+    # Two passes, mean first, as compute_sigma in fsigma3_ext.c
+    total = 0.0
+    for i in range(count):
+        total += values[i]
+    mean = total / count
+    ssum = 0.0
+    for i in range(count):
+        d = values[i] - mean
+        ssum += d * d
+    return np.sqrt(ssum / count)
+
+
+@numba.njit(parallel=True, cache=True)
+def _fsigma3_planes(arr, out, xsize_half, ysize_half, zsize_half, exclude_center):
+    depth, height, width = arr.shape
+    for z in numba.prange(depth):
+        values = np.empty((2 * xsize_half + 1) * (2 * ysize_half + 1) * (2 * zsize_half + 1))
+        for y in range(height):
+            for x in range(width):
+                out[z, y, x] = _window_sigma(arr, z, y, x, xsize_half, ysize_half, zsize_half,
+                                             exclude_center, values)
+
+
+@numba.njit(cache=True)
+def _value_sums(v, shift):
+    """(v - shift, (v - shift)^2, 1, 0) for finite v, (0, 0, 0, 1) for inf, zeros for NaN."""
+    if np.isnan(v):
+        return 0.0, 0.0, 0.0, 0.0
+    if np.isinf(v):
+        return 0.0, 0.0, 0.0, 1.0
+    d = v - shift
+    return d, d * d, 1.0, 0.0
+
+
+@numba.njit(cache=True)
+def _shift_and_scale(arr):
+    """The mean of the finite values and their mean square relative to it."""
+    total = 0.0
+    count = 0.0
+    for v in arr.flat:
+        if np.isfinite(v):
+            total += v
+            count += 1.0
+    if count == 0.0:
+        return 0.0, 0.0
+    shift = total / count
+    squares = 0.0
+    for v in arr.flat:
+        if np.isfinite(v):
+            squares += (v - shift) * (v - shift)
+    return shift, squares / count
+
+
+@numba.njit(cache=True)
+def _window_welford(arr, z, y, x, xsize_half, ysize_half, zsize_half, exclude_center):
+    """Sigma of the window around (x, y, z) with Welford's update, relative to its first value."""
+    depth, height, width = arr.shape
+    first = 0.0
+    mean = 0.0
+    m2 = 0.0
+    count = 0
+    for nz in range(max(z - zsize_half, 0), min(z + zsize_half, depth - 1) + 1):
+        for ny in range(max(y - ysize_half, 0), min(y + ysize_half, height - 1) + 1):
+            for nx in range(max(x - xsize_half, 0), min(x + xsize_half, width - 1) + 1):
+                value = arr[nz, ny, nx]
+                if np.isnan(value) or (exclude_center and nz == z and ny == y and nx == x):
+                    continue
+                if count == 0:
+                    first = value
+                d = value - first
+                count += 1
+                delta = d - mean
+                mean += delta / count
+                m2 += delta * (d - mean)
+    return np.sqrt(m2 / count) if count > 0 else 0.0
+
+
+@numba.njit(parallel=True, cache=True)
+def _fsigma3_running_slabs(arr, out, xsize_half, ysize_half, zsize_half, exclude_center, shift, scale,
+                           slab):
+    depth, height, width = arr.shape
+    for index in numba.prange((depth + slab - 1) // slab):
+        za = index * slab
+        # Sums over the planes of the z window for each (y, x), and of those
+        # over the rows of the y window for each x: s1, s2, n, ninf
+        planes = np.zeros((4, height, width))
+        cols = np.empty((4, width))
+        plane0 = max(za - zsize_half, 0)
+        plane1 = plane0 - 1
+        for z in range(za, min(za + slab, depth)):
+            while plane1 < min(z + zsize_half, depth - 1):
+                plane1 += 1
+                for y in range(height):
+                    for x in range(width):
+                        s1, s2, n, ninf = _value_sums(arr[plane1, y, x], shift)
+                        planes[0, y, x] += s1
+                        planes[1, y, x] += s2
+                        planes[2, y, x] += n
+                        planes[3, y, x] += ninf
+            while plane0 < z - zsize_half:
+                for y in range(height):
+                    for x in range(width):
+                        s1, s2, n, ninf = _value_sums(arr[plane0, y, x], shift)
+                        planes[0, y, x] -= s1
+                        planes[1, y, x] -= s2
+                        planes[2, y, x] -= n
+                        planes[3, y, x] -= ninf
+                plane0 += 1
+
+            cols[:] = 0.0
+            row0 = 0
+            row1 = -1
+            for y in range(height):
+                while row1 < min(y + ysize_half, height - 1):
+                    row1 += 1
+                    for x in range(width):
+                        for j in range(4):
+                            cols[j, x] += planes[j, row1, x]
+                while row0 < y - ysize_half:
+                    for x in range(width):
+                        for j in range(4):
+                            cols[j, x] -= planes[j, row0, x]
+                    row0 += 1
+
+                w1 = w2 = wn = winf = 0.0
+                c0 = 0
+                c1 = -1
+                for x in range(width):
+                    while c1 < min(x + xsize_half, width - 1):
+                        c1 += 1
+                        w1 += cols[0, c1]
+                        w2 += cols[1, c1]
+                        wn += cols[2, c1]
+                        winf += cols[3, c1]
+                    while c0 < x - xsize_half:
+                        w1 -= cols[0, c0]
+                        w2 -= cols[1, c0]
+                        wn -= cols[2, c0]
+                        winf -= cols[3, c0]
+                        c0 += 1
+
+                    s1, s2, n, ninf = w1, w2, wn, winf
+                    if exclude_center:
+                        v1, v2, vn, vinf = _value_sums(arr[z, y, x], shift)
+                        s1 -= v1
+                        s2 -= v2
+                        n -= vn
+                        ninf -= vinf
+                    if ninf > 0:
+                        out[z, y, x] = np.nan
+                        continue
+                    if n < 1.5:
+                        out[z, y, x] = 0.0
+                        continue
+                    mean = s1 / n
+                    mean_square = s2 / n
+                    var = mean_square - mean * mean
+                    if var < _RUNNING_RECHECK * (mean_square + scale):
+                        out[z, y, x] = _window_welford(arr, z, y, x, xsize_half, ysize_half, zsize_half,
+                                                       exclude_center)
+                    else:
+                        out[z, y, x] = np.sqrt(var)
+
+
+def _check_arrays(input_array, output_array):
+    if input_array.ndim != 3 or output_array.ndim != 3:
+        raise ValueError("Arrays must be 3-dimensional")
+    if input_array.shape != output_array.shape:
+        raise ValueError("Input and output arrays must have identical size")
+    if input_array.dtype != np.float64:
+        raise TypeError("input_array must be of type float64")
+    if output_array.dtype != np.float64:
+        raise TypeError("output_array must be of type float64")
+
+
+def fsigma3(input_array, output_array, xsize, ysize, zsize, exclude_center):
+    """Numba version of fsigma3_ext.fsigma3."""
+    _check_arrays(input_array, output_array)
+    _fsigma3_planes(input_array, output_array, xsize // 2, ysize // 2, zsize // 2,
+                    int(exclude_center) != 0)
+
+
+def fsigma3_running(input_array, output_array, xsize, ysize, zsize, exclude_center):
+    """Numba version of fsigma3_ext.fsigma3_running."""
+    _check_arrays(input_array, output_array)
+    zsize_half = zsize // 2
+    shift, scale = _shift_and_scale(input_array)
+    # A slab re-reads the window planes before its first plane, so it is
+    # made long enough for that to stay a small part of its work
+    slab = max(4 * (2 * zsize_half + 1), _RUNNING_SLAB)
+    _fsigma3_running_slabs(input_array, output_array, xsize // 2, ysize // 2, zsize_half,
+                           int(exclude_center) != 0, shift, scale, slab)
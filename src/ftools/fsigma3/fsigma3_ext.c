@@ -4,6 +4,11 @@
 #include <stdlib.h>
 #include <math.h>
 #include <stdint.h>
+#include <string.h>
+
+/* Neighborhoods of up to this many values (e.g. a 15x15 window) are
+   collected in a buffer on the stack, so small calls skip the heap */
+#define STACK_NEIGHBORS 256
 
 /* Function to compute population standard deviation (sigma) of values */
 static double compute_sigma(double *values, int count)
@@ -32,6 +37,74 @@ static double compute_sigma(double *values, int count)
   return sqrt(var);
 }
 
+/* On x86-64, windows lying wholly inside the array are filtered four
+   voxels at a time with AVX2 when the CPU has it */
+#if defined(__x86_64__) && (defined(__GNUC__) || defined(__clang__))
+#define FSIGMA3_HAVE_AVX2 1
+#include <immintrin.h>
+
+static int fsigma3_use_avx2 = 0;
+
+/* Sigma of the windows of the four voxels x .. x+3 of row (y, z) of a
+   float64 array with contiguous rows; the windows must lie inside the
+   array. Each lane sums its window in the order compute_sigma does, with
+   the same two passes, so the results are identical to the scalar path.
+   NaN values are masked out of the sums and counted out of each lane's
+   number of values rather than branched on, so windows holding a NaN
+   stay in the vector path; a lane with no values left gives 0, as
+   compute_sigma does. */
+__attribute__((target("avx2"))) static void fsigma3_f64x4(const char *input_data, npy_intp z_stride,
+                                                         npy_intp y_stride, int x, int y, int z,
+                                                         int xsize_half, int ysize_half, int zsize_half,
+                                                         int exclude_center, double *out)
+{
+  __m256d one = _mm256_set1_pd(1.0);
+  __m256d sum = _mm256_setzero_pd();
+  __m256d n = _mm256_setzero_pd();
+  for (int nz = z - zsize_half; nz <= z + zsize_half; nz++)
+  {
+    for (int ny = y - ysize_half; ny <= y + ysize_half; ny++)
+    {
+      const double *row = (const double *)(input_data + nz * z_stride + ny * y_stride) + x;
+      for (int dx = -xsize_half; dx <= xsize_half; dx++)
+      {
+        if (dx == 0 && ny == y && nz == z && exclude_center != 0)
+        {
+          continue;
+        }
+        __m256d v = _mm256_loadu_pd(row + dx);
+        __m256d ordered = _mm256_cmp_pd(v, v, _CMP_ORD_Q);
+        sum = _mm256_add_pd(sum, _mm256_and_pd(v, ordered));
+        n = _mm256_add_pd(n, _mm256_and_pd(one, ordered));
+      }
+    }
+  }
+
+  __m256d mean = _mm256_div_pd(sum, n);
+  __m256d ssum = _mm256_setzero_pd();
+  for (int nz = z - zsize_half; nz <= z + zsize_half; nz++)
+  {
+    for (int ny = y - ysize_half; ny <= y + ysize_half; ny++)
+    {
+      const double *row = (const double *)(input_data + nz * z_stride + ny * y_stride) + x;
+      for (int dx = -xsize_half; dx <= xsize_half; dx++)
+      {
+        if (dx == 0 && ny == y && nz == z && exclude_center != 0)
+        {
+          continue;
+        }
+        __m256d v = _mm256_loadu_pd(row + dx);
+        __m256d d = _mm256_and_pd(_mm256_sub_pd(v, mean), _mm256_cmp_pd(v, v, _CMP_ORD_Q));
+        ssum = _mm256_add_pd(ssum, _mm256_mul_pd(d, d));
+      }
+    }
+  }
+  __m256d sigma = _mm256_sqrt_pd(_mm256_div_pd(ssum, n));
+  __m256d empty = _mm256_cmp_pd(n, _mm256_setzero_pd(), _CMP_EQ_OQ);
+  _mm256_storeu_pd(out, _mm256_blendv_pd(sigma, _mm256_setzero_pd(), empty));
+}
+#endif
+
 /* Function to check input arguments */
 static int check_inputs(PyArrayObject *input_array, PyArrayObject *output_array,
                         int *depth, int *height, int *width)
@@ -72,17 +145,121 @@ static int check_inputs(PyArrayObject *input_array, PyArrayObject *output_array,
     return -1;
   }
 
+  if (!PyArray_ISWRITEABLE(output_array))
+  {
+    PyErr_SetString(PyExc_ValueError, "output_array must be writeable");
+    return -1;
+  }
+
   return 0; /* Success */
 }
 
+/* Append the non-NaN values of row_data[x0..x1] (x stride x_stride) to
+   neighbors and return the new count. The caller clips the span to the
+   array, so only NaN values need to be skipped here. */
+static inline int append_row_span(const char *row_data, npy_intp x_stride, int x0, int x1,
+                                  double *neighbors, int count)
+{
+  for (int nx = x0; nx <= x1; nx++)
+  {
+    double neighbor_value = *(const double *)(row_data + nx * x_stride);
+    if (!isnan(neighbor_value))
+    {
+      neighbors[count++] = neighbor_value;
+    }
+  }
+  return count;
+}
+
 /* Main fsigma3 function */
+/* Sigma of the window around voxel (x, y, z), clipped to planes z0 .. z1,
+   rows y0 .. y1 and the array width */
+static double fsigma3_voxel(const char *input_data, const npy_intp *input_strides, int width,
+                            int x, int y, int z, int z0, int z1, int y0, int y1,
+                            int xsize_half, int exclude_center, double *neighbors)
+{
+  int count = 0;
+
+  /* Collect neighborhood values from the window clipped to the array, so
+     the loops need no bounds checks. When the center is excluded, the
+     center row is walked in two spans around it. */
+  int x0 = x - xsize_half > 0 ? x - xsize_half : 0;
+  int x1 = x + xsize_half < width - 1 ? x + xsize_half : width - 1;
+  for (int nz = z0; nz <= z1; nz++)
+  {
+    for (int ny = y0; ny <= y1; ny++)
+    {
+      const char *row_data = input_data + nz * input_strides[0] + ny * input_strides[1];
+      if (nz == z && ny == y && exclude_center != 0)
+      {
+        count = append_row_span(row_data, input_strides[2], x0, x - 1, neighbors, count);
+        count = append_row_span(row_data, input_strides[2], x + 1, x1, neighbors, count);
+      }
+      else
+      {
+        count = append_row_span(row_data, input_strides[2], x0, x1, neighbors, count);
+      }
+    }
+  }
+
+  /* Compute sigma of neighborhood values. If count==0, return 0.0 */
+  return compute_sigma(neighbors, count);
+}
+
+/* Filter row (y, z) of the output */
+static void fsigma3_row(const char *input_data, const npy_intp *input_strides,
+                        char *output_data, const npy_intp *output_strides,
+                        int depth, int height, int width, int z, int y,
+                        int xsize_half, int ysize_half, int zsize_half,
+                        int exclude_center, double *neighbors)
+{
+  /* Planes and rows of the window, clipped to the array */
+  int z0 = z - zsize_half > 0 ? z - zsize_half : 0;
+  int z1 = z + zsize_half < depth - 1 ? z + zsize_half : depth - 1;
+  int y0 = y - ysize_half > 0 ? y - ysize_half : 0;
+  int y1 = y + ysize_half < height - 1 ? y + ysize_half : height - 1;
+  char *out_row = output_data + z * output_strides[0] + y * output_strides[1];
+  int x = 0;
+
+#ifdef FSIGMA3_HAVE_AVX2
+  /* Rows whose windows are not clipped in y or z: the voxels whose windows
+     are not clipped in x either go four at a time */
+  if (fsigma3_use_avx2 && z0 == z - zsize_half && z1 == z + zsize_half &&
+      y0 == y - ysize_half && y1 == y + ysize_half &&
+      (xsize_half > 0 || ysize_half > 0 || zsize_half > 0) &&
+      input_strides[2] == sizeof(double) && output_strides[2] == sizeof(double))
+  {
+    for (; x < xsize_half && x < width; x++)
+    {
+      ((double *)out_row)[x] = fsigma3_voxel(input_data, input_strides, width, x, y, z,
+                                             z0, z1, y0, y1, xsize_half, exclude_center, neighbors);
+    }
+    for (; x + 3 + xsize_half < width; x += 4)
+    {
+      fsigma3_f64x4(input_data, input_strides[0], input_strides[1], x, y, z,
+                    xsize_half, ysize_half, zsize_half, exclude_center, (double *)out_row + x);
+    }
+  }
+#endif
+
+  for (; x < width; x++)
+  {
+    *(double *)(out_row + x * output_strides[2]) =
+        fsigma3_voxel(input_data, input_strides, width, x, y, z, z0, z1, y0, y1,
+                      xsize_half, exclude_center, neighbors);
+  }
+}
+
 static PyObject *fsigma3(PyObject *self, PyObject *args)
 {
   PyArrayObject *input_array, *output_array;
   int xsize, ysize, zsize, exclude_center;
   int depth, height, width;
 
-  /* Parse arguments: input_array, output_array, xsize, ysize, zsize, exclude_center */
+  /* Parse arguments: input_array, output_array, xsize, ysize, zsize, exclude_center.
+     Sizes and exclude_center use the "i" format, so plain Python ints (or
+     any object implementing __index__) are accepted as-is; callers do not
+     need to wrap them in NumPy integer scalars. */
   if (!PyArg_ParseTuple(args, "O!O!iiii",
                         &PyArray_Type, &input_array,
                         &PyArray_Type, &output_array,
@@ -112,63 +289,742 @@ static PyObject *fsigma3(PyObject *self, PyObject *args)
 
   /* Allocate buffer for neighborhood values */
   int max_neighbors = (2 * xsize_half + 1) * (2 * ysize_half + 1) * (2 * zsize_half + 1);
-  double *neighbors = (double *)malloc(max_neighbors * sizeof(double));
+  double stack_neighbors[STACK_NEIGHBORS];
+  double *neighbors = stack_neighbors;
+  if (max_neighbors > STACK_NEIGHBORS)
+  {
+    neighbors = (double *)malloc(max_neighbors * sizeof(double));
+  }
   if (neighbors == NULL)
   {
     PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory for neighbors");
     return NULL;
   }
 
-  /* Process each voxel */
+  /* Process each row of voxels */
   for (int z = 0; z < depth; z++)
   {
     for (int y = 0; y < height; y++)
     {
-      for (int x = 0; x < width; x++)
+      fsigma3_row((const char *)input_data, input_strides, (char *)output_data, output_strides,
+                  depth, height, width, z, y, xsize_half, ysize_half, zsize_half,
+                  exclude_center, neighbors);
+    }
+  }
+
+  if (neighbors != stack_neighbors)
+  {
+    free(neighbors);
+  }
+
+  Py_RETURN_NONE;
+}
+
+/* Planes of fsigma3_running's output are filtered in slabs of this many
+   planes (at least), each slab starting its sums afresh, so the rounding
+   errors the running sums collect never span more than a slab */
+#define FSIGMA3_RUNNING_SLAB 32
+
+/* A window whose variance from running sums is below this fraction of its
+   mean square (relative to the shift) plus that of the whole array has
+   lost too many bits to cancellation and to the rounding the sums carry
+   along, and is recomputed from its values */
+#define FSIGMA3_RUNNING_RECHECK (1.0 / (1 << 20))
+
+/* Sums over a set of values, taken relative to a shift: of v - shift and
+   (v - shift)^2 over the finite values, the number of finite values and
+   the number of infinite ones (NaN values are skipped) */
+typedef struct
+{
+  double s1, s2, n, ninf;
+} fsigma3_sums;
+
+/* The same sums for each voxel of a row, one array per sum, so that rows
+   of them are added and filtered several voxels at a time */
+typedef struct
+{
+  double *s1, *s2, *n, *ninf;
+} fsigma3_sums_row;
+
+static inline void sums_add(fsigma3_sums *sums, const fsigma3_sums *other, double sign)
+{
+  sums->s1 += sign * other->s1;
+  sums->s2 += sign * other->s2;
+  sums->n += sign * other->n;
+  sums->ninf += sign * other->ninf;
+}
+
+/* The sums over the single input value v */
+static inline fsigma3_sums value_sums(double v, double shift)
+{
+  fsigma3_sums sums = {0.0, 0.0, 0.0, 0.0};
+  if (isinf(v))
+  {
+    sums.ninf = 1.0;
+  }
+  else if (!isnan(v))
+  {
+    double d = v - shift;
+    sums.s1 = d;
+    sums.s2 = d * d;
+    sums.n = 1.0;
+  }
+  return sums;
+}
+
+/* Input value x of a row */
+static inline double row_value(const char *row_data, npy_intp x_stride, int x)
+{
+  return *(const double *)(row_data + x * x_stride);
+}
+
+/* Sigma of the values summed in sums, as compute_sigma gives it: NaN if
+   one of them is infinite, 0 if there are none (or one). Returns -1
+   instead if the sums cannot give it accurately (see
+   FSIGMA3_RUNNING_RECHECK); scale is the mean square of the whole array
+   relative to the shift. */
+static inline double sigma_from_running_sums(const fsigma3_sums *sums, double scale)
+{
+  if (sums->ninf > 0)
+  {
+    return NAN;
+  }
+  if (sums->n < 1.5)
+  {
+    return 0.0;
+  }
+  double inv_n = 1.0 / sums->n;
+  double mean = sums->s1 * inv_n;
+  double mean_square = sums->s2 * inv_n;
+  double var = mean_square - mean * mean;
+  if (var < FSIGMA3_RUNNING_RECHECK * (mean_square + scale))
+  {
+    return -1.0;
+  }
+  return sqrt(var);
+}
+
+/* Sigma of the window around voxel (x, y, z), clipped to the array, with
+   Welford's single-pass update of the mean and the sum of squared
+   deviations, for the windows the running sums cannot give accurately.
+   The values are taken relative to the first one, so that the mean being
+   updated stays small next to the deviations from it. The window holds
+   no infinite values (those windows give NaN first). */
+static double fsigma3_welford(const char *input_data, const npy_intp *input_strides,
+                              int depth, int height, int width, int x, int y, int z,
+                              int xsize_half, int ysize_half, int zsize_half, int exclude_center)
+{
+  int z0 = z - zsize_half > 0 ? z - zsize_half : 0;
+  int z1 = z + zsize_half < depth - 1 ? z + zsize_half : depth - 1;
+  int y0 = y - ysize_half > 0 ? y - ysize_half : 0;
+  int y1 = y + ysize_half < height - 1 ? y + ysize_half : height - 1;
+  int x0 = x - xsize_half > 0 ? x - xsize_half : 0;
+  int x1 = x + xsize_half < width - 1 ? x + xsize_half : width - 1;
+  double first = 0.0, mean = 0.0, m2 = 0.0;
+  int count = 0;
+  for (int nz = z0; nz <= z1; nz++)
+  {
+    for (int ny = y0; ny <= y1; ny++)
+    {
+      const char *row_data = input_data + nz * input_strides[0] + ny * input_strides[1];
+      for (int nx = x0; nx <= x1; nx++)
       {
-        int count = 0;
+        double v = *(const double *)(row_data + nx * input_strides[2]);
+        if (isnan(v) || (nx == x && ny == y && nz == z && exclude_center != 0))
+        {
+          continue;
+        }
+        if (count == 0)
+        {
+          first = v;
+        }
+        double d = v - first;
+        double delta = d - mean;
+        mean += delta / ++count;
+        m2 += delta * (d - mean);
+      }
+    }
+  }
+  return count > 0 ? sqrt(m2 / count) : 0.0;
+}
 
-        /* Collect neighborhood values (conditionally include center) */
-        for (int dz = -zsize_half; dz <= zsize_half; dz++)
+/* Sigma of voxel (x, y, z) of row_data from the sums over its window
+   (with the center excluded here, if requested), or from its values if
+   the sums cannot give it accurately */
+static double running_voxel_sigma(fsigma3_sums sums, const char *row_data, double shift, double scale,
+                                  const char *input_data, const npy_intp *input_strides, int depth,
+                                  int height, int width, int x, int y, int z, int xsize_half,
+                                  int ysize_half, int zsize_half, int exclude_center)
+{
+  if (exclude_center != 0)
+  {
+    fsigma3_sums center = value_sums(row_value(row_data, input_strides[2], x), shift);
+    sums_add(&sums, &center, -1.0);
+  }
+  double sigma = sigma_from_running_sums(&sums, scale);
+  if (sigma < 0.0)
+  {
+    sigma = fsigma3_welford(input_data, input_strides, depth, height, width, x, y, z,
+                            xsize_half, ysize_half, zsize_half, exclude_center);
+  }
+  return sigma;
+}
+
+#ifdef FSIGMA3_HAVE_AVX2
+/* value_sums of the input values x .. x+3 of a row, as vectors of s1, s2,
+   n and ninf */
+static inline __attribute__((always_inline, target("avx2"))) void
+value_sums_x4(const char *row_data, npy_intp x_stride, int x, __m256d shift, __m256d v[4])
+{
+  __m256d value;
+  if (x_stride == (npy_intp)sizeof(double))
+  {
+    value = _mm256_loadu_pd((const double *)row_data + x);
+  }
+  else
+  {
+    value = _mm256_setr_pd(row_value(row_data, x_stride, x), row_value(row_data, x_stride, x + 1),
+                           row_value(row_data, x_stride, x + 2), row_value(row_data, x_stride, x + 3));
+  }
+  __m256d magnitude = _mm256_andnot_pd(_mm256_set1_pd(-0.0), value);
+  __m256d infinity = _mm256_set1_pd(INFINITY);
+  __m256d one = _mm256_set1_pd(1.0);
+  __m256d finite = _mm256_cmp_pd(magnitude, infinity, _CMP_LT_OQ);
+  __m256d d = _mm256_and_pd(finite, _mm256_sub_pd(value, shift));
+  v[0] = d;
+  v[1] = _mm256_mul_pd(d, d);
+  v[2] = _mm256_and_pd(finite, one);
+  v[3] = _mm256_and_pd(_mm256_cmp_pd(magnitude, infinity, _CMP_EQ_OQ), one);
+}
+
+/* values_update_row for voxels 0 .. width / 4 * 4 - 1, four at a time;
+   returns the number done */
+__attribute__((target("avx2"))) static int values_update_row_avx2(const fsigma3_sums_row *sums,
+                                                                 const char *entering,
+                                                                 const char *leaving,
+                                                                 npy_intp x_stride, int width,
+                                                                 double shift)
+{
+  __m256d vshift = _mm256_set1_pd(shift);
+  __m256d zero = _mm256_setzero_pd();
+  double *dst[4] = {sums->s1, sums->s2, sums->n, sums->ninf};
+  int x = 0;
+  for (; x + 3 < width; x += 4)
+  {
+    __m256d add[4] = {zero, zero, zero, zero}, sub[4] = {zero, zero, zero, zero};
+    if (entering != NULL)
+    {
+      value_sums_x4(entering, x_stride, x, vshift, add);
+    }
+    if (leaving != NULL)
+    {
+      value_sums_x4(leaving, x_stride, x, vshift, sub);
+    }
+    for (int j = 0; j < 4; j++)
+    {
+      __m256d s = _mm256_loadu_pd(dst[j] + x);
+      _mm256_storeu_pd(dst[j] + x, _mm256_add_pd(s, _mm256_sub_pd(add[j], sub[j])));
+    }
+  }
+  return x;
+}
+
+/* running_row for voxels 0 .. width / 4 * 4 - 1, four at a time, with the
+   operations of running_voxel_sigma; returns the number done. Voxels
+   whose window holds an inf, fewer than two values or needs recomputing
+   go through running_voxel_sigma. */
+__attribute__((target("avx2"))) static int running_row_avx2(const fsigma3_sums_row *windows,
+                                                           const char *input_data,
+                                                           const npy_intp *input_strides,
+                                                           char *out_row, npy_intp out_stride,
+                                                           int depth, int height, int width, int y,
+                                                           int z, int xsize_half, int ysize_half,
+                                                           int zsize_half, int exclude_center,
+                                                           double shift, double scale)
+{
+  const char *row_data = input_data + z * input_strides[0] + y * input_strides[1];
+  __m256d vshift = _mm256_set1_pd(shift);
+  __m256d vscale = _mm256_set1_pd(scale);
+  __m256d recheck = _mm256_set1_pd(FSIGMA3_RUNNING_RECHECK);
+  __m256d zero = _mm256_setzero_pd();
+  __m256d one = _mm256_set1_pd(1.0);
+  __m256d few = _mm256_set1_pd(1.5);
+  int x = 0;
+  for (; x + 3 < width; x += 4)
+  {
+    __m256d w[4] = {_mm256_loadu_pd(windows->s1 + x), _mm256_loadu_pd(windows->s2 + x),
+                    _mm256_loadu_pd(windows->n + x), _mm256_loadu_pd(windows->ninf + x)};
+    if (exclude_center != 0)
+    {
+      __m256d v[4];
+      value_sums_x4(row_data, input_strides[2], x, vshift, v);
+      for (int j = 0; j < 4; j++)
+      {
+        w[j] = _mm256_sub_pd(w[j], v[j]);
+      }
+    }
+    __m256d inv_n = _mm256_div_pd(one, w[2]);
+    __m256d mean = _mm256_mul_pd(w[0], inv_n);
+    __m256d mean_square = _mm256_mul_pd(w[1], inv_n);
+    __m256d var = _mm256_sub_pd(mean_square, _mm256_mul_pd(mean, mean));
+    __m256d bad = _mm256_or_pd(_mm256_cmp_pd(w[3], zero, _CMP_GT_OQ), _mm256_cmp_pd(w[2], few, _CMP_LT_OQ));
+    bad = _mm256_or_pd(bad, _mm256_cmp_pd(var, _mm256_mul_pd(recheck, _mm256_add_pd(mean_square, vscale)),
+                                          _CMP_LT_OQ));
+    double sigma[4];
+    _mm256_storeu_pd(sigma, _mm256_sqrt_pd(var));
+    int mask = _mm256_movemask_pd(bad);
+    for (int k = 0; k < 4; k++)
+    {
+      if (mask & (1 << k))
+      {
+        fsigma3_sums sums = {windows->s1[x + k], windows->s2[x + k], windows->n[x + k], windows->ninf[x + k]};
+        sigma[k] = running_voxel_sigma(sums, row_data, shift, scale, input_data, input_strides, depth,
+                                       height, width, x + k, y, z, xsize_half, ysize_half, zsize_half,
+                                       exclude_center);
+      }
+      *(double *)(out_row + (x + k) * out_stride) = sigma[k];
+    }
+  }
+  return x;
+}
+#elif defined(__aarch64__) && defined(__ARM_NEON)
+/* The same two steps with NEON, two voxels at a time. NEON is part of the
+   AArch64 baseline, so it needs no dispatch. */
+#define FSIGMA3_HAVE_NEON 1
+#include <arm_neon.h>
+
+/* value_sums of the input values x and x+1 of a row, as vectors of s1,
+   s2, n and ninf */
+static inline void value_sums_x2(const char *row_data, npy_intp x_stride, int x, float64x2_t shift,
+                                 float64x2_t v[4])
+{
+  float64x2_t value;
+  if (x_stride == (npy_intp)sizeof(double))
+  {
+    value = vld1q_f64((const double *)row_data + x);
+  }
+  else
+  {
+    double pair[2] = {row_value(row_data, x_stride, x), row_value(row_data, x_stride, x + 1)};
+    value = vld1q_f64(pair);
+  }
+  float64x2_t magnitude = vabsq_f64(value);
+  float64x2_t infinity = vdupq_n_f64(INFINITY);
+  uint64x2_t one = vreinterpretq_u64_f64(vdupq_n_f64(1.0));
+  uint64x2_t finite = vcltq_f64(magnitude, infinity);
+  float64x2_t d = vreinterpretq_f64_u64(vandq_u64(finite, vreinterpretq_u64_f64(vsubq_f64(value, shift))));
+  v[0] = d;
+  v[1] = vmulq_f64(d, d);
+  v[2] = vreinterpretq_f64_u64(vandq_u64(finite, one));
+  v[3] = vreinterpretq_f64_u64(vandq_u64(vceqq_f64(magnitude, infinity), one));
+}
+
+/* values_update_row for voxels 0 .. width / 2 * 2 - 1, two at a time;
+   returns the number done */
+static int values_update_row_neon(const fsigma3_sums_row *sums, const char *entering,
+                                  const char *leaving, npy_intp x_stride, int width, double shift)
+{
+  float64x2_t vshift = vdupq_n_f64(shift);
+  float64x2_t zero = vdupq_n_f64(0.0);
+  double *dst[4] = {sums->s1, sums->s2, sums->n, sums->ninf};
+  int x = 0;
+  for (; x + 1 < width; x += 2)
+  {
+    float64x2_t add[4] = {zero, zero, zero, zero}, sub[4] = {zero, zero, zero, zero};
+    if (entering != NULL)
+    {
+      value_sums_x2(entering, x_stride, x, vshift, add);
+    }
+    if (leaving != NULL)
+    {
+      value_sums_x2(leaving, x_stride, x, vshift, sub);
+    }
+    for (int j = 0; j < 4; j++)
+    {
+      vst1q_f64(dst[j] + x, vaddq_f64(vld1q_f64(dst[j] + x), vsubq_f64(add[j], sub[j])));
+    }
+  }
+  return x;
+}
+
+/* running_row for voxels 0 .. width / 2 * 2 - 1, two at a time, as
+   running_row_avx2 does it; returns the number done */
+static int running_row_neon(const fsigma3_sums_row *windows, const char *input_data,
+                            const npy_intp *input_strides, char *out_row, npy_intp out_stride,
+                            int depth, int height, int width, int y, int z, int xsize_half,
+                            int ysize_half, int zsize_half, int exclude_center, double shift,
+                            double scale)
+{
+  const char *row_data = input_data + z * input_strides[0] + y * input_strides[1];
+  float64x2_t vshift = vdupq_n_f64(shift);
+  float64x2_t vscale = vdupq_n_f64(scale);
+  float64x2_t recheck = vdupq_n_f64(FSIGMA3_RUNNING_RECHECK);
+  float64x2_t zero = vdupq_n_f64(0.0);
+  float64x2_t one = vdupq_n_f64(1.0);
+  float64x2_t few = vdupq_n_f64(1.5);
+  int x = 0;
+  for (; x + 1 < width; x += 2)
+  {
+    float64x2_t w[4] = {vld1q_f64(windows->s1 + x), vld1q_f64(windows->s2 + x),
+                        vld1q_f64(windows->n + x), vld1q_f64(windows->ninf + x)};
+    if (exclude_center != 0)
+    {
+      float64x2_t v[4];
+      value_sums_x2(row_data, input_strides[2], x, vshift, v);
+      for (int j = 0; j < 4; j++)
+      {
+        w[j] = vsubq_f64(w[j], v[j]);
+      }
+    }
+    float64x2_t inv_n = vdivq_f64(one, w[2]);
+    float64x2_t mean = vmulq_f64(w[0], inv_n);
+    float64x2_t mean_square = vmulq_f64(w[1], inv_n);
+    float64x2_t var = vsubq_f64(mean_square, vmulq_f64(mean, mean));
+    uint64x2_t bad = vorrq_u64(vcgtq_f64(w[3], zero), vcltq_f64(w[2], few));
+    bad = vorrq_u64(bad, vcltq_f64(var, vmulq_f64(recheck, vaddq_f64(mean_square, vscale))));
+    double sigma[2];
+    vst1q_f64(sigma, vsqrtq_f64(var));
+    uint64_t lanes[2];
+    vst1q_u64(lanes, bad);
+    for (int k = 0; k < 2; k++)
+    {
+      if (lanes[k] != 0)
+      {
+        fsigma3_sums sums = {windows->s1[x + k], windows->s2[x + k], windows->n[x + k], windows->ninf[x + k]};
+        sigma[k] = running_voxel_sigma(sums, row_data, shift, scale, input_data, input_strides, depth,
+                                       height, width, x + k, y, z, xsize_half, ysize_half, zsize_half,
+                                       exclude_center);
+      }
+      *(double *)(out_row + (x + k) * out_stride) = sigma[k];
+    }
+  }
+  return x;
+}
+#endif
+
+/* Add the value_sums of input row entering to sums and subtract those of
+   row leaving; either may be NULL. When both are given, the difference
+   is added, so each sum is read and written once. */
+static void values_update_row(const fsigma3_sums_row *sums, const char *entering, const char *leaving,
+                              npy_intp x_stride, int width, double shift)
+{
+  int x = 0;
+#ifdef FSIGMA3_HAVE_AVX2
+  if (fsigma3_use_avx2)
+  {
+    x = values_update_row_avx2(sums, entering, leaving, x_stride, width, shift);
+  }
+#elif defined(FSIGMA3_HAVE_NEON)
+  x = values_update_row_neon(sums, entering, leaving, x_stride, width, shift);
+#endif
+  fsigma3_sums none = {0.0, 0.0, 0.0, 0.0};
+  for (; x < width; x++)
+  {
+    fsigma3_sums add = entering != NULL ? value_sums(row_value(entering, x_stride, x), shift) : none;
+    fsigma3_sums sub = leaving != NULL ? value_sums(row_value(leaving, x_stride, x), shift) : none;
+    sums->s1[x] += add.s1 - sub.s1;
+    sums->s2[x] += add.s2 - sub.s2;
+    sums->n[x] += add.n - sub.n;
+    sums->ninf[x] += add.ninf - sub.ninf;
+  }
+}
+
+/* d += e - l over a row; either of e and l may be NULL */
+static inline void update_array(double *d, const double *e, const double *l, int width)
+{
+  if (e != NULL && l != NULL)
+  {
+    for (int x = 0; x < width; x++)
+    {
+      d[x] += e[x] - l[x];
+    }
+  }
+  else if (e != NULL)
+  {
+    for (int x = 0; x < width; x++)
+    {
+      d[x] += e[x];
+    }
+  }
+  else if (l != NULL)
+  {
+    for (int x = 0; x < width; x++)
+    {
+      d[x] -= l[x];
+    }
+  }
+}
+
+/* Add the row of sums entering to sums and subtract the row leaving, as
+   values_update_row does for input rows */
+static void sums_update_row(const fsigma3_sums_row *sums, const fsigma3_sums_row *entering,
+                            const fsigma3_sums_row *leaving, int width)
+{
+  update_array(sums->s1, entering != NULL ? entering->s1 : NULL, leaving != NULL ? leaving->s1 : NULL, width);
+  update_array(sums->s2, entering != NULL ? entering->s2 : NULL, leaving != NULL ? leaving->s2 : NULL, width);
+  update_array(sums->n, entering != NULL ? entering->n : NULL, leaving != NULL ? leaving->n : NULL, width);
+  update_array(sums->ninf, entering != NULL ? entering->ninf : NULL, leaving != NULL ? leaving->ninf : NULL,
+               width);
+}
+
+/* Add v to *sum with compensated summation: the rounding error of each
+   addition is collected in *comp, to be added back when the sum is read.
+   The error is found with Knuth's TwoSum rather than Neumaier's compare
+   of magnitudes; both give it exactly, but TwoSum needs no branch. */
+static inline void compensated_add(double *sum, double *comp, double v)
+{
+  double t = *sum + v;
+  double v_part = t - *sum;
+  *comp += (*sum - (t - v_part)) + (v - v_part);
+  *sum = t;
+}
+
+/* Slide a window along cols (the sums over the planes and rows of the
+   windows of a row), storing its sums for each voxel of the row in
+   windows. Where the window moves by one column, the difference of the
+   entering and leaving column is added, so each sum carries one
+   dependent addition per voxel. s1 and s2 are summed with compensation,
+   so that their rounding errors do not build up along wide rows (n and
+   ninf count whole values and are exact). */
+static void window_sums_row(const fsigma3_sums_row *cols, const fsigma3_sums_row *windows, int width,
+                            int xsize_half)
+{
+  fsigma3_sums sums = {0.0, 0.0, 0.0, 0.0};
+  double comp1 = 0.0, comp2 = 0.0;
+  for (int c = 0; c < xsize_half && c < width; c++)
+  {
+    compensated_add(&sums.s1, &comp1, cols->s1[c]);
+    compensated_add(&sums.s2, &comp2, cols->s2[c]);
+    sums.n += cols->n[c];
+    sums.ninf += cols->ninf[c];
+  }
+  for (int x = 0; x < width; x++)
+  {
+    int entering = x + xsize_half, leaving = x - xsize_half - 1;
+    fsigma3_sums delta = {0.0, 0.0, 0.0, 0.0};
+    if (entering < width && leaving >= 0)
+    {
+      delta.s1 = cols->s1[entering] - cols->s1[leaving];
+      delta.s2 = cols->s2[entering] - cols->s2[leaving];
+      delta.n = cols->n[entering] - cols->n[leaving];
+      delta.ninf = cols->ninf[entering] - cols->ninf[leaving];
+    }
+    else if (entering < width)
+    {
+      delta = (fsigma3_sums){cols->s1[entering], cols->s2[entering], cols->n[entering], cols->ninf[entering]};
+    }
+    else if (leaving >= 0)
+    {
+      delta = (fsigma3_sums){-cols->s1[leaving], -cols->s2[leaving], -cols->n[leaving], -cols->ninf[leaving]};
+    }
+    compensated_add(&sums.s1, &comp1, delta.s1);
+    compensated_add(&sums.s2, &comp2, delta.s2);
+    sums.n += delta.n;
+    sums.ninf += delta.ninf;
+    windows->s1[x] = sums.s1 + comp1;
+    windows->s2[x] = sums.s2 + comp2;
+    windows->n[x] = sums.n;
+    windows->ninf[x] = sums.ninf;
+  }
+}
+
+/* Filter row (y, z) from the sums over the windows of its voxels */
+static void running_row(const fsigma3_sums_row *windows, const char *input_data,
+                        const npy_intp *input_strides, char *out_row, npy_intp out_stride,
+                        int depth, int height, int width, int y, int z, int xsize_half,
+                        int ysize_half, int zsize_half, int exclude_center, double shift,
+                        double scale)
+{
+  const char *row_data = input_data + z * input_strides[0] + y * input_strides[1];
+  int x = 0;
+#ifdef FSIGMA3_HAVE_AVX2
+  if (fsigma3_use_avx2)
+  {
+    x = running_row_avx2(windows, input_data, input_strides, out_row, out_stride, depth, height, width,
+                         y, z, xsize_half, ysize_half, zsize_half, exclude_center, shift, scale);
+  }
+#elif defined(FSIGMA3_HAVE_NEON)
+  x = running_row_neon(windows, input_data, input_strides, out_row, out_stride, depth, height, width,
+                       y, z, xsize_half, ysize_half, zsize_half, exclude_center, shift, scale);
+#endif
+  for (; x < width; x++)
+  {
+    fsigma3_sums sums = {windows->s1[x], windows->s2[x], windows->n[x], windows->ninf[x]};
+    *(double *)(out_row + x * out_stride) =
+        running_voxel_sigma(sums, row_data, shift, scale, input_data, input_strides, depth, height,
+                            width, x, y, z, xsize_half, ysize_half, zsize_half, exclude_center);
+  }
+}
+
+/* Row y of a plane of sums: s1, s2, n and ninf each hold height rows */
+static inline fsigma3_sums_row sums_row(const fsigma3_sums_row *plane, int y, int width)
+{
+  size_t offset = (size_t)y * width;
+  fsigma3_sums_row row = {plane->s1 + offset, plane->s2 + offset, plane->n + offset, plane->ninf + offset};
+  return row;
+}
+
+/* Filter planes za .. zb-1 from running sums. buffer holds
+   4 * (height + 2) * width doubles: a plane of sums over the planes of
+   the z windows, a row of sums of those over the rows of the y windows
+   and the window sums of the current row. */
+static void fsigma3_running_slab(const char *input_data, const npy_intp *input_strides,
+                                 char *output_data, const npy_intp *output_strides,
+                                 int depth, int height, int width, int za, int zb,
+                                 int xsize_half, int ysize_half, int zsize_half,
+                                 int exclude_center, double shift, double scale, double *buffer)
+{
+  size_t plane_size = (size_t)height * width;
+  fsigma3_sums_row planes = {buffer, buffer + plane_size, buffer + 2 * plane_size, buffer + 3 * plane_size};
+  double *rows = buffer + 4 * plane_size;
+  fsigma3_sums_row cols = {rows, rows + width, rows + 2 * (size_t)width, rows + 3 * (size_t)width};
+  fsigma3_sums_row windows = {rows + 4 * (size_t)width, rows + 5 * (size_t)width,
+                              rows + 6 * (size_t)width, rows + 7 * (size_t)width};
+
+  /* Planes currently summed: plane0 .. plane1 */
+  int plane0 = za - zsize_half > 0 ? za - zsize_half : 0;
+  int plane1 = plane0 - 1;
+  memset(buffer, 0, 4 * plane_size * sizeof(double));
+
+  for (int z = za; z < zb; z++)
+  {
+    int z0 = z - zsize_half > 0 ? z - zsize_half : 0;
+    int z1 = z + zsize_half < depth - 1 ? z + zsize_half : depth - 1;
+    while (plane1 < z1 || plane0 < z0)
+    {
+      const char *entering = plane1 < z1 ? input_data + ++plane1 * input_strides[0] : NULL;
+      const char *leaving = plane0 < z0 ? input_data + plane0++ * input_strides[0] : NULL;
+      for (int y = 0; y < height; y++)
+      {
+        fsigma3_sums_row row = sums_row(&planes, y, width);
+        values_update_row(&row, entering != NULL ? entering + y * input_strides[1] : NULL,
+                          leaving != NULL ? leaving + y * input_strides[1] : NULL,
+                          input_strides[2], width, shift);
+      }
+    }
+
+    /* Rows currently summed into the columns: row0 .. row1 */
+    int row0 = 0, row1 = -1;
+    memset(rows, 0, 4 * (size_t)width * sizeof(double));
+    for (int y = 0; y < height; y++)
+    {
+      int y0 = y - ysize_half > 0 ? y - ysize_half : 0;
+      int y1 = y + ysize_half < height - 1 ? y + ysize_half : height - 1;
+      while (row1 < y1 || row0 < y0)
+      {
+        int enter = row1 < y1, leave = row0 < y0;
+        fsigma3_sums_row entering = sums_row(&planes, enter ? ++row1 : row1, width);
+        fsigma3_sums_row leaving = sums_row(&planes, leave ? row0++ : row0, width);
+        sums_update_row(&cols, enter ? &entering : NULL, leave ? &leaving : NULL, width);
+      }
+      window_sums_row(&cols, &windows, width, xsize_half);
+      running_row(&windows, input_data, input_strides,
+                  output_data + z * output_strides[0] + y * output_strides[1], output_strides[2],
+                  depth, height, width, y, z, xsize_half, ysize_half, zsize_half, exclude_center,
+                  shift, scale);
+    }
+  }
+}
+
+/* fsigma3 from running sums along all three axes: the cost per voxel does
+   not depend on the window size. The values are summed relative to their
+   mean, which keeps the variance from being the small difference of two
+   large sums for data far from zero; windows far from that mean relative
+   to their spread are recomputed. */
+static PyObject *fsigma3_running(PyObject *self, PyObject *args)
+{
+  PyArrayObject *input_array, *output_array;
+  int xsize, ysize, zsize, exclude_center;
+  int depth, height, width;
+
+  /* Parse arguments: input_array, output_array, xsize, ysize, zsize, exclude_center */
+  if (!PyArg_ParseTuple(args, "O!O!iiii",
+                        &PyArray_Type, &input_array,
+                        &PyArray_Type, &output_array,
+                        &xsize, &ysize, &zsize, &exclude_center))
+  {
+    return NULL;
+  }
+
+  int xsize_half = xsize / 2;
+  int ysize_half = ysize / 2;
+  int zsize_half = zsize / 2;
+
+  if (check_inputs(input_array, output_array, &depth, &height, &width) != 0)
+  {
+    return NULL;
+  }
+
+  const char *input_data = (const char *)PyArray_DATA(input_array);
+  char *output_data = (char *)PyArray_DATA(output_array);
+  npy_intp *input_strides = PyArray_STRIDES(input_array);
+  npy_intp *output_strides = PyArray_STRIDES(output_array);
+
+  /* One plane of sums over the z window and two rows of sums as well
+     (see fsigma3_running_slab) */
+  double *sums = (double *)malloc((4 * ((size_t)height + 2) * width + 1) * sizeof(double));
+  if (sums == NULL)
+  {
+    PyErr_SetString(PyExc_MemoryError, "Failed to allocate memory for running sums");
+    return NULL;
+  }
+
+  /* Slabs of planes; a slab re-reads the window planes before its first
+     plane, so it is made long enough for that to stay a small part of its
+     work */
+  int slab = 4 * (2 * zsize_half + 1) > FSIGMA3_RUNNING_SLAB ? 4 * (2 * zsize_half + 1)
+                                                             : FSIGMA3_RUNNING_SLAB;
+
+  Py_BEGIN_ALLOW_THREADS
+  /* The shift: the mean of the finite values */
+  double total = 0.0, count = 0.0;
+  for (int z = 0; z < depth; z++)
+  {
+    for (int y = 0; y < height; y++)
+    {
+      const char *row_data = input_data + z * input_strides[0] + y * input_strides[1];
+      for (int x = 0; x < width; x++)
+      {
+        double v = *(const double *)(row_data + x * input_strides[2]);
+        if (isfinite(v))
         {
-          for (int dy = -ysize_half; dy <= ysize_half; dy++)
-          {
-            for (int dx = -xsize_half; dx <= xsize_half; dx++)
-            {
-              int nz = z + dz;
-              int ny = y + dy;
-              int nx = x + dx;
-
-              /* Check bounds */
-              if (nz >= 0 && nz < depth && ny >= 0 && ny < height && nx >= 0 && nx < width)
-              {
-                /* Skip center when exclude_center != 0 */
-                if (dz == 0 && dy == 0 && dx == 0 && exclude_center != 0)
-                {
-                  continue;
-                }
-
-                double neighbor_value = *(double *)(((char *)input_data) + nz * input_strides[0] + ny * input_strides[1] + nx * input_strides[2]);
-                /* Skip NaN values so they are not considered in the sigma */
-                if (isnan(neighbor_value))
-                {
-                  continue;
-                }
-                neighbors[count++] = neighbor_value;
-              }
-            }
-          }
+          total += v;
+          count += 1.0;
         }
+      }
+    }
+  }
+  double shift = count > 0.0 ? total / count : 0.0;
 
-        /* Compute sigma of neighborhood values. If count==0, return 0.0 */
-        double sigma_value = compute_sigma(neighbors, count);
-        *(double *)(((char *)output_data) + z * output_strides[0] + y * output_strides[1] + x * output_strides[2]) = sigma_value;
+  /* The scale for FSIGMA3_RUNNING_RECHECK: the mean square relative to it */
+  double squares = 0.0;
+  for (int z = 0; z < depth; z++)
+  {
+    for (int y = 0; y < height; y++)
+    {
+      const char *row_data = input_data + z * input_strides[0] + y * input_strides[1];
+      for (int x = 0; x < width; x++)
+      {
+        double v = *(const double *)(row_data + x * input_strides[2]);
+        if (isfinite(v))
+        {
+          squares += (v - shift) * (v - shift);
+        }
       }
     }
   }
+  double scale = count > 0.0 ? squares / count : 0.0;
 
-  free(neighbors);
+  for (int za = 0; za < depth; za += slab)
+  {
+    int zb = za + slab < depth ? za + slab : depth;
+    fsigma3_running_slab(input_data, input_strides, output_data, output_strides,
+                         depth, height, width, za, zb, xsize_half, ysize_half, zsize_half,
+                         exclude_center, shift, scale, sums);
+  }
+  Py_END_ALLOW_THREADS
 
+  free(sums);
   Py_RETURN_NONE;
 }
 
@@ -180,7 +1036,8 @@ static PyMethodDef Fsigma3Methods[] = {
      "    input_array : numpy.ndarray (float64, 3D)\n"
      "        Input array\n"
      "    output_array : numpy.ndarray (float64, 3D)\n"
-     "        Output array (same size as input)\n"
+     "        Output array (same size as input). Every element is written,\n"
+     "        so allocate it with numpy.empty rather than numpy.zeros\n"
      "    xsize : int\n"
      "        Full width of window in x direction\n"
      "    ysize : int\n"
@@ -194,6 +1051,11 @@ static PyMethodDef Fsigma3Methods[] = {
      "    NaN values in the neighborhood (including the center if included)\n"
      "    are ignored when computing sigma. If no valid neighbors remain,\n"
      "    the result is 0.0.\n"},
+    {"fsigma3_running", fsigma3_running, METH_VARARGS,
+     "Compute local population sigma of a 3D array from running sums.\n\n"
+     "Takes the arguments of fsigma3. The cost per voxel does not depend on\n"
+     "the window size, and the result agrees with fsigma3 to within rounding\n"
+     "(relative to the spread of the data, not to its mean).\n"},
     {NULL, NULL, 0, NULL}};
 
 /* Module definition */
@@ -208,5 +1070,9 @@ static struct PyModuleDef fsigma3_module = {
 PyMODINIT_FUNC PyInit_fsigma3_ext(void)
 {
   import_array();
+#ifdef FSIGMA3_HAVE_AVX2
+  __builtin_cpu_init();
+  fsigma3_use_avx2 = __builtin_cpu_supports("avx2");
+#endif
   return PyModule_Create(&fsigma3_module);
 }
\ No newline at end of file
@@ -1,7 +1,18 @@
 #!/usr/bin/env python3
 """
 Generate C sorting network functions from network specifications.
+
+With --avx2, --avx512 or --neon, instead emit 4-lane AVX2, 8-lane AVX-512
+or 2-lane NEON versions of networks already in sorting_networks_generated.c
+(see generate_vector_sort_function), and with --median scalar versions
+pruned to the median. With --check, verify the networks exhaustively by
+the 0-1 principle.
 """
+import functools
+import os
+import re
+import sys
+
 
 def parse_network_stage(stage_str):
     """Parse a stage like '[(0,1),(2,3),(4,5)]' into list of tuples."""
@@ -23,15 +34,27 @@ def parse_network_stage(stage_str):
     
     return pairs
 
-def generate_sort_function(n, stages, function_name=None):
-    """Generate C code for a sorting network."""
+def generate_sort_function(n, stages, function_name=None, description=None):
+    """Generate C code for a sorting network.
+
+    Comparators are emitted as SWAPs on d[] in stage order. Loading d[] into
+    local variables first (so the compiler needs no alias analysis) was
+    measured for sort25b/sort27b and was no faster: the network is bound by
+    its chain of minsd/maxsd latencies, not by loads and stores. Neither
+    were __restrict__ (d is the only pointer, and constant indices never
+    alias) nor __attribute__((always_inline, hot)), measured on fmedian and
+    fmedian3. description replaces "Sorting network for n elements" in the
+    comment, as for generate_vector_sort_function.
+    """
     if function_name is None:
         function_name = f"sort{n}"
+    if description is None:
+        description = f"Sorting network for {n} elements"
     
     total_comparators = sum(len(stage) for stage in stages)
     
     lines = []
-    lines.append(f"/* Sorting network for {n} elements - {total_comparators} comparators */")
+    lines.append(f"/* {description} - {total_comparators} comparators */")
     lines.append(f"static inline void {function_name}(double *d)")
     lines.append("{")
     
@@ -52,6 +75,231 @@ def generate_sort_function(n, stages, function_name=None):
     
     return "\n".join(lines)
 
+def extract_network_stages(c_source, function_name):
+    """Read the comparator stages of a scalar network back from generated C source."""
+    match = re.search(r"static inline void " + function_name + r"\(double \*d\)\n\{\n(.*?)\n\}", c_source, re.DOTALL)
+    if match is None:
+        raise ValueError(f"{function_name} not found")
+    stages = []
+    for stage in re.split(r"/\* Stage \d+ \*/", match.group(1)):
+        pairs = [(int(a), int(b)) for a, b in re.findall(r"SWAP\(d\[(\d+)\], d\[(\d+)\]\)", stage)]
+        if pairs:
+            stages.append(pairs)
+    return stages
+
+def prune_network(stages, outputs):
+    """Keep only the comparators that can affect the wires in outputs.
+
+    Walking the network backwards, a comparator is needed if either of its
+    wires is still needed, and then both of its inputs are. The pruned
+    network leaves exactly the same values on the output wires as the full
+    one (for any input), so a sorting network pruned to its middle wire is
+    a median network; other wires are left partially sorted.
+    """
+    needed = set(outputs)
+    pruned = []
+    for stage in reversed(stages):
+        kept = []
+        for a, b in reversed(stage):
+            if a in needed or b in needed:
+                kept.append((a, b))
+                needed.update((a, b))
+        if kept:
+            pruned.append(kept[::-1])
+    return pruned[::-1]
+
+# Vector instruction sets the scalar networks are translated to: the C vector
+# type of doubles, the lane-wise minimum and maximum, the name of the
+# compare-exchange macro and of the suffix of the generated functions, and
+# any attribute the functions need to be compiled for that instruction set
+vector_isas = {
+    "avx2": {
+        "title": "AVX2", "header": "immintrin.h", "type": "__m256d", "lanes": 4,
+        "min": "_mm256_min_pd", "max": "_mm256_max_pd", "macro": "VSWAP_PD",
+        "suffix": "pd4", "attribute": '__attribute__((target("avx2"))) ',
+    },
+    "avx512": {
+        "title": "AVX-512", "header": "immintrin.h", "type": "__m512d", "lanes": 8,
+        "min": "_mm512_min_pd", "max": "_mm512_max_pd", "macro": "VSWAP_PD8",
+        "suffix": "pd8", "attribute": '__attribute__((target("avx512f"))) ',
+    },
+    "neon": {
+        "title": "NEON", "header": "arm_neon.h", "type": "float64x2_t", "lanes": 2,
+        "min": "vminq_f64", "max": "vmaxq_f64", "macro": "VSWAP_F64X2",
+        "suffix": "f64x2", "attribute": "",
+    },
+}
+
+def generate_vector_swap_macro(isa):
+    """Generate the lane-wise compare-exchange macro for a vector_isas entry."""
+    body = [
+        f"#define {isa['macro']}(x, y)",
+        "  do",
+        "  {",
+        f"    {isa['type']} vtmp = {isa['min']}(x, y);",
+        f"    (y) = {isa['max']}(x, y);",
+        "    (x) = vtmp;",
+    ]
+    width = max(len(line) for line in body) + 1
+    lines = ["/* Lane-wise compare-exchange: minimum in x, maximum in y */"]
+    lines += [line.ljust(width) + "\\" for line in body]
+    lines.append("  } while (0)")
+    return "\n".join(lines)
+
+def generate_vector_sort_function(n, stages, function_name, isa=vector_isas["avx2"],
+                                  description=None):
+    """Generate C code sorting n vectors of doubles lane-wise.
+
+    Each comparator becomes a branchless lane-wise minimum/maximum pair, so
+    one call sorts as many independent n-element windows as a vector has
+    lanes (four for AVX2, eight for AVX-512, two for NEON). description
+    replaces "Sorting network for n elements" in the comment, e.g. for
+    pruned networks.
+    """
+    total_comparators = sum(len(stage) for stage in stages)
+    if description is None:
+        description = f"Sorting network for {n} elements"
+
+    lines = []
+    lines.append(f"/* {description}, {isa['lanes']} lanes - {total_comparators} comparators */")
+    lines.append(f"{isa['attribute']}static inline void {function_name}({isa['type']} *d)")
+    lines.append("{")
+
+    for stage_num, stage in enumerate(stages, 1):
+        lines.append(f"  /* Stage {stage_num} */")
+        for a, b in stage:
+            lines.append(f"  {isa['macro']}(d[{a}], d[{b}]);")
+        if stage_num < len(stages):
+            lines.append("")
+
+    lines.append("}")
+    lines.append("")
+
+    return "\n".join(lines)
+
+@functools.cache
+def batcher_network(n):
+    """Batcher's odd-even merge sort network for n elements, as a tuple of stages.
+
+    Knuth's Algorithm 5.2.2M, which handles any n directly rather than
+    padding to a power of two: every comparator (i, j) has i < j < n, and
+    none is repeated. Larger than the best known networks (e.g. 155
+    comparators for n=27 against 147 for sort27b), but available for any n.
+    Networks are cached per n, so they are returned as (immutable) tuples.
+    """
+    stages = []
+    t = max(1, (n - 1).bit_length())
+    p = 1 << (t - 1)
+    while p > 0:
+        q, r, d = 1 << (t - 1), 0, p
+        while d > 0:
+            stage = tuple((i, i + d) for i in range(n - d) if i & p == r)
+            if stage:
+                stages.append(stage)
+            d, q, r = q - p, q // 2, p
+        p //= 2
+    return tuple(stages)
+
+def check_network(n, stages):
+    """Return True if the network sorts all 2**n inputs of zeros and ones.
+
+    By the 0-1 principle this proves that it sorts any input. The inputs are
+    bit-packed 64 to a word, one array of words per wire, so a comparator
+    is an AND (minimum) and an OR (maximum) of two arrays. Inputs are
+    handled 2**20 at a time; n=27 takes a few seconds.
+    """
+    import numpy as np
+
+    ones = np.uint64(0xFFFFFFFFFFFFFFFF)
+    low = min(n, 20)
+    words = max(1, (1 << low) // 64)
+    # Within a word, input k sets wire i (i < 6) if bit i of k is set
+    in_word = [np.uint64(sum(1 << k for k in range(64) if (k >> i) & 1)) for i in range(6)]
+    k = np.arange(words, dtype=np.uint64)
+    low_wires = []
+    for i in range(low):
+        if i < 6:
+            low_wires.append(np.full(words, in_word[i], dtype=np.uint64))
+        else:
+            low_wires.append(np.where((k >> np.uint64(i - 6)) & np.uint64(1), ones, np.uint64(0)))
+    if n < 6:
+        # Fewer than 64 inputs: ignore the bits of nonexistent inputs
+        valid = np.uint64((1 << (1 << n)) - 1)
+        low_wires = [w & valid for w in low_wires]
+    else:
+        valid = ones
+
+    for high in range(1 << (n - low)):
+        wires = [w.copy() for w in low_wires]
+        for i in range(low, n):
+            wires.append(np.full(words, valid if (high >> (i - low)) & 1 else 0, dtype=np.uint64))
+        for stage in stages:
+            for a, b in stage:
+                wires[a], wires[b] = wires[a] & wires[b], wires[a] | wires[b]
+        # Sorted means no 1 on a wire above a 0 on the next
+        for i in range(n - 1):
+            if np.any(wires[i] & ~wires[i + 1]):
+                return False
+    return True
+
+# Scalar networks in sorting_networks_generated.c that get vector versions,
+# pruned to the wires holding the median (the middle two for even n): the
+# median filters need nothing else, and pruning drops a quarter of the
+# comparators
+vector_networks = {
+    24: ("sort24", (11, 12)),
+    25: ("sort25b", (12,)),
+    26: ("sort26", (12, 13)),
+    27: ("sort27b", (13,)),
+}
+
+# Scalar median networks: the vector_networks plus the 3x3 window with and
+# without its center
+median_networks = {
+    8: ("sort8", (3, 4)),
+    9: ("sort9", (4,)),
+    **vector_networks,
+}
+
+def main_median():
+    """Print scalar versions of the median_networks, for sorting.c."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, "sorting_networks_generated.c")) as f:
+        c_source = f.read()
+
+    print("/* Median networks generated file */")
+    print("/* Generated by generate_sorting_networks.py --median - do not edit manually */")
+    print("/* Uses SWAP from sorting_networks_generated.c */")
+    print()
+
+    for n, (network, outputs) in sorted(median_networks.items()):
+        stages = prune_network(extract_network_stages(c_source, network), outputs)
+        wires = " and ".join(f"d[{i}]" for i in outputs)
+        description = f"Median network for {n} elements ({network} pruned to {wires})"
+        name = network.replace("sort", "median", 1)
+        print(generate_sort_function(n, stages, name, description))
+
+def main_vector(name):
+    """Print the vector_isas[name] versions of the vector_networks."""
+    isa = vector_isas[name]
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, "sorting_networks_generated.c")) as f:
+        c_source = f.read()
+
+    print(f"/* {isa['title']} sorting networks generated file */")
+    print(f"/* Generated by generate_sorting_networks.py --{name} - do not edit manually */")
+    print(f"/* Include only where {isa['header']} is available */")
+    print()
+    print(generate_vector_swap_macro(isa))
+    print()
+
+    for n, (network, outputs) in sorted(vector_networks.items()):
+        stages = prune_network(extract_network_stages(c_source, network), outputs)
+        wires = " and ".join(f"d[{i}]" for i in outputs)
+        description = f"Median network for {n} elements ({network} pruned to {wires})"
+        name = network.replace("sort", "median", 1)
+        print(generate_vector_sort_function(n, stages, f"{name}_{isa['suffix']}", isa, description))
+
 # Network specifications from your request
 networks = {
     # sort25b - alternative 25-element network
@@ -364,5 +612,42 @@ def main():
         code = generate_sort_function(n, stages, function_name)
         print(code)
 
+def main_check():
+    """Verify every pure network in sorting_networks_generated.c and in the table above."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, "sorting_networks_generated.c")) as f:
+        c_source = f.read()
+
+    to_check = []
+    for name in re.findall(r"static inline void (sort(\d+)[a-z]*)\(double \*d\)", c_source):
+        # Hybrid sorts (calls to smaller networks, insertion sort) are not networks
+        body = c_source.split(f"void {name[0]}(double *d)", 1)[1].split("\n}", 1)[0]
+        if "&d[" in body or "for (" in body:
+            continue
+        to_check.append((name[0], int(name[1]), extract_network_stages(c_source, name[0])))
+    for n, info in sorted(networks.items()):
+        stages = [parse_network_stage(s) for s in info['stages']]
+        to_check.append((f"table sort{n}{info.get('suffix', '')}", n, stages))
+    for n in (25, 27):
+        to_check.append((f"batcher {n}", n, batcher_network(n)))
+
+    failed = 0
+    for name, n, stages in to_check:
+        ok = check_network(n, stages)
+        failed += not ok
+        print(f"{name:16s} n={n:2d} {sum(len(st) for st in stages):4d} comparators: {'ok' if ok else 'FAILS'}")
+    return 1 if failed else 0
+
 if __name__ == '__main__':
-    main()
+    if "--avx2" in sys.argv[1:]:
+        main_vector("avx2")
+    elif "--avx512" in sys.argv[1:]:
+        main_vector("avx512")
+    elif "--neon" in sys.argv[1:]:
+        main_vector("neon")
+    elif "--median" in sys.argv[1:]:
+        main_median()
+    elif "--check" in sys.argv[1:]:
+        sys.exit(main_check())
+    else:
+        main()
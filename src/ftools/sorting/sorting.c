@@ -8,6 +8,7 @@
 
 /* Include all sorting network implementations */
 #include "sorting_networks_generated.c"
+#include "sorting_networks_median.c"
 
 /* Insertion sort for small arrays (much faster than qsort for n < ~40) */
 static void insertion_sort(double *values, int count)
@@ -931,3 +932,161 @@ static void sort_doubles(double *values, int count)
     qsort(values, count, sizeof(double), compare_double);
   }
 }
+
+/*
+ * Find the k-th smallest of values[0..n-1] (introselect).
+ *
+ * Rearranges values so that values[k] holds the k-th smallest, everything
+ * before it is <= and everything after it >= values[k]. Each round takes
+ * the median of the first, middle and last values as the pivot,
+ * partitions in place and continues only in the side holding k, so the
+ * expected cost is linear in n. Should the pivots keep splitting badly,
+ * the rest of the range is sorted instead, bounding the worst case.
+ *
+ * The partition is Lomuto's without branches: every value is swapped to
+ * the end of the "less" part and the part grows by the comparison result,
+ * so random data costs no mispredicted branches. When the pivot equals
+ * the previous one (the value just left of the range, which the range is
+ * not less than), values equal to it go left instead, which sweeps runs
+ * of equal values out in one round.
+ *
+ * Assumes: Input array contains only finite, non-NaN values.
+ */
+static double select_kth(double *values, int n, int k)
+{
+  int left = 0;
+  int right = n - 1;
+  int rounds = 0;
+  int max_rounds = 8;
+  for (int m = n; m > 1; m >>= 1)
+  {
+    max_rounds += 2;
+  }
+
+  while (right - left > 1)
+  {
+    if (++rounds > max_rounds)
+    {
+      sort_doubles_fast(values + left, right - left + 1);
+      return values[k];
+    }
+
+    /* Order values[left], values[left + 1] and values[right] around the
+       median of three, which ends up in values[left + 1] as the pivot */
+    int mid = left + (right - left) / 2;
+    double tmp = values[mid];
+    values[mid] = values[left + 1];
+    values[left + 1] = tmp;
+    SWAP(values[left], values[right]);
+    SWAP(values[left + 1], values[right]);
+    SWAP(values[left], values[left + 1]);
+
+    double pivot = values[left + 1];
+    int store = left + 2;
+    if (left > 0 && values[left - 1] == pivot)
+    {
+      /* Everything in the range is >= pivot, so values[left .. store - 1]
+         all equal it */
+      for (int i = left + 2; i < right; i++)
+      {
+        double v = values[i];
+        values[i] = values[store];
+        values[store] = v;
+        store += v <= pivot;
+      }
+      if (k < store)
+      {
+        return pivot;
+      }
+      left = store;
+      continue;
+    }
+
+    for (int i = left + 2; i < right; i++)
+    {
+      double v = values[i];
+      values[i] = values[store];
+      values[store] = v;
+      store += v < pivot;
+    }
+    int j = store - 1;
+    values[left + 1] = values[j];
+    values[j] = pivot;
+
+    if (k == j)
+    {
+      return pivot;
+    }
+    if (k < j)
+    {
+      right = j - 1;
+    }
+    else
+    {
+      left = j + 1;
+    }
+  }
+
+  if (right - left == 1)
+  {
+    SWAP(values[left], values[right]);
+  }
+  return values[k];
+}
+
+/* Windows of up to this many values are sorted with the networks above,
+   which beats select_kth at these sizes (e.g. 0.13 vs 0.23 us for 33
+   values, but 0.31 vs 0.22 us for 45 and 0.86 vs 0.29 us for 81) */
+#define SELECT_MIN_COUNT 40
+
+/* Median of values[0..count-1] (count > 0), the mean of the middle two for
+   even counts. Reorders values. */
+static double median_doubles(double *values, int count)
+{
+  /* The 3x3, 5x5 and 3x3x3 windows (with and without their center) only
+     need the comparators of their networks that reach the middle */
+  switch (count)
+  {
+  case 8:
+    median8(values);
+    return (values[3] + values[4]) / 2.0;
+  case 9:
+    median9(values);
+    return values[4];
+  case 24:
+    median24(values);
+    return (values[11] + values[12]) / 2.0;
+  case 25:
+    median25b(values);
+    return values[12];
+  case 26:
+    median26(values);
+    return (values[12] + values[13]) / 2.0;
+  case 27:
+    median27b(values);
+    return values[13];
+  }
+
+  if (count <= SELECT_MIN_COUNT)
+  {
+    sort_doubles(values, count);
+    if (count % 2 == 0)
+    {
+      return (values[count / 2 - 1] + values[count / 2]) / 2.0;
+    }
+    return values[count / 2];
+  }
+
+  double upper = select_kth(values, count, count / 2);
+  if (count % 2 != 0)
+  {
+    return upper;
+  }
+  /* The lower middle value is the largest of those before count / 2 */
+  double lower = values[0];
+  for (int i = 1; i < count / 2; i++)
+  {
+    lower = values[i] > lower ? values[i] : lower;
+  }
+  return (lower + upper) / 2.0;
+}
@@ -1849,7 +1849,7 @@ static inline void sort25(double *d)
   }
 }
 
-/* Sorting network for 26 elements - 115 comparators */
+/* Sorting network for 26 elements - 138 comparators */
 static inline void sort26(double *d)
 {
   /* Stage 1 */
@@ -2062,7 +2062,7 @@ static inline void sort27(double *d)
   }
 }
 
-/* Complete sorting network for 27 elements - 114 comparators */
+/* Complete sorting network for 27 elements - 147 comparators */
 static inline void sort27b(double *d)
 {
   /* Stage 1 */
@@ -0,0 +1,296 @@
+/* Median networks generated file */
+/* Generated by generate_sorting_networks.py --median - do not edit manually */
+/* Uses SWAP from sorting_networks_generated.c */
+
+/* Median network for 8 elements (sort8 pruned to d[3] and d[4]) - 17 comparators */
+static inline void median8(double *d)
+{
+  /* Stage 1 */
+  SWAP(d[0], d[2]); SWAP(d[1], d[3]); SWAP(d[4], d[6]); SWAP(d[5], d[7]);
+
+  /* Stage 2 */
+  SWAP(d[0], d[4]); SWAP(d[1], d[5]); SWAP(d[2], d[6]); SWAP(d[3], d[7]);
+
+  /* Stage 3 */
+  SWAP(d[0], d[1]); SWAP(d[2], d[3]); SWAP(d[4], d[5]); SWAP(d[6], d[7]);
+
+  /* Stage 4 */
+  SWAP(d[2], d[4]); SWAP(d[3], d[5]);
+
+  /* Stage 5 */
+  SWAP(d[1], d[4]); SWAP(d[3], d[6]);
+
+  /* Stage 6 */
+  SWAP(d[3], d[4]);
+}
+
+/* Median network for 9 elements (sort9 pruned to d[4]) - 20 comparators */
+static inline void median9(double *d)
+{
+  /* Stage 1 */
+  SWAP(d[0], d[1]); SWAP(d[3], d[4]); SWAP(d[6], d[7]); SWAP(d[1], d[2]);
+  SWAP(d[4], d[5]); SWAP(d[7], d[8]); SWAP(d[0], d[1]); SWAP(d[3], d[4]);
+  SWAP(d[6], d[7]); SWAP(d[0], d[3]); SWAP(d[3], d[6]); SWAP(d[1], d[4]);
+  SWAP(d[4], d[7]); SWAP(d[1], d[4]); SWAP(d[2], d[5]); SWAP(d[5], d[8]);
+  SWAP(d[2], d[5]); SWAP(d[2], d[6]); SWAP(d[4], d[6]); SWAP(d[2], d[4]);
+}
+
+/* Median network for 24 elements (sort24 pruned to d[11] and d[12]) - 94 comparators */
+static inline void median24(double *d)
+{
+  /* Stage 1 */
+  SWAP(d[0], d[20]); SWAP(d[1], d[12]); SWAP(d[2], d[16]); SWAP(d[3], d[23]);
+  SWAP(d[4], d[6]); SWAP(d[5], d[10]); SWAP(d[7], d[21]); SWAP(d[8], d[14]);
+  SWAP(d[9], d[15]); SWAP(d[11], d[22]); SWAP(d[13], d[18]); SWAP(d[17], d[19]);
+
+  /* Stage 2 */
+  SWAP(d[0], d[3]); SWAP(d[1], d[11]); SWAP(d[2], d[7]); SWAP(d[4], d[17]);
+  SWAP(d[5], d[13]); SWAP(d[6], d[19]); SWAP(d[8], d[9]); SWAP(d[10], d[18]);
+  SWAP(d[12], d[22]); SWAP(d[14], d[15]); SWAP(d[16], d[21]); SWAP(d[20], d[23]);
+
+  /* Stage 3 */
+  SWAP(d[0], d[1]); SWAP(d[2], d[4]); SWAP(d[3], d[12]); SWAP(d[5], d[8]);
+  SWAP(d[6], d[9]); SWAP(d[7], d[10]); SWAP(d[11], d[20]); SWAP(d[13], d[16]);
+  SWAP(d[14], d[17]); SWAP(d[15], d[18]); SWAP(d[19], d[21]); SWAP(d[22], d[23]);
+
+  /* Stage 4 */
+  SWAP(d[2], d[5]); SWAP(d[4], d[8]); SWAP(d[6], d[11]); SWAP(d[7], d[14]);
+  SWAP(d[9], d[16]); SWAP(d[12], d[17]); SWAP(d[15], d[19]); SWAP(d[18], d[21]);
+
+  /* Stage 5 */
+  SWAP(d[1], d[8]); SWAP(d[3], d[14]); SWAP(d[4], d[7]); SWAP(d[9], d[20]);
+  SWAP(d[10], d[12]); SWAP(d[11], d[13]); SWAP(d[15], d[22]); SWAP(d[16], d[19]);
+
+  /* Stage 6 */
+  SWAP(d[0], d[7]); SWAP(d[1], d[5]); SWAP(d[3], d[4]); SWAP(d[6], d[11]);
+  SWAP(d[8], d[15]); SWAP(d[9], d[14]); SWAP(d[10], d[13]); SWAP(d[12], d[17]);
+  SWAP(d[16], d[23]); SWAP(d[18], d[22]); SWAP(d[19], d[20]);
+
+  /* Stage 7 */
+  SWAP(d[1], d[6]); SWAP(d[4], d[7]); SWAP(d[5], d[9]); SWAP(d[8], d[10]);
+  SWAP(d[13], d[15]); SWAP(d[14], d[18]); SWAP(d[16], d[19]); SWAP(d[17], d[22]);
+
+  /* Stage 8 */
+  SWAP(d[4], d[5]); SWAP(d[6], d[8]); SWAP(d[7], d[9]); SWAP(d[10], d[11]);
+  SWAP(d[12], d[13]); SWAP(d[14], d[16]); SWAP(d[15], d[17]); SWAP(d[18], d[19]);
+
+  /* Stage 9 */
+  SWAP(d[4], d[10]); SWAP(d[7], d[8]); SWAP(d[9], d[11]); SWAP(d[12], d[14]);
+  SWAP(d[13], d[19]); SWAP(d[15], d[16]);
+
+  /* Stage 10 */
+  SWAP(d[5], d[10]); SWAP(d[8], d[9]); SWAP(d[13], d[18]); SWAP(d[14], d[15]);
+
+  /* Stage 11 */
+  SWAP(d[10], d[12]); SWAP(d[11], d[13]);
+
+  /* Stage 12 */
+  SWAP(d[9], d[12]); SWAP(d[11], d[14]);
+
+  /* Stage 13 */
+  SWAP(d[11], d[12]);
+}
+
+/* Median network for 25 elements (sort25b pruned to d[12]) - 103 comparators */
+static inline void median25b(double *d)
+{
+  /* Stage 1 */
+  SWAP(d[0], d[1]); SWAP(d[2], d[3]); SWAP(d[4], d[5]); SWAP(d[6], d[7]);
+  SWAP(d[8], d[9]); SWAP(d[10], d[11]); SWAP(d[12], d[13]); SWAP(d[14], d[15]);
+  SWAP(d[16], d[17]); SWAP(d[18], d[19]); SWAP(d[20], d[21]); SWAP(d[22], d[23]);
+
+  /* Stage 2 */
+  SWAP(d[0], d[2]); SWAP(d[1], d[3]); SWAP(d[4], d[6]); SWAP(d[5], d[7]);
+  SWAP(d[8], d[10]); SWAP(d[9], d[11]); SWAP(d[12], d[14]); SWAP(d[13], d[15]);
+  SWAP(d[16], d[18]); SWAP(d[17], d[19]); SWAP(d[21], d[22]); SWAP(d[23], d[24]);
+
+  /* Stage 3 */
+  SWAP(d[0], d[4]); SWAP(d[1], d[5]); SWAP(d[2], d[6]); SWAP(d[3], d[7]);
+  SWAP(d[8], d[12]); SWAP(d[9], d[13]); SWAP(d[10], d[14]); SWAP(d[11], d[15]);
+  SWAP(d[18], d[21]); SWAP(d[20], d[23]); SWAP(d[22], d[24]);
+
+  /* Stage 4 */
+  SWAP(d[0], d[8]); SWAP(d[1], d[9]); SWAP(d[2], d[10]); SWAP(d[3], d[11]);
+  SWAP(d[4], d[12]); SWAP(d[5], d[13]); SWAP(d[6], d[14]); SWAP(d[7], d[15]);
+  SWAP(d[16], d[20]); SWAP(d[17], d[22]); SWAP(d[19], d[24]); SWAP(d[21], d[23]);
+
+  /* Stage 5 */
+  SWAP(d[1], d[18]); SWAP(d[3], d[21]); SWAP(d[5], d[23]); SWAP(d[6], d[19]);
+  SWAP(d[11], d[14]); SWAP(d[15], d[24]);
+
+  /* Stage 6 */
+  SWAP(d[1], d[16]); SWAP(d[3], d[17]); SWAP(d[6], d[9]); SWAP(d[7], d[11]);
+  SWAP(d[13], d[19]); SWAP(d[14], d[23]);
+
+  /* Stage 7 */
+  SWAP(d[2], d[16]); SWAP(d[3], d[8]); SWAP(d[7], d[20]); SWAP(d[10], d[13]);
+  SWAP(d[11], d[22]); SWAP(d[15], d[23]);
+
+  /* Stage 8 */
+  SWAP(d[5], d[10]); SWAP(d[7], d[18]); SWAP(d[11], d[21]); SWAP(d[15], d[20]);
+  SWAP(d[19], d[22]);
+
+  /* Stage 9 */
+  SWAP(d[4], d[7]); SWAP(d[5], d[6]); SWAP(d[9], d[18]); SWAP(d[10], d[17]);
+  SWAP(d[11], d[12]); SWAP(d[13], d[21]); SWAP(d[14], d[15]); SWAP(d[19], d[20]);
+
+  /* Stage 10 */
+  SWAP(d[7], d[8]); SWAP(d[9], d[10]); SWAP(d[11], d[16]); SWAP(d[12], d[17]);
+  SWAP(d[13], d[18]); SWAP(d[19], d[21]);
+
+  /* Stage 11 */
+  SWAP(d[5], d[11]); SWAP(d[6], d[16]); SWAP(d[7], d[9]); SWAP(d[8], d[10]);
+  SWAP(d[12], d[13]); SWAP(d[14], d[19]); SWAP(d[15], d[18]);
+
+  /* Stage 12 */
+  SWAP(d[6], d[9]); SWAP(d[8], d[11]); SWAP(d[10], d[16]); SWAP(d[12], d[14]);
+  SWAP(d[15], d[17]);
+
+  /* Stage 13 */
+  SWAP(d[9], d[11]); SWAP(d[10], d[12]); SWAP(d[13], d[14]); SWAP(d[15], d[16]);
+
+  /* Stage 14 */
+  SWAP(d[11], d[12]); SWAP(d[13], d[15]);
+
+  /* Stage 15 */
+  SWAP(d[12], d[13]);
+}
+
+/* Median network for 26 elements (sort26 pruned to d[12] and d[13]) - 110 comparators */
+static inline void median26(double *d)
+{
+  /* Stage 1 */
+  SWAP(d[0], d[1]); SWAP(d[2], d[3]); SWAP(d[4], d[5]); SWAP(d[6], d[7]);
+  SWAP(d[8], d[9]); SWAP(d[10], d[11]); SWAP(d[12], d[13]); SWAP(d[14], d[15]);
+  SWAP(d[16], d[17]); SWAP(d[18], d[19]); SWAP(d[20], d[21]); SWAP(d[22], d[23]);
+  SWAP(d[24], d[25]);
+
+  /* Stage 2 */
+  SWAP(d[0], d[2]); SWAP(d[1], d[3]); SWAP(d[4], d[6]); SWAP(d[5], d[7]);
+  SWAP(d[8], d[10]); SWAP(d[9], d[11]); SWAP(d[14], d[16]); SWAP(d[15], d[17]);
+  SWAP(d[18], d[20]); SWAP(d[19], d[21]); SWAP(d[22], d[24]); SWAP(d[23], d[25]);
+
+  /* Stage 3 */
+  SWAP(d[0], d[4]); SWAP(d[1], d[6]); SWAP(d[2], d[5]); SWAP(d[3], d[7]);
+  SWAP(d[8], d[14]); SWAP(d[9], d[16]); SWAP(d[10], d[15]); SWAP(d[11], d[17]);
+  SWAP(d[18], d[22]); SWAP(d[19], d[24]); SWAP(d[20], d[23]); SWAP(d[21], d[25]);
+
+  /* Stage 4 */
+  SWAP(d[0], d[18]); SWAP(d[1], d[19]); SWAP(d[2], d[20]); SWAP(d[3], d[21]);
+  SWAP(d[4], d[22]); SWAP(d[5], d[23]); SWAP(d[6], d[24]); SWAP(d[7], d[25]);
+  SWAP(d[9], d[12]); SWAP(d[13], d[16]);
+
+  /* Stage 5 */
+  SWAP(d[3], d[11]); SWAP(d[8], d[9]); SWAP(d[10], d[13]); SWAP(d[12], d[15]);
+  SWAP(d[14], d[22]); SWAP(d[16], d[17]);
+
+  /* Stage 6 */
+  SWAP(d[0], d[8]); SWAP(d[1], d[9]); SWAP(d[2], d[14]); SWAP(d[6], d[12]);
+  SWAP(d[7], d[15]); SWAP(d[10], d[18]); SWAP(d[11], d[23]); SWAP(d[13], d[19]);
+  SWAP(d[16], d[24]); SWAP(d[17], d[25]);
+
+  /* Stage 7 */
+  SWAP(d[1], d[2]); SWAP(d[3], d[18]); SWAP(d[4], d[8]); SWAP(d[7], d[22]);
+  SWAP(d[17], d[21]); SWAP(d[23], d[24]);
+
+  /* Stage 8 */
+  SWAP(d[3], d[14]); SWAP(d[4], d[10]); SWAP(d[5], d[18]); SWAP(d[7], d[20]);
+  SWAP(d[8], d[13]); SWAP(d[11], d[22]); SWAP(d[12], d[17]); SWAP(d[15], d[21]);
+
+  /* Stage 9 */
+  SWAP(d[5], d[6]); SWAP(d[7], d[9]); SWAP(d[8], d[10]); SWAP(d[15], d[17]);
+  SWAP(d[16], d[18]); SWAP(d[19], d[20]);
+
+  /* Stage 10 */
+  SWAP(d[2], d[5]); SWAP(d[3], d[10]); SWAP(d[6], d[14]); SWAP(d[9], d[13]);
+  SWAP(d[11], d[19]); SWAP(d[12], d[16]); SWAP(d[15], d[22]); SWAP(d[20], d[23]);
+
+  /* Stage 11 */
+  SWAP(d[5], d[7]); SWAP(d[6], d[9]); SWAP(d[11], d[12]); SWAP(d[13], d[14]);
+  SWAP(d[16], d[19]); SWAP(d[18], d[20]);
+
+  /* Stage 12 */
+  SWAP(d[6], d[11]); SWAP(d[7], d[10]); SWAP(d[9], d[16]); SWAP(d[12], d[13]);
+  SWAP(d[14], d[19]); SWAP(d[15], d[18]);
+
+  /* Stage 13 */
+  SWAP(d[9], d[11]); SWAP(d[10], d[12]); SWAP(d[13], d[15]); SWAP(d[14], d[16]);
+
+  /* Stage 14 */
+  SWAP(d[11], d[12]); SWAP(d[13], d[14]);
+
+  /* Stage 15 */
+  SWAP(d[12], d[13]);
+}
+
+/* Median network for 27 elements (sort27b pruned to d[13]) - 110 comparators */
+static inline void median27b(double *d)
+{
+  /* Stage 1 */
+  SWAP(d[0], d[1]); SWAP(d[2], d[3]); SWAP(d[4], d[5]); SWAP(d[6], d[7]);
+  SWAP(d[8], d[9]); SWAP(d[10], d[11]); SWAP(d[12], d[14]); SWAP(d[15], d[16]);
+  SWAP(d[17], d[18]); SWAP(d[19], d[20]); SWAP(d[21], d[22]); SWAP(d[23], d[24]);
+  SWAP(d[25], d[26]);
+
+  /* Stage 2 */
+  SWAP(d[0], d[2]); SWAP(d[1], d[3]); SWAP(d[4], d[6]); SWAP(d[5], d[7]);
+  SWAP(d[8], d[10]); SWAP(d[9], d[11]); SWAP(d[12], d[13]); SWAP(d[15], d[17]);
+  SWAP(d[16], d[18]); SWAP(d[19], d[21]); SWAP(d[20], d[22]); SWAP(d[23], d[25]);
+  SWAP(d[24], d[26]);
+
+  /* Stage 3 */
+  SWAP(d[0], d[23]); SWAP(d[1], d[24]); SWAP(d[2], d[25]); SWAP(d[3], d[26]);
+  SWAP(d[4], d[8]); SWAP(d[5], d[9]); SWAP(d[6], d[10]); SWAP(d[7], d[11]);
+  SWAP(d[13], d[14]); SWAP(d[15], d[19]); SWAP(d[16], d[20]); SWAP(d[17], d[21]);
+  SWAP(d[18], d[22]);
+
+  /* Stage 4 */
+  SWAP(d[0], d[4]); SWAP(d[1], d[6]); SWAP(d[2], d[19]); SWAP(d[3], d[20]);
+  SWAP(d[5], d[13]); SWAP(d[9], d[21]); SWAP(d[11], d[14]); SWAP(d[12], d[16]);
+  SWAP(d[17], d[23]); SWAP(d[18], d[24]); SWAP(d[22], d[26]);
+
+  /* Stage 5 */
+  SWAP(d[5], d[17]); SWAP(d[6], d[16]); SWAP(d[7], d[22]); SWAP(d[9], d[25]);
+  SWAP(d[10], d[24]); SWAP(d[12], d[15]); SWAP(d[13], d[20]); SWAP(d[14], d[26]);
+
+  /* Stage 6 */
+  SWAP(d[1], d[12]); SWAP(d[4], d[15]); SWAP(d[7], d[23]); SWAP(d[10], d[19]);
+  SWAP(d[11], d[16]); SWAP(d[13], d[18]); SWAP(d[20], d[24]); SWAP(d[22], d[25]);
+
+  /* Stage 7 */
+  SWAP(d[6], d[12]); SWAP(d[8], d[11]); SWAP(d[9], d[15]); SWAP(d[10], d[17]);
+  SWAP(d[14], d[24]); SWAP(d[16], d[21]); SWAP(d[18], d[19]);
+
+  /* Stage 8 */
+  SWAP(d[2], d[8]); SWAP(d[3], d[11]); SWAP(d[12], d[15]); SWAP(d[14], d[20]);
+  SWAP(d[16], d[22]); SWAP(d[21], d[25]);
+
+  /* Stage 9 */
+  SWAP(d[2], d[5]); SWAP(d[3], d[17]); SWAP(d[8], d[13]); SWAP(d[11], d[23]);
+  SWAP(d[21], d[22]);
+
+  /* Stage 10 */
+  SWAP(d[3], d[10]); SWAP(d[5], d[6]); SWAP(d[7], d[13]); SWAP(d[11], d[15]);
+  SWAP(d[14], d[21]); SWAP(d[18], d[23]);
+
+  /* Stage 11 */
+  SWAP(d[6], d[9]); SWAP(d[7], d[8]); SWAP(d[13], d[17]); SWAP(d[14], d[16]);
+  SWAP(d[19], d[23]);
+
+  /* Stage 12 */
+  SWAP(d[8], d[12]); SWAP(d[9], d[10]); SWAP(d[11], d[13]); SWAP(d[14], d[18]);
+  SWAP(d[15], d[17]); SWAP(d[16], d[19]);
+
+  /* Stage 13 */
+  SWAP(d[10], d[12]); SWAP(d[11], d[14]); SWAP(d[13], d[16]); SWAP(d[15], d[18]);
+
+  /* Stage 14 */
+  SWAP(d[12], d[14]); SWAP(d[13], d[15]);
+
+  /* Stage 15 */
+  SWAP(d[12], d[13]); SWAP(d[14], d[15]);
+
+  /* Stage 16 */
+  SWAP(d[13], d[14]);
+}
+
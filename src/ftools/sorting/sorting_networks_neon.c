@@ -0,0 +1,564 @@
+/* NEON sorting networks generated file */
+/* Generated by generate_sorting_networks.py --neon - do not edit manually */
+/* Include only where arm_neon.h is available */
+
+/* Lane-wise compare-exchange: minimum in x, maximum in y */
+#define VSWAP_F64X2(x, y)               \
+  do                                    \
+  {                                     \
+    float64x2_t vtmp = vminq_f64(x, y); \
+    (y) = vmaxq_f64(x, y);              \
+    (x) = vtmp;                         \
+  } while (0)
+
+/* Median network for 24 elements (sort24 pruned to d[11] and d[12]), 2 lanes - 94 comparators */
+static inline void median24_f64x2(float64x2_t *d)
+{
+  /* Stage 1 */
+  VSWAP_F64X2(d[0], d[20]);
+  VSWAP_F64X2(d[1], d[12]);
+  VSWAP_F64X2(d[2], d[16]);
+  VSWAP_F64X2(d[3], d[23]);
+  VSWAP_F64X2(d[4], d[6]);
+  VSWAP_F64X2(d[5], d[10]);
+  VSWAP_F64X2(d[7], d[21]);
+  VSWAP_F64X2(d[8], d[14]);
+  VSWAP_F64X2(d[9], d[15]);
+  VSWAP_F64X2(d[11], d[22]);
+  VSWAP_F64X2(d[13], d[18]);
+  VSWAP_F64X2(d[17], d[19]);
+
+  /* Stage 2 */
+  VSWAP_F64X2(d[0], d[3]);
+  VSWAP_F64X2(d[1], d[11]);
+  VSWAP_F64X2(d[2], d[7]);
+  VSWAP_F64X2(d[4], d[17]);
+  VSWAP_F64X2(d[5], d[13]);
+  VSWAP_F64X2(d[6], d[19]);
+  VSWAP_F64X2(d[8], d[9]);
+  VSWAP_F64X2(d[10], d[18]);
+  VSWAP_F64X2(d[12], d[22]);
+  VSWAP_F64X2(d[14], d[15]);
+  VSWAP_F64X2(d[16], d[21]);
+  VSWAP_F64X2(d[20], d[23]);
+
+  /* Stage 3 */
+  VSWAP_F64X2(d[0], d[1]);
+  VSWAP_F64X2(d[2], d[4]);
+  VSWAP_F64X2(d[3], d[12]);
+  VSWAP_F64X2(d[5], d[8]);
+  VSWAP_F64X2(d[6], d[9]);
+  VSWAP_F64X2(d[7], d[10]);
+  VSWAP_F64X2(d[11], d[20]);
+  VSWAP_F64X2(d[13], d[16]);
+  VSWAP_F64X2(d[14], d[17]);
+  VSWAP_F64X2(d[15], d[18]);
+  VSWAP_F64X2(d[19], d[21]);
+  VSWAP_F64X2(d[22], d[23]);
+
+  /* Stage 4 */
+  VSWAP_F64X2(d[2], d[5]);
+  VSWAP_F64X2(d[4], d[8]);
+  VSWAP_F64X2(d[6], d[11]);
+  VSWAP_F64X2(d[7], d[14]);
+  VSWAP_F64X2(d[9], d[16]);
+  VSWAP_F64X2(d[12], d[17]);
+  VSWAP_F64X2(d[15], d[19]);
+  VSWAP_F64X2(d[18], d[21]);
+
+  /* Stage 5 */
+  VSWAP_F64X2(d[1], d[8]);
+  VSWAP_F64X2(d[3], d[14]);
+  VSWAP_F64X2(d[4], d[7]);
+  VSWAP_F64X2(d[9], d[20]);
+  VSWAP_F64X2(d[10], d[12]);
+  VSWAP_F64X2(d[11], d[13]);
+  VSWAP_F64X2(d[15], d[22]);
+  VSWAP_F64X2(d[16], d[19]);
+
+  /* Stage 6 */
+  VSWAP_F64X2(d[0], d[7]);
+  VSWAP_F64X2(d[1], d[5]);
+  VSWAP_F64X2(d[3], d[4]);
+  VSWAP_F64X2(d[6], d[11]);
+  VSWAP_F64X2(d[8], d[15]);
+  VSWAP_F64X2(d[9], d[14]);
+  VSWAP_F64X2(d[10], d[13]);
+  VSWAP_F64X2(d[12], d[17]);
+  VSWAP_F64X2(d[16], d[23]);
+  VSWAP_F64X2(d[18], d[22]);
+  VSWAP_F64X2(d[19], d[20]);
+
+  /* Stage 7 */
+  VSWAP_F64X2(d[1], d[6]);
+  VSWAP_F64X2(d[4], d[7]);
+  VSWAP_F64X2(d[5], d[9]);
+  VSWAP_F64X2(d[8], d[10]);
+  VSWAP_F64X2(d[13], d[15]);
+  VSWAP_F64X2(d[14], d[18]);
+  VSWAP_F64X2(d[16], d[19]);
+  VSWAP_F64X2(d[17], d[22]);
+
+  /* Stage 8 */
+  VSWAP_F64X2(d[4], d[5]);
+  VSWAP_F64X2(d[6], d[8]);
+  VSWAP_F64X2(d[7], d[9]);
+  VSWAP_F64X2(d[10], d[11]);
+  VSWAP_F64X2(d[12], d[13]);
+  VSWAP_F64X2(d[14], d[16]);
+  VSWAP_F64X2(d[15], d[17]);
+  VSWAP_F64X2(d[18], d[19]);
+
+  /* Stage 9 */
+  VSWAP_F64X2(d[4], d[10]);
+  VSWAP_F64X2(d[7], d[8]);
+  VSWAP_F64X2(d[9], d[11]);
+  VSWAP_F64X2(d[12], d[14]);
+  VSWAP_F64X2(d[13], d[19]);
+  VSWAP_F64X2(d[15], d[16]);
+
+  /* Stage 10 */
+  VSWAP_F64X2(d[5], d[10]);
+  VSWAP_F64X2(d[8], d[9]);
+  VSWAP_F64X2(d[13], d[18]);
+  VSWAP_F64X2(d[14], d[15]);
+
+  /* Stage 11 */
+  VSWAP_F64X2(d[10], d[12]);
+  VSWAP_F64X2(d[11], d[13]);
+
+  /* Stage 12 */
+  VSWAP_F64X2(d[9], d[12]);
+  VSWAP_F64X2(d[11], d[14]);
+
+  /* Stage 13 */
+  VSWAP_F64X2(d[11], d[12]);
+}
+
+/* Median network for 25 elements (sort25b pruned to d[12]), 2 lanes - 103 comparators */
+static inline void median25b_f64x2(float64x2_t *d)
+{
+  /* Stage 1 */
+  VSWAP_F64X2(d[0], d[1]);
+  VSWAP_F64X2(d[2], d[3]);
+  VSWAP_F64X2(d[4], d[5]);
+  VSWAP_F64X2(d[6], d[7]);
+  VSWAP_F64X2(d[8], d[9]);
+  VSWAP_F64X2(d[10], d[11]);
+  VSWAP_F64X2(d[12], d[13]);
+  VSWAP_F64X2(d[14], d[15]);
+  VSWAP_F64X2(d[16], d[17]);
+  VSWAP_F64X2(d[18], d[19]);
+  VSWAP_F64X2(d[20], d[21]);
+  VSWAP_F64X2(d[22], d[23]);
+
+  /* Stage 2 */
+  VSWAP_F64X2(d[0], d[2]);
+  VSWAP_F64X2(d[1], d[3]);
+  VSWAP_F64X2(d[4], d[6]);
+  VSWAP_F64X2(d[5], d[7]);
+  VSWAP_F64X2(d[8], d[10]);
+  VSWAP_F64X2(d[9], d[11]);
+  VSWAP_F64X2(d[12], d[14]);
+  VSWAP_F64X2(d[13], d[15]);
+  VSWAP_F64X2(d[16], d[18]);
+  VSWAP_F64X2(d[17], d[19]);
+  VSWAP_F64X2(d[21], d[22]);
+  VSWAP_F64X2(d[23], d[24]);
+
+  /* Stage 3 */
+  VSWAP_F64X2(d[0], d[4]);
+  VSWAP_F64X2(d[1], d[5]);
+  VSWAP_F64X2(d[2], d[6]);
+  VSWAP_F64X2(d[3], d[7]);
+  VSWAP_F64X2(d[8], d[12]);
+  VSWAP_F64X2(d[9], d[13]);
+  VSWAP_F64X2(d[10], d[14]);
+  VSWAP_F64X2(d[11], d[15]);
+  VSWAP_F64X2(d[18], d[21]);
+  VSWAP_F64X2(d[20], d[23]);
+  VSWAP_F64X2(d[22], d[24]);
+
+  /* Stage 4 */
+  VSWAP_F64X2(d[0], d[8]);
+  VSWAP_F64X2(d[1], d[9]);
+  VSWAP_F64X2(d[2], d[10]);
+  VSWAP_F64X2(d[3], d[11]);
+  VSWAP_F64X2(d[4], d[12]);
+  VSWAP_F64X2(d[5], d[13]);
+  VSWAP_F64X2(d[6], d[14]);
+  VSWAP_F64X2(d[7], d[15]);
+  VSWAP_F64X2(d[16], d[20]);
+  VSWAP_F64X2(d[17], d[22]);
+  VSWAP_F64X2(d[19], d[24]);
+  VSWAP_F64X2(d[21], d[23]);
+
+  /* Stage 5 */
+  VSWAP_F64X2(d[1], d[18]);
+  VSWAP_F64X2(d[3], d[21]);
+  VSWAP_F64X2(d[5], d[23]);
+  VSWAP_F64X2(d[6], d[19]);
+  VSWAP_F64X2(d[11], d[14]);
+  VSWAP_F64X2(d[15], d[24]);
+
+  /* Stage 6 */
+  VSWAP_F64X2(d[1], d[16]);
+  VSWAP_F64X2(d[3], d[17]);
+  VSWAP_F64X2(d[6], d[9]);
+  VSWAP_F64X2(d[7], d[11]);
+  VSWAP_F64X2(d[13], d[19]);
+  VSWAP_F64X2(d[14], d[23]);
+
+  /* Stage 7 */
+  VSWAP_F64X2(d[2], d[16]);
+  VSWAP_F64X2(d[3], d[8]);
+  VSWAP_F64X2(d[7], d[20]);
+  VSWAP_F64X2(d[10], d[13]);
+  VSWAP_F64X2(d[11], d[22]);
+  VSWAP_F64X2(d[15], d[23]);
+
+  /* Stage 8 */
+  VSWAP_F64X2(d[5], d[10]);
+  VSWAP_F64X2(d[7], d[18]);
+  VSWAP_F64X2(d[11], d[21]);
+  VSWAP_F64X2(d[15], d[20]);
+  VSWAP_F64X2(d[19], d[22]);
+
+  /* Stage 9 */
+  VSWAP_F64X2(d[4], d[7]);
+  VSWAP_F64X2(d[5], d[6]);
+  VSWAP_F64X2(d[9], d[18]);
+  VSWAP_F64X2(d[10], d[17]);
+  VSWAP_F64X2(d[11], d[12]);
+  VSWAP_F64X2(d[13], d[21]);
+  VSWAP_F64X2(d[14], d[15]);
+  VSWAP_F64X2(d[19], d[20]);
+
+  /* Stage 10 */
+  VSWAP_F64X2(d[7], d[8]);
+  VSWAP_F64X2(d[9], d[10]);
+  VSWAP_F64X2(d[11], d[16]);
+  VSWAP_F64X2(d[12], d[17]);
+  VSWAP_F64X2(d[13], d[18]);
+  VSWAP_F64X2(d[19], d[21]);
+
+  /* Stage 11 */
+  VSWAP_F64X2(d[5], d[11]);
+  VSWAP_F64X2(d[6], d[16]);
+  VSWAP_F64X2(d[7], d[9]);
+  VSWAP_F64X2(d[8], d[10]);
+  VSWAP_F64X2(d[12], d[13]);
+  VSWAP_F64X2(d[14], d[19]);
+  VSWAP_F64X2(d[15], d[18]);
+
+  /* Stage 12 */
+  VSWAP_F64X2(d[6], d[9]);
+  VSWAP_F64X2(d[8], d[11]);
+  VSWAP_F64X2(d[10], d[16]);
+  VSWAP_F64X2(d[12], d[14]);
+  VSWAP_F64X2(d[15], d[17]);
+
+  /* Stage 13 */
+  VSWAP_F64X2(d[9], d[11]);
+  VSWAP_F64X2(d[10], d[12]);
+  VSWAP_F64X2(d[13], d[14]);
+  VSWAP_F64X2(d[15], d[16]);
+
+  /* Stage 14 */
+  VSWAP_F64X2(d[11], d[12]);
+  VSWAP_F64X2(d[13], d[15]);
+
+  /* Stage 15 */
+  VSWAP_F64X2(d[12], d[13]);
+}
+
+/* Median network for 26 elements (sort26 pruned to d[12] and d[13]), 2 lanes - 110 comparators */
+static inline void median26_f64x2(float64x2_t *d)
+{
+  /* Stage 1 */
+  VSWAP_F64X2(d[0], d[1]);
+  VSWAP_F64X2(d[2], d[3]);
+  VSWAP_F64X2(d[4], d[5]);
+  VSWAP_F64X2(d[6], d[7]);
+  VSWAP_F64X2(d[8], d[9]);
+  VSWAP_F64X2(d[10], d[11]);
+  VSWAP_F64X2(d[12], d[13]);
+  VSWAP_F64X2(d[14], d[15]);
+  VSWAP_F64X2(d[16], d[17]);
+  VSWAP_F64X2(d[18], d[19]);
+  VSWAP_F64X2(d[20], d[21]);
+  VSWAP_F64X2(d[22], d[23]);
+  VSWAP_F64X2(d[24], d[25]);
+
+  /* Stage 2 */
+  VSWAP_F64X2(d[0], d[2]);
+  VSWAP_F64X2(d[1], d[3]);
+  VSWAP_F64X2(d[4], d[6]);
+  VSWAP_F64X2(d[5], d[7]);
+  VSWAP_F64X2(d[8], d[10]);
+  VSWAP_F64X2(d[9], d[11]);
+  VSWAP_F64X2(d[14], d[16]);
+  VSWAP_F64X2(d[15], d[17]);
+  VSWAP_F64X2(d[18], d[20]);
+  VSWAP_F64X2(d[19], d[21]);
+  VSWAP_F64X2(d[22], d[24]);
+  VSWAP_F64X2(d[23], d[25]);
+
+  /* Stage 3 */
+  VSWAP_F64X2(d[0], d[4]);
+  VSWAP_F64X2(d[1], d[6]);
+  VSWAP_F64X2(d[2], d[5]);
+  VSWAP_F64X2(d[3], d[7]);
+  VSWAP_F64X2(d[8], d[14]);
+  VSWAP_F64X2(d[9], d[16]);
+  VSWAP_F64X2(d[10], d[15]);
+  VSWAP_F64X2(d[11], d[17]);
+  VSWAP_F64X2(d[18], d[22]);
+  VSWAP_F64X2(d[19], d[24]);
+  VSWAP_F64X2(d[20], d[23]);
+  VSWAP_F64X2(d[21], d[25]);
+
+  /* Stage 4 */
+  VSWAP_F64X2(d[0], d[18]);
+  VSWAP_F64X2(d[1], d[19]);
+  VSWAP_F64X2(d[2], d[20]);
+  VSWAP_F64X2(d[3], d[21]);
+  VSWAP_F64X2(d[4], d[22]);
+  VSWAP_F64X2(d[5], d[23]);
+  VSWAP_F64X2(d[6], d[24]);
+  VSWAP_F64X2(d[7], d[25]);
+  VSWAP_F64X2(d[9], d[12]);
+  VSWAP_F64X2(d[13], d[16]);
+
+  /* Stage 5 */
+  VSWAP_F64X2(d[3], d[11]);
+  VSWAP_F64X2(d[8], d[9]);
+  VSWAP_F64X2(d[10], d[13]);
+  VSWAP_F64X2(d[12], d[15]);
+  VSWAP_F64X2(d[14], d[22]);
+  VSWAP_F64X2(d[16], d[17]);
+
+  /* Stage 6 */
+  VSWAP_F64X2(d[0], d[8]);
+  VSWAP_F64X2(d[1], d[9]);
+  VSWAP_F64X2(d[2], d[14]);
+  VSWAP_F64X2(d[6], d[12]);
+  VSWAP_F64X2(d[7], d[15]);
+  VSWAP_F64X2(d[10], d[18]);
+  VSWAP_F64X2(d[11], d[23]);
+  VSWAP_F64X2(d[13], d[19]);
+  VSWAP_F64X2(d[16], d[24]);
+  VSWAP_F64X2(d[17], d[25]);
+
+  /* Stage 7 */
+  VSWAP_F64X2(d[1], d[2]);
+  VSWAP_F64X2(d[3], d[18]);
+  VSWAP_F64X2(d[4], d[8]);
+  VSWAP_F64X2(d[7], d[22]);
+  VSWAP_F64X2(d[17], d[21]);
+  VSWAP_F64X2(d[23], d[24]);
+
+  /* Stage 8 */
+  VSWAP_F64X2(d[3], d[14]);
+  VSWAP_F64X2(d[4], d[10]);
+  VSWAP_F64X2(d[5], d[18]);
+  VSWAP_F64X2(d[7], d[20]);
+  VSWAP_F64X2(d[8], d[13]);
+  VSWAP_F64X2(d[11], d[22]);
+  VSWAP_F64X2(d[12], d[17]);
+  VSWAP_F64X2(d[15], d[21]);
+
+  /* Stage 9 */
+  VSWAP_F64X2(d[5], d[6]);
+  VSWAP_F64X2(d[7], d[9]);
+  VSWAP_F64X2(d[8], d[10]);
+  VSWAP_F64X2(d[15], d[17]);
+  VSWAP_F64X2(d[16], d[18]);
+  VSWAP_F64X2(d[19], d[20]);
+
+  /* Stage 10 */
+  VSWAP_F64X2(d[2], d[5]);
+  VSWAP_F64X2(d[3], d[10]);
+  VSWAP_F64X2(d[6], d[14]);
+  VSWAP_F64X2(d[9], d[13]);
+  VSWAP_F64X2(d[11], d[19]);
+  VSWAP_F64X2(d[12], d[16]);
+  VSWAP_F64X2(d[15], d[22]);
+  VSWAP_F64X2(d[20], d[23]);
+
+  /* Stage 11 */
+  VSWAP_F64X2(d[5], d[7]);
+  VSWAP_F64X2(d[6], d[9]);
+  VSWAP_F64X2(d[11], d[12]);
+  VSWAP_F64X2(d[13], d[14]);
+  VSWAP_F64X2(d[16], d[19]);
+  VSWAP_F64X2(d[18], d[20]);
+
+  /* Stage 12 */
+  VSWAP_F64X2(d[6], d[11]);
+  VSWAP_F64X2(d[7], d[10]);
+  VSWAP_F64X2(d[9], d[16]);
+  VSWAP_F64X2(d[12], d[13]);
+  VSWAP_F64X2(d[14], d[19]);
+  VSWAP_F64X2(d[15], d[18]);
+
+  /* Stage 13 */
+  VSWAP_F64X2(d[9], d[11]);
+  VSWAP_F64X2(d[10], d[12]);
+  VSWAP_F64X2(d[13], d[15]);
+  VSWAP_F64X2(d[14], d[16]);
+
+  /* Stage 14 */
+  VSWAP_F64X2(d[11], d[12]);
+  VSWAP_F64X2(d[13], d[14]);
+
+  /* Stage 15 */
+  VSWAP_F64X2(d[12], d[13]);
+}
+
+/* Median network for 27 elements (sort27b pruned to d[13]), 2 lanes - 110 comparators */
+static inline void median27b_f64x2(float64x2_t *d)
+{
+  /* Stage 1 */
+  VSWAP_F64X2(d[0], d[1]);
+  VSWAP_F64X2(d[2], d[3]);
+  VSWAP_F64X2(d[4], d[5]);
+  VSWAP_F64X2(d[6], d[7]);
+  VSWAP_F64X2(d[8], d[9]);
+  VSWAP_F64X2(d[10], d[11]);
+  VSWAP_F64X2(d[12], d[14]);
+  VSWAP_F64X2(d[15], d[16]);
+  VSWAP_F64X2(d[17], d[18]);
+  VSWAP_F64X2(d[19], d[20]);
+  VSWAP_F64X2(d[21], d[22]);
+  VSWAP_F64X2(d[23], d[24]);
+  VSWAP_F64X2(d[25], d[26]);
+
+  /* Stage 2 */
+  VSWAP_F64X2(d[0], d[2]);
+  VSWAP_F64X2(d[1], d[3]);
+  VSWAP_F64X2(d[4], d[6]);
+  VSWAP_F64X2(d[5], d[7]);
+  VSWAP_F64X2(d[8], d[10]);
+  VSWAP_F64X2(d[9], d[11]);
+  VSWAP_F64X2(d[12], d[13]);
+  VSWAP_F64X2(d[15], d[17]);
+  VSWAP_F64X2(d[16], d[18]);
+  VSWAP_F64X2(d[19], d[21]);
+  VSWAP_F64X2(d[20], d[22]);
+  VSWAP_F64X2(d[23], d[25]);
+  VSWAP_F64X2(d[24], d[26]);
+
+  /* Stage 3 */
+  VSWAP_F64X2(d[0], d[23]);
+  VSWAP_F64X2(d[1], d[24]);
+  VSWAP_F64X2(d[2], d[25]);
+  VSWAP_F64X2(d[3], d[26]);
+  VSWAP_F64X2(d[4], d[8]);
+  VSWAP_F64X2(d[5], d[9]);
+  VSWAP_F64X2(d[6], d[10]);
+  VSWAP_F64X2(d[7], d[11]);
+  VSWAP_F64X2(d[13], d[14]);
+  VSWAP_F64X2(d[15], d[19]);
+  VSWAP_F64X2(d[16], d[20]);
+  VSWAP_F64X2(d[17], d[21]);
+  VSWAP_F64X2(d[18], d[22]);
+
+  /* Stage 4 */
+  VSWAP_F64X2(d[0], d[4]);
+  VSWAP_F64X2(d[1], d[6]);
+  VSWAP_F64X2(d[2], d[19]);
+  VSWAP_F64X2(d[3], d[20]);
+  VSWAP_F64X2(d[5], d[13]);
+  VSWAP_F64X2(d[9], d[21]);
+  VSWAP_F64X2(d[11], d[14]);
+  VSWAP_F64X2(d[12], d[16]);
+  VSWAP_F64X2(d[17], d[23]);
+  VSWAP_F64X2(d[18], d[24]);
+  VSWAP_F64X2(d[22], d[26]);
+
+  /* Stage 5 */
+  VSWAP_F64X2(d[5], d[17]);
+  VSWAP_F64X2(d[6], d[16]);
+  VSWAP_F64X2(d[7], d[22]);
+  VSWAP_F64X2(d[9], d[25]);
+  VSWAP_F64X2(d[10], d[24]);
+  VSWAP_F64X2(d[12], d[15]);
+  VSWAP_F64X2(d[13], d[20]);
+  VSWAP_F64X2(d[14], d[26]);
+
+  /* Stage 6 */
+  VSWAP_F64X2(d[1], d[12]);
+  VSWAP_F64X2(d[4], d[15]);
+  VSWAP_F64X2(d[7], d[23]);
+  VSWAP_F64X2(d[10], d[19]);
+  VSWAP_F64X2(d[11], d[16]);
+  VSWAP_F64X2(d[13], d[18]);
+  VSWAP_F64X2(d[20], d[24]);
+  VSWAP_F64X2(d[22], d[25]);
+
+  /* Stage 7 */
+  VSWAP_F64X2(d[6], d[12]);
+  VSWAP_F64X2(d[8], d[11]);
+  VSWAP_F64X2(d[9], d[15]);
+  VSWAP_F64X2(d[10], d[17]);
+  VSWAP_F64X2(d[14], d[24]);
+  VSWAP_F64X2(d[16], d[21]);
+  VSWAP_F64X2(d[18], d[19]);
+
+  /* Stage 8 */
+  VSWAP_F64X2(d[2], d[8]);
+  VSWAP_F64X2(d[3], d[11]);
+  VSWAP_F64X2(d[12], d[15]);
+  VSWAP_F64X2(d[14], d[20]);
+  VSWAP_F64X2(d[16], d[22]);
+  VSWAP_F64X2(d[21], d[25]);
+
+  /* Stage 9 */
+  VSWAP_F64X2(d[2], d[5]);
+  VSWAP_F64X2(d[3], d[17]);
+  VSWAP_F64X2(d[8], d[13]);
+  VSWAP_F64X2(d[11], d[23]);
+  VSWAP_F64X2(d[21], d[22]);
+
+  /* Stage 10 */
+  VSWAP_F64X2(d[3], d[10]);
+  VSWAP_F64X2(d[5], d[6]);
+  VSWAP_F64X2(d[7], d[13]);
+  VSWAP_F64X2(d[11], d[15]);
+  VSWAP_F64X2(d[14], d[21]);
+  VSWAP_F64X2(d[18], d[23]);
+
+  /* Stage 11 */
+  VSWAP_F64X2(d[6], d[9]);
+  VSWAP_F64X2(d[7], d[8]);
+  VSWAP_F64X2(d[13], d[17]);
+  VSWAP_F64X2(d[14], d[16]);
+  VSWAP_F64X2(d[19], d[23]);
+
+  /* Stage 12 */
+  VSWAP_F64X2(d[8], d[12]);
+  VSWAP_F64X2(d[9], d[10]);
+  VSWAP_F64X2(d[11], d[13]);
+  VSWAP_F64X2(d[14], d[18]);
+  VSWAP_F64X2(d[15], d[17]);
+  VSWAP_F64X2(d[16], d[19]);
+
+  /* Stage 13 */
+  VSWAP_F64X2(d[10], d[12]);
+  VSWAP_F64X2(d[11], d[14]);
+  VSWAP_F64X2(d[13], d[16]);
+  VSWAP_F64X2(d[15], d[18]);
+
+  /* Stage 14 */
+  VSWAP_F64X2(d[12], d[14]);
+  VSWAP_F64X2(d[13], d[15]);
+
+  /* Stage 15 */
+  VSWAP_F64X2(d[12], d[13]);
+  VSWAP_F64X2(d[14], d[15]);
+
+  /* Stage 16 */
+  VSWAP_F64X2(d[13], d[14]);
+}
+
@@ -134,6 +134,20 @@ class TestGaussianValidation:
         with pytest.raises(ValueError, match="sigma must be positive"):
             fgaussian_f64(x_f64, 1.0, 0.0, 0.0)
     
+    def test_out_must_match_x(self):
+        """out must be an aligned, writeable array of the output dtype and x's shape"""
+        x = np.linspace(-5, 5, 11, dtype=np.float32)
+        readonly = np.empty(11, dtype=np.float32)
+        readonly.flags.writeable = False
+        with pytest.raises(TypeError, match="float32"):
+            fgaussian_f32(x, 1.0, 0.0, 1.0, np.empty(11))
+        with pytest.raises(ValueError, match="shape"):
+            fgaussian_f32(x, 1.0, 0.0, 1.0, np.empty(10, dtype=np.float32))
+        with pytest.raises(ValueError, match="writeable"):
+            fgaussian_f32(x, 1.0, 0.0, 1.0, readonly)
+        with pytest.raises(TypeError, match="float64"):
+            fgaussian_f64(x, 1.0, 0.0, 1.0, np.empty(11, dtype=np.float32))
+
     def test_negative_sigma_raises(self):
         """Negative sigma should raise ValueError for both versions"""
         x_f32 = np.array([0.0], dtype=np.float32)
@@ -165,6 +179,19 @@ class TestGaussianNumerical:
         expected_f64 = i0 * np.exp(-((x_f64 - mu) ** 2) / (2 * sigma ** 2))
         np.testing.assert_allclose(result_f64, expected_f64, rtol=1e-14, atol=1e-14)
     
+    def test_matches_float64_over_full_range(self):
+        """f32 agrees with a float64 reference for every array length mod 8,
+        down through the values that underflow"""
+        i0, mu, sigma = 2.5, 1.5, 3.0
+        for n in range(1000, 1016):
+            x = np.linspace(-45, 45, n, dtype=np.float32)
+            result = fgaussian_f32(x, i0, mu, sigma)
+            expected = i0 * np.exp(-((x.astype(np.float64) - mu) ** 2) / (2 * sigma ** 2))
+            # Rounding the exponent to float32 alone costs up to ~|exponent|
+            # ulp (about 1e-5 near the underflow)
+            np.testing.assert_allclose(result, expected, rtol=3e-5, atol=1e-37)
+        assert np.isnan(fgaussian_f32(np.full(9, np.nan, dtype=np.float32), 1.0, 0.0, 1.0)).all()
+
     def test_extreme_values(self):
         """Test with extreme x values for both versions"""
         # Test f32
@@ -221,6 +248,46 @@ class TestGaussianTypes:
         assert result.shape == (3,)
         assert result[0] == pytest.approx(1.0, rel=1e-6)
     
+    def test_f32_reads_float64_and_strided_input(self):
+        """fgaussian_f32 takes float64 and non-contiguous input without a copy
+        and returns a C-ordered float32 result"""
+        x = np.linspace(-6, 6, 37 * 53).reshape(37, 53)
+        for arr in (x, x.T, x[::2, ::3], x.astype(np.float32).T, x.astype(">f8")):
+            result = fgaussian_f32(arr, 2.0, 1.0, 1.5)
+            assert result.dtype == np.float32
+            assert result.shape == arr.shape
+            assert result.flags.c_contiguous
+            expected = 2.0 * np.exp(-((arr.astype(np.float64) - 1.0) ** 2) / (2 * 1.5 ** 2))
+            np.testing.assert_allclose(result, expected, rtol=1e-5, atol=1e-37)
+
+    def test_f64_reads_float32_and_strided_input(self):
+        """fgaussian_f64 takes float32 and non-contiguous input without a copy
+        and returns a C-ordered float64 result"""
+        x = np.linspace(-6, 6, 37 * 53).reshape(37, 53)
+        for arr in (x.T, x[::2, ::3], x.astype(np.float32), x.astype(np.float32).T, x.astype(">f4")):
+            result = fgaussian_f64(arr, 2.0, 1.0, 1.5)
+            assert result.dtype == np.float64
+            assert result.shape == arr.shape
+            assert result.flags.c_contiguous
+            expected = 2.0 * np.exp(-((arr.astype(np.float64) - 1.0) ** 2) / (2 * 1.5 ** 2))
+            np.testing.assert_allclose(result, expected, rtol=1e-14, atol=1e-300)
+
+    def test_out_is_filled_and_returned(self):
+        """out= gets the same profile as a new array, also in place and strided"""
+        for func, dtype in ((fgaussian_f32, np.float32), (fgaussian_f64, np.float64)):
+            x = np.linspace(-5, 5, 101, dtype=dtype)
+            expected = func(x, 2.0, 1.0, 1.5)
+            out = np.empty(101, dtype=dtype)
+            assert func(x, 2.0, 1.0, 1.5, out) is out
+            np.testing.assert_array_equal(out, expected)
+            inplace = x.copy()
+            assert func(inplace, 2.0, 1.0, 1.5, inplace) is inplace
+            np.testing.assert_array_equal(inplace, expected)
+            strided = np.zeros(202, dtype=dtype)
+            func(x, 2.0, 1.0, 1.5, strided[::2])
+            np.testing.assert_allclose(strided[::2], expected, rtol=1e-6)
+            assert not strided[1::2].any()
+
     def test_float64_input(self):
         """Test explicit float64 input"""
         x = np.array([0.0, 1.0, 2.0], dtype=np.float64)
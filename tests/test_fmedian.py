@@ -9,6 +9,14 @@ import numpy as np
 import pytest
 
 from ftools import fmedian
+from ftools.fmedian import fmedian as fmedian2d
+from ftools.fmedian import (
+    fmedian_batch,
+    fmedian_ext,
+    fmedian_i16,
+    fmedian_quantized,
+    fmedian_u16,
+)
 
 
 class TestFmedianCore:
@@ -128,6 +136,224 @@ class TestFmedianCore:
         assert out.dtype == np.float64
         assert out.shape == a.shape
 
+    def test_fmedian_strided_view_input(self):
+        """Strided views give the same result as a contiguous copy."""
+        rng = np.random.default_rng(3)
+        big = rng.normal(size=(20, 30))
+        view = big[2:-2:2, 1::3]
+        assert not view.flags.c_contiguous
+        np.testing.assert_array_equal(fmedian(view, (3, 3), 1),
+                                      fmedian(view.copy(), (3, 3), 1))
+        np.testing.assert_array_equal(fmedian(big.T, (3, 5), 0),
+                                      fmedian(big.T.copy(), (3, 5), 0))
+
+    def test_extension_accepts_any_2d_buffer(self):
+        """The C extension reads arrays through the buffer protocol, not just ndarrays."""
+        a = np.random.default_rng(9).normal(size=(6, 7))
+        src = memoryview(bytearray(a.tobytes())).cast("B").cast("d", shape=[6, 7])
+        dst = memoryview(bytearray(a.nbytes)).cast("B").cast("d", shape=[6, 7])
+        fmedian_ext.fmedian(src, dst, 3, 3, 1)
+        np.testing.assert_array_equal(np.asarray(dst), fmedian2d(a, 3, 3, 1))
+
+    def test_fmedian_3x3_matches_nanmedian(self):
+        """The vectorized 3x3 path agrees with np.nanmedian, including NaN blocks and borders."""
+        rng = np.random.default_rng(4)
+        for shape in [(3, 3), (4, 6), (9, 10), (17, 23)]:
+            a = rng.normal(size=shape)
+            a[rng.random(shape) < 0.05] = np.nan
+            windows = np.lib.stride_tricks.sliding_window_view(
+                np.pad(a, 1, constant_values=np.nan), (3, 3)).reshape(shape + (9,))
+            for exclude_center in (0, 1):
+                values = windows.copy()
+                if exclude_center:
+                    values[..., 4] = np.nan
+                expected = np.nanmedian(values, axis=-1)
+                np.testing.assert_array_equal(fmedian2d(a, 3, 3, exclude_center), expected)
+
+    def test_fmedian_5x5_matches_nanmedian(self):
+        """The vectorized 5x5 path agrees with np.nanmedian, including NaN blocks and borders."""
+        rng = np.random.default_rng(9)
+        for shape in [(5, 5), (6, 9), (11, 10), (19, 23)]:
+            a = rng.normal(size=shape)
+            a[rng.random(shape) < 0.02] = np.nan
+            windows = np.lib.stride_tricks.sliding_window_view(
+                np.pad(a, 2, constant_values=np.nan), (5, 5)).reshape(shape + (25,))
+            for exclude_center in (0, 1):
+                values = windows.copy()
+                if exclude_center:
+                    values[..., 12] = np.nan
+                expected = np.nanmedian(values, axis=-1)
+                np.testing.assert_array_equal(fmedian2d(a, 5, 5, exclude_center), expected)
+
+    @pytest.mark.parametrize("size", [11, 13])
+    def test_fmedian_selection_matches_nanmedian(self, size):
+        """Windows too large for the sorting networks (selection path) agree with np.nanmedian."""
+        rng = np.random.default_rng(10)
+        shape = (30, 31)
+        # Few distinct values, so windows are full of ties
+        a = rng.integers(0, 20, size=shape).astype(np.float64)
+        a[rng.random(shape) < 0.05] = np.nan
+        half = size // 2
+        windows = np.lib.stride_tricks.sliding_window_view(
+            np.pad(a, half, constant_values=np.nan), (size, size)).reshape(shape + (size * size,))
+        for exclude_center in (0, 1):
+            values = windows.copy()
+            if exclude_center:
+                values[..., size * size // 2] = np.nan
+            expected = np.nanmedian(values, axis=-1)
+            np.testing.assert_array_equal(fmedian2d(a, size, size, exclude_center), expected)
+
+    @pytest.mark.parametrize("shape", [(12, 40), (40, 3), (7, 7)])
+    def test_fmedian_sliding_window_matches_nanmedian(self, shape):
+        """Windows filtered with the sliding sorted window agree with np.nanmedian at all borders."""
+        rng = np.random.default_rng(11)
+        a = rng.integers(0, 10, size=shape).astype(np.float64)
+        a[rng.random(shape) < 0.1] = np.nan
+        for xsize, ysize in [(9, 5), (7, 7), (15, 3)]:
+            windows = np.lib.stride_tricks.sliding_window_view(
+                np.pad(a, ((ysize // 2,), (xsize // 2,)), constant_values=np.nan), (ysize, xsize))
+            values = windows.reshape(shape + (xsize * ysize,))
+            np.testing.assert_array_equal(fmedian2d(a, xsize, ysize, 0), np.nanmedian(values, axis=-1))
+            values = values.copy()
+            values[..., xsize * ysize // 2] = np.nan
+            expected = np.nanmedian(values, axis=-1)
+            # An excluded center with no other finite value in its window is kept
+            empty = np.isnan(expected) & ~np.isnan(a)
+            expected[empty] = a[empty]
+            np.testing.assert_array_equal(fmedian2d(a, xsize, ysize, 1), expected)
+
+    def test_fmedian_out_buffer_reused(self):
+        """out= is written in place and returned, for both the float and histogram paths."""
+        rng = np.random.default_rng(12)
+        a = rng.normal(size=(9, 11))
+        out = np.empty_like(a)
+        assert fmedian2d(a, 3, 3, 1, out=out) is out
+        np.testing.assert_array_equal(out, fmedian2d(a, 3, 3, 1))
+
+        counts = rng.integers(0, 500, size=(20, 20)).astype(np.uint16)
+        out = np.empty(counts.shape)
+        assert fmedian2d(counts, 7, 7, out=out) is out
+        np.testing.assert_array_equal(out, fmedian2d(counts.astype(np.float64), 7, 7))
+
+    def test_numba_fallback_matches_extension(self):
+        """The Numba fallback gives exactly the results of the C extension."""
+        pytest.importorskip("numba")
+        from ftools.fmedian import _numba_impl, fmedian_ext
+
+        rng = np.random.default_rng(16)
+        a = rng.normal(size=(13, 17))
+        a[rng.random(a.shape) < 0.1] = np.nan
+        counts = rng.integers(0, 1000, size=a.shape).astype(np.uint16)
+        ints = rng.integers(-300, 300, size=a.shape).astype(np.int16)
+        for xsize, ysize in [(1, 1), (3, 3), (5, 3), (9, 9)]:
+            for exclude_center in (0, 1):
+                for name, arr, dtype in [("fmedian", a, np.float64), ("fmedian_u16", counts, np.float64),
+                                         ("fmedian_i16", ints, np.int16)]:
+                    expected = np.empty(a.shape, dtype=dtype)
+                    out = np.empty(a.shape, dtype=dtype)
+                    getattr(fmedian_ext, name)(arr, expected, xsize, ysize, exclude_center)
+                    getattr(_numba_impl, name)(arr, out, xsize, ysize, exclude_center)
+                    np.testing.assert_array_equal(out, expected)
+
+    def test_cuda_device_matches_cpu(self):
+        """device="cuda" gives exactly the CPU result, as numpy or cupy arrays."""
+        cp = pytest.importorskip("cupy")
+        if cp.cuda.runtime.getDeviceCount() == 0:
+            pytest.skip("no CUDA device")
+
+        rng = np.random.default_rng(19)
+        a = rng.normal(size=(37, 45))
+        a[rng.random(a.shape) < 0.1] = np.nan
+        a[:5, :5] = np.nan
+        for xsize, ysize in [(1, 1), (3, 3), (5, 3), (9, 9), (15, 15)]:
+            for exclude_center in (0, 1):
+                expected = fmedian2d(a, xsize, ysize, exclude_center)
+                np.testing.assert_array_equal(fmedian2d(a, xsize, ysize, exclude_center, device="cuda"), expected)
+                result = fmedian2d(cp.asarray(a), xsize, ysize, exclude_center, device="cuda")
+                assert isinstance(result, cp.ndarray)
+                np.testing.assert_array_equal(cp.asnumpy(result), expected)
+
+    def test_fmedian_batch_matches_single_calls(self):
+        """fmedian_batch gives the same result as calling fmedian per array."""
+        rng = np.random.default_rng(7)
+        tiles = [rng.normal(size=shape) for shape in [(8, 8), (5, 11), (1, 1), (16, 3)]]
+        tiles[0][2, 3] = np.nan
+
+        for exclude_center in (0, 1):
+            outs = fmedian_batch(tiles, 3, 5, exclude_center)
+            assert len(outs) == len(tiles)
+            for tile, out in zip(tiles, outs):
+                expected = fmedian(tile, (3, 5), exclude_center)
+                np.testing.assert_array_equal(out, expected)
+
+    def test_fmedian_batch_empty_sequence(self):
+        """An empty batch returns an empty list."""
+        assert fmedian_batch([], 3, 3) == []
+
+    def test_fmedian_num_threads_matches_serial(self):
+        """Multi-threaded filtering gives exactly the single-threaded result."""
+        rng = np.random.default_rng(11)
+        a = rng.normal(size=(120, 90))
+        a[rng.random(a.shape) < 0.05] = np.nan
+        serial = fmedian2d(a, 5, 3, 1, num_threads=1)
+        for num_threads in (2, 3, None):
+            np.testing.assert_array_equal(fmedian2d(a, 5, 3, 1, num_threads=num_threads), serial)
+
+        tiles = [a[:40], a[40:], a[:, :7], a.T]
+        outs = fmedian_batch(tiles, 3, 3, num_threads=3)
+        for tile, out in zip(tiles, outs):
+            np.testing.assert_array_equal(out, fmedian2d(tile, 3, 3, num_threads=1))
+
+    @pytest.mark.parametrize("dtype", [np.uint8, np.uint16])
+    def test_fmedian_u16_matches_float_path(self, dtype):
+        """The histogram kernel gives exactly the sort-based result."""
+        rng = np.random.default_rng(5)
+        for shape in [(1, 1), (1, 9), (7, 1), (23, 31)]:
+            a = rng.integers(0, np.iinfo(dtype).max, size=shape, endpoint=True).astype(dtype)
+            for xsize, ysize in [(1, 1), (3, 3), (5, 1), (1, 7), (9, 5), (15, 15)]:
+                for exclude_center in (0, 1):
+                    expected = fmedian2d(a.astype(np.float64), xsize, ysize, exclude_center)
+                    out = fmedian_u16(a, xsize, ysize, exclude_center)
+                    assert out.dtype == np.float64
+                    np.testing.assert_array_equal(out, expected)
+
+    def test_fmedian_quantized_within_half_a_bin(self):
+        """Quantized medians are within half a bin of the exact ones, and exact for data on the bin centers."""
+        rng = np.random.default_rng(21)
+        a = rng.uniform(5.0, 100.0, size=(40, 33))
+        for xsize, ysize, exclude_center in [(3, 3, 0), (5, 5, 1), (15, 9, 0)]:
+            expected = fmedian2d(a, xsize, ysize, exclude_center)
+            for nbins in (256, 4096):
+                out = fmedian_quantized(a, xsize, ysize, exclude_center, vmin=5.0, vmax=100.0, nbins=nbins)
+                np.testing.assert_allclose(out, expected, rtol=0, atol=95.0 / nbins / 2 * (1 + 1e-9))
+
+        levels = rng.integers(0, 256, size=(25, 30))
+        centers = 10.0 + (levels + 0.5) * 2.0
+        out = np.empty(centers.shape)
+        assert fmedian_quantized(centers, 7, 7, vmin=10.0, vmax=522.0, nbins=256, out=out) is out
+        np.testing.assert_allclose(out, fmedian2d(centers, 7, 7), rtol=1e-12)
+        # The default range is that of the data, widened to a width of 1 for constant data
+        np.testing.assert_allclose(fmedian_quantized(np.full((4, 5), 3.0), 3, 3), 3.0, rtol=0, atol=0.5 / 4096)
+
+    def test_fmedian_i16_matches_floored_float_path(self):
+        """fmedian_i16 gives the float64 median rounded down, as int16."""
+        rng = np.random.default_rng(8)
+        for shape in [(1, 1), (1, 9), (3, 3), (7, 1), (5, 40), (23, 37)]:
+            a = rng.integers(-32768, 32767, size=shape, endpoint=True).astype(np.int16)
+            for xsize, ysize in [(1, 1), (3, 3), (5, 1), (1, 7), (9, 5)]:
+                for exclude_center in (0, 1):
+                    expected = np.floor(fmedian2d(a.astype(np.float64), xsize, ysize, exclude_center))
+                    out = fmedian_i16(a, xsize, ysize, exclude_center)
+                    assert out.dtype == np.int16
+                    np.testing.assert_array_equal(out, expected)
+
+    def test_fmedian_uses_histogram_for_large_uint16_windows(self):
+        """fmedian dispatches uint16 input with large windows without changing results."""
+        rng = np.random.default_rng(6)
+        a = rng.integers(0, 1000, size=(30, 40)).astype(np.uint16)
+        np.testing.assert_array_equal(fmedian(a, (7, 9), 1),
+                                      fmedian(a.astype(np.float64), (7, 9), 1))
+
 
 class TestFmedianEdgeCases:
     """Test fmedian with edge cases, boundaries, and special values."""
@@ -289,6 +515,29 @@ class TestFmedianEdgeCases:
 class TestFmedianValidation:
     """Test parameter validation and error handling for fmedian."""
     
+    def test_fmedian_quantized_rejects_bad_arguments(self):
+        """NaN input, empty or non-finite ranges and bad bin counts are rejected."""
+        a = np.arange(12, dtype=np.float64).reshape(3, 4)
+        with pytest.raises(ValueError, match="NaN"):
+            fmedian_quantized(np.where(a > 5, np.nan, a), 3, 3)
+        with pytest.raises(ValueError, match="vmax > vmin"):
+            fmedian_quantized(a, 3, 3, vmin=4.0, vmax=4.0)
+        with pytest.raises(ValueError, match="vmax > vmin"):
+            fmedian_quantized(np.where(a > 5, np.inf, a), 3, 3)
+        with pytest.raises(ValueError, match="nbins"):
+            fmedian_quantized(a, 3, 3, nbins=65537)
+
+    def test_fmedian_rejects_bad_device(self):
+        """device must be "cpu" or "cuda"; out and windows over 225 pixels are not supported on the GPU."""
+        a = np.ones((3, 3), dtype=np.float64)
+        with pytest.raises(ValueError, match="device must be"):
+            fmedian2d(a, 3, 3, device="gpu")
+        with pytest.raises(ValueError, match="out is not supported"):
+            fmedian2d(a, 3, 3, out=np.empty((3, 3)), device="cuda")
+        with pytest.raises(ValueError, match="up to 225 pixels"):
+            fmedian2d(a, 17, 15, device="cuda")
+        np.testing.assert_array_equal(fmedian2d(a, 3, 3, device="cpu"), fmedian2d(a, 3, 3))
+
     def test_fmedian_negative_xsize(self):
         """Test fmedian rejects negative xsize."""
         a = np.ones((3, 3), dtype=np.float64)
@@ -410,3 +659,50 @@ class TestFmedianValidation:
         
         with pytest.raises(TypeError):
             fmedian(a, 1)  # NOSONAR - intentionally testing invalid input
+
+    def test_fmedian_batch_validation(self):
+        """fmedian_batch validates sizes and every array before filtering."""
+        good = np.ones((3, 3), dtype=np.float64)
+        with pytest.raises(ValueError, match="xsize must be an odd number"):
+            fmedian_batch([good], 2, 3)
+        with pytest.raises(ValueError, match="Arrays must be 2-dimensional"):
+            fmedian_batch([good, np.ones((2, 2, 2))], 3, 3)
+
+    def test_extension_rejects_unusable_buffers(self):
+        """Byte-swapped input and read-only output are rejected by the C extension."""
+        a = np.ones((3, 3))
+        out = np.empty_like(a)
+        with pytest.raises(TypeError, match="input_array must be of type float64"):
+            fmedian_ext.fmedian(a.astype(a.dtype.newbyteorder()), out, 3, 3, 0)
+        out.flags.writeable = False
+        with pytest.raises(ValueError, match="read-only"):
+            fmedian_ext.fmedian(a, out, 3, 3, 0)
+
+    def test_fmedian_rejects_bad_out(self):
+        """out must be a float64 array of the input shape that does not alias it."""
+        a = np.ones((4, 5))
+        with pytest.raises(TypeError, match="float64"):
+            fmedian2d(a, 3, 3, out=np.empty((4, 5), dtype=np.float32))
+        with pytest.raises(ValueError, match="shape"):
+            fmedian2d(a, 3, 3, out=np.empty((5, 4)))
+        with pytest.raises(ValueError, match="overlap"):
+            fmedian2d(a, 3, 3, out=a)
+
+    def test_fmedian_rejects_non_positive_num_threads(self):
+        """num_threads must be a positive integer (or None)."""
+        a = np.ones((3, 3), dtype=np.float64)
+        with pytest.raises(ValueError, match="num_threads must be positive"):
+            fmedian2d(a, 3, 3, num_threads=0)
+
+    def test_fmedian_i16_rejects_other_dtypes(self):
+        """fmedian_i16 only accepts integer input that fits in int16."""
+        for dtype in (np.uint16, np.int32, np.float64, np.bool_):
+            with pytest.raises(TypeError, match="fmedian_i16 requires"):
+                fmedian_i16(np.zeros((4, 4), dtype=dtype), 3, 3)
+
+    def test_fmedian_u16_rejects_other_dtypes(self):
+        """fmedian_u16 only accepts uint8/uint16 input."""
+        with pytest.raises(TypeError, match="uint8 or uint16"):
+            fmedian_u16(np.ones((3, 3), dtype=np.float64), 3, 3)
+        with pytest.raises(TypeError, match="uint8 or uint16"):
+            fmedian_u16(np.ones((3, 3), dtype=np.int16), 3, 3)
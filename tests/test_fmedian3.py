@@ -74,6 +74,135 @@ class TestFmedian3Core:
         assert out.dtype == np.float64
         assert out.shape == a.shape
 
+    def test_strided_view_input(self):
+        """Strided views give the same result as a contiguous copy."""
+        rng = np.random.default_rng(3)
+        big = rng.normal(size=(10, 12, 14))
+        view = big[::2, 1:-1, ::3]
+        assert not view.flags.c_contiguous
+        np.testing.assert_array_equal(fmedian3(view, 3, 3, 3, 1),
+                                      fmedian3(view.copy(), 3, 3, 3, 1))
+
+    def test_matches_partition_reference_in_interior(self):
+        """Voxels with full windows match an np.partition median of each window."""
+        rng = np.random.default_rng(13)
+        a = rng.normal(size=(7, 8, 9))
+        for xsize, ysize, zsize in [(3, 3, 3), (5, 3, 1), (1, 3, 5)]:
+            windows = np.lib.stride_tricks.sliding_window_view(a, (zsize, ysize, xsize))
+            windows = windows.reshape(windows.shape[:3] + (-1,))
+            interior = (slice(zsize // 2, a.shape[0] - zsize // 2),
+                        slice(ysize // 2, a.shape[1] - ysize // 2),
+                        slice(xsize // 2, a.shape[2] - xsize // 2))
+            for exclude_center in (0, 1):
+                values = np.delete(windows, windows.shape[-1] // 2, axis=-1) if exclude_center else windows
+                n = values.shape[-1]
+                lo, hi = (n - 1) // 2, n // 2
+                part = np.partition(values, (lo, hi), axis=-1)
+                expected = (part[..., lo] + part[..., hi]) / 2.0
+                out = fmedian3(a, xsize, ysize, zsize, exclude_center)
+                np.testing.assert_array_equal(out[interior], expected)
+
+    def test_3x3x3_matches_nanmedian(self):
+        """The vectorized 3x3x3 path agrees with np.nanmedian, including NaN blocks and borders."""
+        rng = np.random.default_rng(5)
+        # The last shape crosses the tile boundaries of fmedian3_ext.c along every axis
+        for shape in [(3, 3, 3), (4, 5, 6), (6, 7, 13), (17, 33, 259)]:
+            a = rng.normal(size=shape)
+            a[rng.random(shape) < 0.02] = np.nan
+            windows = np.lib.stride_tricks.sliding_window_view(
+                np.pad(a, 1, constant_values=np.nan), (3, 3, 3)).reshape(shape + (27,))
+            for exclude_center in (0, 1):
+                values = windows.copy()
+                if exclude_center:
+                    values[..., 13] = np.nan
+                expected = np.nanmedian(values, axis=-1)
+                np.testing.assert_array_equal(fmedian3(a, 3, 3, 3, exclude_center), expected)
+
+    def test_large_windows_with_repeated_values_match_nanmedian(self):
+        """Windows of 41+ values (median by selection) match np.nanmedian, also with many equal values."""
+        rng = np.random.default_rng(11)
+        for high in (4, 1000):
+            a = rng.integers(0, high, size=(7, 9, 10)).astype(np.float64)
+            a[rng.random(a.shape) < 0.03] = np.nan
+            a[:3, :4, :5] = 7.0  # a saturated block
+            for sizes in [(5, 3, 3), (5, 5, 3), (5, 5, 5)]:
+                xsize, ysize, zsize = sizes
+                windows = np.lib.stride_tricks.sliding_window_view(
+                    np.pad(a, ((zsize // 2,), (ysize // 2,), (xsize // 2,)), constant_values=np.nan),
+                    (zsize, ysize, xsize)).reshape(a.shape + (-1,))
+                for exclude_center in (0, 1):
+                    values = windows.copy()
+                    if exclude_center:
+                        values[..., values.shape[-1] // 2] = np.nan
+                    np.testing.assert_array_equal(fmedian3(a, *sizes, exclude_center),
+                                                  np.nanmedian(values, axis=-1))
+
+    def test_num_threads_matches_serial(self):
+        """Multi-threaded filtering gives exactly the single-threaded result."""
+        rng = np.random.default_rng(8)
+        a = rng.normal(size=(9, 30, 31))
+        a[rng.random(a.shape) < 0.05] = np.nan
+        for sizes in [(3, 3, 3), (5, 3, 3)]:
+            serial = fmedian3(a, *sizes, 1, num_threads=1)
+            for num_threads in (2, 3, None):
+                np.testing.assert_array_equal(fmedian3(a, *sizes, 1, num_threads=num_threads), serial)
+
+    def test_separable_matches_per_axis_medians(self):
+        """method='separable' is a NaN-skipping median along z, then y, then x."""
+        rng = np.random.default_rng(6)
+        a = rng.normal(size=(7, 8, 9))
+        a[rng.random(a.shape) < 0.02] = np.nan
+        expected = a
+        for axis in (0, 1, 2):
+            pad = [(0, 0)] * 3
+            pad[axis] = (2, 2)
+            windows = np.lib.stride_tricks.sliding_window_view(
+                np.pad(expected, pad, constant_values=np.nan), 5, axis=axis)
+            expected = np.nanmedian(windows, axis=-1)
+        np.testing.assert_array_equal(fmedian3(a, 5, 5, 5, method="separable"), expected)
+
+    @pytest.mark.parametrize("exclude_center", [0, 1])
+    def test_long_single_axis_windows_match_nanmedian(self, exclude_center):
+        """Windows of 17 or more values along one axis (filtered by sliding a sorted window) match nanmedian."""
+        rng = np.random.default_rng(10)
+        a = np.round(rng.normal(size=(20, 21, 22)), 1)
+        a[rng.random(a.shape) < 0.05] = np.nan
+        for axis, size in [(0, 17), (1, 19), (2, 21)]:
+            sizes = [1, 1, 1]
+            sizes[2 - axis] = size
+            pad = [(0, 0)] * 3
+            pad[axis] = (size // 2, size // 2)
+            windows = np.lib.stride_tricks.sliding_window_view(
+                np.pad(a, pad, constant_values=np.nan), size, axis=axis).copy()
+            if exclude_center:
+                windows[..., size // 2] = np.nan
+            expected = np.nanmedian(windows, axis=-1)
+            for num_threads in (1, 3):
+                np.testing.assert_array_equal(
+                    fmedian3(a, *sizes, exclude_center, num_threads=num_threads), expected)
+
+    def test_separable_differs_from_exact_but_removes_outliers(self):
+        """The separable median is not the 3D median, but still removes isolated spikes."""
+        rng = np.random.default_rng(7)
+        a = rng.normal(size=(12, 12, 12))
+        spikes = rng.random(a.shape) < 0.02
+        a[spikes] = 1000.0
+        exact = fmedian3(a, 5, 5, 5)
+        separable = fmedian3(a, 5, 5, 5, method="separable")
+        assert not np.array_equal(separable, exact)
+        assert np.abs(separable).max() < 10
+        assert np.std(separable) < np.std(a[~spikes])
+
+    @pytest.mark.parametrize("method", ["exact", "separable"])
+    @pytest.mark.parametrize("sizes", [(1, 1, 1), (1, 1, 3), (3, 1, 5), (3, 3, 3)])
+    def test_out_buffer_reused(self, method, sizes):
+        """out= is written in place and returned, whatever the number of separable passes."""
+        rng = np.random.default_rng(9)
+        a = rng.normal(size=(6, 7, 8))
+        out = np.full_like(a, np.nan)
+        assert fmedian3(a, *sizes, 1, method=method, out=out) is out
+        np.testing.assert_array_equal(out, fmedian3(a, *sizes, 1, method=method))
+
 
 class TestFmedian3EdgeCases:
     """Test fmedian3 with edge cases, boundaries, and special values."""
@@ -167,7 +296,33 @@ class TestFmedian3Validation:
         input_2d = np.ones((3, 3), dtype=np.float64)
         with pytest.raises(ValueError, match="must be 3-dimensional"):
             fmedian3(input_2d, 3, 3, 3, 1)
+
+        with pytest.raises(ValueError, match="method must be"):
+            fmedian3(input_arr, 3, 3, 3, 1, method="fast")
+
+        with pytest.raises(ValueError, match="num_threads"):
+            fmedian3(input_arr, 3, 3, 3, 1, num_threads=0)
     
+    def test_fmedian3_rejects_bad_out(self):
+        """out must be a float64 array of the input shape that does not alias it."""
+        a = np.ones((3, 4, 5))
+        with pytest.raises(TypeError, match="float64"):
+            fmedian3(a, 3, 3, 3, out=np.empty((3, 4, 5), dtype=np.float32))
+        with pytest.raises(ValueError, match="shape"):
+            fmedian3(a, 3, 3, 3, out=np.empty((5, 4, 3)))
+        with pytest.raises(ValueError, match="overlap"):
+            fmedian3(a, 3, 3, 3, method="separable", out=a)
+
+    def test_fmedian3_rejects_readonly_out(self):
+        """A read-only out is refused by every method, so separable never writes its passes into it."""
+        a = np.arange(60.0).reshape(3, 4, 5)
+        readonly = np.zeros((3, 4, 5))
+        readonly.flags.writeable = False
+        for method in ("exact", "separable"):
+            with pytest.raises(ValueError, match="writeable"):
+                fmedian3(a, 3, 3, 3, method=method, out=readonly)
+        assert np.all(readonly == 0.0)
+
     def test_fmedian3_requires_sizes_not_none(self):
         """Test fmedian3 requires non-None sizes."""
         a = np.ones((3, 3, 3), dtype=np.float64)
@@ -10,6 +10,21 @@ import pytest
 
 from ftools import fsigma
 from ftools.fsigma import fsigma as fsigma_direct
+from ftools.fsigma import fsigma_u16
+
+
+@pytest.fixture(scope="module")
+def buf5():
+    """One 5x5 output buffer shared by the tests of this module."""
+    return np.empty((5, 5), dtype=np.float64)
+
+
+@pytest.fixture(scope="module")
+def ramp5():
+    """A read-only 5x5 ramp (0..24) shared as input by the tests of this module."""
+    a = np.arange(25, dtype=np.float64).reshape(5, 5)
+    a.flags.writeable = False
+    return a
 
 
 class TestFsigmaCore:
@@ -113,6 +128,172 @@ class TestFsigmaCore:
         assert out.dtype == np.float64
         assert out.shape == a.shape
 
+    def test_fsigma_strided_view_input(self):
+        """Strided views give the same result as a contiguous copy."""
+        rng = np.random.default_rng(3)
+        big = rng.normal(size=(20, 30))
+        view = big[2:-2:2, 1::3]
+        assert not view.flags.c_contiguous
+        np.testing.assert_array_equal(fsigma(view, (3, 3), 1),
+                                      fsigma(view.copy(), (3, 3), 1))
+
+    @pytest.mark.parametrize("xsize,ysize,exclude_center", [(3, 3, 0), (5, 3, 1), (1, 1, 1)])
+    def test_fsigma_out_buffer_reused(self, buf5, xsize, ysize, exclude_center):
+        """out= is fully overwritten on every call, so one buffer serves many calls."""
+        a = np.random.default_rng(2).normal(size=(5, 5))
+        buf5.fill(np.nan)
+        assert fsigma_direct(a, xsize, ysize, exclude_center, out=buf5) is buf5
+        np.testing.assert_array_equal(buf5, fsigma_direct(a, xsize, ysize, exclude_center))
+
+    def test_fsigma_float32_matches_float64_path(self):
+        """float32 input is read directly and gives the result for the input converted to float64."""
+        rng = np.random.default_rng(14)
+        a = rng.normal(size=(40, 37)).astype(np.float32)
+        a[rng.random(a.shape) < 0.05] = np.nan
+        for exclude_center in (0, 1):
+            out = fsigma_direct(a, 5, 3, exclude_center)
+            assert out.dtype == np.float64
+            np.testing.assert_array_equal(out, fsigma_direct(a.astype(np.float64), 5, 3, exclude_center))
+        view = a[::2, 1::3]
+        np.testing.assert_array_equal(fsigma_direct(view, 3, 3), fsigma_direct(view.astype(np.float64), 3, 3))
+
+    @pytest.mark.parametrize("dtype", [np.float32, np.float64])
+    def test_fsigma_vector_path_matches_scalar_path(self, dtype):
+        """Contiguous input (filtered several pixels at a time) gives exactly the per-pixel result."""
+        from ftools.fsigma import fsigma_ext
+
+        rng = np.random.default_rng(15)
+        a = rng.normal(size=(31, 45)).astype(dtype)
+        a[rng.random(a.shape) < 0.03] = np.nan
+        a[5, 20] = np.inf
+        # A strided view of the same values, which the kernel filters pixel by pixel
+        wide = np.empty((31, 90), dtype=dtype)
+        wide[:, ::2] = a
+        for xsize, ysize in [(1, 3), (3, 1), (3, 3), (5, 5), (7, 5), (15, 9), (1, 35), (35, 1)]:
+            for exclude_center in (0, 1):
+                expected = np.empty(a.shape)
+                fsigma_ext.fsigma(wide[:, ::2], expected, xsize, ysize, exclude_center)
+                np.testing.assert_array_equal(fsigma_direct(a, xsize, ysize, exclude_center), expected)
+
+    @pytest.mark.parametrize("dtype", [np.float32, np.float64])
+    def test_running_method_matches_exact(self, dtype):
+        """method="running" agrees with "exact" to rounding, including NaN, inf and edges."""
+        rng = np.random.default_rng(23)
+        a = (1000.0 + rng.normal(size=(150, 70))).astype(dtype)
+        a[rng.random(a.shape) < 0.05] = np.nan
+        a[10, 10] = np.inf
+        a[140, 3] = -np.inf
+        for xsize, ysize in [(1, 1), (3, 3), (5, 3), (9, 9), (31, 7), (7, 1), (1, 5), (1, 101), (151, 3)]:
+            for exclude_center in (0, 1):
+                expected = fsigma_direct(a, xsize, ysize, exclude_center)
+                out = fsigma_direct(a, xsize, ysize, exclude_center, method="running")
+                np.testing.assert_allclose(out, expected, rtol=0, atol=1e-6)
+                # Rows are filtered in bands that do not depend on the thread count
+                np.testing.assert_array_equal(
+                    fsigma_direct(a, xsize, ysize, exclude_center, method="running", num_threads=3), out)
+
+    def test_running_method_recomputes_ill_conditioned_windows(self):
+        """A small spread far from the array mean keeps its relative accuracy with method="running"."""
+        rng = np.random.default_rng(24)
+        a = 1e6 + 1e-3 * rng.normal(size=(120, 90))
+        a[:, :45] += 1e3
+        a[30:60, 60:80] = 7.0
+        expected = fsigma_direct(a, 5, 5)
+        out = fsigma_direct(a, 5, 5, method="running")
+        np.testing.assert_allclose(out, expected, rtol=1e-9)
+        assert np.all(out[32:58, 62:78] == 0.0)
+
+    def test_running_method_keeps_accuracy_along_wide_rows(self):
+        """Rounding errors of method="running" do not build up along very wide rows."""
+        rng = np.random.default_rng(25)
+        width = 200000
+        a = 300 * np.sin(np.arange(width) * (20 * np.pi / width)) + rng.normal(size=(3, width))
+        expected = fsigma_direct(a, 7, 3)
+        out = fsigma_direct(a, 7, 3, method="running")
+        np.testing.assert_allclose(out, expected, rtol=1e-9)
+
+    def test_numba_fallback_matches_extension(self):
+        """The Numba fallback agrees with the C extension to rounding, running sums included."""
+        pytest.importorskip("numba")
+        from ftools.fsigma import _numba_impl, fsigma_ext
+
+        rng = np.random.default_rng(17)
+        a = rng.normal(size=(13, 17))
+        a[rng.random(a.shape) < 0.1] = np.nan
+        a[2, 3] = np.inf
+        counts = rng.integers(0, 1000, size=a.shape).astype(np.uint16)
+        for xsize, ysize in [(1, 1), (3, 3), (5, 3), (9, 9)]:
+            for exclude_center in (0, 1):
+                for name, arr in [("fsigma", a), ("fsigma", a.astype(np.float32)), ("fsigma_u16", counts),
+                                  ("fsigma_running", 1e3 + a), ("fsigma_running", a.astype(np.float32))]:
+                    expected = np.empty(a.shape)
+                    out = np.empty(a.shape)
+                    getattr(fsigma_ext, name)(arr, expected, xsize, ysize, exclude_center)
+                    getattr(_numba_impl, name)(arr, out, xsize, ysize, exclude_center)
+                    np.testing.assert_allclose(out, expected, rtol=1e-12, atol=1e-15)
+
+    def test_cuda_device_matches_cpu(self):
+        """device="cuda" agrees with the CPU result to rounding, as numpy or cupy arrays."""
+        cp = pytest.importorskip("cupy")
+        if cp.cuda.runtime.getDeviceCount() == 0:
+            pytest.skip("no CUDA device")
+
+        rng = np.random.default_rng(18)
+        a = rng.normal(size=(37, 45))
+        a[rng.random(a.shape) < 0.1] = np.nan
+        a[:5, :5] = np.nan
+        for xsize, ysize in [(1, 1), (3, 3), (5, 3), (9, 9)]:
+            for exclude_center in (0, 1):
+                expected = fsigma_direct(a, xsize, ysize, exclude_center)
+                out = fsigma_direct(a, xsize, ysize, exclude_center, device="cuda")
+                np.testing.assert_allclose(out, expected, rtol=1e-12, atol=1e-15)
+                result = fsigma_direct(cp.asarray(a), xsize, ysize, exclude_center, device="cuda")
+                assert isinstance(result, cp.ndarray)
+                np.testing.assert_allclose(cp.asnumpy(result), expected, rtol=1e-12, atol=1e-15)
+
+    def test_fsigma_num_threads_matches_serial(self):
+        """Multi-threaded filtering gives exactly the single-threaded result."""
+        rng = np.random.default_rng(13)
+        a = rng.normal(size=(120, 90))
+        a[rng.random(a.shape) < 0.05] = np.nan
+        serial = fsigma_direct(a, 5, 3, 1, num_threads=1)
+        for num_threads in (2, 3, None):
+            np.testing.assert_array_equal(fsigma_direct(a, 5, 3, 1, num_threads=num_threads), serial)
+
+    @pytest.mark.parametrize("dtype", [np.int8, np.uint8, np.int16, np.uint16])
+    def test_fsigma_u16_matches_float_path(self, dtype):
+        """The running-sum kernel agrees with the float64 path to rounding."""
+        rng = np.random.default_rng(6)
+        info = np.iinfo(dtype)
+        for shape in [(1, 1), (1, 9), (7, 1), (23, 31)]:
+            a = rng.integers(info.min, info.max, size=shape, endpoint=True).astype(dtype)
+            for xsize, ysize in [(1, 1), (3, 3), (5, 1), (1, 7), (9, 5), (51, 51)]:
+                for exclude_center in (0, 1):
+                    expected = fsigma_direct(a.astype(np.float64), xsize, ysize, exclude_center)
+                    out = fsigma_u16(a, xsize, ysize, exclude_center)
+                    assert out.dtype == np.float64
+                    np.testing.assert_allclose(out, expected, rtol=1e-12, atol=1e-9)
+                    # fsigma sends these dtypes to the same kernel
+                    np.testing.assert_array_equal(fsigma_direct(a, xsize, ysize, exclude_center), out)
+
+    def test_matches_nanstd_reference_on_large_image(self):
+        """A 512x512 image with NaNs matches np.nanstd over each truncated window."""
+        rng = np.random.default_rng(22)
+        a = rng.normal(100.0, 10.0, size=(512, 512))
+        a[rng.random(a.shape) < 0.01] = np.nan
+        for xsize, ysize in [(3, 3), (5, 3)]:
+            # NaN padding truncates the windows at the edges, like fsigma
+            padded = np.pad(a, ((ysize // 2,), (xsize // 2,)), constant_values=np.nan)
+            windows = np.lib.stride_tricks.sliding_window_view(padded, (ysize, xsize))
+            windows = windows.reshape(a.shape + (-1,))
+            for exclude_center in (0, 1):
+                values = windows.copy()
+                if exclude_center:
+                    values[..., values.shape[-1] // 2] = np.nan
+                expected = np.nanstd(values, axis=-1)
+                np.testing.assert_allclose(fsigma(a, (xsize, ysize), exclude_center),
+                                           expected, rtol=1e-10)
+
     def test_fsigma_5x5_single_outlier(self):
         """Test fsigma with 5x5 dataset containing a single non-zero value.
         
@@ -187,10 +368,10 @@ class TestFsigmaEdgeCases:
         assert np.all(np.isfinite(out))
         assert np.all(out >= 0.0)
 
-    def test_fsigma_asymmetric_windows(self):
+    def test_fsigma_asymmetric_windows(self, ramp5):
         """Test fsigma with asymmetric window sizes (xsize != ysize)."""
-        a = np.arange(25, dtype=np.float64).reshape(5, 5)
-        
+        a = ramp5
+
         # Wide horizontal window
         out1 = fsigma(a, (5, 1), 1)
         assert out1.shape == a.shape
@@ -302,10 +483,9 @@ class TestFsigmaEdgeCases:
         assert np.isfinite(out[2, 0]) and out[2, 0] >= 0.0
         assert np.isfinite(out[2, 2]) and out[2, 2] >= 0.0
 
-    def test_fsigma_edge_pixels(self):
+    def test_fsigma_edge_pixels(self, ramp5):
         """Test fsigma handles edge pixels (partial windows) correctly."""
-        a = np.arange(25, dtype=np.float64).reshape(5, 5)
-        out = fsigma(a, (3, 3), 1)
+        out = fsigma(ramp5, (3, 3), 1)
         
         # Check all edge pixels are finite and non-negative
         assert np.all(np.isfinite(out[0, :])) and np.all(out[0, :] >= 0.0)
@@ -360,6 +540,20 @@ class TestFsigmaEdgeCases:
 class TestFsigmaValidation:
     """Test parameter validation and error handling for fsigma."""
     
+    def test_fsigma_rejects_bad_method(self):
+        """method must be "exact" or "running"."""
+        with pytest.raises(ValueError, match="method must be"):
+            fsigma_direct(np.ones((3, 3)), 3, 3, method="integral")
+
+    def test_fsigma_rejects_bad_device(self):
+        """device must be "cpu" or "cuda", and out is not supported on the GPU."""
+        a = np.ones((3, 3), dtype=np.float64)
+        with pytest.raises(ValueError, match="device must be"):
+            fsigma_direct(a, 3, 3, device="gpu")
+        with pytest.raises(ValueError, match="out is not supported"):
+            fsigma_direct(a, 3, 3, out=np.empty((3, 3)), device="cuda")
+        np.testing.assert_array_equal(fsigma_direct(a, 3, 3, device="cpu"), fsigma_direct(a, 3, 3))
+
     def test_fsigma_requires_x_y_sizes_not_none(self):
         """Test fsigma requires non-None sizes."""
         a = np.ones((3, 3), dtype=np.float64)
@@ -376,6 +570,39 @@ class TestFsigmaValidation:
         with pytest.raises(ValueError, match="ysize must be an odd number"):
             fsigma_direct(a, 3, 2, 0)
     
+    def test_fsigma_rejects_bad_out(self, buf5):
+        """out must be a float64 array of the input shape that does not alias it."""
+        a = np.ones((5, 5))
+        with pytest.raises(TypeError, match="float64"):
+            fsigma_direct(a, 3, 3, out=buf5.astype(np.float32))
+        with pytest.raises(ValueError, match="shape"):
+            fsigma_direct(np.ones((4, 5)), 3, 3, out=buf5)
+        with pytest.raises(ValueError, match="overlap"):
+            fsigma_direct(buf5, 3, 3, out=buf5)
+
+    def test_fsigma_rejects_readonly_out(self):
+        """A read-only out is refused, on the float and the 8/16-bit paths, and left unchanged."""
+        readonly = np.zeros((5, 5))
+        readonly.flags.writeable = False
+        for a in (np.arange(25.0).reshape(5, 5), np.arange(25, dtype=np.uint16).reshape(5, 5)):
+            for method in ("exact", "running"):
+                with pytest.raises(ValueError, match="writeable"):
+                    fsigma_direct(a, 3, 3, out=readonly, method=method)
+        with pytest.raises(ValueError, match="writeable"):
+            fsigma_u16(np.ones((5, 5), dtype=np.uint8), 3, 3, out=readonly)
+        assert np.all(readonly == 0.0)
+
+    def test_fsigma_rejects_bad_num_threads(self):
+        """num_threads must be a positive number (or None)."""
+        with pytest.raises(ValueError, match="num_threads"):
+            fsigma_direct(np.ones((5, 5)), 3, 3, num_threads=0)
+
+    def test_fsigma_u16_rejects_other_dtypes(self):
+        """fsigma_u16 only accepts 8- and 16-bit integer input."""
+        for dtype in (np.int32, np.float64, np.bool_):
+            with pytest.raises(TypeError, match="fsigma_u16 requires"):
+                fsigma_u16(np.zeros((4, 4), dtype=dtype), 3, 3)
+
     def test_fsigma_negative_xsize(self):
         """Test fsigma rejects negative xsize."""
         a = np.ones((3, 3), dtype=np.float64)
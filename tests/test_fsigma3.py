@@ -9,6 +9,7 @@ import numpy as np
 import pytest
 
 from ftools import fsigma3d as fsigma3
+from ftools.fsigma3 import _c_fsigma3
 from ftools.fsigma3 import fsigma3 as fsigma3_direct
 
 
@@ -94,6 +95,106 @@ class TestFsigma3Core:
         
         assert np.all(out >= 0.0)
 
+    def test_fsigma3_strided_view_input(self):
+        """Strided views give the same result as a contiguous copy."""
+        rng = np.random.default_rng(3)
+        big = rng.normal(size=(10, 12, 14))
+        view = big[::2, 1:-1, ::3]
+        assert not view.flags.c_contiguous
+        np.testing.assert_array_equal(fsigma3(view, 3, 3, 3, 1),
+                                      fsigma3(view.copy(), 3, 3, 3, 1))
+
+    def test_vector_path_matches_scalar_path(self):
+        """Contiguous output rows (filtered several voxels at a time) get exactly the per-voxel result.
+
+        That includes windows holding NaNs, which the vector path masks out,
+        and windows holding nothing but NaNs, which give 0.
+        """
+        rng = np.random.default_rng(14)
+        a = rng.normal(size=(7, 9, 23))
+        a[rng.random(a.shape) < 0.02] = np.nan
+        a[1:6, 2:7, 8:18] = np.nan
+        a[3, 4, 5] = np.inf
+        for sizes in [(3, 1, 1), (1, 1, 3), (3, 3, 3), (5, 3, 1)]:
+            for exclude_center in (0, 1):
+                # Output rows with a stride of two doubles go through the per-voxel path
+                strided = np.empty(a.shape + (2,))[..., 0]
+                _c_fsigma3(a, strided, *sizes, exclude_center)
+                np.testing.assert_array_equal(fsigma3_direct(a, *sizes, exclude_center), strided)
+        assert np.all(fsigma3_direct(a, 3, 3, 3)[2:5, 3:6, 9:17] == 0.0)
+
+    def test_matches_numpy_std_in_interior(self):
+        """Voxels with full windows match np.std of each window."""
+        rng = np.random.default_rng(13)
+        a = rng.normal(size=(7, 8, 9))
+        for xsize, ysize, zsize in [(3, 3, 3), (5, 3, 1), (1, 3, 5)]:
+            windows = np.lib.stride_tricks.sliding_window_view(a, (zsize, ysize, xsize))
+            windows = windows.reshape(windows.shape[:3] + (-1,))
+            interior = (slice(zsize // 2, a.shape[0] - zsize // 2),
+                        slice(ysize // 2, a.shape[1] - ysize // 2),
+                        slice(xsize // 2, a.shape[2] - xsize // 2))
+            for exclude_center in (0, 1):
+                values = np.delete(windows, windows.shape[-1] // 2, axis=-1) if exclude_center else windows
+                out = fsigma3(a, xsize, ysize, zsize, exclude_center)
+                np.testing.assert_allclose(out[interior], values.std(axis=-1), rtol=1e-12, atol=1e-14)
+
+    def test_running_method_matches_exact(self):
+        """method="running" agrees with "exact" to rounding, including NaN, inf and edges."""
+        rng = np.random.default_rng(15)
+        a = 1000.0 + rng.normal(size=(37, 21, 25))
+        a[rng.random(a.shape) < 0.05] = np.nan
+        a[5, 5, 5] = np.inf
+        a[30, 2, 20] = -np.inf
+        for sizes in [(1, 1, 1), (3, 3, 3), (5, 3, 1), (1, 1, 7), (9, 9, 9), (3, 43, 3)]:
+            for exclude_center in (0, 1):
+                expected = fsigma3_direct(a, *sizes, exclude_center)
+                out = fsigma3_direct(a, *sizes, exclude_center, method="running")
+                np.testing.assert_allclose(out, expected, rtol=0, atol=1e-6)
+
+    def test_running_method_recomputes_ill_conditioned_windows(self):
+        """A small spread far from the array mean keeps its relative accuracy with method="running"."""
+        rng = np.random.default_rng(16)
+        a = 1e6 + 1e-3 * rng.normal(size=(20, 24, 28))
+        a[:, :, :14] += 1e3
+        a[5:15, 5:15, 18:26] = 7.0
+        expected = fsigma3_direct(a, 3, 3, 3)
+        out = fsigma3_direct(a, 3, 3, 3, method="running")
+        np.testing.assert_allclose(out, expected, rtol=1e-9)
+        assert np.all(out[6:14, 6:14, 19:25] == 0.0)
+    @pytest.mark.parametrize("method", ["exact", "running"])
+    def test_out_buffer_reused(self, method):
+        """out= is written in place and returned, also as a strided view."""
+        rng = np.random.default_rng(20)
+        a = rng.normal(size=(6, 7, 8))
+        expected = fsigma3_direct(a, 3, 3, 3, 1, method=method)
+        out = np.full_like(a, np.nan)
+        assert fsigma3_direct(a, 3, 3, 3, 1, method=method, out=out) is out
+        np.testing.assert_array_equal(out, expected)
+        wide = np.full((6, 7, 16), np.nan)
+        fsigma3_direct(a, 3, 3, 3, 1, method=method, out=wide[:, :, ::2])
+        np.testing.assert_array_equal(wide[:, :, ::2], expected)
+        assert np.isnan(wide[:, :, 1::2]).all()
+
+    def test_numba_fallback_matches_extension(self):
+        """The Numba fallback agrees with the C extension to rounding, running sums included."""
+        pytest.importorskip("numba")
+        from ftools.fsigma3 import _numba_impl, fsigma3_ext
+
+        rng = np.random.default_rng(19)
+        a = 1000.0 + rng.normal(size=(70, 11, 13))
+        a[rng.random(a.shape) < 0.1] = np.nan
+        a[3, 4, 5] = np.inf
+        a[2:8, 2:8, 2:8] = 5.0
+        for sizes in [(1, 1, 1), (3, 3, 3), (5, 3, 1), (3, 3, 9)]:
+            for exclude_center in (0, 1):
+                # Running sums of values near 1000 differ in the last ~1e-9
+                for name, atol in [("fsigma3", 1e-12), ("fsigma3_running", 1e-8)]:
+                    expected = np.empty(a.shape)
+                    out = np.empty(a.shape)
+                    getattr(fsigma3_ext, name)(a, expected, *sizes, exclude_center)
+                    getattr(_numba_impl, name)(a, out, *sizes, exclude_center)
+                    np.testing.assert_allclose(out, expected, rtol=0, atol=atol)
+
 
 class TestFsigma3EdgeCases:
     """Test fsigma3 with edge cases, boundaries, and special values."""
@@ -225,6 +326,33 @@ class TestFsigma3Validation:
         out = fsigma3_direct(a, 3.0, 3.0, 3.0, 0)
         assert out.shape == a.shape
     
+    def test_fsigma3_rejects_bad_method(self):
+        """method must be "exact" or "running"."""
+        with pytest.raises(ValueError, match="method must be"):
+            fsigma3_direct(np.ones((3, 3, 3)), 3, 3, 3, method="integral")
+
+    def test_fsigma3_rejects_bad_out(self):
+        """out must be a float64 array of the input shape that does not alias it."""
+        a = np.ones((3, 4, 5))
+        with pytest.raises(TypeError, match="float64"):
+            fsigma3_direct(a, 3, 3, 3, out=np.empty((3, 4, 5), dtype=np.float32))
+        with pytest.raises(ValueError, match="shape"):
+            fsigma3_direct(a, 3, 3, 3, out=np.empty((5, 4, 3)))
+        with pytest.raises(ValueError, match="overlap"):
+            fsigma3_direct(a, 3, 3, 3, out=a)
+
+    def test_fsigma3_rejects_readonly_out(self):
+        """A read-only out is refused before anything is written to it, also by the extension."""
+        a = np.arange(60.0).reshape(3, 4, 5)
+        readonly = np.zeros((3, 4, 5))
+        readonly.flags.writeable = False
+        for method in ("exact", "running"):
+            with pytest.raises(ValueError, match="writeable"):
+                fsigma3_direct(a, 3, 3, 3, method=method, out=readonly)
+        with pytest.raises(ValueError, match="writeable"):
+            _c_fsigma3(a, readonly, 3, 3, 3, 0)
+        assert np.all(readonly == 0.0)
+
     def test_fsigma3_empty_array(self):
         """Test fsigma3 with empty array."""
         a = np.array([], dtype=np.float64).reshape(0, 0, 0)
@@ -0,0 +1,76 @@
+import importlib
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+class TestImports:
+    """Import-time behaviour of the package and its extension loaders."""
+
+    @pytest.mark.parametrize(
+        "module, ext",
+        [
+            ("ftools.fmedian", "ftools.fmedian.fmedian_ext"),
+            ("ftools.fsigma", "ftools.fsigma.fsigma_ext"),
+            ("ftools.fmedian3", "ftools.fmedian3.fmedian3_ext"),
+            ("ftools.fsigma3", "ftools.fsigma3.fsigma3_ext"),
+        ],
+    )
+    def test_loader_imports_packaged_extension(self, module, ext):
+        """Each loader resolves its extension as a package submodule."""
+        importlib.import_module(module)
+        assert sys.modules[module]._ext.__name__ == ext
+
+    def test_public_names(self):
+        import ftools
+
+        for name in ftools.__all__:
+            assert callable(getattr(ftools, name))
+        assert set(ftools.__all__) <= set(dir(ftools))
+
+    def test_dispatchers_not_shadowed_by_subpackages(self):
+        import ftools
+
+        assert callable(ftools.fmedian) and callable(ftools.fsigma)
+        assert ftools.fmedian.__module__ == "ftools"
+        assert ftools.fsigma.__module__ == "ftools"
+
+    def test_unknown_attribute(self):
+        import ftools
+
+        with pytest.raises(AttributeError):
+            ftools.does_not_exist  # noqa: B018
+
+    def test_fsigma_extension_loaded_on_first_call(self):
+        """The fsigma extension is loaded by the first fsigma() call, not by the import."""
+        code = (
+            "import sys, ftools, numpy\n"
+            "assert 'ftools.fsigma.fsigma_ext' not in sys.modules\n"
+            "ftools.fsigma(numpy.ones((3, 3)), (3, 3))\n"
+            "assert 'ftools.fsigma.fsigma_ext' in sys.modules\n"
+        )
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        subprocess.run([sys.executable, "-c", code], check=True, env=env)
+
+    def test_fsigma_package_forwards_to_extension(self):
+        """Unknown public names on ftools.fsigma are looked up on the extension."""
+        import ftools  # noqa: F401
+
+        package = sys.modules["ftools.fsigma"]
+        assert package.__getattr__("fsigma") is package._ext.fsigma
+        with pytest.raises(AttributeError):
+            package.does_not_exist  # noqa: B018
+
+    def test_lazy_extensions_not_loaded_on_import(self):
+        """Importing ftools loads only the 2D extensions."""
+        code = (
+            "import sys, ftools\n"
+            "lazy = ['ftools.fmedian3', 'ftools.fsigma3', 'ftools.fgaussian']\n"
+            "assert not [m for m in lazy if m in sys.modules], sys.modules.keys()\n"
+            "ftools.fgaussian_f32\n"
+            "assert 'ftools.fgaussian' in sys.modules\n"
+        )
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        subprocess.run([sys.executable, "-c", code], check=True, env=env)
@@ -1,6 +1,6 @@
 import numpy as np
 
-from ftools import fmedian, fsigma
+from ftools import fmedian, fsigma, make_fmedian, make_fsigma
 
 
 def test_smoke_integration_basic():
@@ -25,3 +25,34 @@ def test_smoke_integration_basic():
     # Ensure the pipeline continues to accept fmedian output
     sig2 = fsigma(med, (1, 1), 1)
     assert sig2.shape == arr.shape
+
+
+def test_bound_filters_match_dispatchers():
+    """make_fmedian/make_fsigma give the dispatcher result for 2D and 3D windows."""
+    rng = np.random.default_rng(7)
+    for shape, window in [((12, 15), (3, 5)), ((5, 6, 7), (3, 3, 1))]:
+        arr = rng.normal(size=shape)
+        for exclude_center in (0, 1):
+            np.testing.assert_array_equal(make_fmedian(window, exclude_center)(arr),
+                                          fmedian(arr, window, exclude_center))
+            np.testing.assert_array_equal(make_fsigma(window, exclude_center)(arr),
+                                          fsigma(arr, window, exclude_center))
+
+
+def test_dispatchers_write_into_out():
+    """out= is passed through by the dispatchers and the bound filters, and returned."""
+    rng = np.random.default_rng(8)
+    arr = rng.normal(size=(12, 15))
+    buf = np.empty_like(arr)
+    for window in [(3, 5), (1, 1)]:
+        assert fmedian(arr, window, 1, out=buf) is buf
+        np.testing.assert_array_equal(buf, fmedian(arr, window, 1))
+        assert make_fsigma(window)(arr, out=buf) is buf
+        np.testing.assert_array_equal(buf, fsigma(arr, window))
+
+    cube = rng.normal(size=(5, 6, 7))
+    buf = np.empty_like(cube)
+    assert make_fmedian((3, 3, 3))(cube, out=buf) is buf
+    np.testing.assert_array_equal(buf, fmedian(cube, (3, 3, 3)))
+    assert fsigma(cube, (3, 3, 3), 1, out=buf) is buf
+    np.testing.assert_array_equal(buf, fsigma(cube, (3, 3, 3), 1))